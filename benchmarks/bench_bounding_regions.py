@@ -0,0 +1,69 @@
+"""Compares parsing the bounding regions of citations one citation at a time with the batched NumPy parse.
+
+Before: each source string was split into its regions, and every number was converted separately, as a client
+highlighting the citations of a response had to do. After: the regions of all the citations of a response are
+found with a single regular expression per source, and all their numbers are converted in one NumPy call.
+
+Usage:
+    python benchmarks/bench_bounding_regions.py [--citations 10 100 1000] [--regions-per-citation 2] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utils.bounding_box_utils import parse_bounding_regions  # noqa: E402
+
+
+def _parse_one_at_a_time(sources: list[str]) -> list[list[tuple[int, list[float]]]]:
+    parsed_sources = []
+    for source in sources:
+        regions = []
+        for region in source.split(";"):
+            values = region.strip()[2:-1].split(",")
+            regions.append((int(values[0]), [float(value) for value in values[1:]]))
+        parsed_sources.append(regions)
+    return parsed_sources
+
+
+def _build_sources(citations: int, regions_per_citation: int) -> list[str]:
+    return [
+        ";".join(
+            f"D({page + 1},1.0512,2.1243,7.4412,2.1243,7.4412,2.5123,1.0512,{2.5123 + citation / 1000:.4f})"
+            for page in range(regions_per_citation)
+        )
+        for citation in range(citations)
+    ]
+
+
+def _measure(parse, sources: list[str], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(sources)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--citations", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--regions-per-citation", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for citations in args.citations:
+        sources = _build_sources(citations, args.regions_per_citation)
+        before = _measure(_parse_one_at_a_time, sources, args.repeat)
+        after = _measure(parse_bounding_regions, sources, args.repeat)
+        print(
+            f"{citations:>5} citations: one at a time {before * 1000:7.3f} ms, "
+            f"batched {after * 1000:7.3f} ms ({before / after:.1f}x), best of {args.repeat}"
+        )
+
+
+if __name__ == "__main__":
+    main()
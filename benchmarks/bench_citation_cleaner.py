@@ -0,0 +1,77 @@
+"""Compares the previous four-pass citation cleanup with the current single-pass cleanup.
+
+The previous cleanup ran four regular expression substitutions on every response of the assistant: the citations
+between words, the other citations, the whitespace runs and the whitespace before punctuation. The current
+cleanup removes the citations in a single pass over their matches, skipped for texts without citations, then
+fixes the spacing with a single substitution.
+
+Usage:
+    python benchmarks/bench_citation_cleaner.py [--responses 1000] [--repeat 10]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utils.citation_cleaner import remove_inline_citations_preserve_spacing  # noqa: E402
+
+
+def _legacy_remove_inline_citations_preserve_spacing(text: str) -> str:
+    if not text:
+        return text
+    result = re.sub(r'(\S)\[\d+\](\S)', r'\1 \2', text)
+    result = re.sub(r'\[\d+\]', '', result)
+    result = re.sub(r'\s{2,}', ' ', result)
+    result = re.sub(r'\s+([,.;:!?])', r'\1', result)
+    return result
+
+
+def _build_responses(responses: int) -> list[str]:
+    rng = random.Random(7)
+    sentences = [
+        "The lease for collection 3OAS074 expires on December 31, 2030[{}].",
+        "The current rent amount is $12,500 per month, payable in advance[{}] .",
+        "The tenant has waived any unilateral termination rights[{}][{}].",
+        "The equipment includes 3 forklifts and 2 conveyors[{}], as listed in the amendment[{}].",
+        "No renewal option was found in the documents of this collection.",
+    ]
+    return [
+        " ".join(
+            sentence.format(*range(1, 3))
+            for sentence in rng.choices(sentences, k=rng.randint(1, 8))
+        )
+        for _ in range(responses)
+    ]
+
+
+def _measure(clean, responses: list[str], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for response in responses:
+            clean(response)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    responses = _build_responses(args.responses)
+    before = _measure(_legacy_remove_inline_citations_preserve_spacing, responses, args.repeat)
+    after = _measure(remove_inline_citations_preserve_spacing, responses, args.repeat)
+    print(f"{args.responses} responses, best of {args.repeat}")
+    print(f"four passes:  {before * 1000:8.2f} ms")
+    print(f"single pass:  {after * 1000:8.2f} ms ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Compares the previous recursive CitationMapper with the current single-pass CitationMapper.
+
+The previous mapper walked the fields with recursive helpers, removed keys from the collection data in place and
+rebuilt the spreadsheet-style suffix of every alias from its number. The current mapper copies the fields in a
+single pass over an explicit stack and takes the aliases from a generator.
+
+Synthetic collections are built with string fields and an array of objects per lease, as dumped by the
+collection plugin before the citations are replaced.
+
+Usage:
+    python benchmarks/bench_citation_mapper.py [--leases 10 100 1000] [--repeat 10]
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.citation_mapper import CitationMapper  # noqa: E402
+
+
+class _LegacyCitationMapper:
+    """The mapping previously done by CitationMapper, without the docstrings."""
+
+    def process_json(self, data: dict):
+        mapping = {}
+        id = data["_id"]
+        alias_counter = 1
+        for lease in data.get('unstructured_data', []):
+            self._replace_citations(lease.get('fields', {}), mapping, id, [alias_counter])
+            alias_counter = alias_counter + len(lease.get('fields', {}))
+        return data, mapping
+
+    def _convert_number_to_excel_column(self, number):
+        result = ""
+        while number > 0:
+            number -= 1
+            result = chr(65 + (number % 26)) + result
+            number //= 26
+        return result
+
+    def _process_dict_element(self, field_elem, field_key, fields_to_delete, mapping, id, alias_counter,
+                              document=None):
+        if not any(key.startswith('value') for key in field_elem.keys()):
+            fields_to_delete.add(field_key)
+            return False
+        field_elem.pop('type', None)
+        if ('document' in field_elem and field_elem['document']) or document:
+            _document = document or field_elem['document']
+            if 'valueArray' in field_elem:
+                for item in field_elem['valueArray']:
+                    self._replace_citations(item['valueObject'], mapping, id, alias_counter, _document)
+                field_elem.pop('document', None)
+                return False
+            alias = f"CITE{id}-{self._convert_number_to_excel_column(alias_counter[0])}"
+            mapping[alias] = {"source_document": _document, "source_bounding_boxes": field_elem.get('source')}
+            field_elem['document'] = alias
+            field_elem.pop('source', None)
+            alias_counter[0] += 1
+        return True
+
+    def _replace_citations(self, fields, mapping, id, alias_counter, document=None):
+        fields_to_delete = set()
+        for field_key, field_value in fields.items():
+            field_elems = field_value if isinstance(field_value, list) else [field_value]
+            for field_elem in field_elems:
+                if isinstance(field_elem, dict):
+                    self._process_dict_element(field_elem, field_key, fields_to_delete, mapping, id,
+                                               alias_counter, document)
+        for field_key in fields_to_delete:
+            fields.pop(field_key, None)
+
+
+def _build_collection(leases: int, fields: int = 10, values_per_field: int = 3, array_items: int = 5) -> dict:
+    def build_value(value: str, document: str) -> dict:
+        return {
+            "type": "string",
+            "valueString": value,
+            "source": "D(1,1.0512,2.1243,7.4412,2.1243,7.4412,2.5123,1.0512,2.5123)",
+            "date_of_document": "2023-01-01",
+            "document": document,
+        }
+
+    return {
+        "_id": "BENCH",
+        "lease_config_hash": "bench",
+        "unstructured_data": [
+            {
+                "lease_id": f"{lease_index:06d}",
+                "fields": {
+                    **{
+                        f"field_{field_index}": [
+                            build_value(
+                                f"Value {value_index}", f"Collections/BENCH/{lease_index:06d}/{value_index}.pdf"
+                            )
+                            for value_index in range(values_per_field)
+                        ]
+                        for field_index in range(fields)
+                    },
+                    "equipment": [{
+                        "type": "array",
+                        "valueArray": [
+                            {"valueObject": {
+                                "make": {"valueString": f"Make {item_index}", "source": "D(1,1,1,2,1,2,2,1,2)"},
+                                "quantity": {"valueInteger": item_index, "source": "D(1,1,1,2,1,2,2,1,3)"},
+                            }}
+                            for item_index in range(array_items)
+                        ],
+                        "document": f"Collections/BENCH/{lease_index:06d}/0.pdf",
+                    }],
+                },
+            }
+            for lease_index in range(leases)
+        ],
+    }
+
+
+def _measure(mapper, collection: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        # The previous mapper modifies the collection data, every run gets its own copy
+        data = copy.deepcopy(collection)
+        start = time.perf_counter()
+        mapper.process_json(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leases", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for leases in args.leases:
+        collection = _build_collection(leases)
+        before = _measure(_LegacyCitationMapper(), collection, args.repeat)
+        after = _measure(CitationMapper(), collection, args.repeat)
+        _, mapping = CitationMapper().process_json(collection)
+        print(
+            f"{leases:>5} leases, {len(mapping):>6} citations: recursive {before * 1000:8.2f} ms, "
+            f"single pass {after * 1000:8.2f} ms ({before / after:.1f}x), best of {args.repeat}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compares the JSON and compact collection payload formats returned by the collection plugin.
+
+For the field schema of the sample document extraction configuration (and every parseable configuration in
+`configs/`), a synthetic collection is built and serialized with both payload formats. The script reports
+the payload size, the estimated prompt tokens and the serialization time.
+
+Answer latency depends on the deployed model and is not measured here; run the same questions against
+`/v1/query` with both configurations to compare it.
+
+Usage:
+    python benchmarks/bench_collection_payload_format.py [--leases 50] [--values-per-field 3]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from models.data_collection_config import FieldDataCollectionConfig, PayloadFormat  # noqa: E402
+from models.document_data_models import LeaseAgreementDocumentData  # noqa: E402
+from services.collection_kernel_plugin import CollectionPlugin, document_data_cache  # noqa: E402
+
+_CONFIGS_GLOB = os.path.join(os.path.dirname(__file__), "..", "configs", "*.json")
+_SAMPLE_CONFIG = {
+    "_id": "document-extraction-v1.0",
+    "name": "document-extraction",
+    "version": "v1.0",
+    "prompt": "You are a helpful assistant tasked with using the necessary tools to retrieve document information "
+              "based on the collection ID provided by the user.",
+    "lease_config_hash": "bench",
+    "collection_rows": [{
+        "data_type": "LeaseAgreement",
+        "analyzer_id": "test-analyzer",
+        "field_schema": [
+            {"name": name, "type": "string", "description": name}
+            for name in ["license_grant_scope", "lease_duration", "termination_conditions",
+                         "compliance_audit_terms", "prohibited_uses"]
+        ]
+    }]
+}
+
+
+def _count_tokens(text: str) -> int:
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    except ImportError:
+        # Roughly four characters per token for English text and JSON
+        return len(text) // 4
+
+
+def _build_extracted_fields(config: FieldDataCollectionConfig, leases: int, values_per_field: int) -> dict:
+    field_names = [field.name for row in config.collection_rows for field in row.field_schema]
+    return {
+        f"{lease_index:06d}": {
+            field_name: [
+                LeaseAgreementDocumentData(
+                    valueString=f"Value {value_index} of {field_name} for lease {lease_index}",
+                    source_document=f"Collections/BENCH/{lease_index:06d}/document_{value_index}.pdf",
+                    source_bounding_boxes="D(1,1.0512,2.1243,7.4412,2.1243,7.4412,2.5123,1.0512,2.5123)",
+                    date_of_document=date(2023, 1, 1) + timedelta(days=value_index))
+                for value_index in range(values_per_field)
+            ]
+            for field_name in field_names
+        }
+        for lease_index in range(leases)
+    }
+
+
+def _serialize(config: FieldDataCollectionConfig, extracted_fields: dict, repeat: int) -> tuple[str, float]:
+    document_service = MagicMock()
+    document_service._get_all_extracted_fields_from_collection_doc.return_value = extracted_fields
+    plugin = CollectionPlugin(config, document_service)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        document_data_cache.clear()
+        payload = plugin.get_collection_data("BENCH")
+    return payload, (time.perf_counter() - start) / repeat
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leases", type=int, default=50)
+    parser.add_argument("--values-per-field", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    configs = {"sample": _SAMPLE_CONFIG}
+    for config_path in sorted(glob.glob(_CONFIGS_GLOB)):
+        try:
+            with open(config_path) as file:
+                raw_config = json.load(file, strict=False)
+        except json.JSONDecodeError:
+            continue
+        if "collection_rows" in raw_config:
+            configs[os.path.basename(config_path)] = {"lease_config_hash": "bench", **raw_config}
+
+    for config_name, raw_config in configs.items():
+        config = FieldDataCollectionConfig(**raw_config)
+        extracted_fields = _build_extracted_fields(config, args.leases, args.values_per_field)
+        print(f"{config_name}: {args.leases} leases, {args.values_per_field} values per field")
+
+        baseline_tokens = None
+        for payload_format in PayloadFormat:
+            payload, seconds = _serialize(
+                config.model_copy(update={"payload_format": payload_format}),
+                extracted_fields,
+                args.repeat
+            )
+            prompt = CollectionPlugin(
+                config.model_copy(update={"payload_format": payload_format}), None
+            ).system_prompt
+            tokens = _count_tokens(payload) + _count_tokens(prompt)
+            baseline_tokens = baseline_tokens or tokens
+            print(
+                f"  {payload_format.value:>8}: {len(payload):>9} chars, {tokens:>8} prompt tokens "
+                f"({tokens / baseline_tokens:6.1%} of json), {seconds * 1000:8.2f} ms to serialize"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measures the per-query setup overhead of the Semantic Kernel used to answer collection questions.
+
+Before: a Kernel is built, the chat completion service and the CollectionPlugin are registered and the
+execution settings are rebuilt on every query. After: the kernel and the settings are built once by the
+LlmRequestManager and each query only binds its CollectionPlugin. Both variants also include the copy of
+the settings that Semantic Kernel makes on every request.
+
+No request is sent to Azure OpenAI.
+
+Usage:
+    python benchmarks/bench_kernel_setup.py [--iterations 2000]
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from semantic_kernel import Kernel  # noqa: E402
+from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior  # noqa: E402
+from semantic_kernel.connectors.ai.open_ai.prompt_execution_settings.azure_chat_prompt_execution_settings import (  # noqa: E402,E501
+    AzureChatPromptExecutionSettings,
+)
+from models.api.v1 import GeneratedResponse  # noqa: E402
+from models.data_collection_config import FieldDataCollectionConfig  # noqa: E402
+from services.collection_kernel_plugin import CollectionPlugin, bind_collection_plugin  # noqa: E402
+from services.llm_request_manager import LlmRequestManager  # noqa: E402
+
+_CONFIG = FieldDataCollectionConfig(
+    _id="document-extraction-v1.0",
+    name="document-extraction",
+    version="v1.0",
+    prompt="prompt",
+    lease_config_hash="bench",
+    collection_rows=[]
+)
+
+
+def _per_query_setup(chat_completions, collection_plugin: CollectionPlugin):
+    """The setup previously done by answer_collection_question on every query."""
+    kernel = Kernel()
+    kernel.add_service(chat_completions)
+    kernel.add_plugin(collection_plugin, plugin_name="Collection")
+
+    execution_settings = AzureChatPromptExecutionSettings()
+    execution_settings.function_choice_behavior = FunctionChoiceBehavior.Required(
+        included_functions=["Collection-get_collection_data"]
+    )
+    execution_settings.response_format = GeneratedResponse
+    return kernel, copy.deepcopy(execution_settings)
+
+
+def _shared_setup(llm_request_manager: LlmRequestManager, collection_plugin: CollectionPlugin):
+    """The setup done by answer_collection_question on every query with the shared kernel."""
+    with bind_collection_plugin(collection_plugin):
+        return llm_request_manager._collection_kernel, copy.deepcopy(
+            llm_request_manager._collection_execution_settings)
+
+
+def _measure(setup, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        setup()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    llm_config = MagicMock()
+    llm_config.endpoint = "https://bench.openai.azure.com"
+    llm_config.key = "bench"
+    llm_config.default_model = "bench"
+    llm_config.api_version = "2024-08-01-preview"
+    llm_request_manager = LlmRequestManager(llm_config)
+    chat_completions = llm_request_manager._chat_completions
+
+    before = _measure(lambda: _per_query_setup(chat_completions, CollectionPlugin(_CONFIG, None)), args.iterations)
+    after = _measure(lambda: _shared_setup(llm_request_manager, CollectionPlugin(_CONFIG, None)), args.iterations)
+
+    print(f"per-query kernel: {before * 1e6:9.1f} us per query")
+    print(f"shared kernel:    {after * 1e6:9.1f} us per query ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+r"""Compares the previous regex-based parsing of LLM responses with LlmRequestManager._parse_response_content.
+
+The previous parser extracted `\{.*?\}` matches with a regex, which cuts nested objects short and restarts
+a scan of the rest of the response from every opening brace that is not closed. The current parser validates
+the structured output directly into GeneratedResponse and falls back to a single-pass scan of the embedded
+JSON objects.
+
+Usage:
+    python benchmarks/bench_parse_response_content.py [--size 200000] [--repeat 20]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.llm_request_manager import LlmRequestManager  # noqa: E402
+
+
+def _legacy_parse(raw_content: str) -> str:
+    """The parsing previously done by _parse_response_content, without the citation restoration."""
+    try:
+        json_objects = re.findall(r'\{.*?\}', raw_content, re.DOTALL)
+        if json_objects:
+            return json.loads(json_objects[0]).get("response", "")
+        return raw_content.strip()
+    except (json.JSONDecodeError, ValueError):
+        return raw_content.strip()
+
+
+def _build_cases(size: int) -> dict[str, str]:
+    sentence = "The lease for the site may be terminated with 90 days notice[1]. "
+    response = (sentence * (size // len(sentence) + 1))[:size]
+    citations = [f"CITE123-{index}" for index in range(500)]
+    structured_output = json.dumps({"response": response, "citations": citations})
+    return {
+        "structured output": structured_output,
+        "embedded in prose": f"Here is the answer:\n{structured_output}\nDone.",
+        "unclosed braces": "Fill in the {placeholder " * (size // 25),
+        "plain text": response,
+    }
+
+
+def _measure(parse, raw_content: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(raw_content)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200000, help="Number of characters of the response text")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    llm_config = MagicMock()
+    llm_config.endpoint = "https://bench.openai.azure.com"
+    llm_config.key = "bench"
+    llm_config.default_model = "bench"
+    llm_config.api_version = "2024-08-01-preview"
+    llm_request_manager = LlmRequestManager(llm_config)
+    collection_plugin = MagicMock()
+    collection_plugin.restore_citations.return_value = []
+
+    for case_name, raw_content in _build_cases(args.size).items():
+        # The regex scan is quadratic when the braces are not closed, so it is only run once in that case
+        legacy_repeat = 1 if case_name == "unclosed braces" else args.repeat
+        legacy = _measure(_legacy_parse, raw_content, legacy_repeat)
+        current = _measure(
+            lambda content: llm_request_manager._parse_response_content(content, collection_plugin),
+            raw_content,
+            args.repeat
+        )
+        print(f"{case_name:>20}: regex {legacy * 1000:10.2f} ms, current {current * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Measures the time and peak memory to decode the final response of a Content Understanding operation.
+
+Before: poll_result decoded the whole response twice, once to read the status and once to return it. After: the
+response is decoded once, and only the parts that are ingested are kept (the markdown, fields, category and page
+numbers of the contents); the pages, paragraphs and tables are discarded as soon as they are decoded.
+
+A classifier result is built with one content per subdocument, each with its pages of words and lines as returned
+by Content Understanding. No request is sent.
+
+Usage:
+    python benchmarks/bench_poll_result_parse.py [--subdocuments 20] [--pages-per-subdocument 10] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.ingest_lease_documents_service import INGESTED_RESULT_SELECTION  # noqa: E402
+from utils.json_stream_utils import load_json_selection  # noqa: E402
+
+_POLYGON = "D({page},1.0512,2.1243,7.4412,2.1243,7.4412,2.5123,1.0512,2.5123)"
+
+
+def _build_result(subdocuments: int, pages_per_subdocument: int, words_per_page: int = 400) -> str:
+    def build_page(page: int) -> dict:
+        return {
+            "pageNumber": page,
+            "angle": 0,
+            "width": 8.5,
+            "height": 11,
+            "spans": [{"offset": 0, "length": 2400}],
+            "words": [
+                {"content": f"word{index}", "span": {"offset": index * 6, "length": 5}, "confidence": 0.99,
+                 "source": _POLYGON.format(page=page)}
+                for index in range(words_per_page)
+            ],
+            "lines": [
+                {"content": "word " * 10, "source": _POLYGON.format(page=page), "span": {"offset": index, "length": 50}}
+                for index in range(words_per_page // 10)
+            ],
+        }
+
+    def build_field(index: int) -> dict:
+        return {"type": "string", "valueString": f"Value {index}", "spans": [{"offset": index, "length": 10}],
+                "confidence": 0.9, "source": _POLYGON.format(page=1)}
+
+    contents = []
+    for subdocument in range(subdocuments):
+        start_page = subdocument * pages_per_subdocument + 1
+        contents.append({
+            "markdown": "# Lease\n" + "word " * 400 * pages_per_subdocument,
+            "kind": "document",
+            "startPageNumber": start_page,
+            "endPageNumber": start_page + pages_per_subdocument - 1,
+            "unit": "inch",
+            "pages": [build_page(page) for page in range(start_page, start_page + pages_per_subdocument)],
+            "paragraphs": [{"content": "word " * 40, "source": _POLYGON.format(page=start_page)}] * 20,
+            "category": "lease",
+            "fields": {f"field_{index}": build_field(index) for index in range(20)},
+        })
+    return json.dumps({
+        "id": "operation",
+        "status": "Succeeded",
+        "result": {"analyzerId": "classifier", "apiVersion": "2025-05-01-preview", "contents": contents}
+    })
+
+
+def _legacy_decode(text: str) -> dict:
+    """The decoding previously done by poll_result: the status, then the returned result."""
+    json.loads(text).get("status")
+    return json.loads(text)
+
+
+def _measure(decode, text: str, repeat: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(text)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = decode(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return min(timings), peak
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subdocuments", type=int, default=20)
+    parser.add_argument("--pages-per-subdocument", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = _build_result(args.subdocuments, args.pages_per_subdocument)
+    selection = {**INGESTED_RESULT_SELECTION, "status": True, "error": True}
+    before, before_peak = _measure(_legacy_decode, text, args.repeat)
+    after, after_peak = _measure(lambda text: load_json_selection(text, selection), text, args.repeat)
+
+    print(f"{len(text) / 1e6:.1f} MB response, {args.subdocuments} subdocuments, best of {args.repeat}")
+    print(f"decode twice:            {before * 1000:8.1f} ms, peak {before_peak / 1e6:7.1f} MB")
+    print(f"decode selection once:   {after * 1000:8.1f} ms, peak {after_peak / 1e6:7.1f} MB "
+          f"({before / after:.1f}x faster, {before_peak / after_peak:.1f}x less memory)")
+
+
+if __name__ == "__main__":
+    main()
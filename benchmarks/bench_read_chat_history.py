@@ -0,0 +1,110 @@
+"""Compares the previous and the current CosmosChatHistory.read_messages on long sessions.
+
+The previous read path validated the session into ChatHistoryModel, dumped every message to build a new
+ChatMessageContent, deep copied each of them and parsed the QueryResponse JSON of every response of the
+assistant to remove its inline citations. The current read path validates each message once, shares the
+messages that are sent unchanged and uses the text of the responses stored with them.
+
+The session documents are built by CosmosChatHistory.store_messages. No request is sent to Cosmos DB.
+
+Usage:
+    python benchmarks/bench_read_chat_history.py [--turns 50 100 200] [--repeat 20]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from azure.cosmos import ContainerProxy  # noqa: E402
+from semantic_kernel.contents.chat_message_content import AuthorRole, ChatMessageContent  # noqa: E402
+from semantic_kernel.contents.history_reducer.chat_history_reducer_utils import (  # noqa: E402
+    contains_function_call_or_result,
+)
+from models.api.v1 import QueryMetrics, QueryResponse  # noqa: E402
+from services.cosmos_chat_history import ChatHistoryModel, CosmosChatHistory  # noqa: E402
+from utils.citation_cleaner import remove_inline_citations_preserve_spacing  # noqa: E402
+
+
+def _legacy_read(chat_history: CosmosChatHistory, doc: dict):
+    """The read path previously implemented by read_messages, after reading the document."""
+    chat_history_model = ChatHistoryModel(**doc)
+    chat_history.internal_messages = [
+        ChatMessageContent(**message.model_dump()) for message in chat_history_model.messages
+    ]
+    chat_history.messages = []
+    for internal_message in chat_history.internal_messages:
+        if chat_history.remove_tool_calls and contains_function_call_or_result(internal_message):
+            continue
+        message = internal_message.model_copy(deep=True)
+        if message.role == AuthorRole.ASSISTANT and message.content.startswith("{"):
+            content = message.content
+            try:
+                content = QueryResponse.model_validate_json(content)
+                content = remove_inline_citations_preserve_spacing(content.response)
+            except Exception:
+                pass
+            message.content = content
+        chat_history.messages.append(message)
+
+
+def _build_session(turns: int) -> dict:
+    container = MagicMock(spec=ContainerProxy)
+    chat_history = CosmosChatHistory(container=container, user_message_limit=turns + 1, domain="bench")
+    chat_history.add_system_message("You are a helpful assistant answering questions about lease documents.")
+    for turn in range(turns):
+        chat_history.add_user_message(f"What are the termination conditions of lease {turn} in collection 5OAS074?")
+        chat_history.add_assistant_message(QueryResponse(
+            response=f"Lease {turn} may be terminated with 90 days notice[1] after the initial term[2]. " * 4,
+            citations=[[f"Collections/5OAS074/{turn}/lease.pdf", "D(1,1.05,2.12,7.44,2.12,7.44,2.51,1.05,2.51)"]] * 2,
+            metrics=QueryMetrics(prompt_tokens=1000, completion_tokens=100, total_tokens=1100, total_latency_sec=2.5)
+        ).model_dump_json())
+    chat_history.store_messages("bench", "bench")
+    return container.upsert_item.call_args.kwargs["body"]
+
+
+def _measure(read, doc: dict, repeat: int) -> tuple[float, int]:
+    chat_history = CosmosChatHistory(container=MagicMock(spec=ContainerProxy), user_message_limit=1000, domain="bench",
+                                     remove_tool_calls=True)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read(chat_history, doc)
+    seconds = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    read(chat_history, doc)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def _current_read(chat_history: CosmosChatHistory, doc: dict):
+    chat_history.container.read_item.return_value = doc
+    chat_history.read_messages("bench", "bench")
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    for turns in args.turns:
+        doc = _build_session(turns)
+        legacy_seconds, legacy_peak = _measure(_legacy_read, doc, args.repeat)
+        current_seconds, current_peak = _measure(_current_read, doc, args.repeat)
+        print(
+            f"{turns:>4} turns: previous {legacy_seconds * 1000:7.2f} ms, {legacy_peak / 1024:8.1f} KiB peak; "
+            f"current {current_seconds * 1000:7.2f} ms, {current_peak / 1024:8.1f} KiB peak "
+            f"({legacy_seconds / current_seconds:.1f}x faster)"
+        )
+
+
+if __name__ == "__main__":
+    main()
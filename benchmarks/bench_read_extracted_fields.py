@@ -0,0 +1,133 @@
+"""Measures the time to parse the extracted fields of a collection read from Cosmos DB.
+
+Before: the whole collection document was validated into ExtractedCollectionDocuments, then every field value
+was dumped and validated again into LeaseAgreementDocumentData. After: only the lease IDs and fields are read,
+and the fields of each lease are validated once, directly into LeaseAgreementDocumentData.
+
+The collection document is built as stored by the ingestion, no request is sent to Cosmos DB.
+
+Usage:
+    python benchmarks/bench_read_extracted_fields.py [--leases 500] [--fields 10] [--values-per-field 3]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from models.data_collection_config import FieldDataCollectionConfig  # noqa: E402
+from models.document_data_models import LeaseAgreementDocumentData  # noqa: E402
+from models.extracted_collection_documents import (  # noqa: E402
+    ExtractedCollectionDocuments,
+    ExtractedCollectionInformationCollection,
+    ExtractedLeaseCollection,
+    ExtractedLeaseField,
+    ExtractedLeaseFieldType,
+)
+from services.ingest_lease_documents_service import IngestionCollectionDocumentService  # noqa: E402
+
+_CONFIG = FieldDataCollectionConfig(
+    _id="document-extraction-v1.0",
+    name="document-extraction",
+    version="v1.0",
+    prompt="prompt",
+    lease_config_hash="bench",
+    collection_rows=[]
+)
+
+
+def _build_stored_document(leases: int, fields: int, values_per_field: int) -> dict:
+    """Builds a collection document as stored by the ingestion."""
+    def build_field(lease_index: int, field_index: int, value_index: int) -> ExtractedLeaseField:
+        return ExtractedLeaseField(
+            type=ExtractedLeaseFieldType.STRING,
+            valueString=f"Value {value_index} of field {field_index} for lease {lease_index}",
+            spans=[{"offset": 120 * value_index, "length": 48}],
+            confidence=0.87,
+            source="D(1,1.0512,2.1243,7.4412,2.1243,7.4412,2.5123,1.0512,2.5123)",
+            date_of_document=date(2023, 1, 1),
+            markdown=f"Collections/BENCH/{lease_index:06d}/document_{value_index}.md",
+            document=f"Collections/BENCH/{lease_index:06d}/document_{value_index}.pdf"
+        )
+
+    document = ExtractedCollectionDocuments(
+        _id="BENCH-bench",
+        collection_id="BENCH",
+        config_id=_CONFIG.id,
+        lease_config_hash=_CONFIG.lease_config_hash,
+        information=ExtractedCollectionInformationCollection(leases=[
+            ExtractedLeaseCollection(
+                lease_id=f"{lease_index:06d}",
+                original_documents=[f"Collections/BENCH/{lease_index:06d}/document_{index}.pdf"
+                                    for index in range(values_per_field)],
+                markdowns=[f"Collections/BENCH/{lease_index:06d}/document_{index}.md"
+                           for index in range(values_per_field)],
+                fields={
+                    f"field_{field_index}": [build_field(lease_index, field_index, value_index)
+                                             for value_index in range(values_per_field)]
+                    for field_index in range(fields)
+                }
+            )
+            for lease_index in range(leases)
+        ])
+    )
+    return document.model_dump(by_alias=True, mode="json", exclude_defaults=True)
+
+
+def _legacy_read(stored_document: dict) -> dict:
+    """The parsing previously done by _get_all_extracted_fields_from_collection_doc."""
+    existing_document = ExtractedCollectionDocuments(**stored_document)
+    return {
+        lease.lease_id: {
+            field_name: [LeaseAgreementDocumentData(**field_value.model_dump()) for field_value in field_values]
+            for field_name, field_values in lease.fields.items()
+        }
+        for lease in existing_document.information.leases
+    }
+
+
+def _measure(read, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leases", type=int, default=500)
+    parser.add_argument("--fields", type=int, default=10)
+    parser.add_argument("--values-per-field", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    stored_document = _build_stored_document(args.leases, args.fields, args.values_per_field)
+    # The projection of the read is applied by Cosmos DB, it is not part of the parse time
+    projected_document = {
+        "collection_id": stored_document["collection_id"],
+        "information": {"leases": [
+            {"lease_id": lease["lease_id"], "fields": lease["fields"]}
+            for lease in stored_document["information"]["leases"]
+        ]}
+    }
+    collection = MagicMock()
+    collection.find_one.return_value = projected_document
+    service = IngestionCollectionDocumentService(collection, MagicMock(), MagicMock())
+
+    before = _measure(lambda: _legacy_read(stored_document), args.repeat)
+    after = _measure(lambda: service._get_all_extracted_fields_from_collection_doc("BENCH", _CONFIG), args.repeat)
+
+    values = args.leases * args.fields * args.values_per_field
+    print(f"{args.leases} leases, {values} field values")
+    print(f"validate, dump and validate again: {before * 1000:9.1f} ms")
+    print(f"validate once:                     {after * 1000:9.1f} ms ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -62,12 +62,24 @@ module "app_service" {
   # Application settings for function app
   app_settings = merge(
     {
-      "WEBSITE_RUN_FROM_PACKAGE" = "1" # Run App from package
-      "FUNCTIONS_WORKER_RUNTIME" = var.runtime_name
-      "RUNNING_ON_AZURE"         = "1"
-      "AZURE_CLIENT_ID"          = module.app_service_identity.client_id
-      "APP_CLIENT_ID"            = module.app_service_identity.client_id
-      "APP_TENANT_ID"            = module.app_service_identity.tenant_id
+      "WEBSITE_RUN_FROM_PACKAGE"    = "1" # Run App from package
+      "FUNCTIONS_WORKER_RUNTIME"    = var.runtime_name
+      "RUNNING_ON_AZURE"            = "1"
+      "PYTHON_ENABLE_INIT_INDEXING" = "1" # Required by the HTTP streams of the query/stream endpoint
+      "AZURE_CLIENT_ID"             = module.app_service_identity.client_id
+      "APP_CLIENT_ID"               = module.app_service_identity.client_id
+      "APP_TENANT_ID"               = module.app_service_identity.tenant_id
+      "DocumentStorageContainer"    = "processed" # Container of the documents, read by the app and its blob trigger
+
+      # The host storage, also used by the ingestion queue, is accessed with the identity granted the storage roles
+      "AzureWebJobsStorage__credential" = "managedidentity"
+      "AzureWebJobsStorage__clientId"   = module.app_service_identity.client_id
+
+      # Connection of the blob trigger of the uploaded documents, to the storage account of the documents
+      "DocumentStorage__blobServiceUri"  = data.azurerm_storage_account.storage_data.primary_blob_endpoint
+      "DocumentStorage__queueServiceUri" = data.azurerm_storage_account.storage_data.primary_queue_endpoint
+      "DocumentStorage__credential"      = "managedidentity"
+      "DocumentStorage__clientId"        = module.app_service_identity.client_id
     }
   )
 
@@ -103,3 +115,19 @@ resource "azurerm_role_assignment" "storage_role" {
     ]
   }
 }
+
+# Assign the 'Storage Queue Data Contributor' role to the Function App's Managed Identity,
+# required by the ingestion queue trigger and output bindings on the host storage
+resource "azurerm_role_assignment" "storage_queue_role" {
+  principal_id         = module.app_service_identity.principal_id
+  role_definition_name = "Storage Queue Data Contributor"
+  scope                = data.azurerm_storage_account.storage_data.id
+
+  lifecycle {
+    ignore_changes = [
+      principal_id,
+      role_definition_name,
+      scope
+    ]
+  }
+}
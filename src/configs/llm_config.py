@@ -1,4 +1,5 @@
 from .app_config_manager import get_app_config_manager
+from models.environment_config import AnswerCacheConfig
 
 
 class LlmConfig:
@@ -6,6 +7,8 @@ class LlmConfig:
     _endpoint: str
     _api_version: str
     _default_model: str
+    _answer_cache: AnswerCacheConfig
+    _inject_known_collection_data: bool
 
     def __init__(self):
         """LLM cconfig constructor."""
@@ -23,6 +26,8 @@ class LlmConfig:
         self._endpoint = endpoint
         self._api_version = api_version
         self._default_model = default_model
+        self._answer_cache = config.llm.answer_cache
+        self._inject_known_collection_data = config.llm.inject_known_collection_data.value.lower() == "true"
 
     @property
     def key(self):
@@ -40,6 +45,14 @@ class LlmConfig:
     def default_model(self):
         return self._default_model
 
+    @property
+    def answer_cache(self):
+        return self._answer_cache
+
+    @property
+    def inject_known_collection_data(self):
+        return self._inject_known_collection_data
+
 
 llm_config: LlmConfig | None = None
 
@@ -14,3 +14,20 @@ class MongoLockContants(object):
 class PathConstants(object):
     """Constants for path."""
     COLLECTION_PREFIX = "Collections"
+
+
+class IngestionQueueConstants(object):
+    """Constants for the ingestion queue."""
+    QUEUE_NAME = "ingestion-jobs"
+    # The host moves the messages that failed too many times to this queue
+    POISON_QUEUE_NAME = "ingestion-jobs-poison"
+    CONNECTION = "AzureWebJobsStorage"
+
+
+class DocumentStorageConstants(object):
+    """Constants for the blob storage of the documents."""
+    # The app setting of the container of the documents, read by `blob_storage.container_name` as well
+    CONTAINER_SETTING = "DocumentStorageContainer"
+    # The documents of the collections, resolved from the app setting by the Functions host
+    COLLECTIONS_PATH = f"%{CONTAINER_SETTING}%/{PathConstants.COLLECTION_PREFIX}/{{name}}"
+    CONNECTION = "DocumentStorage"
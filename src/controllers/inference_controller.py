@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import re
+from typing import AsyncIterator, Optional
 
 from pydantic import ValidationError
 
@@ -9,7 +12,12 @@ from services.collection_kernel_plugin import CollectionPlugin
 from services.cosmos_chat_history import CosmosChatHistory
 from utils.document_utils import build_config_id
 from models import HTTPError
-from models.api.v1 import QueryRequest, QueryResponse
+from models.api.v1 import QueryRequest, QueryResponse, QueryStreamEvent
+
+# Words of a question that may be collection IDs: at least 4 characters, including a digit
+_COLLECTION_ID_CANDIDATE_PATTERN = re.compile(r"\b(?=[\w-]*\d)[\w-]{4,}\b")
+# Maximum number of candidate collection IDs looked up when prefetching the collection data of a query
+MAX_PREFETCH_CANDIDATES = 3
 
 
 class InferenceController(object):
@@ -40,47 +48,253 @@ class InferenceController(object):
         self._chat_history = chat_history
         self._document_service = document_service
 
-    async def query(
+    async def _prepare_query(
         self,
         query_request: QueryRequest,
         config_name: str,
         config_version: str,
         user_id: str
-    ) -> QueryResponse:
-        """Handles the query request.
+    ) -> CollectionPlugin:
+        """Loads the configuration and the chat history of the session before answering a query.
+
+        The configuration and the chat history are loaded concurrently, in worker threads, so that the event loop
+        is not blocked by the round trips to the databases.
 
         Args:
-            request (dict): The query request data.
+            query_request (QueryRequest): The query request.
             config_name (str): The configuration name.
             config_version (str): The configuration version.
             user_id (str): The user ID.
 
+        Raises:
+            HTTPError: If the configuration is not found or the user message limit is exceeded.
+
         Returns:
-            QueryResponse: The query response.
+            CollectionPlugin: The collection plugin for the configuration.
         """
         logging.info(f"Querying with config: {config_name}; version: {config_version}")
         config_id = build_config_id(config_name, config_version)
-        config = self._config_management_service.load_config(config_id)
+        config, _ = await asyncio.gather(
+            asyncio.to_thread(self._config_management_service.load_config, config_id),
+            asyncio.to_thread(self._chat_history.read_messages, query_request.sid, user_id)
+        )
 
         if not config:
             raise HTTPError("Configuration not found.", 404)
 
         collection_plugin = CollectionPlugin(config, self._document_service)
-        self._chat_history.read_messages(query_request.sid, user_id)
         if self._chat_history.user_message_limit_exceeded:
             raise HTTPError("User message limit exceeded.", 400)
+        return collection_plugin
+
+    def _get_prefetch_candidates(self, query: str) -> list[str]:
+        """Gets the IDs of the collections the query is likely about, most likely first.
+
+        The collections requested earlier in the session and mentioned in the query come first, then the words of
+        the query that look like collection IDs. Without any, the query is assumed to be a follow-up question about
+        the last collection requested in the session.
+
+        Args:
+            query (str): The query of the user.
+
+        Returns:
+            list[str]: At most `MAX_PREFETCH_CANDIDATES` candidate collection IDs.
+        """
+        requested_collection_ids = self._chat_history.get_requested_collection_ids()
+        candidates = [
+            collection_id for collection_id in reversed(requested_collection_ids)
+            if collection_id.casefold() in query.casefold()
+        ]
+        candidates.extend(_COLLECTION_ID_CANDIDATE_PATTERN.findall(query))
+        if not candidates and requested_collection_ids:
+            candidates.append(requested_collection_ids[-1])
+        return list(dict.fromkeys(candidates))[:MAX_PREFETCH_CANDIDATES]
+
+    def _get_known_collection_id(self, query: str) -> Optional[str]:
+        """Gets the ID of the collection the query is about, when it was already resolved earlier in the session.
+
+        Args:
+            query (str): The query of the user.
+
+        Returns:
+            Optional[str]: The most likely collection of the query if it was requested earlier in the session.
+        """
+        candidates = self._get_prefetch_candidates(query)
+        if candidates and candidates[0] in self._chat_history.get_requested_collection_ids():
+            return candidates[0]
+        return None
+
+    def _prefetch_collection_data(self, collection_plugin: CollectionPlugin, candidates: list[str]):
+        """Loads the data of the first existing candidate collection in the cache, before the model requests it.
+
+        The model is required to call the tool retrieving the collection data, so the data is always needed. The
+        prefetch is speculative: its errors are only logged, and the tool call loads the data if the model
+        requests another collection.
+
+        Args:
+            collection_plugin (CollectionPlugin): The collection plugin of the query.
+            candidates (list[str]): The candidate collection IDs, most likely first.
+        """
+        for collection_id in candidates:
+            try:
+                if collection_plugin.prefetch_collection_data(collection_id):
+                    logging.info(f"Prefetched the data of collection {collection_id}")
+                    return
+            except Exception as e:
+                logging.warning(f"Failed to prefetch the data of collection {collection_id}: {str(e)}")
+
+    def _start_collection_data_prefetch(self, collection_plugin: CollectionPlugin, query: str) -> asyncio.Task:
+        """Starts prefetching the collection data of the query in a worker thread.
+
+        Args:
+            collection_plugin (CollectionPlugin): The collection plugin of the query.
+            query (str): The query of the user.
+
+        Returns:
+            asyncio.Task: The task prefetching the collection data.
+        """
+        return asyncio.create_task(asyncio.to_thread(
+            self._prefetch_collection_data, collection_plugin, self._get_prefetch_candidates(query)))
+
+    def _start_history_summary(self) -> Optional[asyncio.Task]:
+        """Starts summarizing the turns left out of the chat history sent to the LLM, if needed.
+
+        The summary is generated while the query is answered, and used from the next query of the session.
+
+        Returns:
+            Optional[asyncio.Task]: The task returning the summary and the number of messages it covers, if any.
+        """
+        messages, summarized_message_count = self._chat_history.get_messages_to_summarize()
+        if not messages:
+            return None
+
+        async def summarize() -> tuple[str, int]:
+            summary = await self._llm_request_manager.summarize_history(self._chat_history.summary, messages)
+            return summary, summarized_message_count
+
+        return asyncio.create_task(summarize())
+
+    async def _store_history(self, summary_task: Optional[asyncio.Task], session_id: str, user_id: str):
+        """Stores the messages of the query in the chat history, and the summary of the history if any.
+
+        The messages are stored in a worker thread while the summary is completed.
+
+        Args:
+            summary_task (Optional[asyncio.Task]): The task generating the summary, if any.
+            session_id (str): The session ID.
+            user_id (str): The user ID.
+        """
+        await asyncio.gather(
+            asyncio.to_thread(self._chat_history.store_messages, session_id, user_id),
+            self._store_history_summary(summary_task, session_id, user_id)
+        )
+
+    async def _store_history_summary(self, summary_task: Optional[asyncio.Task], session_id: str, user_id: str):
+        """Stores the summary of the chat history once it is generated.
+
+        A summary that cannot be generated or stored is only logged, it is generated again for the next query.
+
+        Args:
+            summary_task (Optional[asyncio.Task]): The task generating the summary, if any.
+            session_id (str): The session ID.
+            user_id (str): The user ID.
+        """
+        if summary_task is None:
+            return
+        try:
+            summary, summarized_message_count = await summary_task
+            await asyncio.to_thread(
+                self._chat_history.store_summary, session_id, user_id, summary, summarized_message_count)
+        except Exception as e:
+            logging.warning(f"Failed to summarize the chat history: {str(e)}")
+
+    async def query(
+        self,
+        query_request: QueryRequest,
+        config_name: str,
+        config_version: str,
+        user_id: str
+    ) -> QueryResponse:
+        """Handles the query request.
+
+        Args:
+            request (dict): The query request data.
+            config_name (str): The configuration name.
+            config_version (str): The configuration version.
+            user_id (str): The user ID.
+
+        Returns:
+            QueryResponse: The query response.
+        """
+        collection_plugin = await self._prepare_query(query_request, config_name, config_version, user_id)
+        prefetch_task = self._start_collection_data_prefetch(collection_plugin, query_request.query)
+        summary_task = self._start_history_summary()
 
         result = await self._llm_request_manager.answer_collection_question(
-            config.prompt,
+            collection_plugin.system_prompt,
             query_request.query,
             collection_plugin,
             self._chat_history,
+            known_collection_id=self._get_known_collection_id(query_request.query),
         )
-        self._chat_history.store_messages(query_request.sid, user_id)
+        await prefetch_task
+        await self._store_history(summary_task, query_request.sid, user_id)
 
         try:
             output = QueryResponse.model_validate_json(result)
         except ValidationError:
             raise HTTPError(f"Invalid JSON for QueryResponse: {result}", 500)
 
+        if output.metrics:
+            output.metrics.history_tokens_saved = self._chat_history.history_tokens_saved
         return output
+
+    async def query_stream(
+        self,
+        query_request: QueryRequest,
+        config_name: str,
+        config_version: str,
+        user_id: str
+    ) -> AsyncIterator[QueryStreamEvent]:
+        """Handles the query request, streaming the response as it is generated.
+
+        The configuration and the chat history are loaded before returning, so that their errors are raised
+        before the response starts streaming. An error raised once the response is streaming ends the stream with
+        an "error" event. The messages of the query are stored in the chat history even then, so that the question
+        is kept in the session.
+
+        Args:
+            query_request (QueryRequest): The query request.
+            config_name (str): The configuration name.
+            config_version (str): The configuration version.
+            user_id (str): The user ID.
+
+        Returns:
+            AsyncIterator[QueryStreamEvent]: The events of the streamed query response.
+        """
+        collection_plugin = await self._prepare_query(query_request, config_name, config_version, user_id)
+
+        async def stream_events() -> AsyncIterator[QueryStreamEvent]:
+            prefetch_task = self._start_collection_data_prefetch(collection_plugin, query_request.query)
+            summary_task = self._start_history_summary()
+            try:
+                async for event in self._llm_request_manager.stream_collection_question(
+                    collection_plugin.system_prompt,
+                    query_request.query,
+                    collection_plugin,
+                    self._chat_history,
+                    known_collection_id=self._get_known_collection_id(query_request.query),
+                ):
+                    if event.response and event.response.metrics:
+                        event.response.metrics.history_tokens_saved = self._chat_history.history_tokens_saved
+                    yield event
+            except Exception as e:
+                # The status of the response is already sent, the error can only be reported in the stream
+                logging.exception(f"Failed to stream the query response: {str(e)}")
+                error = str(e) if isinstance(e, HTTPError) else "The response could not be generated."
+                yield QueryStreamEvent(event="error", error=error)
+            finally:
+                await prefetch_task
+                await self._store_history(summary_task, query_request.sid, user_id)
+
+        return stream_events()
@@ -1,13 +1,13 @@
 import logging
-from typing import Union
+from typing import Optional, Union
 import os
 from services.ingest_config_management_service import IngestConfigManagementService
 from services.azure_content_understanding_client import AzureContentUnderstandingClient
-from services.ingest_lease_documents_service import IngestionCollectionDocumentService
+from services.ingest_lease_documents_service import INGESTED_RESULT_SELECTION, IngestionCollectionDocumentService
+from services.ingestion_job_service import IngestionJobService
 from utils.document_utils import build_config_id
 from models.http_error import HTTPError
-from models.data_collection_config import DataType, LeaseAgreementCollectionRow
-from models.ingestion_models import IngestCollectionDocumentRequest
+from models.ingestion_models import IngestCollectionDocumentRequest, IngestionJobStatus
 from .file_cache_manager import FileCacheManager
 
 
@@ -15,12 +15,14 @@ class IngestLeaseDocumentsController(object):
     _content_understanding_client: AzureContentUnderstandingClient
     _ingestion_collection_document_service: IngestionCollectionDocumentService
     _ingestion_configuration_management_service: IngestConfigManagementService
+    _ingestion_job_service: Optional[IngestionJobService]
 
     def __init__(
         self,
         content_understanding_client: AzureContentUnderstandingClient,
         ingestion_collection_document_service: IngestionCollectionDocumentService,
-        ingestion_configuration_management_service: IngestConfigManagementService
+        ingestion_configuration_management_service: IngestConfigManagementService,
+        ingestion_job_service: Optional[IngestionJobService] = None
     ):
         """Initializes the IngestLeaseDocumentsController.
 
@@ -29,15 +31,28 @@ class IngestLeaseDocumentsController(object):
             ingestion_collection_document_service (IngestionCollectionDocumentService): The ingestion collection document service.
             ingestion_configuration_management_service (IngestConfigManagementService): The ingestion configuration
                 management service.
+            ingestion_job_service (Optional[IngestionJobService]): The service tracking the progress of the documents
+                with a job ID, if it is tracked.
         """
         self._content_understanding_client = content_understanding_client
         self._ingestion_collection_document_service = ingestion_collection_document_service
         self._ingestion_configuration_management_service = ingestion_configuration_management_service
+        self._ingestion_job_service = ingestion_job_service
         self._file_cache_manager = FileCacheManager("analyzer_cache", self._is_local_dev_mode())
 
     def _is_local_dev_mode(self):
         return os.environ.get("ENVIRONMENT") and os.environ.get("ENVIRONMENT").lower() == "local"
 
+    def _set_job_status(self, document: IngestCollectionDocumentRequest, status: IngestionJobStatus):
+        """Records the stage of the ingestion job of a document, if its progress is tracked.
+
+        Args:
+            document (IngestCollectionDocumentRequest): The document.
+            status (IngestionJobStatus): The stage entered by the ingestion of the document.
+        """
+        if self._ingestion_job_service is not None and document.job_id is not None:
+            self._ingestion_job_service.set_status(document.job_id, status)
+
     def ingest_documents(self,
                          config_name: str,
                          config_version: str,
@@ -57,11 +72,8 @@ class IngestLeaseDocumentsController(object):
         """
         config = self._load_and_validate_config(config_name, config_version)
 
-        lease_collection_rows: list[LeaseAgreementCollectionRow] = \
-            [row for row in config.collection_rows if row.data_type == DataType.LEASE_AGREEMENT]
-
         for document in documents:
-            for collection_row in lease_collection_rows:
+            for collection_row in config.lease_collection_rows:
                 self._ingestion_collection_document_service.clean_empty_document(
                     document.id,
                     config
@@ -94,6 +106,7 @@ class IngestLeaseDocumentsController(object):
 
                 # If not already cached, call the appropriate CU API endpoint to get the output to ingest
                 if content_understanding_output is None:
+                    self._set_job_status(document, IngestionJobStatus.ANALYZING)
                     if is_classifier_enabled:
                         # If classifier is enabled, use the classifier ID from the collection row
                         classifier_id = collection_row.classifier.classifier_id
@@ -102,14 +115,16 @@ class IngestLeaseDocumentsController(object):
                             classifier_id,
                             document.file_bytes
                         )
-                        content_understanding_output = self._content_understanding_client.poll_result(response)
+                        content_understanding_output = self._content_understanding_client.poll_result(
+                            response, result_selection=INGESTED_RESULT_SELECTION)
                     else:
                         # Otherwise, use the analyzer ID for ingestion
                         analyzer_id = collection_row.analyzer_id
 
                         response = self._content_understanding_client.begin_analyze_data(analyzer_id,
                                                                                          document.file_bytes)
-                        content_understanding_output = self._content_understanding_client.poll_result(response)
+                        content_understanding_output = self._content_understanding_client.poll_result(
+                            response, result_selection=INGESTED_RESULT_SELECTION)
 
                     # Cache the content understanding output if in local dev mode
                     if self._is_local_dev_mode():
@@ -117,6 +132,7 @@ class IngestLeaseDocumentsController(object):
                         logging.info(f"Cached content understanding output to file for key: {cache_key}")
 
                 # Ingest the content understanding output into CosmosDB using the appropriate service method
+                self._set_job_status(document, IngestionJobStatus.INGESTING)
                 if is_classifier_enabled:
                     self._ingestion_collection_document_service.ingest_classifier_output(
                         document.type,
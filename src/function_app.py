@@ -4,6 +4,7 @@ from routes.api.v1 import health_check_routes_bp
 from routes.api.v1 import ingest_config_routes_bp
 from routes.api.v1 import inference_config_routes_bp
 from routes.api.v1 import classifier_routes_bp
+from routes.api.v1 import ingestion_jobs_routes_bp
 from routes.api.v1.ingest_documents_routes import ingest_docs_routes_bp
 from utils.monitoring_utils import set_up_monitoring
 
@@ -15,4 +16,5 @@ app.register_functions(health_check_routes_bp)
 app.register_functions(ingest_config_routes_bp)
 app.register_functions(inference_config_routes_bp)
 app.register_functions(ingest_docs_routes_bp)
+app.register_functions(ingestion_jobs_routes_bp)
 # app.register_functions(classifier_routes_bp)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Literal, Optional
 from semantic_kernel.kernel_pydantic import KernelBaseModel
 
 
@@ -28,6 +28,22 @@ class QueryMetrics(BaseModel):
     completion_tokens: int
     total_tokens: int
     total_latency_sec: float
+    time_to_first_token_sec: Optional[float] = None
+    cache_hit: bool = False
+    history_tokens_saved: Optional[int] = None
+
+
+class CitationRegions(BaseModel):
+    """CitationRegions model for the bounding regions of all the citations of a response, with one entry per region.
+
+    Attributes:
+            citation_index (list[int]): The index in the citations of the response of the citation of each region.
+            page (list[int]): The page number of each region.
+            polygon (list[list[float]]): The coordinates of the polygon of each region, as x1, y1, x2, y2 and so on.
+    """
+    citation_index: list[int]
+    page: list[int]
+    polygon: list[list[float]]
 
 
 class QueryResponse(BaseModel):
@@ -37,8 +53,25 @@ class QueryResponse(BaseModel):
             response (str): The main response text. Always include the inline citation number in the response text,
                 e.g., 'The termination rights for collection document 123 has been waived any unilateral termination rights[1]'."
             citations (list): A list of citations in the format ["source_document", "source_bounding_boxes"].
+            citation_regions (CitationRegions): The parsed bounding regions of the citations, to highlight them.
     """
     response: str
     citations: list[list[str]]
     metrics: Optional[QueryMetrics] = None
+    citation_regions: Optional[CitationRegions] = None
 
+
+class QueryStreamEvent(BaseModel):
+    """QueryStreamEvent model for the server-sent events of streamed API responses.
+
+    Attributes:
+            event (str): "delta" for each chunk of the response text as it is generated, then "response" once
+                the generation is complete, or "error" if it failed.
+            delta (str): The chunk of the response text, for "delta" events.
+            response (QueryResponse): The complete response with its citations and metrics, for "response" events.
+            error (str): The error that ended the response, for "error" events.
+    """
+    event: Literal["delta", "response", "error"]
+    delta: Optional[str] = None
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
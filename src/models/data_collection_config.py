@@ -1,3 +1,4 @@
+from functools import cached_property
 from uuid import uuid4
 from pydantic import BaseModel, Field
 from enum import Enum
@@ -48,6 +49,12 @@ class FieldMappingType(str, Enum):
         return mapping[self]
 
 
+class PayloadFormat(str, Enum):
+    """The encoding of the collection data returned to the LLM by the collection plugin."""
+    JSON = "json"
+    COMPACT = "compact"
+
+
 class FieldSchema(BaseModel):
     """Schema representation of the extracted field."""
     name: str
@@ -89,4 +96,17 @@ class FieldDataCollectionConfig(BaseModel):
     version: str
     prompt: str
     lease_config_hash: str = ""
+    payload_format: PayloadFormat = PayloadFormat.JSON
     collection_rows: list[LeaseAgreementCollectionRow]
+
+    # The structures derived from the collection rows are computed once per configuration and are copied with it,
+    # the collection rows are not expected to change once the configuration is loaded
+    @cached_property
+    def lease_collection_rows(self) -> tuple[LeaseAgreementCollectionRow, ...]:
+        """The collection rows of the lease agreements."""
+        return tuple(row for row in self.collection_rows if row.data_type == DataType.LEASE_AGREEMENT)
+
+    @cached_property
+    def lease_field_names(self) -> frozenset[str]:
+        """The names of the fields extracted from the lease agreements."""
+        return frozenset(field.name for row in self.lease_collection_rows for field in row.field_schema)
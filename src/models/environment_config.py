@@ -32,11 +32,33 @@ class UserManagedIdentityConfig(BaseModel):
     client_id: Optional[ConfigurationValue] = None
 
 
+class ConfigCacheConfig(BaseModel):
+    enabled: ConfigurationValue[str] = ConfigurationValue(value="true")
+    max_size: ConfigurationValue[int] = ConfigurationValue[int](value=100)
+    # Bounds how long a worker keeps the configurations that are no longer used
+    ttl_seconds: ConfigurationValue[int] = ConfigurationValue[int](value=300)
+    # Bounds how long a configuration upserted through another worker can be served stale
+    revalidate_after_seconds: ConfigurationValue[int] = ConfigurationValue[int](value=30)
+
+
 class CosmosDbConfig(BaseModel):
     db_name: ConfigurationValue
     endpoint: ConfigurationValue
     configuration_collection_name: ConfigurationValue
     document_collection_name: ConfigurationValue
+    ingestion_job_collection_name: ConfigurationValue = ConfigurationValue(value="IngestionJobs")
+    rate_limit_collection_name: ConfigurationValue = ConfigurationValue(value="RateLimits")
+    config_cache: ConfigCacheConfig = ConfigCacheConfig()
+
+
+class AnswerCacheConfig(BaseModel):
+    enabled: ConfigurationValue[str] = ConfigurationValue(value="false")
+    max_size: ConfigurationValue[int] = ConfigurationValue[int](value=1000)
+    ttl_seconds: ConfigurationValue[int] = ConfigurationValue[int](value=3600)
+    # Optional embedding deployment used to also match questions that are phrased differently
+    embedding_endpoint: Optional[ConfigurationValue] = None
+    embedding_model_name: Optional[ConfigurationValue] = None
+    similarity_threshold: ConfigurationValue[float] = ConfigurationValue[float](value=0.95)
 
 
 class LLMConfig(BaseModel):
@@ -44,6 +66,8 @@ class LLMConfig(BaseModel):
     endpoint: ConfigurationValue
     access_key: ConfigurationValue
     api_version: ConfigurationValue
+    answer_cache: AnswerCacheConfig = AnswerCacheConfig()
+    inject_known_collection_data: ConfigurationValue[str] = ConfigurationValue(value="false")
 
 
 class DefaultIngestConfig(BaseModel):
@@ -51,11 +75,24 @@ class DefaultIngestConfig(BaseModel):
     version: ConfigurationValue
 
 
+class ContentUnderstandingRateLimitConfig(BaseModel):
+    enabled: ConfigurationValue[str] = ConfigurationValue(value="false")
+    requests_per_second: ConfigurationValue[float] = ConfigurationValue[float](value=1.0)
+    burst: ConfigurationValue[int] = ConfigurationValue[int](value=4)
+    max_concurrent_operations: ConfigurationValue[int] = ConfigurationValue[int](value=4)
+    # The slot of an operation whose result is not polled is reclaimed after this time
+    operation_timeout_seconds: ConfigurationValue[int] = ConfigurationValue[int](value=300)
+    max_throttled_retries: ConfigurationValue[int] = ConfigurationValue[int](value=3)
+    # Limits the requests of all the workers together, counting them in Cosmos DB
+    shared_across_workers: ConfigurationValue[str] = ConfigurationValue(value="false")
+
+
 class ContentUnderstandingConfig(BaseModel):
     endpoint: ConfigurationValue
     subscription_key: ConfigurationValue
     request_timeout: Optional[ConfigurationValue[int]] = None
     project_id: ConfigurationValue
+    rate_limit: ContentUnderstandingRateLimitConfig = ContentUnderstandingRateLimitConfig()
 
 
 class ChatHistoryConfig(BaseModel):
@@ -66,6 +103,18 @@ class ChatHistoryConfig(BaseModel):
     user_message_limit: ConfigurationValue[int]
     domain: ConfigurationValue
     remove_tool_calls: ConfigurationValue[str] = ConfigurationValue(value="true")
+    max_turns: Optional[ConfigurationValue[int]] = None
+    summarize_older_turns: ConfigurationValue[str] = ConfigurationValue(value="false")
+    keep_last_tool_result_only: ConfigurationValue[str] = ConfigurationValue(value="false")
+
+
+class IngestionQueueConfig(BaseModel):
+    enabled: ConfigurationValue[str] = ConfigurationValue(value="false")
+    ingest_uploaded_documents: ConfigurationValue[str] = ConfigurationValue(value="false")
+    # Must match `extensions.queues.maxDequeueCount` in host.json, the job fails after the last attempt
+    max_dequeue_count: ConfigurationValue[int] = ConfigurationValue[int](value=3)
+    # The jobs are deleted once they were not updated for this time
+    job_ttl_seconds: ConfigurationValue[int] = ConfigurationValue[int](value=604800)
 
 
 class BlobStorageConfig(BaseModel):
@@ -83,3 +132,4 @@ class EnvironmentConfig(BaseModel):
     content_understanding: ContentUnderstandingConfig
     chat_history: ChatHistoryConfig
     blob_storage: BlobStorageConfig
+    ingestion_queue: IngestionQueueConfig = IngestionQueueConfig()
@@ -71,3 +71,4 @@ class ExtractedCollectionDocuments(BaseMongoLockable):
     config_id: str
     lease_config_hash: str
     information: ExtractedCollectionInformationCollection
+    data_version: int = 0  # Incremented every time extracted data is stored in the document
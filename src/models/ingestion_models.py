@@ -1,6 +1,6 @@
 from typing import Literal
-from pydantic import BaseModel
-from datetime import date
+from pydantic import BaseModel, Field
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 
@@ -21,3 +21,69 @@ class BaseIngestDocumentRequest(BaseModel):
 class IngestCollectionDocumentRequest(BaseIngestDocumentRequest):
     type: Literal[IngestDocumentType.COLLECTION] = IngestDocumentType.COLLECTION
     lease_id: str
+    # The ID of the ingestion job of the document, when its progress is tracked
+    job_id: Optional[str] = None
+
+
+class IngestionJobMessage(BaseModel):
+    """The message of a document ingestion queued by the ingest documents route."""
+    job_id: str
+    collection_id: str
+    lease_id: str
+    document_name: str
+    document_path: str
+    date_of_document: date
+
+
+class IngestionJobStatus(str, Enum):
+    """The stages of the ingestion of a queued document."""
+    SUBMITTED = "submitted"
+    # An attempt failed, the job is queued again until the host gives up on it
+    RETRYING = "retrying"
+    ANALYZING = "analyzing"
+    INGESTING = "ingesting"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class IngestionJob(BaseModel):
+    """The progress of the ingestion of a queued document, as stored in Cosmos DB."""
+    id: str = Field(alias="_id")
+    collection_id: str
+    lease_id: str
+    document_name: str
+    document_path: str
+    status: IngestionJobStatus
+    # The time each stage was last entered, by status
+    timestamps: dict[IngestionJobStatus, datetime] = {}
+    attempts: int = 0
+    error: Optional[str] = None
+    updated_at: datetime
+
+
+class IngestionDurationStats(BaseModel):
+    """The distribution of a duration of the ingestion jobs, in seconds."""
+    count: int = 0
+    mean_seconds: Optional[float] = None
+    p50_seconds: Optional[float] = None
+    p95_seconds: Optional[float] = None
+    max_seconds: Optional[float] = None
+
+
+class IngestionJobStats(BaseModel):
+    """The throughput and latency of the ingestion jobs completed over a time window."""
+    window_minutes: int
+    # The number of jobs by status, over all the stored jobs
+    status_counts: dict[IngestionJobStatus, int]
+    # The jobs queued, for their first attempt or a retry, and not yet picked up by a worker
+    queue_depth: int
+    in_progress: int
+    completed: int
+    failed: int
+    throughput_per_minute: float
+    # From the submission of the jobs to the end of their ingestion
+    end_to_end: IngestionDurationStats
+    # From the submission of the jobs to the start of their analysis
+    queue_wait: IngestionDurationStats
+    analysis: IngestionDurationStats
+    ingestion: IngestionDurationStats
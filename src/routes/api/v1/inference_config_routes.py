@@ -1,8 +1,12 @@
 import azure.functions as func
 import os
+from typing import AsyncIterator
+from azurefunctions.extensions.http.fastapi import PlainTextResponse, Request, Response, StreamingResponse
 from controllers import InferenceController
 from decorators import error_handler
-from models.api.v1 import QueryRequest
+from models import HTTPError
+from models.api.v1 import QueryRequest, QueryStreamEvent
+from models.environment_config import EnvironmentConfig
 from services.ingest_config_management_service import IngestConfigManagementService
 from services.ingest_lease_documents_service import IngestionCollectionDocumentService
 from services.llm_request_manager import get_llm_request_manager
@@ -14,6 +18,29 @@ from opentelemetry import trace
 inference_config_routes_bp = func.Blueprint()
 
 
+def _build_inference_controller(env_name: str, environment_config: EnvironmentConfig) -> InferenceController:
+    """Builds the inference controller with its services.
+
+    Args:
+        env_name (str): The environment name.
+        environment_config (EnvironmentConfig): The environment configuration.
+
+    Returns:
+        InferenceController: The inference controller.
+    """
+    ingest_config_management_service = IngestConfigManagementService\
+        .from_environment_config(environment_config)
+    llm_request_manager = get_llm_request_manager()
+    chat_history = get_cosmos_chat_history(env_name, environment_config)
+    ingestion_collection_document_service = IngestionCollectionDocumentService.from_environment_config(environment_config)
+    return InferenceController(
+        llm_request_manager,
+        ingest_config_management_service,
+        chat_history,
+        ingestion_collection_document_service
+    )
+
+
 @inference_config_routes_bp.route(route="v1/query", methods=["POST"])
 @error_handler
 async def query(req: func.HttpRequest) -> func.HttpResponse:
@@ -49,17 +76,7 @@ async def query(req: func.HttpRequest) -> func.HttpResponse:
     session_id = query_request.sid
     correlation_id = query_request.cid
 
-    ingest_config_management_service = IngestConfigManagementService\
-        .from_environment_config(environment_config)
-    llm_request_manager = get_llm_request_manager()
-    chat_history = get_cosmos_chat_history(env_name, environment_config)
-    ingestion_collection_document_service = IngestionCollectionDocumentService.from_environment_config(environment_config)
-    controller = InferenceController(
-        llm_request_manager,
-        ingest_config_management_service,
-        chat_history,
-        ingestion_collection_document_service
-    )
+    controller = _build_inference_controller(env_name, environment_config)
 
     tracer = trace.get_tracer(__name__)
     with tracer.start_as_current_span(name="query",
@@ -72,3 +89,77 @@ async def query(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json",
             status_code=200
         )
+
+
+@inference_config_routes_bp.route(route="v1/query/stream", methods=["POST"])
+async def query_stream(req: Request) -> Response:
+    """Streams the response to a query as server-sent events.
+
+    A "delta" event is sent for each chunk of the response text as it is generated, followed by a
+    "response" event with the complete response, its citations and metrics, or by an "error" event if the
+    response fails once it is streaming.
+
+    Args:
+        req (Request): The request object.
+
+    Returns:
+        Response: The streamed response, or an error response.
+    """
+    environment_config = get_app_config_manager().hydrate_config()
+    user_id = req.headers.get("x-user")
+    if not user_id:
+        return PlainTextResponse(
+            "User ID header is missing.",
+            status_code=400
+        )
+
+    config_name = req.query_params.get('config_name') or environment_config.default_ingest_config.name.value
+    config_version = req.query_params.get('config_version') or environment_config.default_ingest_config.version.value
+
+    try:
+        query_request = QueryRequest(**await req.json())
+    except ValueError:
+        return PlainTextResponse(
+            "Invalid JSON data.",
+            status_code=400
+        )
+
+    env_name = os.getenv('ENVIRONMENT', 'dev')
+    controller = _build_inference_controller(env_name, environment_config)
+
+    try:
+        events = await controller.query_stream(query_request, config_name, config_version, user_id)
+    except HTTPError as e:
+        return PlainTextResponse(
+            str(e),
+            status_code=e.status_code
+        )
+
+    return StreamingResponse(
+        _to_server_sent_events(events, env_name, query_request),
+        media_type="text/event-stream"
+    )
+
+
+async def _to_server_sent_events(
+    events: AsyncIterator[QueryStreamEvent],
+    env_name: str,
+    query_request: QueryRequest
+) -> AsyncIterator[str]:
+    """Formats the events of a streamed query response as server-sent events.
+
+    Args:
+        events (AsyncIterator[QueryStreamEvent]): The events of the streamed query response.
+        env_name (str): The environment name.
+        query_request (QueryRequest): The query request.
+
+    Yields:
+        str: The server-sent events.
+    """
+    tracer = trace.get_tracer(__name__)
+    with tracer.start_as_current_span(name="query_stream",
+                                      attributes={"environment": env_name,
+                                                  "correlation-id": query_request.cid,
+                                                  "session-id": query_request.sid}):
+        async for event in events:
+            yield f"event: {event.event}\ndata: {event.model_dump_json(exclude_none=True)}\n\n"
@@ -1,43 +1,147 @@
 from datetime import date
+from typing import Optional
 import azure.functions as func
 import json
+import logging
+import uuid
+from pydantic import ValidationError
 from configs.app_config_manager import get_app_config_manager
+from constants import DocumentStorageConstants, IngestionQueueConstants
 from controllers import IngestLeaseDocumentsController
 from decorators import error_handler
-from models.ingestion_models import IngestCollectionDocumentRequest
+from models.environment_config import EnvironmentConfig
+from models.ingestion_models import (
+    IngestCollectionDocumentRequest,
+    IngestDocumentType,
+    IngestionJobMessage,
+    IngestionJobStatus,
+)
 from services.azure_content_understanding_client import AzureContentUnderstandingClient
+from services.container_client import get_container_client
 from services.ingest_config_management_service import IngestConfigManagementService
 from services.ingest_lease_documents_service import IngestionCollectionDocumentService
+from services.ingestion_job_service import IngestionJobService
+from services.request_scheduler import get_request_scheduler
 from utils.constants import AZURE_AI_CONTENT_UNDERSTANDING_USER_AGENT
+from utils.path_utils import build_adls_pdf_file_path, parse_adls_pdf_file_path
 
 
 ingest_docs_routes_bp = func.Blueprint()
 
-@ingest_docs_routes_bp.route(
-    route="ingest-documents/{collection_id}/{lease_id}/{document_name}",
-    methods=["POST"]
-)
-@error_handler
-def ingest_docs(req: func.HttpRequest) -> func.HttpResponse:
-    """Ingests a single document using Azure Content Understanding."""
-    environment_config = get_app_config_manager().hydrate_config()
+
+def _build_ingest_lease_documents_controller(
+    environment_config: EnvironmentConfig,
+    ingestion_job_service: Optional[IngestionJobService] = None
+) -> IngestLeaseDocumentsController:
+    """Builds the controller ingesting the documents, with its services.
+
+    Args:
+        environment_config (EnvironmentConfig): The environment configuration.
+        ingestion_job_service (Optional[IngestionJobService]): The service tracking the progress of the documents,
+            if it is tracked.
+
+    Returns:
+        IngestLeaseDocumentsController: The controller.
+    """
     config_management_service = IngestConfigManagementService\
         .from_environment_config(environment_config)
     collection_document_service = IngestionCollectionDocumentService.\
         from_environment_config(environment_config)
-    
+
     azure_content_understanding_client = AzureContentUnderstandingClient(
         endpoint=environment_config.content_understanding.endpoint.value,
         subscription_key=environment_config.content_understanding.subscription_key.value,
         timeout=environment_config.content_understanding.request_timeout.value,
-        x_ms_useragent=AZURE_AI_CONTENT_UNDERSTANDING_USER_AGENT
+        x_ms_useragent=AZURE_AI_CONTENT_UNDERSTANDING_USER_AGENT,
+        scheduler=get_request_scheduler(environment_config),
+        max_throttled_retries=environment_config.content_understanding.rate_limit.max_throttled_retries.value
     )
 
-    ingest_lease_documents_controller = IngestLeaseDocumentsController(
+    return IngestLeaseDocumentsController(
         content_understanding_client=azure_content_understanding_client,
         ingestion_collection_document_service=collection_document_service,
-        ingestion_configuration_management_service=config_management_service
+        ingestion_configuration_management_service=config_management_service,
+        ingestion_job_service=ingestion_job_service
+    )
+
+
+def _queue_ingestion_job(
+    environment_config: EnvironmentConfig,
+    job: IngestionJobMessage,
+    ingestion_jobs: func.Out[str]
+):
+    """Records an ingestion job, then queues it.
+
+    The job is recorded first, so that its record exists when a worker updates its status.
+
+    Args:
+        environment_config (EnvironmentConfig): The environment configuration.
+        job (IngestionJobMessage): The job.
+        ingestion_jobs (func.Out[str]): The output binding of the ingestion queue.
+    """
+    IngestionJobService.from_environment_config(environment_config).submit_job(job)
+    ingestion_jobs.set(job.model_dump_json())
+
+
+def _enqueue_ingestion_job(
+    environment_config: EnvironmentConfig,
+    collection_id: str,
+    lease_id: str,
+    document_name: str,
+    document_body: bytes,
+    ingestion_jobs: func.Out[str]
+) -> IngestionJobMessage:
+    """Uploads a document to the blob storage and queues its ingestion.
+
+    The queue messages are limited to 64 KB, so the message only references the uploaded document.
+
+    Args:
+        environment_config (EnvironmentConfig): The environment configuration.
+        collection_id (str): The ID of the collection.
+        lease_id (str): The ID of the lease.
+        document_name (str): The name of the document.
+        document_body (bytes): The content of the document.
+        ingestion_jobs (func.Out[str]): The output binding of the ingestion queue.
+
+    Returns:
+        IngestionJobMessage: The queued message.
+    """
+    job = IngestionJobMessage(
+        job_id=str(uuid.uuid4()),
+        collection_id=collection_id,
+        lease_id=lease_id,
+        document_name=document_name,
+        document_path=build_adls_pdf_file_path(
+            IngestDocumentType.COLLECTION, collection_id, document_name, lease_id
+        ),
+        date_of_document=date.today()
+    )
+    get_container_client(environment_config).upload_document(
+        document_body,
+        job.document_path,
+        metadata={"job_id": job.job_id}
     )
+    _queue_ingestion_job(environment_config, job, ingestion_jobs)
+    return job
+
+
+@ingest_docs_routes_bp.route(
+    route="ingest-documents/{collection_id}/{lease_id}/{document_name}",
+    methods=["POST"]
+)
+@ingest_docs_routes_bp.queue_output(
+    arg_name="ingestion_jobs",
+    queue_name=IngestionQueueConstants.QUEUE_NAME,
+    connection=IngestionQueueConstants.CONNECTION
+)
+@error_handler
+def ingest_docs(req: func.HttpRequest, ingestion_jobs: func.Out[str]) -> func.HttpResponse:
+    """Ingests a single document using Azure Content Understanding.
+
+    When the ingestion queue is enabled, the document is queued and ingested by `ingest_queued_docs` instead, and
+    the route responds with the ID of the ingestion job.
+    """
+    environment_config = get_app_config_manager().hydrate_config()
 
     try:
         collection_id = req.route_params.get("collection_id")
@@ -65,7 +169,17 @@ def ingest_docs(req: func.HttpRequest) -> func.HttpResponse:
             "No document body provided.",
             status_code=400
         )
-    
+
+    if environment_config.ingestion_queue.enabled.value.lower() == "true":
+        job = _enqueue_ingestion_job(
+            environment_config, collection_id, lease_id, document_name, document_body, ingestion_jobs
+        )
+        return func.HttpResponse(
+            body=json.dumps({"job_id": job.job_id, "status": "queued"}),
+            mimetype="application/json",
+            status_code=202
+        )
+
     request = IngestCollectionDocumentRequest(
         id=collection_id,
         filename=document_name,
@@ -75,7 +189,7 @@ def ingest_docs(req: func.HttpRequest) -> func.HttpResponse:
     )
     documents = [request]
 
-    ingest_lease_documents_controller.ingest_documents(
+    _build_ingest_lease_documents_controller(environment_config).ingest_documents(
         config_name=config_name,
         config_version=config_version,
         documents=documents
@@ -85,3 +199,117 @@ def ingest_docs(req: func.HttpRequest) -> func.HttpResponse:
         body="Document ingested successfully.",
         status_code=200
     )
+
+
+@ingest_docs_routes_bp.queue_trigger(
+    arg_name="message",
+    queue_name=IngestionQueueConstants.QUEUE_NAME,
+    connection=IngestionQueueConstants.CONNECTION
+)
+def ingest_queued_docs(message: func.QueueMessage) -> None:
+    """Ingests a document queued by `ingest_docs`.
+
+    A failed ingestion raises, so that the message becomes visible again and is retried once the visibility timeout
+    configured in `host.json` expires. The messages that failed `maxDequeueCount` times are moved to the poison
+    queue by the Functions host. The progress of the ingestion is recorded in the job of the document, which is
+    retrying after a failed attempt and failed after the last one.
+    """
+    job = IngestionJobMessage.model_validate_json(message.get_body())
+    logging.info(
+        f"Ingesting document {job.document_path} of job {job.job_id}, attempt {message.dequeue_count}."
+    )
+
+    environment_config = get_app_config_manager().hydrate_config()
+    ingestion_job_service = IngestionJobService.from_environment_config(environment_config)
+    try:
+        file_bytes, _ = get_container_client(environment_config).download_file(job.document_path)
+
+        _build_ingest_lease_documents_controller(environment_config, ingestion_job_service).ingest_documents(
+            config_name=environment_config.default_ingest_config.name.value,
+            config_version=environment_config.default_ingest_config.version.value,
+            documents=[IngestCollectionDocumentRequest(
+                id=job.collection_id,
+                filename=job.document_name,
+                file_bytes=file_bytes,
+                date_of_document=job.date_of_document,
+                lease_id=job.lease_id,
+                job_id=job.job_id
+            )]
+        )
+    except Exception as e:
+        is_last_attempt = (message.dequeue_count or 0) >= environment_config.ingestion_queue.max_dequeue_count.value
+        ingestion_job_service.set_status(
+            job.job_id,
+            IngestionJobStatus.FAILED if is_last_attempt else IngestionJobStatus.RETRYING,
+            attempts=message.dequeue_count,
+            error=str(e)
+        )
+        raise
+
+    ingestion_job_service.set_status(job.job_id, IngestionJobStatus.DONE, attempts=message.dequeue_count)
+    logging.info(f"Ingested document {job.document_path} of job {job.job_id}.")
+
+
+@ingest_docs_routes_bp.blob_trigger(
+    arg_name="blob",
+    path=DocumentStorageConstants.COLLECTIONS_PATH,
+    connection=DocumentStorageConstants.CONNECTION
+)
+@ingest_docs_routes_bp.queue_output(
+    arg_name="ingestion_jobs",
+    queue_name=IngestionQueueConstants.QUEUE_NAME,
+    connection=IngestionQueueConstants.CONNECTION
+)
+def queue_uploaded_docs(blob: func.InputStream, ingestion_jobs: func.Out[str]) -> None:
+    """Queues the ingestion of a document uploaded directly to the blob storage.
+
+    The documents are ingested by `ingest_queued_docs`, so the documents uploaded together are ingested in batches
+    of the size configured in `host.json`, with the same retries as the documents sent to `ingest_docs`. The
+    documents uploaded by `ingest_docs` are already queued and are skipped, as are the markdown files written by the
+    ingestion.
+    """
+    if (blob.metadata or {}).get("job_id"):
+        return
+
+    environment_config = get_app_config_manager().hydrate_config()
+    if environment_config.ingestion_queue.ingest_uploaded_documents.value.lower() != "true":
+        return
+
+    # The name of the blob starts with its container
+    document_path = blob.name.split("/", 1)[-1]
+    try:
+        _, collection_id, document_name, lease_id = parse_adls_pdf_file_path(document_path)
+    except ValueError:
+        logging.info(f"Skipping the ingestion of {document_path}, it is not a PDF file of a collection lease.")
+        return
+
+    job = IngestionJobMessage(
+        job_id=str(uuid.uuid4()),
+        collection_id=collection_id,
+        lease_id=lease_id,
+        document_name=document_name,
+        document_path=document_path,
+        date_of_document=date.today()
+    )
+    _queue_ingestion_job(environment_config, job, ingestion_jobs)
+    logging.info(f"Queued the ingestion of the uploaded document {document_path} as job {job.job_id}.")
+
+
+@ingest_docs_routes_bp.queue_trigger(
+    arg_name="message",
+    queue_name=IngestionQueueConstants.POISON_QUEUE_NAME,
+    connection=IngestionQueueConstants.CONNECTION
+)
+def log_poisoned_ingestion_jobs(message: func.QueueMessage) -> None:
+    """Logs the ingestions that failed on every attempt, the document stays in the blob storage to be resubmitted."""
+    logging.error(f"Ingestion job failed on every attempt and was abandoned: {message.get_body().decode()}")
+
+    try:
+        job = IngestionJobMessage.model_validate_json(message.get_body())
+    except ValidationError:
+        return
+
+    environment_config = get_app_config_manager().hydrate_config()
+    IngestionJobService.from_environment_config(environment_config).set_status(
+        job.job_id, IngestionJobStatus.FAILED, error="The ingestion failed on every attempt and was abandoned."
+    )
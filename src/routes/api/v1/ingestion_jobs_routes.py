@@ -0,0 +1,75 @@
+from datetime import timedelta
+import azure.functions as func
+import json
+from configs.app_config_manager import get_app_config_manager
+from decorators import error_handler
+from models import HTTPError
+from services.ingestion_job_service import IngestionJobService
+from services.request_scheduler import get_request_scheduler
+
+
+ingestion_jobs_routes_bp = func.Blueprint()
+
+_DEFAULT_STATS_WINDOW_MINUTES = 60
+
+
+@ingestion_jobs_routes_bp.route(
+    route="ingestion-jobs/stats",
+    methods=["GET"]
+)
+@error_handler
+def get_ingestion_job_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Gets the throughput and latency of the ingestion jobs completed over a time window, and the queue depth.
+
+    When the Content Understanding requests are rate limited, the delays of the requests scheduled by the worker
+    handling the request are returned as well, under `request_scheduler`.
+
+    Args:
+        req (func.HttpRequest): The request object, with the optional `window_minutes` query parameter.
+
+    Returns:
+        func.HttpResponse: The response object.
+    """
+    window_minutes = req.params.get("window_minutes", str(_DEFAULT_STATS_WINDOW_MINUTES))
+    if not window_minutes.isdigit() or int(window_minutes) == 0:
+        raise HTTPError("The 'window_minutes' query parameter must be a positive integer.", 400)
+
+    environment_config = get_app_config_manager().hydrate_config()
+    stats = IngestionJobService.from_environment_config(environment_config)\
+        .get_stats(timedelta(minutes=int(window_minutes)))
+    body = stats.model_dump(mode="json")
+    request_scheduler = get_request_scheduler(environment_config)
+    if request_scheduler is not None:
+        body["request_scheduler"] = request_scheduler.stats.model_dump()
+    return func.HttpResponse(
+        body=json.dumps(body),
+        status_code=200,
+        headers={"Content-Type": "application/json"}
+    )
+
+
+@ingestion_jobs_routes_bp.route(
+    route="ingestion-jobs/{job_id}",
+    methods=["GET"]
+)
+@error_handler
+def get_ingestion_job(req: func.HttpRequest) -> func.HttpResponse:
+    """Gets the status of an ingestion job, with the time each stage was entered.
+
+    Args:
+        req (func.HttpRequest): The request object.
+
+    Returns:
+        func.HttpResponse: The response object.
+    """
+    job_id = req.route_params.get("job_id")
+    environment_config = get_app_config_manager().hydrate_config()
+    job = IngestionJobService.from_environment_config(environment_config).get_job(job_id)
+    if job is None:
+        raise HTTPError(f"Ingestion job '{job_id}' not found.", 404)
+
+    return func.HttpResponse(
+        body=job.model_dump_json(),
+        status_code=200,
+        headers={"Content-Type": "application/json"}
+    )
@@ -0,0 +1,216 @@
+import logging
+import re
+import threading
+import unicodedata
+from typing import Callable, Optional
+
+import numpy as np
+from cachetools import TTLCache
+from cachetools.keys import hashkey
+from pydantic import BaseModel, ConfigDict
+
+from models.api.v1 import QueryResponse
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " ?!.;:"
+# Punctuation around the words of a question, which is not part of the collection IDs
+_WORD_PUNCTUATION = "?!.,;:'\"()[]{}"
+
+
+def normalize_question(question: str) -> str:
+    """Normalizes a question so that trivially different phrasings share a cache entry.
+
+    Args:
+        question (str): The question of the user.
+
+    Returns:
+        str: The question in NFKC form, case folded, with collapsed whitespace and without trailing punctuation.
+
+    Examples:
+        >>> normalize_question("  When does lease   X expire?? ")
+        'when does lease x expire'
+    """
+    question = unicodedata.normalize("NFKC", question).casefold()
+    return _WHITESPACE_PATTERN.sub(" ", question).strip(_TRAILING_PUNCTUATION)
+
+
+def get_question_words(question: str) -> list[str]:
+    """Gets the whole words of a question, with their case, which the collection IDs are matched against.
+
+    Args:
+        question (str): The question of the user.
+
+    Returns:
+        list[str]: The distinct words of the question in NFKC form, without surrounding punctuation.
+
+    Examples:
+        >>> get_question_words("When does lease X in 3OAS-074 expire?")
+        ['When', 'does', 'lease', 'X', 'in', '3OAS-074', 'expire']
+    """
+    words = (word.strip(_WORD_PUNCTUATION) for word in unicodedata.normalize("NFKC", question).split())
+    return list(dict.fromkeys(word for word in words if word))
+
+
+class AnswerCacheEntry(BaseModel):
+    """An answer stored in the cache, with the collection data version it was generated from."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    question: str
+    config_id: str
+    lease_config_hash: str
+    collection_id: str
+    data_version: int
+    response: QueryResponse
+    embedding: Optional[np.ndarray] = None
+
+    @property
+    def key(self) -> tuple:
+        """The key of the entry in the cache."""
+        return hashkey(self.config_id, self.lease_config_hash, self.collection_id, self.question)
+
+
+class AnswerCache:
+    """Cache of the answers to the first question of a session, by question and collection data version.
+
+    Entries are keyed by configuration ID, lease configuration hash, collection ID and normalized question. The
+    collection of a new question is not known before it is answered, so an entry is looked up for each word of the
+    question, compared case-sensitively with the collection IDs: only the answers about a collection named in their
+    question are cached. An entry is only returned while the data of its collection still has the version the
+    answer was generated from, so that answers are never served from data that has since been re-ingested.
+
+    When question embeddings are provided, questions phrased differently can also be matched: the entry with the
+    most similar question above the similarity threshold is used, as long as its collection ID is a word of the new
+    question.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, similarity_threshold: float = 0.95):
+        """Initializes the answer cache.
+
+        Args:
+            max_size (int): The maximum number of cached answers.
+            ttl_seconds (int): The time to live of the cached answers, in seconds.
+            similarity_threshold (float): The minimum cosine similarity of the question embeddings to reuse an
+                answer to a differently phrased question.
+        """
+        self._entries: TTLCache = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+        self._similarity_threshold = similarity_threshold
+        # The cache is shared by the queries handled concurrently in the worker threads
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        question: str,
+        config_id: str,
+        lease_config_hash: str,
+        get_data_version: Callable[[str], Optional[int]],
+        embedding: Optional[np.ndarray] = None
+    ) -> Optional[QueryResponse]:
+        """Gets the cached answer to a question.
+
+        Args:
+            question (str): The question of the user.
+            config_id (str): The ID of the configuration used to answer, which holds the prompt.
+            lease_config_hash (str): The lease configuration hash of the configuration used to answer.
+            get_data_version (Callable[[str], Optional[int]]): Gets the current data version of a collection.
+            embedding (Optional[np.ndarray]): The embedding of the question, to match similar questions.
+
+        Returns:
+            Optional[QueryResponse]: A copy of the cached answer, or None if there is no valid cached answer.
+        """
+        normalized_question = normalize_question(question)
+        words = get_question_words(question)
+        with self._lock:
+            entry = None
+            for word in words:
+                entry = self._entries.get(hashkey(config_id, lease_config_hash, word, normalized_question))
+                if entry is not None:
+                    break
+            if entry is None and embedding is not None:
+                entry = self._find_similar_entry(words, config_id, lease_config_hash, embedding)
+
+        if entry is None:
+            return None
+
+        if entry.data_version != get_data_version(entry.collection_id):
+            logging.info(f"Cached answer for collection {entry.collection_id} is outdated.")
+            with self._lock:
+                if self._entries.get(entry.key) is entry:
+                    del self._entries[entry.key]
+            return None
+
+        return entry.response.model_copy(deep=True)
+
+    def set(
+        self,
+        question: str,
+        config_id: str,
+        lease_config_hash: str,
+        collection_id: str,
+        data_version: int,
+        response: QueryResponse,
+        embedding: Optional[np.ndarray] = None
+    ):
+        """Caches the answer to a question, if the question names its collection.
+
+        Args:
+            question (str): The question of the user.
+            config_id (str): The ID of the configuration used to answer, which holds the prompt.
+            lease_config_hash (str): The lease configuration hash of the configuration used to answer.
+            collection_id (str): The ID of the collection the answer is based on.
+            data_version (int): The version of the collection data the answer is based on.
+            response (QueryResponse): The answer, with its restored citations.
+            embedding (Optional[np.ndarray]): The embedding of the question, to match similar questions.
+        """
+        if collection_id not in get_question_words(question):
+            # The answer could not be looked up, the collection of a question is only known by its words
+            return
+
+        entry = AnswerCacheEntry(
+            question=normalize_question(question),
+            config_id=config_id,
+            lease_config_hash=lease_config_hash,
+            collection_id=collection_id,
+            data_version=data_version,
+            response=response.model_copy(update={"metrics": None}, deep=True),
+            embedding=None if embedding is None else embedding / np.linalg.norm(embedding)
+        )
+        with self._lock:
+            self._entries[entry.key] = entry
+
+    def _find_similar_entry(
+        self,
+        words: list[str],
+        config_id: str,
+        lease_config_hash: str,
+        embedding: np.ndarray
+    ) -> Optional[AnswerCacheEntry]:
+        """Finds the entry with the most similar question, using a cosine similarity search over the entries.
+
+        Only the entries of the same configuration whose collection ID is a word of the question are considered,
+        as questions about different collections are otherwise nearly identical.
+
+        Args:
+            words (list[str]): The words of the question of the user.
+            config_id (str): The ID of the configuration used to answer.
+            lease_config_hash (str): The lease configuration hash of the configuration used to answer.
+            embedding (np.ndarray): The embedding of the question.
+
+        Returns:
+            Optional[AnswerCacheEntry]: The most similar entry above the similarity threshold, if any.
+        """
+        words = set(words)
+        candidates = [
+            entry for entry in self._entries.values()
+            if entry.embedding is not None
+            and entry.config_id == config_id
+            and entry.lease_config_hash == lease_config_hash
+            and entry.collection_id in words
+        ]
+        if not candidates:
+            return None
+
+        similarities = np.stack([entry.embedding for entry in candidates]) @ (embedding / np.linalg.norm(embedding))
+        best_index = int(np.argmax(similarities))
+        if similarities[best_index] < self._similarity_threshold:
+            return None
+        return candidates[best_index]
@@ -1,13 +1,77 @@
 import requests
 from requests.models import Response
+import codecs
+import itertools
 import logging
 import json
 import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+
+from services.request_scheduler import RequestScheduler
+from utils.json_stream_utils import JsonSelection, JsonStringFieldStreamReader, load_json_selection
 
 
 _DEFAULT_API_VERSION = "2025-05-01-preview"
 _DEFAULT_TIMEOUT_SECONDS = 30
+# The status of an operation is at the start of its JSON body, only this much is read while it is in progress
+_STATUS_CHUNK_SIZE = 1024
+_RESULT_CHUNK_SIZE = 1024 * 1024
+_COMPLETED_STATUSES = ("succeeded", "failed")
+# The statuses of the responses asking to retry later, with the Retry-After header
+_THROTTLED_STATUS_CODES = (429, 503)
+_DEFAULT_MAX_THROTTLED_RETRIES = 3
+# The delay before retrying a request throttled without Retry-After header, doubled on every attempt
+_DEFAULT_RETRY_AFTER_SECONDS = 1
+# Waiting for less than this before sending a request is not logged
+_MIN_LOGGED_DELAY_SECONDS = 0.1
+
+
+def _get_retry_after_seconds(response: Response, attempt: int) -> float:
+    """Gets the time to wait before retrying a throttled request.
+
+    Args:
+        response (Response): The throttled response.
+        attempt (int): The number of the attempt that was throttled, from 0.
+
+    Returns:
+        float: The time to wait, in seconds: the time set by the Retry-After header, in seconds or as a date, or an
+            exponential backoff when the header is missing or invalid.
+
+    Examples:
+        >>> response = Response()
+        >>> response.headers["Retry-After"] = "7"
+        >>> _get_retry_after_seconds(response, 0)
+        7.0
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return float(_DEFAULT_RETRY_AFTER_SECONDS * 2 ** attempt)
+
+
+class OperationPollingStats(BaseModel):
+    """Counters of the requests polling the result of an operation.
+
+    Attributes:
+        polls (int): The number of polling requests.
+        bytes_read (int): The number of bytes of the response bodies read, for all the polling requests.
+        result_bytes (int): The number of bytes of the body of the completed operation.
+    """
+    polls: int = 0
+    bytes_read: int = 0
+    result_bytes: int = 0
 
 
 class AzureContentUnderstandingClient:
@@ -19,12 +83,32 @@ class AzureContentUnderstandingClient:
         token_provider: callable = lambda: None,
         x_ms_useragent: str = "data-extraction-code",
         timeout: int = _DEFAULT_TIMEOUT_SECONDS,
+        scheduler: Optional[RequestScheduler] = None,
+        max_throttled_retries: int = _DEFAULT_MAX_THROTTLED_RETRIES,
     ):
-        """Costructor client for interacting with the Azure Content Understanding service.
+        """Constructs a client for interacting with the Azure Content Understanding service.
+
+        This client provides methods to manage and analyze content using the Azure Content Understanding service.
+        The requests starting an analysis or a classification wait for the scheduler, when given, to limit their rate
+        and the number of operations in progress. The requests answered with a 429 or 503 status are retried after
+        the time set by their Retry-After header, up to `max_throttled_retries` times.
+
+        Args:
+            endpoint (str): The endpoint of the Azure Content Understanding service.
+            api_version (str): The version of the API.
+            subscription_key (str): The subscription key of the service, if the requests are not authenticated with a
+                token.
+            token_provider (callable): Returns the token authenticating the requests, if no subscription key is
+                provided.
+            x_ms_useragent (str): The user agent sent in the `x-ms-useragent` header.
+            timeout (int): The timeout of the HTTP requests, in seconds.
+            scheduler (Optional[RequestScheduler]): The scheduler of the requests of the worker, if they are rate
+                limited.
+            max_throttled_retries (int): The maximum number of retries of a throttled request.
 
-        This client provides methods to manage and analyze content using the Azure Content Understanding serviceon.
+        Raises:
             ValueError: If neither `subscription_key` nor `token_provider` is provided, or if `api_version` or
-            `endpoint` is not provided.
+                `endpoint` is not provided.
         """
         if not subscription_key and not token_provider:
             raise ValueError(
@@ -37,11 +121,99 @@ class AzureContentUnderstandingClient:
 
         self._endpoint = endpoint.rstrip("/")
         self._api_version = api_version
+        # The counters of the last operation polled with poll_result
+        self.last_polling_stats: Optional[OperationPollingStats] = None
         self._logger = logging.getLogger(__name__)
         self._headers = self._get_headers(
             subscription_key, token_provider(), x_ms_useragent
         )
         self._timeout = timeout
+        self._scheduler = scheduler
+        self._max_throttled_retries = max_throttled_retries
+        # The slots of the operations started by this client and not polled yet, by operation location
+        self._operation_slots: dict[str, int] = {}
+
+    def _send(self, send: Callable[..., Response], *args, rate_limited: bool = True, **kwargs) -> Response:
+        """Sends a request, waiting for the scheduler and retrying it while it is throttled.
+
+        A throttled request is always retried after the time asked by the service. With a scheduler, the other
+        requests of the process wait for that time as well, including the requests that are not rate limited.
+
+        Args:
+            send (Callable[..., Response]): The function sending the request, e.g. `requests.post`.
+            *args: The positional arguments of the request.
+            rate_limited (bool, optional): Whether the request waits for the rate limit of the scheduler. Defaults to
+                True.
+            **kwargs: The keyword arguments of the request.
+
+        Returns:
+            Response: The response, which is still throttled if the retries are exhausted.
+        """
+        for attempt in itertools.count():
+            if self._scheduler is not None:
+                delay_seconds = self._scheduler.acquire_request() if rate_limited else self._scheduler.wait_for_pause()
+                if delay_seconds >= _MIN_LOGGED_DELAY_SECONDS:
+                    self._logger.info(f"Request waited {delay_seconds:.2f} seconds before being sent.")
+
+            response = send(*args, **kwargs)
+            if response.status_code not in _THROTTLED_STATUS_CODES or attempt >= self._max_throttled_retries:
+                return response
+
+            retry_after_seconds = _get_retry_after_seconds(response, attempt)
+            response.close()
+            self._logger.warning(
+                f"Request throttled with status {response.status_code}, retrying in {retry_after_seconds:.2f} "
+                f"seconds (attempt {attempt + 1} of {self._max_throttled_retries})."
+            )
+            if self._scheduler is not None:
+                # The other requests of the process wait too, they would be throttled as well
+                self._scheduler.pause(retry_after_seconds)
+            else:
+                time.sleep(retry_after_seconds)
+
+    def _begin_operation(self, **kwargs) -> Response:
+        """Sends a request starting an operation, taking a slot of the scheduler until its result is polled.
+
+        Args:
+            **kwargs: The arguments of the POST request.
+
+        Returns:
+            Response: The response of the request.
+
+        Raises:
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        if self._scheduler is None:
+            response = self._send(requests.post, **kwargs)
+            response.raise_for_status()
+            return response
+
+        slot_id, delay_seconds = self._scheduler.acquire_operation()
+        if delay_seconds >= _MIN_LOGGED_DELAY_SECONDS:
+            self._logger.info(f"Operation waited {delay_seconds:.2f} seconds for another operation to complete.")
+        try:
+            response = self._send(requests.post, **kwargs)
+            response.raise_for_status()
+        except BaseException:
+            self._scheduler.release_operation(slot_id)
+            raise
+
+        operation_location = response.headers.get("operation-location", "")
+        if operation_location:
+            self._operation_slots[operation_location] = slot_id
+        else:
+            self._scheduler.release_operation(slot_id)
+        return response
+
+    def _release_operation(self, operation_location: str):
+        """Releases the slot of an operation started by this client, if it has one.
+
+        Args:
+            operation_location (str): The location of the operation.
+        """
+        slot_id = self._operation_slots.pop(operation_location, None)
+        if slot_id is not None:
+            self._scheduler.release_operation(slot_id)
 
     def _get_analyzer_url(self, endpoint, api_version, analyzer_id):
         return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}?api-version={api_version}"  # noqa
@@ -316,7 +488,7 @@ class AzureContentUnderstandingClient:
         headers = kwargs.get("headers", {"Content-Type": "application/octet-stream"})
         headers.update(self._headers)
         if isinstance(data, dict):
-            response = requests.post(
+            response = self._begin_operation(
                 url=self._get_analyze_url(
                     self._endpoint, self._api_version, analyzer_id
                 ),
@@ -325,7 +497,7 @@ class AzureContentUnderstandingClient:
                 timeout=self._timeout
             )
         else:
-            response = requests.post(
+            response = self._begin_operation(
                 url=self._get_analyze_url(
                     self._endpoint, self._api_version, analyzer_id
                 ),
@@ -334,7 +506,6 @@ class AzureContentUnderstandingClient:
                 timeout=self._timeout
             )
 
-        response.raise_for_status()
         self._logger.info(
             f"Analyzing file data with analyzer: {analyzer_id}"
         )
@@ -383,7 +554,7 @@ class AzureContentUnderstandingClient:
         """
         headers = kwargs.get("headers", {"Content-Type": "application/octet-stream"})
         headers.update(self._headers)
-        response = requests.post(
+        response = self._begin_operation(
             url=self._get_classify_url(
                 self._endpoint, self._api_version, classifier_id
             ),
@@ -392,7 +563,6 @@ class AzureContentUnderstandingClient:
             timeout=self._timeout
         )
 
-        response.raise_for_status()
         self._logger.info(
             f"Processing file data with classifier: {classifier_id}"
         )
@@ -467,15 +637,25 @@ class AzureContentUnderstandingClient:
         response: Response,
         timeout_seconds: int = 180,
         polling_interval_seconds: int = 2,
+        result_selection: Optional[JsonSelection] = None,
     ):
         """Polls the result of an asynchronous operation until it completes or times out.
 
+        The polling responses are streamed: only the start of their body is read to find the status of the
+        operation, and the responses of operations in progress are closed without reading the rest. The body of
+        the completed operation is read and decoded once. When a result selection is given, only the selected parts
+        of the body are kept, the other values are discarded as soon as they are decoded. The counters of the
+        polling are logged and kept in `last_polling_stats`.
+
         Args:
             response (Response): The initial response object containing the operation location.
             timeout_seconds (int, optional): The maximum number of seconds to wait for the operation to complete.
                 Defaults to 120.
             polling_interval_seconds (int, optional): The number of seconds to wait between polling attempts.
                 Defaults to 2.
+            result_selection (JsonSelection, optional): The parts of the JSON response to decode, e.g. the parts of
+                large analyze results that are used. The status and error of the operation are always decoded.
+                Defaults to the whole response.
 
         Raises:
             ValueError: If the operation location is not found in the response headers.
@@ -492,6 +672,40 @@ class AzureContentUnderstandingClient:
         headers = {"Content-Type": "application/json"}
         headers.update(self._headers)
 
+        stats = OperationPollingStats()
+        self.last_polling_stats = stats
+        try:
+            return self._poll_operation(
+                operation_location, stats, timeout_seconds, polling_interval_seconds, result_selection
+            )
+        finally:
+            # The operation is completed, or it is abandoned
+            self._release_operation(operation_location)
+
+    def _poll_operation(
+        self,
+        operation_location: str,
+        stats: OperationPollingStats,
+        timeout_seconds: int,
+        polling_interval_seconds: int,
+        result_selection: Optional[JsonSelection]
+    ):
+        """Polls an operation until it completes or times out, see `poll_result`.
+
+        Args:
+            operation_location (str): The location of the operation.
+            stats (OperationPollingStats): The counters of the polling.
+            timeout_seconds (int): The maximum number of seconds to wait for the operation to complete.
+            polling_interval_seconds (int): The number of seconds to wait between polling attempts.
+            result_selection (Optional[JsonSelection]): The parts of the JSON response to decode.
+
+        Raises:
+            TimeoutError: If the operation does not complete within the specified timeout.
+            RuntimeError: If the operation fails.
+
+        Returns:
+            dict: The JSON response of the completed operation if it succeeds.
+        """
         start_time = time.time()
         while True:
             elapsed_time = time.time() - start_time
@@ -500,23 +714,78 @@ class AzureContentUnderstandingClient:
                     f"Operation timed out after {timeout_seconds:.2f} seconds."
                 )
 
-            response = requests.get(
+            # The polling requests do not start operations, they are only retried when throttled
+            response = self._send(
+                requests.get,
                 operation_location,
+                rate_limited=False,
                 headers=self._headers,
-                timeout=self._timeout
+                timeout=self._timeout,
+                stream=True
             )
-            response.raise_for_status()
-            status = response.json().get("status").lower()
+            try:
+                response.raise_for_status()
+                stats.polls += 1
+                status, result = self._read_operation_status(response, stats, result_selection)
+            finally:
+                response.close()
+
             if status == "succeeded":
                 self._logger.info(
-                    f"Request result is ready after {elapsed_time:.2f} seconds."
+                    f"Request result is ready after {elapsed_time:.2f} seconds. {stats.polls} polls, "
+                    f"{stats.bytes_read} bytes read, {stats.result_bytes} bytes for the result."
                 )
-                return response.json()
+                return result
             elif status == "failed":
-                self._logger.error(f"Request failed. Reason: {response.json()}")
+                self._logger.error(f"Request failed. Reason: {result}")
                 raise RuntimeError("Request failed.")
             else:
                 self._logger.info(
                     f"Request {operation_location.split('/')[-1].split('?')[0]} in progress ..."
                 )
             time.sleep(polling_interval_seconds)
+
+    def _read_operation_status(
+        self,
+        response: Response,
+        stats: OperationPollingStats,
+        result_selection: Optional[JsonSelection]
+    ) -> tuple[str, Optional[dict]]:
+        """Reads the status of an operation from a streamed polling response, and its result once completed.
+
+        Args:
+            response (Response): The streamed polling response.
+            stats (OperationPollingStats): The counters of the polling, updated with the bytes read.
+            result_selection (Optional[JsonSelection]): The parts of the JSON response to decode.
+
+        Returns:
+            tuple[str, Optional[dict]]: The status of the operation in lower case, and the decoded response if the
+                operation is completed.
+        """
+        chunks = []
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        status_reader = JsonStringFieldStreamReader("status")
+        status = ""
+        for chunk in response.iter_content(chunk_size=_STATUS_CHUNK_SIZE):
+            chunks.append(chunk)
+            stats.bytes_read += len(chunk)
+            status += status_reader.feed(decoder.decode(chunk))
+            if status_reader.field_read:
+                break
+
+        if status_reader.field_read and status.lower() not in _COMPLETED_STATUSES:
+            return status.lower(), None
+
+        # The rest of the body of a completed operation, or of a body whose status could not be read while streamed
+        for chunk in response.iter_content(chunk_size=_RESULT_CHUNK_SIZE):
+            chunks.append(chunk)
+            stats.bytes_read += len(chunk)
+        body = b"".join(chunks)
+        stats.result_bytes = len(body)
+
+        text = body.decode(response.encoding or "utf-8")
+        if result_selection is None:
+            result = json.loads(text)
+        else:
+            result = load_json_selection(text, {**result_selection, "status": True, "error": True})
+        return result.get("status").lower(), result
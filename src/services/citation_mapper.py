@@ -1,123 +1,192 @@
-from typing import Tuple, Dict, Optional
+import itertools
+import string
+from typing import Dict, Iterator, Optional, Tuple
+
+from models.extracted_collection_documents import ExtractedLeaseFieldValue
 
 
-_VALUE_PREFIX = 'value'
 _VALUE_ARRAY_KEY = 'valueArray'
 _VALUE_OBJECT_KEY = 'valueObject'
 _SOURCE_KEY = 'source'
 _DOCUMENT_KEY = 'document'
 _TYPE_KEY = 'type'
+# The keys of the extracted values, a field element without any of them has no value
+_VALUE_KEYS = frozenset(name for name in ExtractedLeaseFieldValue.model_fields if name.startswith('value'))
 
 
-class CitationMapper:
-    def process_json(self, data: dict) -> Tuple[dict, Dict[str, str]]:
-        """Process the JSON object to replace `source_document` and `source_bounding_boxes`.
+def _generate_alias_suffixes(length: int) -> Iterator[str]:
+    return ("".join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=length))
 
-        Replacing them with aliases and generate a mapping for the replacements.
 
-        Args:
-            data (dict): The input JSON object.
+# The suffixes of the first 18278 aliases of a collection, from A to ZZZ
+_ALIAS_SUFFIXES = tuple(suffix for length in range(1, 4) for suffix in _generate_alias_suffixes(length))
 
-        Returns:
-            Tuple[dict, Dict[str, str]]: The processed JSON object and the mapping.
+
+def _iter_alias_suffixes() -> Iterator[str]:
+    """Generates the suffixes of the citation aliases, named like spreadsheet columns.
+
+    Yields:
+        str: The suffixes A to Z, then AA to ZZ, then AAA and so on.
+
+    Examples:
+        >>> list(itertools.islice(_iter_alias_suffixes(), 25, 29))
+        ['Z', 'AA', 'AB', 'AC']
+    """
+    yield from _ALIAS_SUFFIXES
+    for length in itertools.count(4):
+        yield from _generate_alias_suffixes(length)
+
+
+class _CitationReplacement:
+    """Copies the fields of the leases of a collection, replacing their citations with aliases.
+
+    The fields are processed over an explicit stack of generators instead of recursive calls: the generator of a
+    fields dictionary or array yields when it finds a cited array, whose items are processed before the generator
+    is resumed. The aliases are therefore numbered in the order the values appear in the JSON object.
+    """
+
+    def __init__(self, collection_id: str):
+        """Initializes the replacement.
+
+        Args:
+            collection_id (str): The ID of the collection, used in the aliases.
         """
-        mapping = {}
-        id = data["_id"]
-        alias_counter = 1
-
-        # Process unstructured data
-        for lease in data.get('unstructured_data', []):
-            self._replace_citations(lease.get('fields', {}), mapping, id, [alias_counter])
-            alias_counter = alias_counter + len(lease.get('fields', {}))
-
-        return data, mapping
-
-    def _convert_number_to_excel_column(self, number):
-        result = ""
-        while number > 0:
-            number -= 1
-            result = chr(65 + (number % 26)) + result
-            number //= 26
-        return result
-
-    def _process_dict_element(
-        self,
-        field_elem: dict,
-        field_key: str,
-        fields_to_delete: set,
-        mapping: dict,
-        id: str,
-        alias_counter: list,
-        document: Optional[str] = None
-    ):
-        """Helper method to process a dictionary element for citation replacement.
+        alias_prefix = f"CITE{collection_id}-"
+        self.mapping = {}
+        self._aliases = (alias_prefix + suffix for suffix in _iter_alias_suffixes())
+        # The cited arrays found while processing an element: the items, the list receiving their processed copies
+        # and the document of the array
+        self._arrays: list[Tuple[list, list, str]] = []
+
+    def replace_citations(self, fields: dict) -> dict:
+        """Copies the fields of a lease, replacing their citations with aliases.
 
         Args:
-            field_elem (dict): The dictionary element to process
-            field_key (str): The key of the field being processed
-            fields_to_delete (set): Set to track fields that should be deleted
-            mapping (dict): The mapping dictionary to store the replacements
-            id (str): The ID of the document
-            alias_counter (list): A list containing a single integer to track the alias count
-            document (Optional[str]): The document name to use for citation
+            fields (dict): The fields dictionary containing the citations.
 
         Returns:
-            bool: True if the field should be kept, False if processing should continue to next field
+            dict: The processed fields.
         """
-        field_keys = field_elem.keys()
-        # check if a key starts with value
-        if not any(key.startswith(_VALUE_PREFIX) for key in field_keys):
-            fields_to_delete.add(field_key)
-            return False
-
-        if _TYPE_KEY in field_elem:
-            field_elem.pop(_TYPE_KEY, None)
-
-        if (_DOCUMENT_KEY in field_elem and field_elem[_DOCUMENT_KEY]) or document:
-            _document = document or field_elem[_DOCUMENT_KEY]
-            if _VALUE_ARRAY_KEY in field_elem:
-                for item in field_elem[_VALUE_ARRAY_KEY]:
-                    value_object = item[_VALUE_OBJECT_KEY]
-                    self._replace_citations(value_object, mapping, id, alias_counter, _document)
-                field_elem.pop(_DOCUMENT_KEY, None)
-                return False
-
-            alias = f"CITE{id}-{self._convert_number_to_excel_column(alias_counter[0])}"
-            mapping[alias] = {
-                "source_document": _document,
-                "source_bounding_boxes": field_elem.get(_SOURCE_KEY)
-            }
-            field_elem[_DOCUMENT_KEY] = alias
-            field_elem.pop(_SOURCE_KEY, None)
-            alias_counter[0] += 1
-
-        return True
-
-    def _replace_citations(self, fields, mapping, id, alias_counter, document: Optional[str] = None):
-        """Helper to replace citations in fields dict.
+        processed_fields = {}
+        stack = [self._process_fields(fields, processed_fields, None)]
+        while stack:
+            # The generators yield False for each cited array they find, and default to True once exhausted
+            if next(stack[-1], True):
+                stack.pop()
+            else:
+                stack.append(self._process_array(*self._arrays.pop()))
+        return processed_fields
+
+    def _process_fields(self, fields: dict, processed_fields: dict, document: Optional[str]) -> Iterator[bool]:
+        """Copies fields, replacing the citations of their elements. Fields with an element without value are left out.
 
         Args:
-            fields (dict): The fields dictionary containing the citations.
-            mapping (dict): The mapping dictionary to store the replacements.
-            id (str): The ID of the document.
-            alias_counter (list): A list containing a single integer to track the alias count.
-            document (Optional[str]): The document name to be used for the citation.
+            fields (dict): The fields to process.
+            processed_fields (dict): The dictionary receiving the processed fields.
+            document (Optional[str]): The document name to use for citation.
+
+        Yields:
+            bool: False when a cited array was found, to process it before resuming.
         """
-        fields_to_delete = set()
         for field_key, field_value in fields.items():
             if isinstance(field_value, list):
+                if any(isinstance(elem, dict) and _VALUE_KEYS.isdisjoint(elem) for elem in field_value):
+                    continue
+                processed_elems = processed_fields[field_key] = []
                 for field_elem in field_value:
                     if isinstance(field_elem, dict):
-                        if not self._process_dict_element(
-                                field_elem, field_key, fields_to_delete,
-                                mapping, id, alias_counter, document):
-                            continue
+                        processed_elems.append(self._process_element(field_elem, document))
+                        if self._arrays:
+                            yield False
+                    else:
+                        processed_elems.append(field_elem)
             elif isinstance(field_value, dict):
-                if not self._process_dict_element(
-                        field_value, field_key, fields_to_delete,
-                        mapping, id, alias_counter, document):
+                if _VALUE_KEYS.isdisjoint(field_value):
                     continue
+                processed_fields[field_key] = self._process_element(field_value, document)
+                if self._arrays:
+                    yield False
+            else:
+                processed_fields[field_key] = field_value
 
-        # delete all fields that are not needed
-        for field_key in fields_to_delete:
-            fields.pop(field_key, None)
+    def _process_array(self, items: list, processed_items: list, document: str) -> Iterator[bool]:
+        """Copies the items of an array, replacing the citations of their values with the document of the array.
+
+        Args:
+            items (list): The items of the array.
+            processed_items (list): The list receiving the processed items.
+            document (str): The document of the array.
+
+        Yields:
+            bool: False when a nested cited array was found, to process it before resuming.
+        """
+        for item in items:
+            if not isinstance(item, dict):
+                processed_items.append(item)
+            elif isinstance(item.get(_VALUE_OBJECT_KEY), dict):
+                processed_item = dict(item)
+                processed_item[_VALUE_OBJECT_KEY] = {}
+                processed_items.append(processed_item)
+                yield from self._process_fields(item[_VALUE_OBJECT_KEY], processed_item[_VALUE_OBJECT_KEY], document)
+            else:
+                processed_items.append(self._process_element(item, document))
+                if self._arrays:
+                    yield False
+
+    def _process_element(self, field_elem: dict, document: Optional[str]) -> dict:
+        """Copies a field element, replacing its citation with an alias.
+
+        The items of a cited array are not processed here, the array is added to the arrays to process.
+
+        Args:
+            field_elem (dict): The field element.
+            document (Optional[str]): The document name to use for citation, instead of the one of the element.
+
+        Returns:
+            dict: The processed element.
+        """
+        processed_elem = dict(field_elem)
+        processed_elem.pop(_TYPE_KEY, None)
+        document = document or field_elem.get(_DOCUMENT_KEY)
+        if not document:
+            return processed_elem
+
+        if _VALUE_ARRAY_KEY in field_elem:
+            # The values of the array are cited with the document of the array
+            processed_elem.pop(_DOCUMENT_KEY, None)
+            processed_items = processed_elem[_VALUE_ARRAY_KEY] = []
+            self._arrays.append((field_elem[_VALUE_ARRAY_KEY], processed_items, document))
+            return processed_elem
+
+        alias = next(self._aliases)
+        self.mapping[alias] = {
+            "source_document": document,
+            "source_bounding_boxes": processed_elem.pop(_SOURCE_KEY, None)
+        }
+        processed_elem[_DOCUMENT_KEY] = alias
+        return processed_elem
+
+
+class CitationMapper:
+    def process_json(self, data: dict) -> Tuple[dict, Dict[str, str]]:
+        """Process the JSON object to replace `source_document` and `source_bounding_boxes`.
+
+        Replacing them with aliases and generate a mapping for the replacements. The fields are copied in a single
+        pass, the input object is not modified. The aliases are numbered across all the leases, so that every
+        citation of the collection has its own alias.
+
+        Args:
+            data (dict): The input JSON object.
+
+        Returns:
+            Tuple[dict, Dict[str, str]]: The processed JSON object and the mapping.
+        """
+        if 'unstructured_data' not in data:
+            return data, {}
+
+        replacement = _CitationReplacement(data["_id"])
+        leases = [
+            {**lease, 'fields': replacement.replace_citations(lease['fields'])} if 'fields' in lease else lease
+            for lease in data['unstructured_data']
+        ]
+        return {**data, 'unstructured_data': leases}, replacement.mapping
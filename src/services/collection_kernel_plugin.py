@@ -1,16 +1,21 @@
+import asyncio
 from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
 from semantic_kernel.functions import kernel_function
 from datetime import date, datetime
-from typing import Optional
+from typing import Iterator, Optional
 import json
-from models.data_collection_config import DataType, \
-    FieldDataCollectionConfig, \
-    LeaseAgreementCollectionRow
+import logging
+from models.data_collection_config import FieldDataCollectionConfig, \
+    PayloadFormat
 from models.document_data_models import LeaseAgreement, DocumentData
 from services.ingest_lease_documents_service import IngestionCollectionDocumentService
 from cachetools import TTLCache
 from cachetools.keys import hashkey
 from services.citation_mapper import CitationMapper
+from services.compact_payload_serializer import CompactPayloadSerializer, COMPACT_PAYLOAD_LEGEND
 
 document_data_cache = TTLCache(maxsize=100, ttl=86400)
 
@@ -40,6 +45,43 @@ class CollectionPlugin:
         self._config = config
         self._document_service = document_service
         self._citation_mapper = CitationMapper()
+        self._compact_payload_serializer = CompactPayloadSerializer()
+        self._data_versions: dict[str, Optional[int]] = {}
+        # Serializes the loads of the collection data, so that the tool call waits for a prefetch in progress
+        self._load_lock = threading.Lock()
+
+    @property
+    def config_id(self) -> str:
+        """The ID of the configuration."""
+        return self._config.id
+
+    @property
+    def lease_config_hash(self) -> str:
+        """The lease configuration hash of the configuration."""
+        return self._config.lease_config_hash
+
+    @property
+    def data_versions(self) -> dict[str, Optional[int]]:
+        """The version of the data of each collection retrieved by the plugin, by collection ID."""
+        return dict(self._data_versions)
+
+    def get_data_version(self, collection_id: str) -> Optional[int]:
+        """Gets the current version of the extracted data of a collection.
+
+        Args:
+            collection_id (str): The collection ID.
+
+        Returns:
+            Optional[int]: The data version, or None if the collection has no extracted data.
+        """
+        return self._document_service.get_data_version(collection_id, self._config.lease_config_hash)
+
+    @property
+    def system_prompt(self) -> str:
+        """The prompt of the configuration, extended with the legend of the payload format when it is compact."""
+        if self._config.payload_format == PayloadFormat.COMPACT:
+            return f"{self._config.prompt}\n\n{COMPACT_PAYLOAD_LEGEND}"
+        return self._config.prompt
 
     def composite_key(self, collection_id: str, lease_config_hash: str):
         """Generates a composite key by hashing the provided collection ID and lease configuration hash.
@@ -67,38 +109,92 @@ class CollectionPlugin:
         cache_key = self.composite_key(collection_id, self._config.lease_config_hash)
 
         # Check if the data is already in the cache
-        if cache_key in document_data_cache:
-            document_data_str = document_data_cache[cache_key]["document_data_str"]
-            citation_mappings = document_data_cache[cache_key]["citation_mappings"]
-        else:
-            # Fetch structured and unstructured data leases
-            unstructured_data = self._get_unstructured_data_lease_info_by_collection_id(collection_id)
-
-            # Create the document data object
-            document_data = DocumentData(
-                _id=collection_id,
-                lease_config_hash=self._config.lease_config_hash,
-                unstructured_data=unstructured_data,
-            )
-            document_data = document_data.model_dump(
-                by_alias=True,
-                exclude_none=True,
-                exclude_defaults=True,
-                exclude_unset=True,
-            )
+        with self._load_lock:
+            cache_entry = document_data_cache.get(cache_key)
+            if cache_entry is None:
+                # Read the version before the data: if data is ingested in between, the answers based on it are
+                # labelled with the previous version and will not be reused
+                cache_entry = self._load_collection_data(collection_id, self.get_data_version(collection_id))
 
-            document_data, citation_mappings = self._citation_mapper.process_json(document_data)
+        # Store the result in the cache
+        document_data_cache[cache_key] = cache_entry
+        self._data_versions[collection_id] = cache_entry.get("data_version")
 
-            # Serialize the document data to a string
-            document_data_str = json.dumps(document_data, default=convert_datetime)
+        return cache_entry["document_data_str"]
 
-        # Store the result in the cache
-        document_data_cache[cache_key] = {
-            "document_data_str": document_data_str,
-            "citation_mappings": citation_mappings
+    def prefetch_collection_data(self, collection_id: str) -> bool:
+        """Loads the data of a collection in the cache before the model requests it, if the collection exists.
+
+        The collection is not recorded as retrieved by the plugin.
+
+        Args:
+            collection_id (str): The collection ID, which may not exist.
+
+        Returns:
+            bool: True if the data of the collection is cached, False if the collection has no extracted data.
+        """
+        cache_key = self.composite_key(collection_id, self._config.lease_config_hash)
+        with self._load_lock:
+            if cache_key in document_data_cache:
+                return True
+            data_version = self.get_data_version(collection_id)
+            if data_version is None:
+                return False
+            document_data_cache[cache_key] = self._load_collection_data(collection_id, data_version)
+        return True
+
+    def _load_collection_data(self, collection_id: str, data_version: Optional[int]) -> dict:
+        """Loads and serializes the data of a collection.
+
+        Args:
+            collection_id (str): The collection ID.
+            data_version (Optional[int]): The version of the collection data, read before the data.
+
+        Returns:
+            dict: The cache entry of the collection, with the serialized data and its citation mappings.
+        """
+        # Fetch structured and unstructured data leases
+        unstructured_data = self._get_unstructured_data_lease_info_by_collection_id(collection_id)
+
+        # Create the document data object
+        document_data = DocumentData(
+            _id=collection_id,
+            lease_config_hash=self._config.lease_config_hash,
+            unstructured_data=unstructured_data,
+        )
+        document_data = document_data.model_dump(
+            by_alias=True,
+            exclude_none=True,
+            exclude_defaults=True,
+            exclude_unset=True,
+        )
+
+        document_data, citation_mappings = self._citation_mapper.process_json(document_data)
+        self._store_citation_mappings(collection_id, data_version, citation_mappings)
+
+        return {
+            # Serialize the document data to a string
+            "document_data_str": self._serialize_document_data(document_data),
+            "citation_mappings": citation_mappings,
+            "data_version": data_version
         }
 
-        return document_data_str
+    def _serialize_document_data(self, document_data: dict) -> str:
+        """Serializes the citation-mapped document data in the payload format of the configuration.
+
+        Args:
+            document_data (dict): The citation-mapped document data.
+
+        Returns:
+            str: The serialized document data.
+        """
+        if self._config.payload_format == PayloadFormat.COMPACT:
+            return json.dumps(
+                self._compact_payload_serializer.encode(document_data),
+                default=convert_datetime,
+                separators=(",", ":")
+            )
+        return json.dumps(document_data, default=convert_datetime)
 
     def _get_unstructured_data_lease_info_by_collection_id(self, collection_id: str) -> list[LeaseAgreement]:
         """Queries CosmosDB to retrieve extracted lease information for the specified collection ID.
@@ -111,10 +207,7 @@ class CollectionPlugin:
                                   raw lease documents using Azure AI Content Understanding
         """
         unstructured_data_leases = []
-        lease_document_rows: list[LeaseAgreementCollectionRow] = \
-            [row for row in self._config.collection_rows if row.data_type == DataType.LEASE_AGREEMENT]
-
-        if len(lease_document_rows) > 0:
+        if self._config.lease_collection_rows:
             extracted_fields = self._document_service._get_all_extracted_fields_from_collection_doc(collection_id,
                                                                                                      self._config)
 
@@ -123,14 +216,14 @@ class CollectionPlugin:
 
         return unstructured_data_leases
 
-    def _get_original_citation(self, citation: str) -> str:
+    def _parse_citation(self, citation: str) -> tuple[str, str]:
         """Extracts the original collection ID from the citation string.
 
         Args:
             citation (str): Citation string in the format 'CITE{collection_id}-{alias}'.
 
         Returns:
-            str: Extracted collection ID.
+            tuple[str, str]: The citation without list brackets, and the extracted collection ID.
         """
         # Citation is in the format of CITE{collection_id}-{alias}. Extract the collection ID.
         # Validate the citation format in list-like string
@@ -146,22 +239,20 @@ class CollectionPlugin:
         if not citation.startswith("CITE") or "-" not in citation:
             raise ValueError("Invalid citation format. Expected format: 'CITE{collection_id}-{alias}'.")
 
-        # Extract and return the collection ID
-        collection_id = citation.split('-')[0][4:]
-
-        key = self.composite_key(collection_id, self._config.lease_config_hash)
-
-        # Check if the key exists in the cache
-        if key not in document_data_cache:
-            return None
+        # The alias has no dash, while the collection ID may have some
+        return citation, citation[4:].rsplit('-', 1)[0]
 
-        # Check if the citation exists in the citation mappings
-        if citation not in document_data_cache[key]['citation_mappings']:
-            return None
+    def _get_original_citation(self, citation: str) -> Optional[list[str]]:
+        """Restores the original form of a citation.
 
-        restored_citation = document_data_cache[key]['citation_mappings'][citation]
+        Args:
+            citation (str): Citation string in the format 'CITE{collection_id}-{alias}'.
 
-        return [restored_citation['source_document'], restored_citation['source_bounding_boxes']]
+        Returns:
+            Optional[list[str]]: The source document and bounding boxes of the citation, or None if it is unknown.
+        """
+        restored_citations = self.restore_citations([citation])
+        return restored_citations[0] if restored_citations else None
 
     def restore_citations(self, citations: list[str]):
         """Restores the original form of a list of citations.
@@ -169,17 +260,155 @@ class CollectionPlugin:
         This method takes a list of citations, processes each citation to retrieve
         its original form, and returns a new list containing the restored citations.
 
+        The citation mappings are taken from the cached collection data. When the collection is not cached, e.g.
+        when it was evicted or loaded by another worker, the mappings of the citations are read from the database
+        in a single request per collection. The mappings of another version of the collection data than the one
+        retrieved by the plugin are not used, as their aliases may refer to other sources.
+
         Args:
             citations (list[str]): A list of citation strings to be restored.
 
         Returns:
             list[str]: A list of citations in their original form.
         """
+        parsed_citations = [self._parse_citation(citation) for citation in citations]
+
+        citation_mappings_by_collection = {}
+        for collection_id in dict.fromkeys(collection_id for _, collection_id in parsed_citations):
+            # The version of the data the answer is based on, unknown when the plugin did not retrieve the data
+            data_version = self._data_versions.get(collection_id)
+            cache_entry = document_data_cache.get(self.composite_key(collection_id, self._config.lease_config_hash))
+            if cache_entry is not None and (data_version is None or cache_entry.get("data_version") == data_version):
+                citation_mappings_by_collection[collection_id] = cache_entry['citation_mappings']
+            else:
+                citation_mappings_by_collection[collection_id] = self._read_citation_mappings(
+                    collection_id,
+                    [citation for citation, citation_collection_id in parsed_citations
+                     if citation_collection_id == collection_id],
+                    data_version
+                )
+
         new_citations = []
-        for citation in citations:
-            new_citation = self._get_original_citation(citation)
+        for citation, collection_id in parsed_citations:
+            restored_citation = citation_mappings_by_collection[collection_id].get(citation)
 
-            if new_citation:
-                new_citations.append(new_citation)
+            if restored_citation:
+                new_citations.append(
+                    [restored_citation['source_document'], restored_citation['source_bounding_boxes']]
+                )
 
         return new_citations
+
+    def _store_citation_mappings(self, collection_id: str, data_version: Optional[int], citation_mappings: dict):
+        """Stores the citation mappings of the collection data, so that they can be restored by any worker.
+
+        The mappings are stored by alias, without the citation prefix of the collection. A failure is logged
+        without failing the load of the collection data.
+
+        Args:
+            collection_id (str): The collection ID.
+            data_version (Optional[int]): The version of the collection data.
+            citation_mappings (dict): The citation mappings of the collection data.
+        """
+        prefix_length = len(_build_citation_prefix(collection_id))
+        try:
+            self._document_service.store_citation_mappings(
+                collection_id,
+                self._config.lease_config_hash,
+                data_version,
+                {
+                    citation[prefix_length:]: [mapping['source_document'], mapping['source_bounding_boxes']]
+                    for citation, mapping in citation_mappings.items()
+                }
+            )
+        except Exception as e:
+            logging.warning(f"Citation mappings of collection {collection_id} could not be stored: {e}")
+
+    def _read_citation_mappings(self, collection_id: str, citations: list[str], data_version: Optional[int]) -> dict:
+        """Reads the stored mappings of citations of a collection.
+
+        Args:
+            collection_id (str): The collection ID.
+            citations (list[str]): The citations of the collection.
+            data_version (Optional[int]): The version of the collection data the citations were generated from, if
+                known.
+
+        Returns:
+            dict: The mappings of the stored citations, by citation.
+        """
+        citation_prefix = _build_citation_prefix(collection_id)
+        aliases = [citation[len(citation_prefix):] for citation in citations]
+        # The aliases are used as field names of the stored mappings
+        aliases = [alias for alias in aliases if alias.isalpha()]
+        if not aliases:
+            return {}
+
+        stored_mappings = self._document_service.get_citation_mappings(
+            collection_id,
+            self._config.lease_config_hash,
+            aliases,
+            data_version
+        )
+        return {
+            citation_prefix + alias: {"source_document": document, "source_bounding_boxes": bounding_boxes}
+            for alias, (document, bounding_boxes) in stored_mappings.items()
+        }
+
+
+def _build_citation_prefix(collection_id: str) -> str:
+    """Builds the prefix of the citation aliases of a collection, as generated by the CitationMapper.
+
+    Args:
+        collection_id (str): The collection ID.
+
+    Returns:
+        str: The citation prefix.
+    """
+    return f"CITE{collection_id}-"
+
+
+_bound_collection_plugin: ContextVar[Optional[CollectionPlugin]] = ContextVar("bound_collection_plugin", default=None)
+
+
+@contextmanager
+def bind_collection_plugin(collection_plugin: CollectionPlugin) -> Iterator[CollectionPlugin]:
+    """Binds the CollectionPlugin of a request to the BoundCollectionPlugin of the shared kernel.
+
+    The binding is stored in a context variable, so concurrent requests and the tool calls they run in
+    separate tasks each see their own plugin.
+
+    Args:
+        collection_plugin (CollectionPlugin): The plugin of the request.
+
+    Yields:
+        CollectionPlugin: The bound plugin.
+    """
+    token = _bound_collection_plugin.set(collection_plugin)
+    try:
+        yield collection_plugin
+    finally:
+        _bound_collection_plugin.reset(token)
+
+
+class BoundCollectionPlugin:
+    """Kernel plugin delegating to the CollectionPlugin bound to the current request.
+
+    It is registered once in a kernel shared by all the queries, while the CollectionPlugin of each query,
+    which holds its configuration, is bound with `bind_collection_plugin`. The kernel runs the tool calls on the
+    event loop shared by the queries, so the collection data is loaded in a worker thread: a slow load, or a wait
+    for a prefetch in progress, does not block the other queries.
+    """
+
+    @kernel_function(
+        name=CollectionPlugin.get_collection_data.__kernel_function_name__,
+        description=CollectionPlugin.get_collection_data.__kernel_function_description__,
+    )
+    async def get_collection_data(
+        self,
+        collection_id: str,
+    ) -> str:
+        """Gets the data for a specified collection by the collection id."""
+        collection_plugin = _bound_collection_plugin.get()
+        if collection_plugin is None:
+            raise RuntimeError("No CollectionPlugin is bound to the current query.")
+        return await asyncio.to_thread(collection_plugin.get_collection_data, collection_id)
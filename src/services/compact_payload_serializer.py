@@ -0,0 +1,107 @@
+from typing import Any
+
+
+_VALUE_PREFIX = 'value'
+_VALUE_ARRAY_KEY = 'valueArray'
+_VALUE_OBJECT_KEY = 'valueObject'
+_DOCUMENT_KEY = 'document'
+_DATE_OF_DOCUMENT_KEY = 'date_of_document'
+
+_VALUE_COLUMN = 'v'
+_DATE_COLUMN = 'd'
+_CITATION_COLUMN = 'c'
+_COLUMNS = (_VALUE_COLUMN, _DATE_COLUMN, _CITATION_COLUMN)
+
+COMPACT_PAYLOAD_LEGEND = (
+    "The collection data returned by the get_collection_data tool uses a compact tabular format. "
+    "'id' is the collection ID and 'leases' lists the leases, each with a 'lease_id' and its 'fields'. "
+    "Every field has 'cols', the names of the row columns, and 'rows', one row per extracted value. "
+    "Column 'v' is the value, 'd' is the date of the source document and 'c' is the citation. "
+    "Columns that are not listed in 'cols' have no data for that field. "
+    "Array values are lists, and object values map each property name to a [value, citation] pair."
+)
+
+
+class CompactPayloadSerializer:
+    def encode(self, data: dict) -> dict:
+        """Encode the citation-mapped collection data into the compact tabular format.
+
+        Keys repeated for every field instance in the JSON payload (`valueString`, `date_of_document`,
+        `document`, ...) are replaced by a per-field header of short column names, which are explained
+        once to the model through `COMPACT_PAYLOAD_LEGEND`.
+
+        Args:
+            data (dict): The collection data, as returned by `CitationMapper.process_json`.
+
+        Returns:
+            dict: The compact representation of the collection data.
+        """
+        return {
+            "id": data["_id"],
+            "leases": [
+                {
+                    "lease_id": lease.get("lease_id"),
+                    "fields": {
+                        field_name: self._encode_field(field_values)
+                        for field_name, field_values in lease.get("fields", {}).items()
+                    }
+                }
+                for lease in data.get("unstructured_data", [])
+            ]
+        }
+
+    def _encode_field(self, field_values: list | dict) -> dict:
+        """Encode all the extracted values of a field as a table with a header.
+
+        Args:
+            field_values (list | dict): The extracted values of the field.
+
+        Returns:
+            dict: The `cols` header and the `rows` of the field.
+        """
+        if isinstance(field_values, dict):
+            field_values = [field_values]
+
+        rows = [
+            (
+                self._encode_value(field_value),
+                field_value.get(_DATE_OF_DOCUMENT_KEY),
+                field_value.get(_DOCUMENT_KEY),
+            )
+            for field_value in field_values
+            if isinstance(field_value, dict)
+        ]
+
+        # Drop the columns without any data so that they do not cost a token per row
+        column_indexes = [
+            index for index in range(len(_COLUMNS))
+            if index == 0 or any(row[index] is not None for row in rows)
+        ]
+        return {
+            "cols": [_COLUMNS[index] for index in column_indexes],
+            "rows": [[row[index] for index in column_indexes] for row in rows]
+        }
+
+    def _encode_value(self, field_value: dict) -> Any:
+        """Encode the value of an extracted field, whatever its type.
+
+        Args:
+            field_value (dict): The extracted field.
+
+        Returns:
+            Any: The scalar value, a list for arrays or a dict of [value, citation] pairs for objects.
+        """
+        if _VALUE_ARRAY_KEY in field_value:
+            return [self._encode_value(item) for item in field_value[_VALUE_ARRAY_KEY] or []]
+
+        if _VALUE_OBJECT_KEY in field_value:
+            return {
+                name: [self._encode_value(value), value.get(_DOCUMENT_KEY)]
+                for name, value in (field_value[_VALUE_OBJECT_KEY] or {}).items()
+                if isinstance(value, dict)
+            }
+
+        return next(
+            (value for key, value in field_value.items() if key.startswith(_VALUE_PREFIX)),
+            None
+        )
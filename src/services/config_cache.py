@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from cachetools import TTLCache
+
+from models import FieldDataCollectionConfig
+
+
+class ConfigCache:
+    """In-process cache of the ingestion configurations, by configuration ID.
+
+    The configurations are read on every ingestion and query but rarely change, so they are kept in memory
+    instead of being read and parsed from the database every time. A cached configuration is served without reading
+    the database until its content hash was last checked more than the revalidation delay ago; its current hash is then
+    read again, and the configuration is only served if it is unchanged. The configurations upserted through another
+    worker are served stale for at most the revalidation delay; the time to live bounds how long the configurations
+    no longer used are kept.
+
+    The cached configurations are shared by the callers and must not be modified.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, revalidate_after_seconds: int):
+        """Initializes the configuration cache.
+
+        Args:
+            max_size (int): The maximum number of cached configurations.
+            ttl_seconds (int): The time to live of the cached configurations, in seconds.
+            revalidate_after_seconds (int): The delay after which the content hash of a cached configuration is
+                checked again, in seconds.
+        """
+        # The entries are the content hash, the configuration and the time its hash was last checked
+        self._entries: TTLCache = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+        self._revalidate_after_seconds = revalidate_after_seconds
+        # The cache is shared by the requests handled concurrently in the worker threads
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        """The number of configurations served from the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """The number of configurations that were not in the cache."""
+        return self._misses
+
+    def get(self, id: str, read_content_hash: Callable[[], Optional[str]]) -> Optional[FieldDataCollectionConfig]:
+        """Gets a cached configuration.
+
+        Args:
+            id (str): The ID of the configuration.
+            read_content_hash (Callable[[], Optional[str]]): Reads the current content hash of the configuration, only
+                called when the hash of the cached configuration must be checked again.
+
+        Returns:
+            Optional[FieldDataCollectionConfig]: The cached configuration, read-only, or None if it is not cached or
+                its content hash changed.
+        """
+        with self._lock:
+            entry = self._entries.get(id)
+            if entry is None:
+                self._misses += 1
+                return None
+            content_hash, config, checked_at = entry
+            if time.monotonic() - checked_at < self._revalidate_after_seconds:
+                self._hits += 1
+                return config
+
+        # The hash is read out of the lock, so that the database round trip does not block the other configurations
+        current_hash = read_content_hash()
+
+        with self._lock:
+            if current_hash != content_hash or self._entries.get(id) is not entry:
+                self._misses += 1
+                return None
+            self._entries[id] = (content_hash, config, time.monotonic())
+            self._hits += 1
+            return config
+
+    def set(self, config: FieldDataCollectionConfig, content_hash: str):
+        """Caches a configuration, replacing the previous configuration with the same ID.
+
+        Args:
+            config (FieldDataCollectionConfig): The configuration.
+            content_hash (str): The content hash of the configuration.
+        """
+        # The caller keeps its instance, which it may modify
+        config = config.model_copy(deep=True)
+        # Computes the derived structures once, they are shared with the configuration
+        config.lease_collection_rows
+        config.lease_field_names
+        with self._lock:
+            self._entries[config.id] = (content_hash, config, time.monotonic())
+
+    def invalidate(self, id: str):
+        """Removes a configuration from the cache.
+
+        Args:
+            id (str): The ID of the configuration.
+        """
+        with self._lock:
+            self._entries.pop(id, None)
+
+    def clear(self):
+        """Removes all the configurations from the cache."""
+        with self._lock:
+            self._entries.clear()
@@ -1,23 +1,37 @@
+import hashlib
 import logging
 from enum import Enum
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 from typing import Any
 from semantic_kernel.kernel_pydantic import KernelBaseModel
 
 from semantic_kernel.contents import (
-    ChatHistory
+    ChatHistory,
+    TextContent
 )
 from semantic_kernel.contents.chat_message_content import ChatMessageContent, AuthorRole
+from semantic_kernel.contents.const import ContentTypes
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
 from semantic_kernel.contents.history_reducer.chat_history_reducer_utils import contains_function_call_or_result
 from semantic_kernel.exceptions import ContentInitializationError
 from azure.core.credentials import TokenCredential
 from azure.identity import ManagedIdentityCredential, DefaultAzureCredential
 from azure.cosmos import CosmosClient, DatabaseProxy, ContainerProxy, CosmosDict
-from azure.cosmos.exceptions import CosmosHttpResponseError
+from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
 from models.environment_config import EnvironmentConfig
 from models.api.v1 import QueryResponse
 from utils.citation_cleaner import remove_inline_citations_preserve_spacing
+from utils.token_utils import estimate_message_tokens
+
+
+# Maximum number of operations of a single Cosmos DB patch request
+MAX_PATCH_OPERATIONS = 10
+# Tool results of at least this length are stored in their own item and referenced from the session document
+TOOL_RESULT_REFERENCE_MIN_LENGTH = 1024
+TOOL_RESULT_REF_METADATA_KEY = "result_ref"
+SUMMARY_MESSAGE_PREFIX = "Summary of the earlier conversation:"
 
 
 class ChatMessageType(str, Enum):
@@ -28,6 +42,8 @@ class ChatMessageType(str, Enum):
 
 class ChatMessageData(KernelBaseModel):
     content: str
+    # The content sent to the LLM, when it differs from the stored content
+    model_content: str | None = None
 
 
 class ChatMessageWithTypeAndData(ChatMessageContent):
@@ -40,6 +56,8 @@ class ChatHistoryModel(KernelBaseModel, extra="ignore"):
     user_id: str
     messages: list[ChatMessageWithTypeAndData]
     domain: str
+    summary: str | None = None
+    summarized_message_count: int = 0
 
 
 class CosmosChatHistory(ChatHistory):
@@ -47,7 +65,21 @@ class CosmosChatHistory(ChatHistory):
     user_message_limit: int
     domain: str
     remove_tool_calls: bool = False
+    # Number of previous turns sent to the LLM, all the turns are sent when None
+    max_turns: int | None = None
+    summarize_older_turns: bool = False
+    keep_last_tool_result_only: bool = False
     internal_messages: list[ChatMessageContent] = Field(default_factory=list, kw_only=False)
+    summary: str | None = None
+    summarized_message_count: int = 0
+    # Estimated prompt tokens of the messages left out of the history sent to the LLM, net of the summary
+    history_tokens_saved: int = 0
+    # Number of internal messages already stored in the session document
+    _stored_message_count: int = PrivateAttr(default=0)
+    # References of the tool results known to be stored in their own item
+    _stored_tool_result_refs: set[str] = PrivateAttr(default_factory=set)
+    # The content sent to the LLM of the internal messages stored with one, by index
+    _model_contents: dict[int, str] = PrivateAttr(default_factory=dict)
 
     def _message_to_type(self, msg: ChatMessageContent) -> ChatMessageType:
         """Convert the message to a type.
@@ -96,6 +128,56 @@ class CosmosChatHistory(ChatHistory):
         self.internal_messages.append(ChatMessageContent(**message))
         self.messages.append(ChatMessageContent(**message))
 
+    def _to_stored_message(self, message: ChatMessageContent, tool_results: dict[str, str]) -> dict[str, Any]:
+        """Convert a message to the format stored in the session document.
+
+        Large tool results, such as the collection data, are replaced by a reference to the hash of their content,
+        so that they are stored once in their own item instead of in every session document that contains them.
+
+        Args:
+            message (ChatMessageContent): The message content.
+            tool_results (dict[str, str]): The tool results to store in their own item, by reference. The tool
+                results of the message are added to it.
+
+        Returns:
+            dict[str, Any]: The serializable message, with its type and data.
+        """
+        stored_message = ChatMessageWithTypeAndData(
+            **message.model_dump(),
+            type=self._message_to_type(message),
+            data=ChatMessageData(content=message.content, model_content=_get_model_content(message)),
+        ).model_dump()
+        for item in stored_message["items"]:
+            result = item.get("result")
+            if item.get("content_type") != ContentTypes.FUNCTION_RESULT_CONTENT or not isinstance(result, str) \
+                    or len(result) < TOOL_RESULT_REFERENCE_MIN_LENGTH:
+                continue
+            result_ref = hashlib.sha256(result.encode("utf-8")).hexdigest()
+            tool_results[result_ref] = result
+            item["result"] = ""
+            item["metadata"] = {**item["metadata"], TOOL_RESULT_REF_METADATA_KEY: result_ref}
+        return stored_message
+
+    def _store_tool_results(self, user_id: str, tool_results: dict[str, str]) -> None:
+        """Store the tool results that are not stored yet in their own item, in the partition of the user.
+
+        Args:
+            user_id (str): The user ID.
+            tool_results (dict[str, str]): The tool results, by reference.
+        """
+        for result_ref, result in tool_results.items():
+            if result_ref in self._stored_tool_result_refs:
+                continue
+            self.container.upsert_item(
+                body={
+                    "id": _build_tool_result_id(result_ref),
+                    "user_id": user_id.lower(),
+                    "domain": self.domain,
+                    "result": result
+                }
+            )
+            self._stored_tool_result_refs.add(result_ref)
+
     def store_messages(
         self,
         session_id: str,
@@ -103,29 +185,111 @@ class CosmosChatHistory(ChatHistory):
     ) -> None:
         """Store the chat history in the Cosmos DB.
 
+        The messages added since the session was read are appended to the messages of the session document with
+        patch operations, so that the cost of storing a turn does not grow with the length of the session. New
+        sessions, and sessions whose messages could not be appended, are stored by upserting the whole document.
+        Large tool results are stored in their own item before the messages referencing them.
+
         Args:
             session_id (str): The session ID.
             user_id (str): The user ID.
         """
-        messages = []
-        for message in self.internal_messages:
-            message_type = self._message_to_type(message)
-            content = message.content
-            messages.append(ChatMessageWithTypeAndData(
-                **message.model_dump(),
-                type=message_type,
-                data=ChatMessageData(content=content),
-            ).model_dump())
+        tool_results: dict[str, str] = {}
+        new_messages = self.internal_messages[self._stored_message_count:]
+        if self._stored_message_count > 0:
+            if not new_messages:
+                return
+            stored_messages = [self._to_stored_message(message, tool_results) for message in new_messages]
+            self._store_tool_results(user_id, tool_results)
+            try:
+                self._append_messages(session_id, user_id, stored_messages)
+                self._stored_message_count = len(self.internal_messages)
+                return
+            except CosmosResourceNotFoundError:
+                logging.info("Session document not found, storing the whole session")
+            except CosmosHttpResponseError as e:
+                # Rewrite the whole document, in case only some of the messages were appended
+                logging.warning(f"Failed to append messages to the session, storing the whole session: {str(e)}")
 
         chat_history_message = ChatHistoryModel(
             id=session_id,
             user_id=user_id.lower(),
-            messages=messages,
-            domain=self.domain
+            messages=[self._to_stored_message(message, tool_results) for message in self.internal_messages],
+            domain=self.domain,
+            summary=self.summary,
+            summarized_message_count=self.summarized_message_count
         )
+        self._store_tool_results(user_id, tool_results)
         self.container.upsert_item(
             body=chat_history_message.model_dump()
         )
+        self._stored_message_count = len(self.internal_messages)
+
+    def _append_messages(
+        self,
+        session_id: str,
+        user_id: str,
+        stored_messages: list[dict[str, Any]],
+    ) -> None:
+        """Append messages to the messages of an existing session document.
+
+        Args:
+            session_id (str): The session ID.
+            user_id (str): The user ID.
+            stored_messages (list[dict[str, Any]]): The messages to append, in their stored format.
+        """
+        operations = [
+            {"op": "add", "path": "/messages/-", "value": stored_message}
+            for stored_message in stored_messages
+        ]
+        for start in range(0, len(operations), MAX_PATCH_OPERATIONS):
+            self.container.patch_item(
+                item=session_id,
+                partition_key=[user_id.lower(), self.domain],
+                patch_operations=operations[start:start + MAX_PATCH_OPERATIONS]
+            )
+
+    def _load_tool_results(self, user_id: str) -> None:
+        """Replace the references to the tool results of the internal messages by the stored tool results.
+
+        Each distinct tool result is read once. References to tool results that cannot be read are left in place,
+        with an empty result.
+
+        Args:
+            user_id (str): The user ID.
+        """
+        tool_results: dict[str, str | None] = {}
+        for message in self.internal_messages:
+            for item in message.items:
+                result_ref = item.metadata.get(TOOL_RESULT_REF_METADATA_KEY)
+                if not isinstance(item, FunctionResultContent) or result_ref is None:
+                    continue
+                if result_ref not in tool_results:
+                    tool_results[result_ref] = self._read_tool_result(user_id, result_ref)
+                if tool_results[result_ref] is not None:
+                    item.result = tool_results[result_ref]
+                    item.metadata = {
+                        key: value for key, value in item.metadata.items() if key != TOOL_RESULT_REF_METADATA_KEY
+                    }
+
+    def _read_tool_result(self, user_id: str, result_ref: str) -> str | None:
+        """Read a tool result stored in its own item.
+
+        Args:
+            user_id (str): The user ID.
+            result_ref (str): The reference to the tool result.
+
+        Returns:
+            str | None: The tool result, or None if it cannot be read.
+        """
+        try:
+            doc = self.container.read_item(
+                item=_build_tool_result_id(result_ref), partition_key=[user_id.lower(), self.domain]
+            )
+        except CosmosHttpResponseError:
+            logging.warning(f"Tool result {result_ref} not found")
+            return None
+        return doc["result"]
 
     def read_messages(
         self,
@@ -134,7 +298,8 @@ class CosmosChatHistory(ChatHistory):
     ) -> None:
         """Read the chat history from the Cosmos DB.
 
-        Note that we use the model_validate method to convert the serializable format back into a ChatMessageContent.
+        The stored messages are validated once, directly into ChatMessageContent. The messages sent to the LLM
+        share the internal messages, except the responses of the assistant, whose text stored with them is used.
         """
         doc: CosmosDict
         try:
@@ -145,29 +310,183 @@ class CosmosChatHistory(ChatHistory):
             logging.info("no session found")
             return
 
-        chat_history_model = ChatHistoryModel(**doc)
-        self.internal_messages = [
-            ChatMessageContent(**message.model_dump()) for message in chat_history_model.messages
+        stored_messages = doc.get("messages", [])
+        self.internal_messages = [ChatMessageContent(**message) for message in stored_messages]
+        self._model_contents = {
+            index: message["data"]["model_content"]
+            for index, message in enumerate(stored_messages)
+            if (message.get("data") or {}).get("model_content") is not None
+        }
+        self.summary = doc.get("summary")
+        self.summarized_message_count = doc.get("summarized_message_count", 0)
+        self._stored_message_count = len(self.internal_messages)
+        self._stored_tool_result_refs = {
+            item.metadata[TOOL_RESULT_REF_METADATA_KEY]
+            for message in self.internal_messages
+            for item in message.items
+            if TOOL_RESULT_REF_METADATA_KEY in item.metadata
+        }
+        # The tool results are only needed when they are sent back to the LLM
+        if not self.remove_tool_calls:
+            self._load_tool_results(user_id)
+        self._reduce_messages()
+
+    def _to_model_message(self, index: int) -> ChatMessageContent:
+        """Convert an internal message to the message sent to the LLM.
+
+        The responses of the assistant are stored as QueryResponse JSON, only their text is sent to the LLM. The
+        other messages are sent as they are stored, without being copied.
+
+        Args:
+            index (int): The index of the internal message.
+
+        Returns:
+            ChatMessageContent: The message, or a copy with the text of the response of the assistant.
+        """
+        internal_message = self.internal_messages[index]
+        model_content = self._model_contents.get(index)
+        if model_content is None:
+            # Messages stored before the text of the responses was stored with them, or not stored yet
+            model_content = _get_model_content(internal_message)
+        if model_content is None:
+            return internal_message
+        return internal_message.model_copy(update={"items": [TextContent(text=model_content)]})
+
+    def _get_window_start(self) -> int:
+        """Get the index of the first internal message of the turns sent to the LLM.
+
+        A turn starts with a message of the user, so that tool calls and their results stay together.
+
+        Returns:
+            int: The index of the first message of the last `max_turns` turns, or 0 if all the turns are sent.
+        """
+        turn_starts = [
+            index for index, message in enumerate(self.internal_messages) if message.role == AuthorRole.USER
         ]
-        self.messages = []
+        if self.max_turns is None or len(turn_starts) <= self.max_turns:
+            return 0
+        return turn_starts[-self.max_turns] if self.max_turns > 0 else len(self.internal_messages)
+
+    def _get_last_tool_result_index(self) -> int:
+        """Get the index of the last internal message with a tool result.
 
-        for internal_message in self.internal_messages:
+        Returns:
+            int: The index of the message, or -1 if there is no tool result.
+        """
+        for index in range(len(self.internal_messages) - 1, -1, -1):
+            if any(isinstance(item, FunctionResultContent) for item in self.internal_messages[index].items):
+                return index
+        return -1
+
+    def _reduce_messages(self) -> None:
+        """Build the messages sent to the LLM from the internal messages.
+
+        The system messages are always kept. The turns before the last `max_turns` turns are left out, and replaced
+        by the summary of the earlier conversation when there is one. Tool calls are left out when
+        `remove_tool_calls` is set; when `keep_last_tool_result_only` is set, only the tool calls of the last turn
+        that called a tool are kept, as the results of the earlier calls are usually superseded by it.
+        """
+        window_start = self._get_window_start()
+        last_tool_turn_start = -1
+        if self.keep_last_tool_result_only:
+            last_tool_result_index = self._get_last_tool_result_index()
+            last_tool_turn_start = max(
+                (index for index, message in enumerate(self.internal_messages[:last_tool_result_index + 1])
+                 if message.role == AuthorRole.USER),
+                default=0
+            )
+
+        self.messages = []
+        self.history_tokens_saved = 0
+        for index, internal_message in enumerate(self.internal_messages):
+            is_tool_message = contains_function_call_or_result(internal_message)
             # Mark when we find a tool call (function call or result)
-            if self.remove_tool_calls and contains_function_call_or_result(internal_message):
+            if self.remove_tool_calls and is_tool_message:
                 continue
 
-            message = internal_message.model_copy(deep=True)
-            if message.role == AuthorRole.ASSISTANT and message.content.startswith("{"):
-                content = message.content
+            is_out_of_window = index < window_start and internal_message.role != AuthorRole.SYSTEM
+            is_stale_tool_message = is_tool_message and index < last_tool_turn_start
+            if is_out_of_window or is_stale_tool_message:
+                self.history_tokens_saved += estimate_message_tokens(internal_message)
+                continue
+
+            self.messages.append(self._to_model_message(index))
+
+        if window_start > 0 and self.summary:
+            summary_message = ChatMessageContent(
+                role=AuthorRole.SYSTEM, content=f"{SUMMARY_MESSAGE_PREFIX}\n{self.summary}"
+            )
+            system_message_count = next(
+                (index for index, message in enumerate(self.messages) if message.role != AuthorRole.SYSTEM),
+                len(self.messages)
+            )
+            self.messages.insert(system_message_count, summary_message)
+            self.history_tokens_saved -= estimate_message_tokens(summary_message)
+
+    def get_messages_to_summarize(self) -> tuple[list[ChatMessageContent], int]:
+        """Get the messages of the turns left out of the history sent to the LLM that are not summarized yet.
+
+        Returns:
+            tuple[list[ChatMessageContent], int]: The user and assistant messages to add to the summary, and the
+                number of internal messages covered by the summary once they are added.
+        """
+        window_start = self._get_window_start()
+        if not self.summarize_older_turns or window_start <= self.summarized_message_count:
+            return [], self.summarized_message_count
+
+        messages = [
+            self._to_model_message(index)
+            for index in range(self.summarized_message_count, window_start)
+            if self.internal_messages[index].role in (AuthorRole.USER, AuthorRole.ASSISTANT)
+            and not contains_function_call_or_result(self.internal_messages[index])
+        ]
+        return messages, window_start
+
+    def store_summary(
+        self,
+        session_id: str,
+        user_id: str,
+        summary: str,
+        summarized_message_count: int,
+    ) -> None:
+        """Store the summary of the earlier conversation in the session document.
+
+        Args:
+            session_id (str): The session ID.
+            user_id (str): The user ID.
+            summary (str): The summary of the earlier conversation.
+            summarized_message_count (int): The number of internal messages covered by the summary.
+        """
+        self.container.patch_item(
+            item=session_id,
+            partition_key=[user_id.lower(), self.domain],
+            patch_operations=[
+                {"op": "set", "path": "/summary", "value": summary},
+                {"op": "set", "path": "/summarized_message_count", "value": summarized_message_count}
+            ]
+        )
+        self.summary = summary
+        self.summarized_message_count = summarized_message_count
+
+    def get_requested_collection_ids(self) -> list[str]:
+        """Get the IDs of the collections whose data was requested by the LLM in the session.
+
+        Returns:
+            list[str]: The distinct collection IDs, from the least to the most recently requested.
+        """
+        collection_ids: dict[str, None] = {}
+        for message in self.internal_messages:
+            for item in message.items:
+                if not isinstance(item, FunctionCallContent) or item.function_name != "get_collection_data":
+                    continue
                 try:
-                    content = QueryResponse.model_validate_json(content)
-                    content = remove_inline_citations_preserve_spacing(content.response)
+                    collection_id = item.parse_arguments().get("collection_id")
                 except Exception:
-                    logging.warning(
-                        "Failed to parse message content as QueryResponse: %s", content
-                    )
-                message.content = content
-            self.messages.append(message)
+                    continue
+                if isinstance(collection_id, str):
+                    collection_ids.pop(collection_id, None)
+                    collection_ids[collection_id] = None
+        return list(collection_ids)
 
     @property
     def user_message_limit_exceeded(self) -> bool:
@@ -182,6 +501,38 @@ class CosmosChatHistory(ChatHistory):
         return len(user_messages) >= self.user_message_limit
 
 
+def _get_model_content(message: ChatMessageContent) -> str | None:
+    """Get the text of a response of the assistant, without its inline citations, to send it to the LLM.
+
+    Args:
+        message (ChatMessageContent): The message.
+
+    Returns:
+        str | None: The text of the response, or None if the message is not a QueryResponse of the assistant.
+    """
+    if message.role != AuthorRole.ASSISTANT or not message.content.startswith("{"):
+        return None
+    try:
+        return remove_inline_citations_preserve_spacing(QueryResponse.model_validate_json(message.content).response)
+    except Exception:
+        logging.warning(
+            "Failed to parse message content as QueryResponse: %s", message.content
+        )
+        return None
+
+
+def _build_tool_result_id(result_ref: str) -> str:
+    """Builds the ID of the item storing a tool result.
+
+    Args:
+        result_ref (str): The reference to the tool result, the SHA-256 hash of its content.
+
+    Returns:
+        str: The item ID.
+    """
+    return f"tool-result-{result_ref}"
+
+
 _cosmos_container: ContainerProxy | None = None
 
 
@@ -220,6 +571,9 @@ def get_cosmos_chat_history(env_name, environment_config: EnvironmentConfig) ->
         user_message_limit=environment_config.chat_history.user_message_limit.value,
         domain=environment_config.chat_history.domain.value,
         remove_tool_calls=True if environment_config.chat_history.remove_tool_calls.value.lower() == "true" else False,
+        max_turns=max_turns.value if (max_turns := environment_config.chat_history.max_turns) else None,
+        summarize_older_turns=environment_config.chat_history.summarize_older_turns.value.lower() == "true",
+        keep_last_tool_result_only=environment_config.chat_history.keep_last_tool_result_only.value.lower() == "true",
     )
 
     return chat_history
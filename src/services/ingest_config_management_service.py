@@ -1,23 +1,52 @@
+import hashlib
+import logging
+from typing import Optional
+from pymongo import errors
 from pymongo.collection import Collection
 from ._cosmos_client import CosmosClient
 from models import FieldDataCollectionConfig
-from models.environment_config import EnvironmentConfig
+from models.environment_config import ConfigCacheConfig, EnvironmentConfig
+from services.config_cache import ConfigCache
+
+
+# The field storing the hash of the content of a configuration, to check that a cached configuration is current
+CONTENT_HASH_FIELD = "content_hash"
+
+
+def compute_content_hash(config: FieldDataCollectionConfig) -> str:
+    """Computes the SHA-256 hash of the content of a configuration.
+
+    Args:
+        config (FieldDataCollectionConfig): The configuration.
+
+    Returns:
+        str: The hash of the configuration.
+    """
+    return hashlib.sha256(config.model_dump_json(by_alias=True).encode("utf-8")).hexdigest()
 
 
 class IngestConfigManagementService(object):
     _collection: Collection
+    _config_cache: Optional[ConfigCache]
 
-    def __init__(self, cosmos_client: CosmosClient, environment_config: EnvironmentConfig):
+    def __init__(
+        self,
+        cosmos_client: CosmosClient,
+        environment_config: EnvironmentConfig,
+        config_cache: Optional[ConfigCache] = None
+    ):
         """Initializes the ConfigManagementService with the given CosmosClient.
 
         Args:
             cosmos_client (CosmosClient): The CosmosClient instance.
             environment_config (EnvironmentConfig): The environment configuration.
+            config_cache (Optional[ConfigCache]): The cache of the configurations, if they are cached.
         """
         self._collection = cosmos_client.get_collection(
             environment_config.cosmosdb.db_name.value,
             environment_config.cosmosdb.configuration_collection_name.value
         )
+        self._config_cache = config_cache
 
     def load_config(
         self,
@@ -25,30 +54,84 @@ class IngestConfigManagementService(object):
     ) -> FieldDataCollectionConfig | None:
         """Loads the configuration from the database.
 
+        When the configurations are cached, a cached configuration is returned without reading the database, until its
+        content hash must be checked again. The cached configurations are shared and must not be modified.
+
         Args:
             id (str): The ID of the configuration.
 
         Returns:
             dict: The configuration data.
         """
+        if self._config_cache is not None:
+            cached_config = self._config_cache.get(id, lambda: self._read_content_hash(id))
+            if cached_config is not None:
+                return cached_config
+
         config = self._collection.find_one({"_id": id})
 
         if config:
-            return FieldDataCollectionConfig(**config)
+            content_hash = config.get(CONTENT_HASH_FIELD)
+            config = FieldDataCollectionConfig(**config)
+            if self._config_cache is not None:
+                if not content_hash:
+                    content_hash = self._backfill_content_hash(config)
+                self._config_cache.set(config, content_hash)
+            return config
         return None
 
+    def _read_content_hash(self, id: str) -> Optional[str]:
+        """Reads only the content hash of the stored configuration.
+
+        Args:
+            id (str): The ID of the configuration.
+
+        Returns:
+            Optional[str]: The content hash, or None if the configuration does not exist.
+        """
+        stored_hash = self._collection.find_one({"_id": id}, {CONTENT_HASH_FIELD: 1})
+        return stored_hash.get(CONTENT_HASH_FIELD) if stored_hash else None
+
+    def _backfill_content_hash(self, config: FieldDataCollectionConfig) -> str:
+        """Computes and stores the content hash of a configuration upserted before the hash was stored.
+
+        Args:
+            config (FieldDataCollectionConfig): The configuration.
+
+        Returns:
+            str: The content hash of the configuration.
+        """
+        content_hash = compute_content_hash(config)
+        try:
+            # Only stores the hash if the configuration was not upserted with its own hash in the meantime
+            self._collection.update_one(
+                {"_id": config.id, CONTENT_HASH_FIELD: {"$exists": False}},
+                {"$set": {CONTENT_HASH_FIELD: content_hash}}
+            )
+        except errors.PyMongoError as e:
+            logging.warning(f"Failed to store the content hash of the configuration {config.id}: {e}")
+        return content_hash
+
     def upsert_config(self, config: FieldDataCollectionConfig):
         """Upserts the configuration in the database.
 
         Args:
             config (dict): The configuration data.
         """
+        if self._config_cache is not None:
+            # Invalidate first, so that the previous configuration is not served if the update fails
+            self._config_cache.invalidate(config.id)
+
+        content_hash = compute_content_hash(config)
         self._collection.update_one(
             {"_id": config.id},
-            {"$set": config.model_dump(by_alias=True)},
+            {"$set": {**config.model_dump(by_alias=True), CONTENT_HASH_FIELD: content_hash}},
             upsert=True
         )
 
+        if self._config_cache is not None:
+            self._config_cache.set(config, content_hash)
+
     @classmethod
     def from_environment_config(cls, environment_config: EnvironmentConfig):
         """Creates a ConfigManagementService instance from a connection string.
@@ -60,4 +143,28 @@ class IngestConfigManagementService(object):
             ConfigManagementService: The ConfigManagementService instance.
         """
         cosmos_client = CosmosClient(environment_config.cosmosdb.endpoint.value)
-        return cls(cosmos_client, environment_config)
+        return cls(cosmos_client, environment_config, get_config_cache(environment_config.cosmosdb.config_cache))
+
+
+config_cache: ConfigCache | None = None
+
+
+def get_config_cache(config: ConfigCacheConfig) -> ConfigCache | None:
+    """Gets the configuration cache shared by the requests of the process as singleton.
+
+    Args:
+        config (ConfigCacheConfig): The configuration of the cache.
+
+    Returns:
+        ConfigCache | None: The configuration cache, or None if the configurations are not cached.
+    """
+    global config_cache
+    if config.enabled.value.lower() != "true":
+        return None
+    if config_cache is None:
+        config_cache = ConfigCache(
+            max_size=config.max_size.value,
+            ttl_seconds=config.ttl_seconds.value,
+            revalidate_after_seconds=config.revalidate_after_seconds.value
+        )
+    return config_cache
@@ -1,5 +1,6 @@
 import logging
 from datetime import date
+from pydantic import TypeAdapter
 from pymongo.collection import Collection
 from typing import Optional
 
@@ -9,13 +10,31 @@ from models.extracted_collection_documents import ExtractedLeaseCollection, \
     ExtractedLeaseField, \
     ExtractedCollectionDocuments, \
     ExtractedCollectionInformationCollection
-from models.data_collection_config import DataType, FieldDataCollectionConfig
+from models.data_collection_config import FieldDataCollectionConfig
 from models.document_data_models import LeaseAgreementDocumentData
 from models.ingestion_models import IngestDocumentType
 from ._cosmos_client import CosmosClient
 from models.environment_config import EnvironmentConfig
 from utils.path_utils import build_adls_markdown_file_path, build_adls_pdf_file_path
 
+# Validates the stored fields of a lease in a single call, directly from the document read from the database
+_LEASE_FIELDS_ADAPTER = TypeAdapter(dict[str, list[LeaseAgreementDocumentData]])
+# Only the parts of the collection document needed to build the extracted fields are read
+_EXTRACTED_FIELDS_PROJECTION = {"collection_id": 1, "information.leases.lease_id": 1, "information.leases.fields": 1}
+# The parts of the analyzer and classifier results that are ingested. The pages, paragraphs and tables of the
+# contents, which make most of the results of large documents, are not used
+INGESTED_RESULT_SELECTION = {
+    "result": {
+        "contents": [{
+            "markdown": True,
+            "fields": True,
+            "category": True,
+            "startPageNumber": True,
+            "endPageNumber": True
+        }]
+    }
+}
+
 
 def _build_document_id(collection_id: str, config_hash: str) -> str:
     """Builds the document ID for the collection document.
@@ -30,6 +49,19 @@ def _build_document_id(collection_id: str, config_hash: str) -> str:
     return f"{collection_id}-{config_hash}"
 
 
+def _build_citation_mappings_id(collection_id: str, config_hash: str) -> str:
+    """Builds the ID of the document storing the citation mappings of the collection data.
+
+    Args:
+        collection_id (str): The collection ID.
+        config_hash (str): The configuration hash.
+
+    Returns:
+        str: The document ID.
+    """
+    return f"{_build_document_id(collection_id, config_hash)}-citations"
+
+
 class IngestionCollectionDocumentService(object):
     _collection_documents_collection: Collection
     _container_client: ContainerClient
@@ -73,7 +105,6 @@ class IngestionCollectionDocumentService(object):
             data (dict): The analyzer output data.
             config (FieldDataCollectionConfig): The configuration object containing lease configuration hash.
         """
-        field_list = self._extract_field_list(config)
         pdf_file_path = build_adls_pdf_file_path(
             doc_type,
             collection_id,
@@ -102,7 +133,7 @@ class IngestionCollectionDocumentService(object):
 
             self._update_fields_from_analyzer_output(lease,
                                                      data,
-                                                     field_list,
+                                                     config.lease_field_names,
                                                      date_of_document,
                                                      markdown_file_path,
                                                      pdf_file_path)
@@ -139,7 +170,6 @@ class IngestionCollectionDocumentService(object):
             data (dict): The classifier output data.
             config (FieldDataCollectionConfig): The configuration object containing lease configuration hash.
         """
-        field_list = self._extract_field_list(config)
         pdf_file_path = build_adls_pdf_file_path(
             doc_type,
             collection_id,
@@ -168,7 +198,7 @@ class IngestionCollectionDocumentService(object):
 
             self._update_fields_from_classifier_output(lease,
                                                        data,
-                                                       field_list,
+                                                       config.lease_field_names,
                                                        date_of_document,
                                                        markdown_file_path,
                                                        pdf_file_path)
@@ -249,17 +279,6 @@ class IngestionCollectionDocumentService(object):
 
         return True
 
-    def _extract_field_list(self, config: FieldDataCollectionConfig):
-        field_list = []
-        for collection_row in config.collection_rows:
-            if collection_row.data_type is not DataType.LEASE_AGREEMENT:
-                continue
-
-            for field_schema in collection_row.field_schema:
-                field_list.append(field_schema.name)
-
-        return field_list
-
     def _get_or_create_document(
         self,
         document_id: str,
@@ -328,7 +347,7 @@ class IngestionCollectionDocumentService(object):
         lease: ExtractedLeaseCollection,
         field_name: str,
         field_value: dict,
-        field_list: list,
+        field_names: frozenset[str],
         date_of_document: date,
         markdown_path: str,
         pdf_path: str,
@@ -342,7 +361,7 @@ class IngestionCollectionDocumentService(object):
             lease (ExtractedLeaseCollection): The lease to add the field to.
             field_name (str): The name of the field.
             field_value (dict): The field value data.
-            field_list (list): List of allowed field names.
+            field_names (frozenset[str]): The allowed field names.
             date_of_document (date): The date of the document.
             markdown_path (str): Path to the markdown file.
             pdf_path (str): Path to the PDF file.
@@ -353,7 +372,7 @@ class IngestionCollectionDocumentService(object):
         Returns:
             bool: True if the field was processed, False if it was skipped.
         """
-        if field_name not in field_list:
+        if field_name not in field_names:
             logging.info(f"Skipping field '{field_name}'. Field is not part of the configuration.")
             return False
 
@@ -406,7 +425,7 @@ class IngestionCollectionDocumentService(object):
         self,
         lease: ExtractedLeaseCollection,
         data: dict,
-        field_list: list,
+        field_names: frozenset[str],
         date_of_document: date,
         markdown_path: str,
         pdf_path: str
@@ -416,7 +435,7 @@ class IngestionCollectionDocumentService(object):
                 lease,
                 field_name,
                 field_value,
-                field_list,
+                field_names,
                 date_of_document,
                 markdown_path,
                 pdf_path
@@ -442,7 +461,7 @@ class IngestionCollectionDocumentService(object):
         self,
         lease: ExtractedLeaseCollection,
         data: dict,
-        field_list: list,
+        field_names: frozenset[str],
         date_of_document: date,
         markdown_path: str,
         pdf_path: str
@@ -460,7 +479,7 @@ class IngestionCollectionDocumentService(object):
                     lease,
                     field_name,
                     field_value,
-                    field_list,
+                    field_names,
                     date_of_document,
                     markdown_path,
                     pdf_path,
@@ -475,10 +494,93 @@ class IngestionCollectionDocumentService(object):
     ):
         self._collection_documents_collection.update_one(
             {"_id": existing_document.id},
-            {"$set": existing_document.model_dump(by_alias=True, mode='json', exclude_defaults=True)},
+            {
+                "$set": existing_document.model_dump(
+                    by_alias=True, mode='json', exclude_defaults=True, exclude={"data_version"}
+                ),
+                "$inc": {"data_version": 1}
+            },
             upsert=True
         )
 
+    def get_data_version(self, collection_id: str, lease_config_hash: str) -> Optional[int]:
+        """Gets the version of the extracted data of a collection, which changes every time data is ingested.
+
+        Args:
+            collection_id (str): The collection ID.
+            lease_config_hash (str): The lease configuration hash.
+
+        Returns:
+            Optional[int]: The data version, or None if the collection document does not exist.
+        """
+        existing_document = self._collection_documents_collection.find_one(
+            {"_id": _build_document_id(collection_id, lease_config_hash)},
+            {"data_version": 1}
+        )
+        if not existing_document:
+            return None
+        return existing_document.get("data_version", 0)
+
+    def store_citation_mappings(
+        self,
+        collection_id: str,
+        lease_config_hash: str,
+        data_version: Optional[int],
+        citation_mappings: dict[str, list[Optional[str]]]
+    ):
+        """Stores the citation mappings of the collection data sent to the LLM, replacing the previous ones.
+
+        Args:
+            collection_id (str): The collection ID.
+            lease_config_hash (str): The lease configuration hash.
+            data_version (Optional[int]): The version of the collection data the mappings were generated from.
+            citation_mappings (dict[str, list[Optional[str]]]): The source document and bounding boxes of each
+                citation, by key. The keys must be valid field names, without dots or leading dollar sign.
+        """
+        self._collection_documents_collection.replace_one(
+            {"_id": _build_citation_mappings_id(collection_id, lease_config_hash)},
+            {
+                "lease_config_hash": lease_config_hash,
+                "data_version": data_version,
+                "citations": citation_mappings
+            },
+            upsert=True
+        )
+
+    def get_citation_mappings(
+        self,
+        collection_id: str,
+        lease_config_hash: str,
+        keys: list[str],
+        data_version: Optional[int] = None
+    ) -> dict[str, list[Optional[str]]]:
+        """Gets stored citation mappings, reading only the requested ones.
+
+        Args:
+            collection_id (str): The collection ID.
+            lease_config_hash (str): The lease configuration hash.
+            keys (list[str]): The keys of the citations.
+            data_version (Optional[int]): The version of the collection data the citations were generated from, if
+                known. The mappings stored for another version are not returned.
+
+        Returns:
+            dict[str, list[Optional[str]]]: The source document and bounding boxes of the stored citations, by key.
+        """
+        stored_mappings = self._collection_documents_collection.find_one(
+            {"_id": _build_citation_mappings_id(collection_id, lease_config_hash)},
+            {"data_version": 1, **{f"citations.{key}": 1 for key in keys}}
+        )
+        if not stored_mappings:
+            return {}
+        if data_version is not None and stored_mappings.get("data_version") != data_version:
+            # The collection was ingested again, the aliases of the stored mappings refer to other sources
+            logging.warning(
+                f"Citation mappings of collection {collection_id} are of data version "
+                f"{stored_mappings.get('data_version')} instead of {data_version}, they are not restored."
+            )
+            return {}
+        return stored_mappings.get("citations", {})
+
     def _get_all_extracted_fields_from_collection_doc(self, collection_id: str, config: FieldDataCollectionConfig) -> dict:
         """Gets all extracted fields from an existing collection document.
 
@@ -496,36 +598,24 @@ class IngestionCollectionDocumentService(object):
         # Query Cosmos for collection document
         logging.info(f"Querying CosmosDB for collection ID {collection_id} and Lease Config Hash {config.lease_config_hash}")
         existing_document = self._collection_documents_collection.find_one(
-            {"_id": _build_document_id(collection_id, config.lease_config_hash)}
+            {"_id": _build_document_id(collection_id, config.lease_config_hash)},
+            _EXTRACTED_FIELDS_PROJECTION
         )
         if not existing_document or existing_document.get("collection_id") is None:
             logging.warning(
                 f"data for collection {collection_id} and lease config hash {config.lease_config_hash} does not exist."
             )
             return all_lease_fields_dict
-        existing_document = ExtractedCollectionDocuments(**existing_document)
 
-        # Iterate over all leases in the collection document
-        for lease in existing_document.information.leases:
-            lease_key = lease.lease_id
+        # The document was validated when it was stored: the fields are validated directly into the models returned,
+        # instead of being validated as ExtractedLeaseField then dumped and validated again
+        for lease in existing_document["information"]["leases"]:
+            lease_key = lease.get("lease_id")
             if lease_key in all_lease_fields_dict:
                 logging.error(f"A lease with ID {lease_key} has already been processed - skipping...")
                 continue
 
-            lease_field_dict = {}
-            # Get stringified values of each element
-
-            for field_name, field_values in lease.fields.items():
-                lease_agreement_data: list[dict] = []
-                for field_value in field_values:
-                    lease_agreement_data.append(
-                        LeaseAgreementDocumentData(**field_value.model_dump())
-                    )
-
-                lease_field_dict[field_name] = lease_agreement_data
-
-            # Update the top-level dictionary with the lease fields
-            all_lease_fields_dict[lease_key] = lease_field_dict
+            all_lease_fields_dict[lease_key] = _LEASE_FIELDS_ADAPTER.validate_python(lease["fields"])
 
         return all_lease_fields_dict
 
@@ -0,0 +1,214 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+from pymongo import errors
+from pymongo.collection import Collection
+
+from models.environment_config import EnvironmentConfig
+from models.ingestion_models import (
+    IngestionDurationStats,
+    IngestionJob,
+    IngestionJobMessage,
+    IngestionJobStats,
+    IngestionJobStatus,
+)
+from ._cosmos_client import CosmosClient
+
+
+# The stages between which the durations of the completed jobs are measured, by duration
+_DURATION_STAGES = {
+    "end_to_end": (IngestionJobStatus.SUBMITTED, IngestionJobStatus.DONE),
+    "queue_wait": (IngestionJobStatus.SUBMITTED, IngestionJobStatus.ANALYZING),
+    "analysis": (IngestionJobStatus.ANALYZING, IngestionJobStatus.INGESTING),
+    "ingestion": (IngestionJobStatus.INGESTING, IngestionJobStatus.DONE),
+}
+# The collections whose TTL index was created by this process
+_indexed_collections: set[str] = set()
+
+
+def _summarize_durations(durations: list[float]) -> IngestionDurationStats:
+    """Summarizes durations.
+
+    Args:
+        durations (list[float]): The durations, in seconds.
+
+    Returns:
+        IngestionDurationStats: The distribution of the durations.
+    """
+    if not durations:
+        return IngestionDurationStats()
+
+    values = np.array(durations, dtype=np.float64)
+    p50, p95 = np.percentile(values, [50, 95])
+    return IngestionDurationStats(
+        count=len(values),
+        mean_seconds=float(values.mean()),
+        p50_seconds=float(p50),
+        p95_seconds=float(p95),
+        max_seconds=float(values.max())
+    )
+
+
+class IngestionJobService(object):
+    """Tracks the progress of the ingestion of the queued documents in Cosmos DB.
+
+    Tracking is best effort: a failure to update a job is logged and does not fail the ingestion of the document.
+    """
+    _collection: Collection
+
+    def __init__(self, collection: Collection):
+        """Initializes the IngestionJobService.
+
+        Args:
+            collection (Collection): The collection of the ingestion jobs.
+        """
+        self._collection = collection
+
+    def create_ttl_index(self, ttl_seconds: int):
+        """Creates the index deleting the jobs that were not updated for a time.
+
+        Cosmos DB only supports TTL indexes on `_ts`, the time of the last update of a document.
+
+        Args:
+            ttl_seconds (int): The time after which the jobs are deleted, in seconds.
+        """
+        try:
+            self._collection.create_index("_ts", expireAfterSeconds=ttl_seconds)
+        except errors.PyMongoError as e:
+            logging.warning(f"Failed to create the TTL index of the ingestion jobs: {e}")
+
+    def submit_job(self, job: IngestionJobMessage):
+        """Records a queued ingestion job.
+
+        Args:
+            job (IngestionJobMessage): The queued job.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            self._collection.update_one(
+                {"_id": job.job_id},
+                {
+                    "$set": {
+                        "collection_id": job.collection_id,
+                        "lease_id": job.lease_id,
+                        "document_name": job.document_name,
+                        "document_path": job.document_path,
+                        "status": IngestionJobStatus.SUBMITTED.value,
+                        f"timestamps.{IngestionJobStatus.SUBMITTED.value}": now,
+                        "attempts": 0,
+                        "updated_at": now
+                    }
+                },
+                upsert=True
+            )
+        except errors.PyMongoError as e:
+            logging.warning(f"Failed to record the submission of ingestion job {job.job_id}: {e}")
+
+    def set_status(
+        self,
+        job_id: str,
+        status: IngestionJobStatus,
+        attempts: Optional[int] = None,
+        error: Optional[str] = None
+    ):
+        """Records that an ingestion job entered a stage.
+
+        Args:
+            job_id (str): The ID of the job.
+            status (IngestionJobStatus): The stage entered by the job.
+            attempts (Optional[int]): The number of times the job was picked up by a worker, if known.
+            error (Optional[str]): The error that failed the job.
+        """
+        now = datetime.now(timezone.utc)
+        update = {
+            "status": status.value,
+            f"timestamps.{status.value}": now,
+            "error": error,
+            "updated_at": now
+        }
+        if attempts is not None:
+            update["attempts"] = attempts
+        try:
+            self._collection.update_one({"_id": job_id}, {"$set": update})
+        except errors.PyMongoError as e:
+            logging.warning(f"Failed to record the status {status.value} of ingestion job {job_id}: {e}")
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Gets an ingestion job.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            Optional[IngestionJob]: The job, or None if it does not exist or has expired.
+        """
+        job = self._collection.find_one({"_id": job_id})
+        return IngestionJob(**job) if job else None
+
+    def get_stats(self, window: timedelta) -> IngestionJobStats:
+        """Computes the throughput and latency of the ingestion jobs completed over a time window.
+
+        Args:
+            window (timedelta): The time window, ending now.
+
+        Returns:
+            IngestionJobStats: The statistics of the jobs.
+        """
+        status_counts = {status: 0 for status in IngestionJobStatus}
+        for group in self._collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            if group["_id"] in status_counts:
+                status_counts[IngestionJobStatus(group["_id"])] = group["count"]
+
+        durations = {name: [] for name in _DURATION_STAGES}
+        completed = failed = 0
+        finished_jobs = self._collection.find(
+            {
+                "status": {"$in": [IngestionJobStatus.DONE.value, IngestionJobStatus.FAILED.value]},
+                "updated_at": {"$gte": datetime.now(timezone.utc) - window}
+            },
+            {"_id": 0, "status": 1, "timestamps": 1}
+        )
+        for job in finished_jobs:
+            if job["status"] == IngestionJobStatus.FAILED.value:
+                failed += 1
+                continue
+
+            completed += 1
+            timestamps = job.get("timestamps", {})
+            for name, (start, end) in _DURATION_STAGES.items():
+                if start.value in timestamps and end.value in timestamps:
+                    durations[name].append((timestamps[end.value] - timestamps[start.value]).total_seconds())
+
+        window_minutes = window.total_seconds() / 60
+        return IngestionJobStats(
+            window_minutes=int(window_minutes),
+            status_counts=status_counts,
+            queue_depth=status_counts[IngestionJobStatus.SUBMITTED] + status_counts[IngestionJobStatus.RETRYING],
+            in_progress=status_counts[IngestionJobStatus.ANALYZING] + status_counts[IngestionJobStatus.INGESTING],
+            completed=completed,
+            failed=failed,
+            throughput_per_minute=completed / window_minutes,
+            **{name: _summarize_durations(values) for name, values in durations.items()}
+        )
+
+    @classmethod
+    def from_environment_config(cls, environment_config: EnvironmentConfig):
+        """Creates an IngestionJobService instance from the environment configuration.
+
+        The TTL index of the collection is created the first time the service is created in the process.
+
+        Args:
+            environment_config (EnvironmentConfig): The environment configuration.
+
+        Returns:
+            IngestionJobService: The IngestionJobService instance.
+        """
+        collection_name = environment_config.cosmosdb.ingestion_job_collection_name.value
+        cosmos_client = CosmosClient(environment_config.cosmosdb.endpoint.value)
+        service = cls(cosmos_client.get_collection(environment_config.cosmosdb.db_name.value, collection_name))
+        if collection_name not in _indexed_collections:
+            service.create_ttl_index(environment_config.ingestion_queue.job_ttl_seconds.value)
+            _indexed_collections.add(collection_name)
+        return service
@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import uuid
+from typing import AsyncIterator, Optional
 
 import httpx
 import ssl
@@ -6,20 +9,40 @@ import os
 import time
 from openai import AsyncAzureOpenAI
 from semantic_kernel import Kernel
+from semantic_kernel.connectors.ai.completion_usage import CompletionUsage
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
 from semantic_kernel.connectors.ai.open_ai.services.azure_chat_completion import AzureChatCompletion
 from semantic_kernel.connectors.ai.open_ai.services.open_ai_chat_completion import OpenAIChatCompletion
 from semantic_kernel.connectors.ai.open_ai.prompt_execution_settings.azure_chat_prompt_execution_settings import (
     AzureChatPromptExecutionSettings,
 )
+from semantic_kernel.connectors.ai.open_ai.services.azure_text_embedding import AzureTextEmbedding
 from semantic_kernel.contents import ChatHistory
-from services.collection_kernel_plugin import CollectionPlugin
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+import numpy as np
+from services.answer_cache import AnswerCache
+from services.collection_kernel_plugin import BoundCollectionPlugin, CollectionPlugin, bind_collection_plugin
 from configs.llm_config import LlmConfig, get_llm_config
-from models.api.v1 import QueryResponse, GeneratedResponse, QueryMetrics
-import re
+from models.api.v1 import CitationRegions, QueryResponse, GeneratedResponse, QueryMetrics, QueryStreamEvent
 import json
+from pydantic import ValidationError
 from services.citation_mapper import CitationMapper
+from utils.bounding_box_utils import parse_bounding_regions
 from utils.health_check_cache import service_status
+from utils.json_stream_utils import JsonStringFieldStreamReader, iter_json_objects
+
+COLLECTION_PLUGIN_NAME = "Collection"
+
+HISTORY_SUMMARY_PROMPT = (
+    "Summarize the conversation between a user and an assistant answering questions about document "
+    "collections. Keep the collection IDs, lease IDs, facts, figures and dates that were asked about or "
+    "answered, and the open questions of the user. Include the details of the existing summary, if any. "
+    "Answer with the summary only, in at most 200 words."
+)
 
 
 class LlmRequestManager:
@@ -49,77 +72,359 @@ class LlmRequestManager:
             async_client=async_openai_client
         )
         self._citation_mapper = CitationMapper()
+        self._collection_kernel, self._collection_execution_settings = self._build_collection_kernel()
+        # When the data of the collection is already in the chat history, the model may answer without a tool call
+        self._inject_known_collection_data = config.inject_known_collection_data is True
+        self._known_collection_execution_settings = AzureChatPromptExecutionSettings(
+            function_choice_behavior=FunctionChoiceBehavior.Auto(included_functions=[self._collection_function_name]),
+            response_format=GeneratedResponse
+        )
+        self._general_kernel, self._general_execution_settings = self._build_general_kernel()
+        self._answer_execution_settings = AzureChatPromptExecutionSettings(response_format=GeneratedResponse)
+
+        self._answer_cache: Optional[AnswerCache] = None
+        self._text_embedding: Optional[AzureTextEmbedding] = None
+        answer_cache_config = config.answer_cache
+        if answer_cache_config.enabled.value.lower() == "true":
+            self._answer_cache = AnswerCache(
+                max_size=answer_cache_config.max_size.value,
+                ttl_seconds=answer_cache_config.ttl_seconds.value,
+                similarity_threshold=answer_cache_config.similarity_threshold.value
+            )
+            if answer_cache_config.embedding_endpoint and answer_cache_config.embedding_model_name:
+                self._text_embedding = AzureTextEmbedding(
+                    service_id="answer-cache-embedding",
+                    api_key=config.key,
+                    base_url=answer_cache_config.embedding_endpoint.value,
+                    api_version=config.api_version,
+                    deployment_name=answer_cache_config.embedding_model_name.value
+                )
+
+    @property
+    def _collection_function_name(self) -> str:
+        """The fully qualified name of the function retrieving the collection data."""
+        return f"{COLLECTION_PLUGIN_NAME}-{CollectionPlugin.get_collection_data.__kernel_function_name__}"
+
+    def _build_collection_kernel(self) -> tuple[Kernel, AzureChatPromptExecutionSettings]:
+        """Builds the kernel and the execution settings shared by the questions about a collection.
+
+        The kernel registers a BoundCollectionPlugin, which delegates to the CollectionPlugin bound to each
+        query with `bind_collection_plugin`. The execution settings are copied by Semantic Kernel on every
+        request, so they are not modified by the queries.
+
+        Returns:
+            tuple[Kernel, AzureChatPromptExecutionSettings]: The kernel and the execution settings.
+        """
+        kernel = Kernel()
+
+        kernel.add_service(self._chat_completions)
+        kernel.add_plugin(
+            BoundCollectionPlugin(),
+            plugin_name=COLLECTION_PLUGIN_NAME,
+        )
+
+        execution_settings = AzureChatPromptExecutionSettings()
+        execution_settings.function_choice_behavior = FunctionChoiceBehavior.Required(
+            included_functions=[self._collection_function_name]
+        )
+        execution_settings.response_format = GeneratedResponse
+        return kernel, execution_settings
+
+    def _build_general_kernel(self) -> tuple[Kernel, AzureChatPromptExecutionSettings]:
+        """Builds the kernel and the execution settings shared by the general questions.
+
+        Returns:
+            tuple[Kernel, AzureChatPromptExecutionSettings]: The kernel and the execution settings.
+        """
+        kernel = Kernel()
+        kernel.add_service(self._chat_completions)
+
+        execution_settings = AzureChatPromptExecutionSettings()
+        execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
+        execution_settings.parallel_tool_calls = False
+        return kernel, execution_settings
 
     def _parse_response_content(self,
                                 raw_content: str,
                                 collection_plugin: CollectionPlugin) -> QueryResponse:
-        """Parses the raw content to extract the first valid JSON object or handle plain strings."""
+        """Parses the raw content to extract the first valid JSON object or handle plain strings.
+
+        The structured output requested with `GeneratedResponse` is validated in a single decode. Otherwise, the
+        content is scanned once for embedded JSON objects, and the first one is used.
+        """
+        try:
+            generated_response = GeneratedResponse.model_validate_json(raw_content)
+            response = generated_response.response
+            citations = generated_response.citations
+        except ValidationError:
+            response, citations = self._parse_embedded_response_content(raw_content)
+
+        citations = collection_plugin.restore_citations(citations)
+        query_response = QueryResponse(
+            response=response,
+            citations=citations
+        )
+        return query_response
+
+    @staticmethod
+    def _build_query_metrics(usages: list[Optional[CompletionUsage]], **kwargs) -> QueryMetrics:
+        """Builds the metrics of an answer from the usage of all the requests sent to answer it.
+
+        Args:
+            usages (list[Optional[CompletionUsage]]): The usage of each request, None for the responses without it.
+            **kwargs: The latencies of the answer.
+
+        Returns:
+            QueryMetrics: The metrics of the answer.
+        """
+        prompt_tokens = sum(usage.prompt_tokens or 0 for usage in usages if usage)
+        completion_tokens = sum(usage.completion_tokens or 0 for usage in usages if usage)
+        return QueryMetrics(prompt_tokens=prompt_tokens,
+                            completion_tokens=completion_tokens,
+                            total_tokens=prompt_tokens + completion_tokens,
+                            **kwargs)
+
+    @staticmethod
+    def _build_citation_regions(citations: list[list[str]]) -> CitationRegions:
+        """Parses the bounding regions of all the citations of a response at once.
+
+        The regions are added to the response returned to the client only, they are not part of the chat history.
+
+        Args:
+            citations (list[list[str]]): The restored citations, as source document and bounding boxes.
+
+        Returns:
+            CitationRegions: The bounding regions of the citations.
+        """
+        regions = parse_bounding_regions([citation[1] if len(citation) > 1 else None for citation in citations])
+        return CitationRegions(
+            citation_index=regions.source_indices.tolist(),
+            page=regions.pages.tolist(),
+            polygon=[polygon.tolist() for polygon in regions.polygons()]
+        )
+
+    def _parse_embedded_response_content(self, raw_content: str) -> tuple[str, list[str]]:
+        """Parses the first JSON object embedded in content that is not a valid structured output.
+
+        Args:
+            raw_content (str): The raw content of the LLM response.
+
+        Returns:
+            tuple[str, list[str]]: The response text and the citations.
+        """
         try:
-            # Use a regex to extract all valid JSON objects from the response
-            json_objects = re.findall(r'\{.*?\}', raw_content, re.DOTALL)
+            json_objects = iter_json_objects(raw_content)
+            first_json_object = next(json_objects, None)
 
-            if json_objects:
-                if len(json_objects) > 1:
+            if first_json_object is not None:
+                if next(json_objects, None) is not None:
                     logging.warning("More than one JSON object found in the response. Using the first one.")
 
                 # Parse the first valid JSON object
-                first_payload = json.loads(json_objects[0])
-                response = first_payload.get("response", "")
-                citations = first_payload.get("citations", [])
-            else:
-                # If no JSON objects are found, treat the content as a plain string
-                logging.warning("The raw content is a pure string with no JSON object.")
-                response = raw_content.strip()
-                citations = []
+                first_payload = json.loads(first_json_object)
+                return first_payload.get("response", ""), first_payload.get("citations", [])
+
+            # If no JSON objects are found, treat the content as a plain string
+            logging.warning("The raw content is a pure string with no JSON object.")
         except (json.JSONDecodeError, ValueError) as e:
             logging.error(f"Error parsing response: {e}")
-            response = raw_content.strip()  # Fallback to raw content
-            citations = []
 
-        citations = collection_plugin.restore_citations(citations)
-        query_response = QueryResponse(
-            response=response,
-            citations=citations
+        return raw_content.strip(), []
+
+    async def _get_cached_answer(
+        self,
+        user_message: str,
+        collection_plugin: CollectionPlugin,
+        is_first_question: bool
+    ) -> tuple[Optional[QueryResponse], Optional[np.ndarray]]:
+        """Gets the cached answer to the first question of a session.
+
+        Follow-up questions depend on the previous turns of their session, so they are never answered from the cache.
+        The question is only embedded when it has no exact match and an embedding deployment is configured.
+
+        Args:
+            user_message (str): The question of the user.
+            collection_plugin (CollectionPlugin): The plugin retrieving the collection data.
+            is_first_question (bool): Whether the question is the first of its session.
+
+        Returns:
+            tuple[Optional[QueryResponse], Optional[np.ndarray]]: The cached answer, if any, and the embedding of the
+                question, if it was computed.
+        """
+        if self._answer_cache is None or not is_first_question:
+            return None, None
+
+        cached_response = self._answer_cache.get(
+            user_message,
+            collection_plugin.config_id,
+            collection_plugin.lease_config_hash,
+            collection_plugin.get_data_version
         )
-        return query_response
+        if cached_response is not None or self._text_embedding is None:
+            return cached_response, None
+
+        try:
+            question_embedding = (await self._text_embedding.generate_embeddings([user_message]))[0]
+        except Exception as e:
+            logging.warning(f"Failed to embed the question for the answer cache: {str(e)}")
+            return None, None
+
+        cached_response = self._answer_cache.get(
+            user_message,
+            collection_plugin.config_id,
+            collection_plugin.lease_config_hash,
+            collection_plugin.get_data_version,
+            question_embedding
+        )
+        return cached_response, question_embedding
+
+    def _cache_answer(
+        self,
+        user_message: str,
+        collection_plugin: CollectionPlugin,
+        query_response: QueryResponse,
+        question_embedding: Optional[np.ndarray],
+        is_first_question: bool
+    ):
+        """Caches the answer to the first question of a session, when it is based on the data of a single collection.
+
+        Args:
+            user_message (str): The question of the user.
+            collection_plugin (CollectionPlugin): The plugin that retrieved the collection data.
+            query_response (QueryResponse): The answer, with its restored citations.
+            question_embedding (Optional[np.ndarray]): The embedding of the question, if it was computed.
+            is_first_question (bool): Whether the question is the first of its session.
+        """
+        data_versions = collection_plugin.data_versions
+        if self._answer_cache is None or not is_first_question or len(data_versions) != 1:
+            return
+
+        (collection_id, data_version), = data_versions.items()
+        if data_version is not None:
+            self._answer_cache.set(
+                user_message,
+                collection_plugin.config_id,
+                collection_plugin.lease_config_hash,
+                collection_id,
+                data_version,
+                query_response,
+                question_embedding
+            )
+
+    def _answer_from_cache(
+        self,
+        cached_response: QueryResponse,
+        history: ChatHistory,
+        start_time: float
+    ) -> QueryResponse:
+        """Records a cached answer in the chat history and adds its metrics.
+
+        Args:
+            cached_response (QueryResponse): The cached answer.
+            history (ChatHistory): The chat history of the session.
+            start_time (float): The time the query started, from `time.perf_counter`.
+
+        Returns:
+            QueryResponse: The cached answer with its metrics.
+        """
+        logging.info("Answering query from the answer cache")
+        history.add_assistant_message(cached_response.model_dump_json())
+        cached_response.metrics = QueryMetrics(prompt_tokens=0,
+                                               completion_tokens=0,
+                                               total_tokens=0,
+                                               total_latency_sec=time.perf_counter() - start_time,
+                                               cache_hit=True)
+        cached_response.citation_regions = self._build_citation_regions(cached_response.citations)
+        return cached_response
+
+    async def _add_known_collection_data(
+        self,
+        collection_plugin: CollectionPlugin,
+        history: ChatHistory,
+        known_collection_id: Optional[str]
+    ) -> bool:
+        """Adds the data of the collection resolved earlier in the session to the chat history.
+
+        The data is added as a call of the tool retrieving it and its result, as if the model had requested it, so
+        that the model can answer in a single request. The model may still call the tool for another collection.
+
+        Args:
+            collection_plugin (CollectionPlugin): The plugin retrieving the collection data.
+            history (ChatHistory): The chat history of the session, ending with the question of the user.
+            known_collection_id (Optional[str]): The ID of the collection the question is about, if it was
+                resolved earlier in the session.
+
+        Returns:
+            bool: True if the collection data was added to the chat history.
+        """
+        if not self._inject_known_collection_data or known_collection_id is None:
+            return False
+
+        # The data is usually prefetched, the tool call would wait for a prefetch in progress
+        collection_data = await asyncio.to_thread(collection_plugin.get_collection_data, known_collection_id)
+        function_call = FunctionCallContent(
+            id=f"call_{uuid.uuid4().hex}",
+            function_name=CollectionPlugin.get_collection_data.__kernel_function_name__,
+            plugin_name=COLLECTION_PLUGIN_NAME,
+            arguments=json.dumps({"collection_id": known_collection_id})
+        )
+        history.add_message(ChatMessageContent(role=AuthorRole.ASSISTANT, items=[function_call]))
+        history.add_message(ChatMessageContent(
+            role=AuthorRole.TOOL,
+            items=[FunctionResultContent.from_function_call_content_and_result(function_call, collection_data)]
+        ))
+        logging.info(f"Added the data of collection {known_collection_id} to the chat history")
+        return True
 
     async def answer_collection_question(
         self,
         system_message: str,
         user_message: str,
         collection_plugin: CollectionPlugin,
-        history: ChatHistory
+        history: ChatHistory,
+        known_collection_id: Optional[str] = None
     ) -> str:
-        kernel = Kernel()
+        """Answers a question about a collection.
 
-        collection_plugin_name = "Collection"
-        kernel.add_service(self._chat_completions)
-        kernel.add_plugin(
-            collection_plugin,
-            plugin_name=collection_plugin_name,
-        )
+        The model is required to retrieve the collection data with a tool call, unless the data of the collection
+        resolved earlier in the session is added to the chat history (`inject_known_collection_data`).
 
-        execution_settings = AzureChatPromptExecutionSettings()
-        execution_settings.function_choice_behavior = FunctionChoiceBehavior.Required(
-            included_functions=[
-                f"{collection_plugin_name}-{CollectionPlugin.get_collection_data.__kernel_function_name__}"
-            ]
-        )
-        execution_settings.response_format = GeneratedResponse
+        Args:
+            system_message (str): The system message used for new sessions.
+            user_message (str): The question of the user.
+            collection_plugin (CollectionPlugin): The plugin retrieving the collection data.
+            history (ChatHistory): The chat history of the session.
+            known_collection_id (Optional[str]): The ID of the collection the question is about, if it was
+                resolved earlier in the session.
+
+        Returns:
+            str: The QueryResponse JSON of the answer, with its metrics.
+        """
+        start_time = time.perf_counter()
+        is_first_question = not any(message.role == AuthorRole.USER for message in history.messages)
+        cached_response, question_embedding = await self._get_cached_answer(
+            user_message, collection_plugin, is_first_question)
 
         if len(history.messages or []) == 0:
             history.add_system_message(system_message)
         history.add_user_message(user_message)
 
+        if cached_response is not None:
+            return self._answer_from_cache(cached_response, history, start_time).model_dump_json()
+
         logging.info(f"Running query '{user_message}'")
-        start_time = time.perf_counter()
         result = None
+        first_new_message = len(history.messages)
         try:
-            result = await self._chat_completions.get_chat_message_content(
-                chat_history=history,
-                settings=execution_settings,
-                kernel=kernel
-            )
+            settings = self._collection_execution_settings
+            if await self._add_known_collection_data(collection_plugin, history, known_collection_id):
+                settings = self._known_collection_execution_settings
+            with bind_collection_plugin(collection_plugin):
+                result = await self._chat_completions.get_chat_message_content(
+                    chat_history=history,
+                    settings=settings,
+                    kernel=self._collection_kernel
+                )
             service_status["openai"] = {"status": "healthy", "details": "azure_openai is running as expected."}
         except Exception as e:
             logging.error(f"azure_openai check failed with error: {str(e)}")
@@ -133,29 +438,178 @@ class LlmRequestManager:
         end_time = time.perf_counter()
         latency = end_time - start_time
 
-        # tokens = result.inner_content.usage.prompt_tokens, total_tokens, completion_tokens
-        query_metrics = QueryMetrics(prompt_tokens=result.inner_content.usage.prompt_tokens,
-                                     completion_tokens=result.inner_content.usage.completion_tokens,
-                                     total_tokens=result.inner_content.usage.total_tokens,
-                                     total_latency_sec=latency)
+        # The tool call messages added to the chat history by the auto invoke loop carry the usage of their request
+        usages = [message.metadata.get("usage") for message in history.messages[first_new_message:]]
+        query_metrics = self._build_query_metrics(usages + [result.inner_content.usage], total_latency_sec=latency)
 
         # Parse the raw content and handle invalid json content, then add to chat history
         query_response = self._parse_response_content(result.content, collection_plugin)
         history.add_assistant_message(query_response.model_dump_json())
+        self._cache_answer(user_message, collection_plugin, query_response, question_embedding, is_first_question)
 
-        # Add metrics to the response after it's been recorded in the chat history
+        # Add metrics and citation regions to the response after it's been recorded in the chat history
         query_response.metrics = query_metrics
+        query_response.citation_regions = self._build_citation_regions(query_response.citations)
         return query_response.model_dump_json()
 
-    async def answer_general_question(self, system_message: str, user_message: str) -> str:
-        kernel = Kernel()
+    async def _stream_collection_tool_call(
+        self,
+        collection_plugin: CollectionPlugin,
+        history: ChatHistory
+    ) -> AsyncIterator[StreamingChatMessageContent]:
+        """Runs the required tool call retrieving the collection data, with a streamed request.
 
-        kernel.add_service(self._chat_completions)
+        The streamed auto invoke loop stops after the tool call, which adds the collection data to the chat
+        history. Its chunks only contain the tool call, only the chunks carrying the usage of the request are
+        forwarded, so that its tokens are counted in the metrics of the answer.
 
-        execution_settings = AzureChatPromptExecutionSettings()
-        execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
-        execution_settings.parallel_tool_calls = False
+        Args:
+            collection_plugin (CollectionPlugin): The plugin retrieving the collection data.
+            history (ChatHistory): The chat history of the session.
+
+        Yields:
+            StreamingChatMessageContent: The chunks carrying the usage of the request, without content.
+        """
+        with bind_collection_plugin(collection_plugin):
+            async for chunk in self._chat_completions.get_streaming_chat_message_content(
+                chat_history=history,
+                settings=self._collection_execution_settings,
+                kernel=self._collection_kernel
+            ):
+                if chunk is not None and chunk.metadata.get("usage"):
+                    yield StreamingChatMessageContent(
+                        role=AuthorRole.ASSISTANT,
+                        content="",
+                        choice_index=chunk.choice_index,
+                        metadata={"usage": chunk.metadata["usage"]}
+                    )
+
+    async def _stream_answer(
+        self,
+        collection_plugin: CollectionPlugin,
+        history: ChatHistory,
+        known_collection_id: Optional[str]
+    ) -> AsyncIterator[StreamingChatMessageContent]:
+        """Streams the chunks of the answer to a question about a collection.
+
+        Args:
+            collection_plugin (CollectionPlugin): The plugin retrieving the collection data.
+            history (ChatHistory): The chat history of the session, ending with the question of the user.
+            known_collection_id (Optional[str]): The ID of the collection the question is about, if it was
+                resolved earlier in the session.
+
+        Yields:
+            StreamingChatMessageContent: The chunks of the answer, and the chunks carrying the usage of every
+                request sent to answer it.
+        """
+        if await self._add_known_collection_data(collection_plugin, history, known_collection_id):
+            # The model answers directly, or calls the tool for another collection before answering
+            with bind_collection_plugin(collection_plugin):
+                async for chunk in self._chat_completions.get_streaming_chat_message_content(
+                    chat_history=history,
+                    settings=self._known_collection_execution_settings,
+                    kernel=self._collection_kernel
+                ):
+                    yield chunk
+            return
 
+        async for chunk in self._stream_collection_tool_call(collection_plugin, history):
+            yield chunk
+
+        # Then request the answer without tools, like the final request of the non-streamed loop
+        async for chunk in self._chat_completions.get_streaming_chat_message_content(
+            chat_history=history,
+            settings=self._answer_execution_settings
+        ):
+            yield chunk
+
+    async def stream_collection_question(
+        self,
+        system_message: str,
+        user_message: str,
+        collection_plugin: CollectionPlugin,
+        history: ChatHistory,
+        known_collection_id: Optional[str] = None
+    ) -> AsyncIterator[QueryStreamEvent]:
+        """Answers a question about a collection, streaming the response text as it is generated.
+
+        The collection data is first retrieved through the required tool call, or added to the chat history when
+        the collection was resolved earlier in the session, then the text of the response is forwarded chunk by
+        chunk. Once the generation is complete, the buffered response is parsed, its citations are restored and it
+        is added to the chat history.
+
+        Args:
+            system_message (str): The system message used for new sessions.
+            user_message (str): The question of the user.
+            collection_plugin (CollectionPlugin): The plugin retrieving the collection data.
+            history (ChatHistory): The chat history of the session.
+            known_collection_id (Optional[str]): The ID of the collection the question is about, if it was
+                resolved earlier in the session.
+
+        Yields:
+            QueryStreamEvent: A "delta" event per chunk of the response text, then the final "response" event.
+        """
+        start_time = time.perf_counter()
+        is_first_question = not any(message.role == AuthorRole.USER for message in history.messages)
+        cached_response, question_embedding = await self._get_cached_answer(
+            user_message, collection_plugin, is_first_question)
+
+        if len(history.messages or []) == 0:
+            history.add_system_message(system_message)
+        history.add_user_message(user_message)
+
+        if cached_response is not None:
+            query_response = self._answer_from_cache(cached_response, history, start_time)
+            query_response.metrics.time_to_first_token_sec = query_response.metrics.total_latency_sec
+            yield QueryStreamEvent(event="delta", delta=query_response.response)
+            yield QueryStreamEvent(event="response", response=query_response)
+            return
+
+        logging.info(f"Running streamed query '{user_message}'")
+        time_to_first_token = None
+        usages = []
+        content_chunks = []
+        response_reader = JsonStringFieldStreamReader("response")
+        try:
+            async for chunk in self._stream_answer(collection_plugin, history, known_collection_id):
+                if chunk is None:
+                    continue
+                # Each request of the tool calling round trip reports its usage in its last chunk
+                usages.append(chunk.metadata.get("usage"))
+                if not chunk.content:
+                    continue
+
+                content_chunks.append(chunk.content)
+                delta = response_reader.feed(chunk.content)
+                if delta:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - start_time
+                    yield QueryStreamEvent(event="delta", delta=delta)
+            service_status["openai"] = {"status": "healthy", "details": "azure_openai is running as expected."}
+        except Exception as e:
+            logging.error(f"azure_openai check failed with error: {str(e)}")
+
+            service_status["openai"] = {
+                "status": "unhealthy",
+                "details": str(e)
+            }
+            raise e
+
+        latency = time.perf_counter() - start_time
+        query_metrics = self._build_query_metrics(usages,
+                                                  total_latency_sec=latency,
+                                                  time_to_first_token_sec=time_to_first_token)
+
+        # Parse the complete response once the generation is done, then add it to the chat history
+        query_response = self._parse_response_content("".join(content_chunks), collection_plugin)
+        history.add_assistant_message(query_response.model_dump_json())
+        self._cache_answer(user_message, collection_plugin, query_response, question_embedding, is_first_question)
+
+        query_response.metrics = query_metrics
+        query_response.citation_regions = self._build_citation_regions(query_response.citations)
+        yield QueryStreamEvent(event="response", response=query_response)
+
+    async def answer_general_question(self, system_message: str, user_message: str) -> str:
         history = ChatHistory()
         history.add_system_message(system_message)
         history.add_user_message(user_message)
@@ -163,11 +617,28 @@ class LlmRequestManager:
         logging.info(f"Running query '{user_message}'")
         result = await self._chat_completions.get_chat_message_content(
             chat_history=history,
-            settings=execution_settings,
-            kernel=kernel
+            settings=self._general_execution_settings,
+            kernel=self._general_kernel
         )
         return result.content
 
+    async def summarize_history(self, summary: Optional[str], messages: list[ChatMessageContent]) -> str:
+        """Summarizes earlier turns of a conversation, so that they can be left out of the chat history.
+
+        Args:
+            summary (Optional[str]): The summary of the turns before the messages, if any.
+            messages (list[ChatMessageContent]): The user and assistant messages of the turns to summarize.
+
+        Returns:
+            str: The summary of the whole earlier conversation.
+        """
+        conversation = "\n".join(f"{message.role.value}: {message.content}" for message in messages)
+        if summary:
+            conversation = f"Existing summary:\n{summary}\n\nNew messages:\n{conversation}"
+
+        logging.info(f"Summarizing {len(messages)} messages of the chat history")
+        return await self.answer_general_question(HISTORY_SUMMARY_PROMPT, conversation)
+
 
 llm_request_manager: LlmRequestManager | None = None
 
@@ -0,0 +1,296 @@
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import Optional, Protocol
+
+from pydantic import BaseModel
+from pymongo import ReturnDocument, errors
+from pymongo.collection import Collection
+
+from models.environment_config import EnvironmentConfig
+from ._cosmos_client import CosmosClient
+
+
+# Waiting for a few milliseconds to take a lock is not counted as a delay
+_MIN_DELAY_SECONDS = 0.01
+
+
+class RequestSchedulerStats(BaseModel):
+    """Counters of the requests scheduled by a RequestScheduler.
+
+    Attributes:
+        requests (int): The number of requests scheduled.
+        delayed_requests (int): The number of requests that waited before being sent.
+        total_delay_seconds (float): The time the requests waited before being sent, in total.
+        max_delay_seconds (float): The longest time a request waited before being sent.
+        operations (int): The number of operations started.
+        delayed_operations (int): The number of operations that waited for another operation to complete.
+        total_operation_delay_seconds (float): The time the operations waited for a slot, in total.
+        throttled_responses (int): The number of responses asking to retry later, with a 429 or 503 status.
+    """
+    requests: int = 0
+    delayed_requests: int = 0
+    total_delay_seconds: float = 0
+    max_delay_seconds: float = 0
+    operations: int = 0
+    delayed_operations: int = 0
+    total_operation_delay_seconds: float = 0
+    throttled_responses: int = 0
+
+
+class RateLimiter(Protocol):
+    def acquire(self):
+        """Waits until a request can be sent."""
+        ...
+
+
+class TokenBucket(object):
+    """Limits the rate of the requests sent by the process.
+
+    The bucket holds up to `burst` tokens and is refilled at `rate` tokens per second; each request takes a token,
+    and waits for the bucket to be refilled when it is empty.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """Initializes the token bucket, full.
+
+        Args:
+            rate (float): The number of requests per second.
+            burst (int): The number of requests that can be sent at once after the bucket was idle.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, waiting for the bucket to be refilled if it is empty."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self._rate
+            time.sleep(wait_seconds)
+
+
+class MongoRateLimiter(object):
+    """Limits the rate of the requests sent by all the workers, counting them in Cosmos DB.
+
+    The requests are counted in fixed windows of time, with a document per window: a request increments the
+    counter of the current window, and waits for the next window when the limit of the current one is reached.
+    Unlike the token bucket, the requests of a window can be sent at once.
+    """
+
+    def __init__(self, collection: Collection, name: str, rate: float):
+        """Initializes the rate limiter.
+
+        Args:
+            collection (Collection): The collection of the counters.
+            name (str): The name of the limited resource, the prefix of the IDs of the counters.
+            rate (float): The number of requests per second.
+        """
+        self._collection = collection
+        self._name = name
+        # A window lets at least one request through, it is longer than a second for the rates below one
+        self._window_seconds = max(1.0, 1 / rate)
+        self._requests_per_window = max(1, math.floor(rate * self._window_seconds))
+
+    def acquire(self):
+        """Counts a request in the current window, waiting for the next windows while the current one is full."""
+        while True:
+            now = time.time()
+            window = math.floor(now / self._window_seconds)
+            try:
+                counter = self._collection.find_one_and_update(
+                    {"_id": f"{self._name}-{window}"},
+                    {"$inc": {"count": 1}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except errors.DuplicateKeyError:
+                # Another worker created the counter of the window at the same time
+                continue
+            except errors.PyMongoError as e:
+                logging.warning(f"Failed to count the request in the rate limit of {self._name}, sending it: {e}")
+                return
+            if counter["count"] <= self._requests_per_window:
+                return
+            time.sleep((window + 1) * self._window_seconds - now)
+
+
+class RequestScheduler(object):
+    """Schedules the requests sent to a service, shared by the requests handled concurrently by the process.
+
+    The rate of the requests is limited by a rate limiter, and the number of operations in progress, from the
+    request starting them to their completion, is limited by slots. A slot that is not released, e.g. because the
+    result of its operation was never polled, is reclaimed once the operation times out. When the service asks to
+    retry later, all the requests are paused for the time it asked.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter, max_concurrent_operations: int, operation_timeout_seconds: float):
+        """Initializes the scheduler.
+
+        Args:
+            rate_limiter (RateLimiter): The rate limiter of the requests.
+            max_concurrent_operations (int): The number of operations that can be in progress at once.
+            operation_timeout_seconds (float): The time after which the slot of an operation is reclaimed.
+        """
+        self._rate_limiter = rate_limiter
+        self._max_concurrent_operations = max_concurrent_operations
+        self._operation_timeout_seconds = operation_timeout_seconds
+        self._paused_until = 0.0
+        # The deadlines of the slots of the operations in progress, by slot ID
+        self._operation_slots: dict[int, float] = {}
+        self._slot_ids = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = RequestSchedulerStats()
+
+    @property
+    def stats(self) -> RequestSchedulerStats:
+        """A copy of the counters of the scheduled requests."""
+        with self._condition:
+            return self._stats.model_copy()
+
+    def wait_for_pause(self) -> float:
+        """Waits until the requests are no longer paused, without waiting for the rate limiter.
+
+        Returns:
+            float: The time waited, in seconds.
+        """
+        start = time.monotonic()
+        while True:
+            with self._condition:
+                paused_seconds = self._paused_until - time.monotonic()
+            if paused_seconds <= 0:
+                return time.monotonic() - start
+            # The pause may be extended by another throttled response meanwhile
+            time.sleep(paused_seconds)
+
+    def acquire_request(self) -> float:
+        """Waits until a request can be sent.
+
+        Returns:
+            float: The time the request waited, in seconds.
+        """
+        start = time.monotonic()
+        self.wait_for_pause()
+        self._rate_limiter.acquire()
+
+        delay_seconds = time.monotonic() - start
+        with self._condition:
+            self._stats.requests += 1
+            self._stats.total_delay_seconds += delay_seconds
+            self._stats.max_delay_seconds = max(self._stats.max_delay_seconds, delay_seconds)
+            if delay_seconds >= _MIN_DELAY_SECONDS:
+                self._stats.delayed_requests += 1
+        return delay_seconds
+
+    def acquire_operation(self) -> tuple[int, float]:
+        """Waits until an operation can be started, and takes a slot for it.
+
+        Returns:
+            tuple[int, float]: The ID of the slot of the operation, to release it once the operation is completed, and
+                the time the operation waited, in seconds.
+        """
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                for slot_id in [id for id, deadline in self._operation_slots.items() if deadline <= now]:
+                    del self._operation_slots[slot_id]
+                if len(self._operation_slots) < self._max_concurrent_operations:
+                    break
+                self._condition.wait(min(self._operation_slots.values()) - now)
+
+            slot_id = next(self._slot_ids)
+            self._operation_slots[slot_id] = now + self._operation_timeout_seconds
+            delay_seconds = now - start
+            self._stats.operations += 1
+            self._stats.total_operation_delay_seconds += delay_seconds
+            if delay_seconds >= _MIN_DELAY_SECONDS:
+                self._stats.delayed_operations += 1
+        return slot_id, delay_seconds
+
+    def release_operation(self, slot_id: int):
+        """Releases the slot of a completed operation.
+
+        Args:
+            slot_id (int): The ID of the slot.
+        """
+        with self._condition:
+            if self._operation_slots.pop(slot_id, None) is not None:
+                self._condition.notify()
+
+    def pause(self, seconds: float):
+        """Pauses the requests, after the service asked to retry later.
+
+        Args:
+            seconds (float): The time to wait before sending the next request.
+        """
+        with self._condition:
+            self._stats.throttled_responses += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+# The collections whose TTL index was created by this process
+_indexed_collections: set[str] = set()
+request_scheduler: RequestScheduler | None = None
+
+
+def _build_mongo_rate_limiter(environment_config: EnvironmentConfig, rate: float) -> MongoRateLimiter:
+    """Builds the rate limiter shared by the workers through Cosmos DB.
+
+    Args:
+        environment_config (EnvironmentConfig): The environment configuration.
+        rate (float): The number of requests per second.
+
+    Returns:
+        MongoRateLimiter: The rate limiter.
+    """
+    collection_name = environment_config.cosmosdb.rate_limit_collection_name.value
+    collection = CosmosClient(environment_config.cosmosdb.endpoint.value).get_collection(
+        environment_config.cosmosdb.db_name.value,
+        collection_name
+    )
+    if collection_name not in _indexed_collections:
+        try:
+            # The counters of the past windows are only read while they are current
+            collection.create_index("_ts", expireAfterSeconds=60)
+        except errors.PyMongoError as e:
+            logging.warning(f"Failed to create the TTL index of the rate limit counters: {e}")
+        _indexed_collections.add(collection_name)
+    return MongoRateLimiter(collection, "content-understanding", rate)
+
+
+def get_request_scheduler(environment_config: EnvironmentConfig) -> Optional[RequestScheduler]:
+    """Gets the scheduler of the Content Understanding requests shared by the requests of the process as singleton.
+
+    Args:
+        environment_config (EnvironmentConfig): The environment configuration.
+
+    Returns:
+        Optional[RequestScheduler]: The scheduler, or None if the requests are not rate limited.
+    """
+    global request_scheduler
+    config = environment_config.content_understanding.rate_limit
+    if config.enabled.value.lower() != "true":
+        return None
+    if request_scheduler is None:
+        rate = config.requests_per_second.value
+        if config.shared_across_workers.value.lower() == "true":
+            rate_limiter = _build_mongo_rate_limiter(environment_config, rate)
+        else:
+            rate_limiter = TokenBucket(rate, config.burst.value)
+        request_scheduler = RequestScheduler(
+            rate_limiter,
+            max_concurrent_operations=config.max_concurrent_operations.value,
+            operation_timeout_seconds=config.operation_timeout_seconds.value
+        )
+    return request_scheduler
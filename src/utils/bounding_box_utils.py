@@ -0,0 +1,113 @@
+import re
+from itertools import repeat
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+# A bounding region of a source returned by Content Understanding: the page number, then the coordinates of the
+# polygon, e.g. D(1,1.0512,2.1243,7.4412,2.1243,7.4412,2.5123,1.0512,2.5123). The regions of a source are separated
+# by semicolons.
+_REGION_PATTERN = re.compile(rf"D\((\d+(?:,{_NUMBER})*)\)")
+_REGION_SEPARATOR = ";"
+
+
+class BoundingRegions(NamedTuple):
+    """The bounding regions of a batch of sources, stored in flat arrays.
+
+    The regions of the source `i` are the regions `source_offsets[i]` to `source_offsets[i + 1]`, and the
+    coordinates of the polygon of the region `j` are `coordinates[polygon_offsets[j]:polygon_offsets[j + 1]]`,
+    as x1, y1, x2, y2 and so on.
+    """
+    source_offsets: np.ndarray
+    pages: np.ndarray
+    polygon_offsets: np.ndarray
+    coordinates: np.ndarray
+
+    @property
+    def source_indices(self) -> np.ndarray:
+        """The index of the source of each region."""
+        return np.repeat(np.arange(len(self.source_offsets) - 1), np.diff(self.source_offsets))
+
+    def polygons(self) -> list[np.ndarray]:
+        """Splits the coordinates by region.
+
+        Returns:
+            list[np.ndarray]: The coordinates of the polygon of each region.
+        """
+        return np.split(self.coordinates, self.polygon_offsets[1:-1]) if len(self.pages) else []
+
+
+def parse_bounding_regions(sources: Sequence[Optional[str]]) -> BoundingRegions:
+    """Parses the bounding regions of a batch of sources at once.
+
+    The sources are joined and all their numbers are converted in a single NumPy call, instead of one conversion
+    per value, while the regions are delimited with NumPy on the joined sources. When a source is malformed, the
+    well-formed regions of each source are found with a regular expression before the same parsing.
+
+    Args:
+        sources (Sequence[Optional[str]]): The sources, e.g. the `source_bounding_boxes` of citations.
+
+    Returns:
+        BoundingRegions: The bounding regions of the sources. Missing sources and malformed regions have no regions.
+
+    Examples:
+        >>> regions = parse_bounding_regions(["D(1,0,0,1,0,1,1,0,1);D(2,0.5,0.5,1,1)", None])
+        >>> regions.pages.tolist(), regions.source_offsets.tolist()
+        ([1, 2], [0, 2, 2])
+        >>> [polygon.tolist() for polygon in regions.polygons()]
+        [[0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0], [0.5, 0.5, 1.0, 1.0]]
+    """
+    sources = [source or "" for source in sources]
+    try:
+        return _parse_well_formed_sources(sources)
+    except ValueError:
+        return _parse_well_formed_sources([
+            _REGION_SEPARATOR.join(f"D({body})" for body in _REGION_PATTERN.findall(source)) for source in sources
+        ])
+
+
+def _parse_well_formed_sources(sources: list[str]) -> BoundingRegions:
+    """Parses the bounding regions of sources made of well-formed regions separated by semicolons.
+
+    Args:
+        sources (list[str]): The sources.
+
+    Returns:
+        BoundingRegions: The bounding regions of the sources.
+
+    Raises:
+        ValueError: If a source is malformed.
+    """
+    region_counts = np.fromiter(map(str.count, sources, repeat("D(")), dtype=np.int64, count=len(sources))
+    source_offsets = np.concatenate(([0], np.cumsum(region_counts)))
+    region_count = int(source_offsets[-1])
+    if region_count == 0:
+        return BoundingRegions(
+            source_offsets=source_offsets,
+            pages=np.empty(0, dtype=np.int32),
+            polygon_offsets=np.zeros(1, dtype=np.int64),
+            coordinates=np.empty(0, dtype=np.float64)
+        )
+
+    text = _REGION_SEPARATOR.join(source for source in sources if source)
+    if text.count(")") != region_count or text.count(_REGION_SEPARATOR) != region_count - 1:
+        raise ValueError("The sources have malformed regions.")
+
+    # Without the parentheses, the regions are lists of numbers separated by semicolons.
+    # The conversion rejects anything else, e.g. text before or after a region
+    numbers = text.replace("D(", "").replace(")", "")
+    values = np.array(numbers.replace(_REGION_SEPARATOR, ",").split(","), dtype=np.float64)
+
+    # The separator k is between the values k and k + 1, a semicolon starts a region
+    separators = np.frombuffer(numbers.encode(), dtype=np.uint8)
+    separators = separators[(separators == ord(",")) | (separators == ord(_REGION_SEPARATOR))]
+    value_offsets = np.concatenate(([0], np.flatnonzero(separators == ord(_REGION_SEPARATOR)) + 1, [len(values)]))
+    # Each region starts with its page number, followed by the coordinates of its polygon
+    page_positions = value_offsets[:-1]
+    return BoundingRegions(
+        source_offsets=source_offsets,
+        pages=values[page_positions].astype(np.int32),
+        polygon_offsets=value_offsets - np.arange(len(value_offsets)),
+        coordinates=np.delete(values, page_positions)
+    )
@@ -1,9 +1,17 @@
 import re
 
+_CITATION_PATTERN = re.compile(r'\[\d+\]')
+# A whitespace run before punctuation is removed, another run of two or more whitespaces becomes a single space
+_WHITESPACE_PATTERN = re.compile(r'(\s+(?=[,.;:!?]))|\s{2,}')
+
 
 def remove_inline_citations_preserve_spacing(text: str) -> str:
     """Removes all inline citations in the format [number] from a string, preserving proper spacing between words.
 
+    A citation between two words without spaces is replaced with a space, the other citations are removed. The
+    citations are removed in a single pass over their matches, then the spacing is fixed with a single regular
+    expression substitution.
+
     Args:
         text (str): The text containing inline citations.
 
@@ -17,16 +25,48 @@ def remove_inline_citations_preserve_spacing(text: str) -> str:
     if not text:
         return text
 
-    # Replace citations with a space if they're between words without spaces
-    result = re.sub(r'(\S)\[\d+\](\S)', r'\1 \2', text)
+    if '[' in text:
+        text = _remove_citations(text)
+
+    return _WHITESPACE_PATTERN.sub(_replace_whitespace, text)
+
 
-    # Then remove all remaining citations
-    result = re.sub(r'\[\d+\]', '', result)
+def _remove_citations(text: str) -> str:
+    """Removes the inline citations of a text, replacing the citations between two words with a space.
 
-    # Fix any double spaces that might have been created
-    result = re.sub(r'\s{2,}', ' ', result)
+    A citation is between two words when it is preceded and followed by non-whitespace characters. As in a
+    left-to-right scan matching a character, the citation and the next character, the character preceding a
+    citation between words cannot be the character following the previous citation between words.
 
-    # Fix spacing before punctuation
-    result = re.sub(r'\s+([,.;:!?])', r'\1', result)
+    Args:
+        text (str): The text containing inline citations.
 
-    return result
+    Returns:
+        str: The text without citations, before its spacing is fixed.
+    """
+    pieces = []
+    position = 0
+    # The index of the character following the last citation replaced with a space
+    last_following_index = -1
+    for match in _CITATION_PATTERN.finditer(text):
+        start, end = match.span()
+        pieces.append(text[position:start])
+        if start - 1 > last_following_index and end < len(text) \
+                and not text[start - 1].isspace() and not text[end].isspace():
+            pieces.append(' ')
+            last_following_index = end
+        position = end
+    pieces.append(text[position:])
+    return ''.join(pieces)
+
+
+def _replace_whitespace(match: re.Match) -> str:
+    """Replaces a whitespace run matched by the whitespace pattern.
+
+    Args:
+        match (re.Match): The whitespace run.
+
+    Returns:
+        str: An empty string before punctuation, a single space otherwise.
+    """
+    return '' if match.lastindex else ' '
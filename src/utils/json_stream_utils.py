@@ -0,0 +1,281 @@
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, Iterator, Optional, Union
+
+_JSON_STRUCTURAL_CHARACTERS = re.compile(r'[{}"]')
+_JSON_STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_JSON_DECODER = json.JSONDecoder()
+
+# The parts of a JSON value to decode: True for the whole value, the selections of the fields of an object, or a
+# list with the selection of the items of an array
+JsonSelection = Union[bool, dict[str, "JsonSelection"], list["JsonSelection"]]
+
+
+def iter_json_objects(text: str) -> Iterator[str]:
+    """Finds the top-level JSON objects embedded in a text, in a single pass.
+
+    Braces are balanced while skipping the content of JSON strings, so that nested objects and arrays, and
+    braces or quotes inside string values, are handled. Objects that are not closed by the end of the text
+    are not returned. The objects are not validated, they should be decoded with `json.loads`.
+
+    Args:
+        text (str): The text containing JSON objects, e.g. the response of an LLM.
+
+    Yields:
+        str: Each top-level JSON object of the text, in order of appearance.
+
+    Examples:
+        >>> list(iter_json_objects('Answer: {"response": "a {b}", "citations": [{"c": 1}]} and {}'))
+        ['{"response": "a {b}", "citations": [{"c": 1}]}', '{}']
+    """
+    depth = 0
+    start = 0
+    skip_until = 0
+    # Only the structural characters are visited, the regex engine skips over the rest of the text
+    for match in _JSON_STRUCTURAL_CHARACTERS.finditer(text):
+        index = match.start()
+        if index < skip_until:
+            continue
+
+        char = match.group()
+        if char == "{":
+            if depth == 0:
+                start = index
+            depth += 1
+        elif depth == 0:
+            continue
+        elif char == '"':
+            string_end = _JSON_STRING_END.match(text, index + 1)
+            if string_end is None:
+                # The string, and therefore the object, is not closed
+                return
+            skip_until = string_end.end()
+        else:
+            depth -= 1
+            if depth == 0:
+                yield text[start:index + 1]
+
+
+class JsonStringFieldStreamReader:
+    """Incrementally reads the string value of a top-level field from a JSON object streamed in chunks.
+
+    The model streams its structured output (e.g. `{"response": "...", "citations": [...]}`) token by token.
+    The reader decodes the characters of the requested field as soon as they arrive, so that they can be
+    forwarded to the user before the JSON object is complete.
+
+    Examples:
+        >>> reader = JsonStringFieldStreamReader("response")
+        >>> reader.feed('{"respo') + reader.feed('nse": "Hello') + reader.feed(' world", "citations": []}')
+        'Hello world'
+    """
+
+    def __init__(self, field_name: str):
+        """Initializes the reader.
+
+        Args:
+            field_name (str): The name of the top-level field whose string value is read.
+        """
+        self._field_name = field_name
+        self._depth = 0
+        self._in_string = False
+        self._in_field_value = False
+        self._expecting_value = False
+        self._field_read = False
+        self._escape = ""
+        self._high_surrogate = ""
+        self._key_chars: list[str] = []
+        self._last_key: Optional[str] = None
+
+    @property
+    def field_read(self) -> bool:
+        """Whether the whole value of the field was read."""
+        return self._field_read
+
+    def feed(self, chunk: str) -> str:
+        """Feeds the next chunk of the JSON object to the reader.
+
+        Args:
+            chunk (str): The next chunk of the streamed JSON object.
+
+        Returns:
+            str: The decoded characters of the field value found in the chunk, if any.
+        """
+        output: list[str] = []
+        for char in chunk:
+            if self._in_string:
+                self._read_string_char(char, output)
+            elif char == '"':
+                self._start_string()
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            elif char == ":" and self._depth == 1:
+                self._expecting_value = True
+            elif char == "," and self._depth == 1:
+                self._expecting_value = False
+                self._last_key = None
+        return "".join(output)
+
+    def _start_string(self):
+        self._in_string = True
+        self._key_chars = []
+        self._in_field_value = (
+            not self._field_read
+            and self._depth == 1
+            and self._expecting_value
+            and self._last_key == self._field_name
+        )
+
+    def _read_string_char(self, char: str, output: list[str]):
+        if self._escape:
+            self._escape += char
+            if len(self._escape) == 2 and char != "u" or len(self._escape) == 6:
+                decoded = json.loads(f'"{self._escape}"')
+                self._escape = ""
+                self._append(decoded, output)
+        elif char == "\\":
+            self._escape = char
+        elif char == '"':
+            self._end_string()
+        else:
+            self._append(char, output)
+
+    def _append(self, decoded: str, output: list[str]):
+        if self._high_surrogate:
+            # Characters outside the BMP are escaped as a pair of \uXXXX surrogates
+            decoded = (self._high_surrogate + decoded).encode("utf-16", "surrogatepass").decode("utf-16")
+            self._high_surrogate = ""
+        elif "\ud800" <= decoded <= "\udbff":
+            self._high_surrogate = decoded
+            return
+
+        if self._in_field_value:
+            output.append(decoded)
+        else:
+            self._key_chars.append(decoded)
+
+    def _end_string(self):
+        self._in_string = False
+        if self._in_field_value:
+            self._in_field_value = False
+            self._field_read = True
+        elif self._depth == 1 and not self._expecting_value:
+            self._last_key = "".join(self._key_chars)
+
+
+def load_json_selection(text: str, selection: JsonSelection) -> Any:
+    """Decodes the selected parts of a JSON document, one value at a time.
+
+    The fields that are not selected are decoded one by one and discarded right away, instead of being kept in the
+    decoded document, so that only the selected parts and the largest discarded value are in memory at once. The
+    values are decoded by the C decoder of the json module; only the selected objects and arrays are walked here.
+
+    Args:
+        text (str): The JSON document.
+        selection (JsonSelection): The parts of the document to decode.
+
+    Returns:
+        Any: The document with the selected parts only. A value that is not an object or an array, when selected
+            as such, is decoded as is.
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON.
+
+    Examples:
+        >>> load_json_selection(
+        ...     '{"status": "Succeeded", "result": {"contents": [{"markdown": "# Lease", "pages": [{"words": []}]}]}}',
+        ...     {"status": True, "result": {"contents": [{"markdown": True}]}}
+        ... )
+        {'status': 'Succeeded', 'result': {'contents': [{'markdown': '# Lease'}]}}
+    """
+    value, index = _decode_selection(text, _JSON_WHITESPACE.match(text, 0).end(), selection)
+    index = _JSON_WHITESPACE.match(text, index).end()
+    if index != len(text):
+        raise json.JSONDecodeError("Extra data", text, index)
+    return value
+
+
+def _decode_selection(text: str, index: int, selection: JsonSelection) -> tuple[Any, int]:
+    """Decodes the selected parts of the JSON value starting at an index.
+
+    Args:
+        text (str): The JSON document.
+        index (int): The index of the first character of the value.
+        selection (JsonSelection): The parts of the value to decode.
+
+    Returns:
+        tuple[Any, int]: The value with the selected parts only, and the index following the value.
+    """
+    if isinstance(selection, dict) and text.startswith("{", index):
+        return _decode_object_selection(text, index, selection)
+    if isinstance(selection, list) and text.startswith("[", index):
+        return _decode_array_selection(text, index, selection[0])
+    return _JSON_DECODER.raw_decode(text, index)
+
+
+def _decode_object_selection(text: str, index: int, selection: dict[str, JsonSelection]) -> tuple[dict, int]:
+    """Decodes the selected fields of the JSON object starting at an index.
+
+    Args:
+        text (str): The JSON document.
+        index (int): The index of the opening brace of the object.
+        selection (dict[str, JsonSelection]): The selections of the fields to decode.
+
+    Returns:
+        tuple[dict, int]: The selected fields, and the index following the object.
+    """
+    selected_fields = {}
+    index = _JSON_WHITESPACE.match(text, index + 1).end()
+    if text.startswith("}", index):
+        return selected_fields, index + 1
+
+    while True:
+        if not text.startswith('"', index):
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, index)
+        key, index = scanstring(text, index + 1)
+        index = _JSON_WHITESPACE.match(text, index).end()
+        if not text.startswith(":", index):
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, index)
+        index = _JSON_WHITESPACE.match(text, index + 1).end()
+
+        if key in selection:
+            selected_fields[key], index = _decode_selection(text, index, selection[key])
+        else:
+            _, index = _JSON_DECODER.raw_decode(text, index)
+
+        index = _JSON_WHITESPACE.match(text, index).end()
+        if text.startswith("}", index):
+            return selected_fields, index + 1
+        if not text.startswith(",", index):
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+        index = _JSON_WHITESPACE.match(text, index + 1).end()
+
+
+def _decode_array_selection(text: str, index: int, item_selection: JsonSelection) -> tuple[list, int]:
+    """Decodes the selected parts of the items of the JSON array starting at an index.
+
+    Args:
+        text (str): The JSON document.
+        index (int): The index of the opening bracket of the array.
+        item_selection (JsonSelection): The parts of the items to decode.
+
+    Returns:
+        tuple[list, int]: The selected parts of the items, and the index following the array.
+    """
+    items = []
+    index = _JSON_WHITESPACE.match(text, index + 1).end()
+    if text.startswith("]", index):
+        return items, index + 1
+
+    while True:
+        item, index = _decode_selection(text, index, item_selection)
+        items.append(item)
+        index = _JSON_WHITESPACE.match(text, index).end()
+        if text.startswith("]", index):
+            return items, index + 1
+        if not text.startswith(",", index):
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+        index = _JSON_WHITESPACE.match(text, index + 1).end()
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Tuple
 from models.ingestion_models import IngestDocumentType
 from constants import PathConstants
 
@@ -53,3 +53,29 @@ def build_adls_pdf_file_path(
         raise ValueError("Lease ID must be provided for COLLECTION document type.")
 
     return f"{PathConstants.COLLECTION_PREFIX}/{id}/{lease_id}/{file_name}"
+
+
+def parse_adls_pdf_file_path(path: str) -> Tuple[IngestDocumentType, str, str, str]:
+    """Parse a PDF file path, the inverse of `build_adls_pdf_file_path`.
+
+    Args:
+        path (str): The PDF file path, relative to the container.
+
+    Returns:
+        Tuple[IngestDocumentType, str, str, str]: The document type, the ID of the document, the file name and the
+            lease ID, in the order of the arguments of `build_adls_pdf_file_path`.
+
+    Raises:
+        ValueError: If the path is not the path of a PDF file of a lease of a collection.
+
+    Examples:
+        >>> parse_adls_pdf_file_path("Collections/3OAS-074/000123/lease.pdf")
+        (<IngestDocumentType.COLLECTION: 'Collection'>, '3OAS-074', 'lease.pdf', '000123')
+    """
+    parts = path.split("/")
+    if len(parts) != 4 or parts[0] != PathConstants.COLLECTION_PREFIX or not all(parts) \
+            or not parts[3].endswith(".pdf"):
+        raise ValueError(f"{path} is not the path of a PDF file of a collection lease.")
+
+    _, id, lease_id, file_name = parts
+    return IngestDocumentType.COLLECTION, id, file_name, lease_id
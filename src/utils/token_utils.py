@@ -0,0 +1,45 @@
+import math
+
+from semantic_kernel.contents import FunctionCallContent, FunctionResultContent, TextContent
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+
+# Average number of characters per token of English text and JSON for the GPT tokenizers
+CHARACTERS_PER_TOKEN = 4
+# Tokens added by the chat format around the content of each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens of a text, without loading a tokenizer.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated number of tokens.
+
+    Examples:
+        >>> estimate_tokens("When does the lease expire?")
+        7
+    """
+    return math.ceil(len(text) / CHARACTERS_PER_TOKEN)
+
+
+def estimate_message_tokens(message: ChatMessageContent) -> int:
+    """Estimates the number of prompt tokens of a chat message, including its function calls and results.
+
+    Args:
+        message (ChatMessageContent): The chat message.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    for item in message.items:
+        if isinstance(item, TextContent):
+            tokens += estimate_tokens(item.text or "")
+        elif isinstance(item, FunctionCallContent):
+            tokens += estimate_tokens(f"{item.name}{item.arguments or ''}")
+        elif isinstance(item, FunctionResultContent):
+            tokens += estimate_tokens(str(item.result))
+    return tokens
@@ -195,6 +195,7 @@ class TestGetConfig(unittest.TestCase):
             "name": "test_config",
             "version": "1.0",
             "lease_config_hash": "fake-hash",
+            "payload_format": "json",
             "prompt": "Test prompt",
             "collection_rows": []
         }
@@ -1,13 +1,15 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 from controllers.inference_controller import InferenceController
 from services.ingest_config_management_service import IngestConfigManagementService
 from services.ingest_lease_documents_service import IngestionCollectionDocumentService
 from services.llm_request_manager import LlmRequestManager
-from models.api.v1 import QueryRequest, QueryResponse, QueryMetrics
+from semantic_kernel.contents.chat_message_content import ChatMessageContent, AuthorRole
+from models.api.v1 import QueryRequest, QueryResponse, QueryMetrics, QueryStreamEvent
 from services.cosmos_chat_history import CosmosChatHistory
 from models import HTTPError
 import asyncio
+import threading
 
 
 class TestInferenceController(unittest.TestCase):
@@ -16,6 +18,9 @@ class TestInferenceController(unittest.TestCase):
         self.llm_request_manager = MagicMock(spec=LlmRequestManager)
         self.config_management_service = MagicMock(spec=IngestConfigManagementService)
         self.chat_history = MagicMock(spec=CosmosChatHistory)
+        self.chat_history.get_messages_to_summarize.return_value = ([], 0)
+        self.chat_history.history_tokens_saved = 0
+        self.chat_history.get_requested_collection_ids.return_value = []
         self.lease_docs_service = MagicMock(spec=IngestionCollectionDocumentService)
         self.controller = InferenceController(
             self.llm_request_manager,
@@ -87,9 +92,192 @@ class TestInferenceController(unittest.TestCase):
             config.prompt,
             request.query,
             unittest.mock.ANY,
-            self.chat_history
+            self.chat_history,
+            known_collection_id=None
         )
         # Instead of checking the instance type directly, check the class name
         self.assertEqual(response.__class__.__name__, "QueryResponse")
         self.assertEqual(response.response, test_response)
         self.assertEqual(response.citations, test_citations)
+
+    def test_query_stream_config_not_found(self):
+        request = QueryRequest(query="test query", sid="1234", cid="test-correlation-id")
+        self.config_management_service.load_config.return_value = None
+
+        with self.assertRaises(HTTPError) as context:
+            asyncio.run(self.controller.query_stream(request, "test_config", "1.0", "user123"))
+
+        self.assertEqual(context.exception.status_code, 404)
+        self.llm_request_manager.stream_collection_question.assert_not_called()
+
+    def test_query_stream_success(self):
+        request = QueryRequest(query="test query", sid="1234", cid="test-correlation-id")
+        user_id = "user123"
+        config = MagicMock()
+        config.prompt = "test prompt"
+        self.config_management_service.load_config.return_value = config
+        self.chat_history.user_message_limit_exceeded = False
+        stream_events = [
+            QueryStreamEvent(event="delta", delta="test "),
+            QueryStreamEvent(event="delta", delta="response"),
+            QueryStreamEvent(event="response", response=QueryResponse(response="test response", citations=[]))
+        ]
+
+        async def stream_collection_question(*args, **kwargs):
+            for event in stream_events:
+                yield event
+        self.llm_request_manager.stream_collection_question = MagicMock(side_effect=stream_collection_question)
+
+        async def consume():
+            events = await self.controller.query_stream(request, "test_config", "1.0", user_id)
+            self.chat_history.read_messages.assert_called_once_with(request.sid, user_id)
+            return [event async for event in events]
+
+        events = asyncio.run(consume())
+
+        self.assertEqual(events, stream_events)
+        self.llm_request_manager.stream_collection_question.assert_called_once_with(
+            config.prompt,
+            request.query,
+            unittest.mock.ANY,
+            self.chat_history,
+            known_collection_id=None
+        )
+        self.chat_history.store_messages.assert_called_once_with(request.sid, user_id)
+
+    def test_query_stream_error_after_first_event(self):
+        request = QueryRequest(query="test query", sid="1234", cid="test-correlation-id")
+        config = MagicMock()
+        config.prompt = "test prompt"
+        self.config_management_service.load_config.return_value = config
+        self.chat_history.user_message_limit_exceeded = False
+
+        async def stream_collection_question(*args, **kwargs):
+            yield QueryStreamEvent(event="delta", delta="test ")
+            raise Exception("LLM unavailable")
+        self.llm_request_manager.stream_collection_question = MagicMock(side_effect=stream_collection_question)
+
+        async def consume():
+            events = await self.controller.query_stream(request, "test_config", "1.0", "user123")
+            return [event async for event in events]
+
+        with self.assertLogs(level="ERROR"):
+            events = asyncio.run(consume())
+
+        self.assertEqual(events, [
+            QueryStreamEvent(event="delta", delta="test "),
+            QueryStreamEvent(event="error", error="The response could not be generated.")
+        ])
+        self.chat_history.store_messages.assert_called_once_with(request.sid, "user123")
+
+    def _mock_query(self) -> QueryRequest:
+        config = MagicMock()
+        config.prompt = "test prompt"
+        self.config_management_service.load_config.return_value = config
+        self.chat_history.user_message_limit_exceeded = False
+        self.llm_request_manager.answer_collection_question.return_value = QueryResponse(
+            response="test response",
+            citations=[],
+            metrics=QueryMetrics(prompt_tokens=100, completion_tokens=10, total_tokens=110, total_latency_sec=2.0)
+        ).model_dump_json()
+        return QueryRequest(query="test query", sid="1234", cid="test-correlation-id")
+
+    def test_query_reports_history_tokens_saved(self):
+        request = self._mock_query()
+        self.chat_history.history_tokens_saved = 1500
+
+        response = asyncio.run(self.controller.query(request, "test_config", "1.0", "user123"))
+
+        self.assertEqual(response.metrics.history_tokens_saved, 1500)
+        self.llm_request_manager.summarize_history.assert_not_called()
+
+    def test_query_summarizes_turns_left_out_of_history(self):
+        request = self._mock_query()
+        messages = [ChatMessageContent(role=AuthorRole.USER, content="first question")]
+        self.chat_history.get_messages_to_summarize.return_value = (messages, 4)
+        self.chat_history.summary = "previous summary"
+        self.llm_request_manager.summarize_history = AsyncMock(return_value="new summary")
+
+        asyncio.run(self.controller.query(request, "test_config", "1.0", "user123"))
+
+        self.llm_request_manager.summarize_history.assert_called_once_with("previous summary", messages)
+        self.chat_history.store_summary.assert_called_once_with(request.sid, "user123", "new summary", 4)
+        self.chat_history.store_messages.assert_called_once_with(request.sid, "user123")
+
+    def test_query_succeeds_when_summary_fails(self):
+        request = self._mock_query()
+        self.chat_history.get_messages_to_summarize.return_value = (
+            [ChatMessageContent(role=AuthorRole.USER, content="first question")], 4)
+        self.llm_request_manager.summarize_history = AsyncMock(side_effect=Exception("LLM error"))
+
+        response = asyncio.run(self.controller.query(request, "test_config", "1.0", "user123"))
+
+        self.assertEqual(response.response, "test response")
+        self.chat_history.store_summary.assert_not_called()
+
+    def test_query_loads_config_and_history_concurrently(self):
+        request = self._mock_query()
+        config = self.config_management_service.load_config.return_value
+        history_read = threading.Event()
+
+        def load_config(config_id):
+            # Only returns once the history is read, which would time out if they were loaded one after the other
+            self.assertTrue(history_read.wait(timeout=5))
+            return config
+        self.config_management_service.load_config.side_effect = load_config
+        self.chat_history.read_messages.side_effect = lambda *args: history_read.set()
+
+        response = asyncio.run(self.controller.query(request, "test_config", "1.0", "user123"))
+
+        self.assertEqual(response.response, "test response")
+        self.chat_history.read_messages.assert_called_once_with(request.sid, "user123")
+
+    def test_query_stores_history_outside_event_loop(self):
+        request = self._mock_query()
+        event_loop_thread = threading.get_ident()
+        store_threads = []
+        self.chat_history.store_messages.side_effect = lambda *args: store_threads.append(threading.get_ident())
+
+        asyncio.run(self.controller.query(request, "test_config", "1.0", "user123"))
+
+        self.assertEqual(len(store_threads), 1)
+        self.assertNotEqual(store_threads[0], event_loop_thread)
+
+    def test_get_prefetch_candidates_from_query_and_session(self):
+        self.chat_history.get_requested_collection_ids.return_value = ["7ABC123", "5OAS074"]
+
+        self.assertEqual(
+            self.controller._get_prefetch_candidates("Compare 7abc123 with 9XYZ999 for 2024"),
+            ["7ABC123", "7abc123", "9XYZ999"]
+        )
+        self.assertEqual(self.controller._get_prefetch_candidates("When does it expire?"), ["5OAS074"])
+        self.chat_history.get_requested_collection_ids.return_value = []
+        self.assertEqual(self.controller._get_prefetch_candidates("When does it expire?"), [])
+
+    def test_query_prefetches_collection_data(self):
+        request = self._mock_query()
+        request.query = "When does the lease in 5OAS074 expire?"
+        with patch("controllers.inference_controller.CollectionPlugin") as mock_collection_plugin:
+            mock_collection_plugin.return_value.prefetch_collection_data.return_value = True
+
+            asyncio.run(self.controller.query(request, "test_config", "1.0", "user123"))
+
+        mock_collection_plugin.return_value.prefetch_collection_data.assert_called_once_with("5OAS074")
+
+    def test_prefetch_collection_data_tries_next_candidate(self):
+        collection_plugin = MagicMock()
+        collection_plugin.prefetch_collection_data.side_effect = [Exception("Database error"), False, True]
+
+        self.controller._prefetch_collection_data(collection_plugin, ["A1234", "B1234", "C1234", "D1234"])
+
+        self.assertEqual(
+            [call.args[0] for call in collection_plugin.prefetch_collection_data.call_args_list],
+            ["A1234", "B1234", "C1234"]
+        )
+
+    def test_get_known_collection_id(self):
+        self.chat_history.get_requested_collection_ids.return_value = ["7ABC123", "5OAS074"]
+
+        self.assertEqual(self.controller._get_known_collection_id("And for 7ABC123?"), "7ABC123")
+        self.assertEqual(self.controller._get_known_collection_id("When does it expire?"), "5OAS074")
+        self.assertIsNone(self.controller._get_known_collection_id("What about 9XYZ999?"))
@@ -1,11 +1,12 @@
 import unittest
-from unittest.mock import Mock
+from unittest.mock import ANY, Mock
 from services.ingest_config_management_service import IngestConfigManagementService
 from services.azure_content_understanding_client import AzureContentUnderstandingClient
-from services.ingest_lease_documents_service import IngestionCollectionDocumentService
+from services.ingest_lease_documents_service import INGESTED_RESULT_SELECTION, IngestionCollectionDocumentService
+from services.ingestion_job_service import IngestionJobService
 from controllers.ingest_lease_documents_controller import IngestLeaseDocumentsController
 from models.data_collection_config import FieldDataCollectionConfig
-from models.ingestion_models import IngestCollectionDocumentRequest, IngestDocumentType
+from models.ingestion_models import IngestCollectionDocumentRequest, IngestDocumentType, IngestionJobStatus
 from models.http_error import HTTPError
 from datetime import date
 
@@ -88,6 +89,9 @@ class TestIngestDocuments(TestIngestLeaseDocumentsControllerBase):
         )
         self.assertEqual(self.mock_content_understanding_client.begin_analyze_data.call_count, len(documents))
         self.assertEqual(self.mock_content_understanding_client.poll_result.call_count, len(documents))
+        # Only the parts of the results that are ingested are decoded
+        self.mock_content_understanding_client.poll_result.assert_called_with(
+            ANY, result_selection=INGESTED_RESULT_SELECTION)
         self.assertEqual(self.mock_ingestion_collection_document_service.ingest_analyzer_output.call_count, len(documents))
 
         for document in documents:
@@ -265,6 +269,9 @@ class TestIngestDocuments(TestIngestLeaseDocumentsControllerBase):
         )
         self.assertEqual(self.mock_content_understanding_client.begin_classify_data.call_count, len(documents))
         self.assertEqual(self.mock_content_understanding_client.poll_result.call_count, len(documents))
+        # Only the parts of the results that are ingested are decoded
+        self.mock_content_understanding_client.poll_result.assert_called_with(
+            ANY, result_selection=INGESTED_RESULT_SELECTION)
         classifier_output_call_count = self.mock_ingestion_collection_document_service.ingest_classifier_output.call_count
         self.assertEqual(classifier_output_call_count, len(documents))
 
@@ -435,3 +442,85 @@ class TestIngestDocuments(TestIngestLeaseDocumentsControllerBase):
         # Verify classifier methods are not called when classifier is disabled
         self.mock_content_understanding_client.begin_classify_data.assert_not_called()
         self.mock_ingestion_collection_document_service.ingest_classifier_output.assert_not_called()
+
+
+class TestIngestDocumentsJobStatus(TestIngestLeaseDocumentsControllerBase):
+    def setUp(self):
+        """Set up the test case with a controller tracking the progress of the documents."""
+        super().setUp()
+        self.mock_ingestion_job_service = Mock(spec=IngestionJobService)
+        self.controller = IngestLeaseDocumentsController(
+            content_understanding_client=self.mock_content_understanding_client,
+            ingestion_collection_document_service=self.mock_ingestion_collection_document_service,
+            ingestion_configuration_management_service=self.mock_ingestion_configuration_management_service,
+            ingestion_job_service=self.mock_ingestion_job_service
+        )
+        self.mock_ingestion_configuration_management_service.load_config.return_value = FieldDataCollectionConfig(**{
+            "_id": "test_config-1.0",
+            "name": "test_config",
+            "version": "1.0",
+            "prompt": "Test prompt.",
+            "lease_config_hash": "test_hash",
+            "collection_rows": [
+                {
+                    "data_type": "LeaseAgreement",
+                    "container_name": "lesa",
+                    "folder_name": "lease-agreements",
+                    "field_schema": [],
+                    "analyzer_id": "test-analyzer"
+                }
+            ]
+        })
+        self.mock_content_understanding_client.poll_result.return_value = {"analyzer": "output"}
+
+    def test_when_job_id_records_stages(self):
+        """Test that the analysis and ingestion stages of the documents with a job ID are recorded."""
+        # Arrange
+        self.mock_ingestion_collection_document_service.is_document_ingested.return_value = False
+        documents = [
+            IngestCollectionDocumentRequest(
+                id="collection_id_1",
+                lease_id="lease_id_1",
+                filename="filename_1",
+                file_bytes=b"file_bytes_1",
+                date_of_document=date(2023, 10, 1),
+                job_id="job-1"
+            ),
+            IngestCollectionDocumentRequest(
+                id="collection_id_2",
+                lease_id="lease_id_2",
+                filename="filename_2",
+                file_bytes=b"file_bytes_2",
+                date_of_document=date(2023, 10, 1)
+            )
+        ]
+
+        # Act
+        self.controller.ingest_documents("test_config", "1.0", documents)
+
+        # Assert
+        self.assertEqual(self.mock_ingestion_job_service.set_status.call_args_list, [
+            (("job-1", IngestionJobStatus.ANALYZING),),
+            (("job-1", IngestionJobStatus.INGESTING),),
+        ])
+
+    def test_when_already_ingested_records_no_stage(self):
+        """Test that no stage is recorded for the documents that are already ingested."""
+        # Arrange
+        self.mock_ingestion_collection_document_service.is_document_ingested.return_value = True
+        documents = [
+            IngestCollectionDocumentRequest(
+                id="collection_id_1",
+                lease_id="lease_id_1",
+                filename="filename_1",
+                file_bytes=b"file_bytes_1",
+                date_of_document=date(2023, 10, 1),
+                job_id="job-1"
+            )
+        ]
+
+        # Act
+        self.controller.ingest_documents("test_config", "1.0", documents)
+
+        # Assert
+        self.mock_ingestion_job_service.set_status.assert_not_called()
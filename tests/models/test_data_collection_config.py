@@ -0,0 +1,50 @@
+import unittest
+from models.data_collection_config import FieldDataCollectionConfig
+
+
+class TestFieldDataCollectionConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.config = FieldDataCollectionConfig(
+            _id="test_config-1.0",
+            name="test_config",
+            version="1.0",
+            prompt="Test prompt",
+            collection_rows=[
+                {
+                    "data_type": "LeaseAgreement",
+                    "analyzer_id": "analyzer-1",
+                    "field_schema": [
+                        {"name": "lease_duration", "type": "string", "description": "Lease duration"},
+                        {"name": "termination_conditions", "type": "string", "description": "Termination"}
+                    ]
+                },
+                {
+                    "data_type": "LeaseAgreement",
+                    "analyzer_id": "analyzer-2",
+                    "field_schema": [
+                        {"name": "lease_duration", "type": "string", "description": "Lease duration"},
+                        {"name": "prohibited_uses", "type": "string", "description": "Prohibited uses"}
+                    ]
+                }
+            ]
+        )
+
+    def test_lease_collection_rows(self):
+        self.assertEqual(self.config.lease_collection_rows, tuple(self.config.collection_rows))
+
+    def test_lease_field_names(self):
+        self.assertEqual(
+            self.config.lease_field_names,
+            frozenset({"lease_duration", "termination_conditions", "prohibited_uses"})
+        )
+
+    def test_derived_structures_are_computed_once(self):
+        self.assertIs(self.config.lease_field_names, self.config.lease_field_names)
+        # The computed structures are copied with the configuration, e.g. by the configuration cache
+        self.assertIn("lease_field_names", self.config.model_copy(deep=True).__dict__)
+
+    def test_derived_structures_are_not_serialized(self):
+        self.config.lease_field_names
+
+        self.assertNotIn("lease_field_names", self.config.model_dump(by_alias=True))
@@ -1,8 +1,9 @@
 import json
 import unittest
 from unittest.mock import patch, MagicMock, AsyncMock
-from routes.api.v1.inference_config_routes import query
-from models.api.v1 import QueryRequest
+from routes.api.v1.inference_config_routes import query, query_stream
+from models import HTTPError
+from models.api.v1 import QueryRequest, QueryResponse, QueryStreamEvent
 
 import azure.functions as func
 
@@ -163,3 +164,70 @@ class TestInferenceConfigRoutes(unittest.IsolatedAsyncioTestCase):
         # Assert
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.get_body().decode(), "User ID header is missing.")
+
+    @staticmethod
+    def _stream_request(request_body: dict, headers: dict) -> MagicMock:
+        request = MagicMock()
+        request.headers = headers
+        request.query_params = {}
+        request.json = AsyncMock(return_value=request_body)
+        return request
+
+    @patch('routes.api.v1.inference_config_routes.get_app_config_manager')
+    @patch('routes.api.v1.inference_config_routes._build_inference_controller')
+    async def test_query_stream_success(self, mock_build_inference_controller, mock_get_app_config_manager):
+        # Arrange
+        request_body = {"query": "test query", "cid": "test-correlation-id", "sid": "test-session-id"}
+        request = self._stream_request(request_body, {"x-user": "test_user"})
+
+        mock_environment_config = MagicMock()
+        mock_environment_config.default_ingest_config.name.value = "default_config_name"
+        mock_environment_config.default_ingest_config.version.value = "default_config_version"
+        mock_get_app_config_manager.return_value.hydrate_config.return_value = mock_environment_config
+
+        async def stream_events():
+            yield QueryStreamEvent(event="delta", delta="test")
+            yield QueryStreamEvent(event="response", response=QueryResponse(response="test", citations=[]))
+        mock_controller = mock_build_inference_controller.return_value
+        mock_controller.query_stream = AsyncMock(return_value=stream_events())
+
+        # Act
+        response = await query_stream(request)
+        body = "".join([chunk async for chunk in response.body_iterator])
+
+        # Assert
+        mock_controller.query_stream.assert_called_once_with(
+            QueryRequest(**request_body),
+            "default_config_name",
+            "default_config_version",
+            "test_user"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.media_type, "text/event-stream")
+        self.assertEqual(
+            body,
+            'event: delta\ndata: {"event":"delta","delta":"test"}\n\n'
+            'event: response\ndata: {"event":"response","response":{"response":"test","citations":[]}}\n\n'
+        )
+
+    @patch('routes.api.v1.inference_config_routes.get_app_config_manager')
+    @patch('routes.api.v1.inference_config_routes._build_inference_controller')
+    async def test_query_stream_http_error(self, mock_build_inference_controller, mock_get_app_config_manager):
+        request_body = {"query": "test query", "cid": "test-correlation-id", "sid": "test-session-id"}
+        request = self._stream_request(request_body, {"x-user": "test_user"})
+        mock_build_inference_controller.return_value.query_stream = AsyncMock(
+            side_effect=HTTPError("Configuration not found.", 404))
+
+        response = await query_stream(request)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.body.decode(), "Configuration not found.")
+
+    @patch('routes.api.v1.inference_config_routes.get_app_config_manager')
+    async def test_query_stream_missing_user_id(self, mock_get_app_config_manager):
+        request = self._stream_request({"query": "test query"}, {})
+
+        response = await query_stream(request)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.body.decode(), "User ID header is missing.")
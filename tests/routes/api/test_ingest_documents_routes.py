@@ -1,10 +1,18 @@
 import unittest
 from unittest.mock import patch, Mock
-from azure.functions import HttpRequest
+from azure.functions import HttpRequest, QueueMessage
+from azure.functions.queue import QueueMessage as DequeuedQueueMessage
+from azure.functions.blob import InputStream
 import json
 from datetime import date
-from routes.api.v1.ingest_documents_routes import ingest_docs
-from models.ingestion_models import IngestCollectionDocumentRequest
+from models.ingestion_models import IngestionJobStatus
+from routes.api.v1.ingest_documents_routes import (
+    ingest_docs,
+    ingest_queued_docs,
+    log_poisoned_ingestion_jobs,
+    queue_uploaded_docs
+)
+from models.ingestion_models import IngestCollectionDocumentRequest, IngestionJobMessage
 from utils.constants import AZURE_AI_CONTENT_UNDERSTANDING_USER_AGENT
 
 
@@ -17,6 +25,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         self.mock_environment_config.content_understanding.endpoint.value = "https://test-endpoint.com"
         self.mock_environment_config.content_understanding.subscription_key.value = "test-key"
         self.mock_environment_config.content_understanding.request_timeout.value = 30
+        self.mock_environment_config.content_understanding.rate_limit.max_throttled_retries.value = 3
         self.mock_environment_config.default_ingest_config.name.value = "test-config"
         self.mock_environment_config.default_ingest_config.version.value = "1.0"
     @patch("routes.api.v1.ingest_documents_routes.IngestLeaseDocumentsController")
@@ -51,7 +60,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 200)
@@ -62,7 +71,9 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
             endpoint="https://test-endpoint.com",
             subscription_key="test-key",
             timeout=30,
-            x_ms_useragent=AZURE_AI_CONTENT_UNDERSTANDING_USER_AGENT
+            x_ms_useragent=AZURE_AI_CONTENT_UNDERSTANDING_USER_AGENT,
+            scheduler=None,
+            max_throttled_retries=3
         )
         
         # Verify controller was called with correct parameters
@@ -111,7 +122,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 400)
@@ -149,7 +160,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 400)
@@ -187,7 +198,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 400)
@@ -225,7 +236,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 400)
@@ -262,7 +273,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 400)
@@ -300,7 +311,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         with self.assertRaises(Exception):
-            ingest_docs(req)
+            ingest_docs(req, Mock())
 
     @patch("routes.api.v1.ingest_documents_routes.IngestLeaseDocumentsController")
     @patch("routes.api.v1.ingest_documents_routes.AzureContentUnderstandingClient")
@@ -335,7 +346,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 200)
@@ -379,7 +390,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 200)
@@ -427,7 +438,7 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         )
 
         # Act
-        response = ingest_docs(req)
+        response = ingest_docs(req, Mock())
 
         # Assert
         self.assertEqual(response.status_code, 200)
@@ -440,5 +451,258 @@ class TestIngestDocumentsRoutes(unittest.TestCase):
         self.assertEqual(document_request.filename, "document with spaces.pdf")
 
 
+class TestIngestDocumentsQueue(unittest.TestCase):
+    """Unit tests for the queued ingestion of documents."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_environment_config = Mock()
+        self.mock_environment_config.ingestion_queue.enabled.value = "true"
+        self.mock_environment_config.ingestion_queue.max_dequeue_count.value = 3
+        self.mock_environment_config.content_understanding.endpoint.value = "https://test-endpoint.com"
+        self.mock_environment_config.content_understanding.subscription_key.value = "test-key"
+        self.mock_environment_config.content_understanding.request_timeout.value = 30
+        self.mock_environment_config.default_ingest_config.name.value = "test-config"
+        self.mock_environment_config.default_ingest_config.version.value = "1.0"
+        self.job = IngestionJobMessage(
+            job_id="job-1",
+            collection_id="collection1",
+            lease_id="lease1",
+            document_name="document.pdf",
+            document_path="Collections/collection1/lease1/document.pdf",
+            date_of_document=date(2024, 5, 1)
+        )
+        job_service_patcher = patch("routes.api.v1.ingest_documents_routes.IngestionJobService")
+        self.mock_job_service = job_service_patcher.start().from_environment_config.return_value
+        self.addCleanup(job_service_patcher.stop)
+
+    @patch("routes.api.v1.ingest_documents_routes.IngestLeaseDocumentsController")
+    @patch("routes.api.v1.ingest_documents_routes.get_container_client")
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_ingest_docs_queues_document(self, mock_app_config_manager, mock_get_container_client, mock_controller):
+        """Test that the document is uploaded and queued when the ingestion queue is enabled."""
+        # Arrange
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        ingestion_jobs = Mock()
+        document_body = b"test document content"
+        req = HttpRequest(
+            method="POST",
+            url="/ingest-documents/collection1/lease1/document.pdf",
+            route_params={
+                "collection_id": "collection1",
+                "lease_id": "lease1",
+                "document_name": "document.pdf"
+            },
+            body=document_body
+        )
+
+        # Act
+        response = ingest_docs(req, ingestion_jobs)
+
+        # Assert
+        self.assertEqual(response.status_code, 202)
+        body = json.loads(response.get_body())
+        self.assertEqual(body["status"], "queued")
+
+        job = IngestionJobMessage.model_validate_json(ingestion_jobs.set.call_args[0][0])
+        self.assertEqual(job.job_id, body["job_id"])
+        self.assertEqual(job.collection_id, "collection1")
+        self.assertEqual(job.lease_id, "lease1")
+        self.assertEqual(job.document_name, "document.pdf")
+        self.assertEqual(job.document_path, "Collections/collection1/lease1/document.pdf")
+        self.assertEqual(job.date_of_document, date.today())
+        mock_get_container_client.return_value.upload_document.assert_called_once_with(
+            document_body, job.document_path, metadata={"job_id": job.job_id}
+        )
+        self.mock_job_service.submit_job.assert_called_once_with(job)
+        mock_controller.assert_not_called()
+
+    @patch("routes.api.v1.ingest_documents_routes.get_container_client")
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_ingest_docs_does_not_queue_without_document_body(self, mock_app_config_manager,
+                                                              mock_get_container_client):
+        """Test that a request without document is rejected before being queued."""
+        # Arrange
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        ingestion_jobs = Mock()
+        req = HttpRequest(
+            method="POST",
+            url="/ingest-documents/collection1/lease1/document.pdf",
+            route_params={
+                "collection_id": "collection1",
+                "lease_id": "lease1",
+                "document_name": "document.pdf"
+            },
+            body=b""
+        )
+
+        # Act
+        response = ingest_docs(req, ingestion_jobs)
+
+        # Assert
+        self.assertEqual(response.status_code, 400)
+        ingestion_jobs.set.assert_not_called()
+        mock_get_container_client.return_value.upload_document.assert_not_called()
+
+    @patch("routes.api.v1.ingest_documents_routes.IngestLeaseDocumentsController")
+    @patch("routes.api.v1.ingest_documents_routes.AzureContentUnderstandingClient")
+    @patch("routes.api.v1.ingest_documents_routes.IngestionCollectionDocumentService")
+    @patch("routes.api.v1.ingest_documents_routes.IngestConfigManagementService")
+    @patch("routes.api.v1.ingest_documents_routes.get_container_client")
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_ingest_queued_docs(self,
+                                mock_app_config_manager,
+                                mock_get_container_client,
+                                mock_config_service,
+                                mock_collection_service,
+                                mock_azure_client,
+                                mock_controller):
+        """Test that a queued document is downloaded and ingested."""
+        # Arrange
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        mock_get_container_client.return_value.download_file.return_value = (b"test document content", {})
+        message = QueueMessage(id="message-1", body=self.job.model_dump_json())
+
+        # Act
+        ingest_queued_docs(message)
+
+        # Assert
+        mock_get_container_client.return_value.download_file.assert_called_once_with(self.job.document_path)
+        call_args = mock_controller.return_value.ingest_documents.call_args[1]
+        self.assertEqual(call_args["config_name"], "test-config")
+        self.assertEqual(call_args["config_version"], "1.0")
+        self.assertEqual(call_args["documents"], [IngestCollectionDocumentRequest(
+            id="collection1",
+            filename="document.pdf",
+            file_bytes=b"test document content",
+            date_of_document=date(2024, 5, 1),
+            lease_id="lease1",
+            job_id="job-1"
+        )])
+        self.assertEqual(mock_controller.call_args[1]["ingestion_job_service"], self.mock_job_service)
+        self.mock_job_service.set_status.assert_called_once_with("job-1", IngestionJobStatus.DONE, attempts=None)
+
+    @patch("routes.api.v1.ingest_documents_routes.IngestLeaseDocumentsController")
+    @patch("routes.api.v1.ingest_documents_routes.AzureContentUnderstandingClient")
+    @patch("routes.api.v1.ingest_documents_routes.IngestionCollectionDocumentService")
+    @patch("routes.api.v1.ingest_documents_routes.IngestConfigManagementService")
+    @patch("routes.api.v1.ingest_documents_routes.get_container_client")
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_ingest_queued_docs_raises_to_retry(self,
+                                                mock_app_config_manager,
+                                                mock_get_container_client,
+                                                mock_config_service,
+                                                mock_collection_service,
+                                                mock_azure_client,
+                                                mock_controller):
+        """Test that a failed ingestion raises, so that the message is retried by the host."""
+        # Arrange
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        mock_get_container_client.return_value.download_file.return_value = (b"test document content", {})
+        mock_controller.return_value.ingest_documents.side_effect = Exception("Controller error")
+        message = DequeuedQueueMessage(id="message-1", body=self.job.model_dump_json(), dequeue_count=1)
+
+        # Act & Assert
+        with self.assertRaises(Exception):
+            ingest_queued_docs(message)
+        self.mock_job_service.set_status.assert_called_once_with(
+            "job-1", IngestionJobStatus.RETRYING, attempts=1, error="Controller error"
+        )
+
+    @patch("routes.api.v1.ingest_documents_routes.IngestLeaseDocumentsController")
+    @patch("routes.api.v1.ingest_documents_routes.AzureContentUnderstandingClient")
+    @patch("routes.api.v1.ingest_documents_routes.IngestionCollectionDocumentService")
+    @patch("routes.api.v1.ingest_documents_routes.IngestConfigManagementService")
+    @patch("routes.api.v1.ingest_documents_routes.get_container_client")
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_ingest_queued_docs_fails_job_after_last_attempt(self,
+                                                             mock_app_config_manager,
+                                                             mock_get_container_client,
+                                                             mock_config_service,
+                                                             mock_collection_service,
+                                                             mock_azure_client,
+                                                             mock_controller):
+        """Test that the job fails when the last attempt allowed by the host fails."""
+        # Arrange
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        mock_get_container_client.return_value.download_file.return_value = (b"test document content", {})
+        mock_controller.return_value.ingest_documents.side_effect = Exception("Controller error")
+        message = DequeuedQueueMessage(id="message-1", body=self.job.model_dump_json(), dequeue_count=3)
+
+        # Act & Assert
+        with self.assertRaises(Exception):
+            ingest_queued_docs(message)
+        self.mock_job_service.set_status.assert_called_once_with(
+            "job-1", IngestionJobStatus.FAILED, attempts=3, error="Controller error"
+        )
+
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_log_poisoned_ingestion_jobs(self, mock_app_config_manager):
+        """Test that the abandoned ingestion jobs are logged and recorded as failed."""
+        # Arrange
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        message = QueueMessage(id="message-1", body=self.job.model_dump_json())
+
+        # Act
+        with self.assertLogs(level="ERROR") as logs:
+            log_poisoned_ingestion_jobs(message)
+
+        # Assert
+        self.assertIn("job-1", logs.output[0])
+        self.assertEqual(self.mock_job_service.set_status.call_args[0], ("job-1", IngestionJobStatus.FAILED))
+
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_queue_uploaded_docs(self, mock_app_config_manager):
+        """Test that a document uploaded to the collections is queued."""
+        # Arrange
+        self.mock_environment_config.ingestion_queue.ingest_uploaded_documents.value = "true"
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        ingestion_jobs = Mock()
+        blob = InputStream(data=b"test document content", name="processed/Collections/collection1/lease1/document.pdf")
+
+        # Act
+        queue_uploaded_docs(blob, ingestion_jobs)
+
+        # Assert
+        job = IngestionJobMessage.model_validate_json(ingestion_jobs.set.call_args[0][0])
+        self.assertEqual(job.collection_id, "collection1")
+        self.assertEqual(job.lease_id, "lease1")
+        self.assertEqual(job.document_name, "document.pdf")
+        self.assertEqual(job.document_path, "Collections/collection1/lease1/document.pdf")
+        self.assertEqual(job.date_of_document, date.today())
+        self.mock_job_service.submit_job.assert_called_once_with(job)
+
+    @patch("routes.api.v1.ingest_documents_routes.get_app_config_manager")
+    def test_queue_uploaded_docs_skips_blobs(self, mock_app_config_manager):
+        """Test that the documents already queued, the other files and the disabled ingestion are skipped."""
+        mock_app_config_manager.return_value.hydrate_config.return_value = self.mock_environment_config
+        blobs = {
+            "already queued": ("true", InputStream(
+                data=b"test document content",
+                name="processed/Collections/collection1/lease1/document.pdf",
+                metadata={"job_id": "job-1"}
+            )),
+            "markdown": ("true", InputStream(
+                data=b"# Lease",
+                name="processed/Collections/collection1/lease1/document.md"
+            )),
+            "disabled": ("false", InputStream(
+                data=b"test document content",
+                name="processed/Collections/collection1/lease1/document.pdf"
+            )),
+        }
+        for case, (ingest_uploaded_documents, blob) in blobs.items():
+            with self.subTest(case=case):
+                # Arrange
+                self.mock_environment_config.ingestion_queue.ingest_uploaded_documents.value = ingest_uploaded_documents
+                ingestion_jobs = Mock()
+
+                # Act
+                queue_uploaded_docs(blob, ingestion_jobs)
+
+                # Assert
+                ingestion_jobs.set.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,169 @@
+import unittest
+from unittest.mock import patch
+from azure.functions import HttpRequest
+import json
+from datetime import datetime, timedelta
+from models.ingestion_models import IngestionJob, IngestionJobStats, IngestionJobStatus
+from routes.api.v1.ingestion_jobs_routes import get_ingestion_job, get_ingestion_job_stats
+from services.request_scheduler import RequestSchedulerStats
+
+
+class TestIngestionJobsRoutes(unittest.TestCase):
+    """Unit tests for ingestion jobs routes."""
+
+    @patch("routes.api.v1.ingestion_jobs_routes.IngestionJobService")
+    @patch("routes.api.v1.ingestion_jobs_routes.get_app_config_manager")
+    def test_get_ingestion_job(self, mock_app_config_manager, mock_job_service):
+        """Test that the status of a job is returned."""
+        # Arrange
+        submitted = datetime(2024, 5, 1, 12, 0, 0)
+        mock_job_service.from_environment_config.return_value.get_job.return_value = IngestionJob(
+            _id="job-1",
+            collection_id="collection1",
+            lease_id="lease1",
+            document_name="document.pdf",
+            document_path="Collections/collection1/lease1/document.pdf",
+            status=IngestionJobStatus.ANALYZING,
+            timestamps={
+                IngestionJobStatus.SUBMITTED: submitted,
+                IngestionJobStatus.ANALYZING: submitted + timedelta(seconds=5)
+            },
+            updated_at=submitted + timedelta(seconds=5)
+        )
+        req = HttpRequest(
+            method="GET",
+            url="/ingestion-jobs/job-1",
+            route_params={"job_id": "job-1"},
+            body=None
+        )
+
+        # Act
+        response = get_ingestion_job(req)
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.get_body())
+        self.assertEqual(body["id"], "job-1")
+        self.assertEqual(body["status"], "analyzing")
+        self.assertEqual(body["timestamps"]["analyzing"], "2024-05-01T12:00:05")
+        mock_job_service.from_environment_config.return_value.get_job.assert_called_once_with("job-1")
+
+    @patch("routes.api.v1.ingestion_jobs_routes.IngestionJobService")
+    @patch("routes.api.v1.ingestion_jobs_routes.get_app_config_manager")
+    def test_get_ingestion_job_not_found(self, mock_app_config_manager, mock_job_service):
+        """Test that an unknown job is not found."""
+        # Arrange
+        mock_job_service.from_environment_config.return_value.get_job.return_value = None
+        req = HttpRequest(
+            method="GET",
+            url="/ingestion-jobs/job-1",
+            route_params={"job_id": "job-1"},
+            body=None
+        )
+
+        # Act
+        response = get_ingestion_job(req)
+
+        # Assert
+        self.assertEqual(response.status_code, 404)
+
+    @patch("routes.api.v1.ingestion_jobs_routes.IngestionJobService")
+    @patch("routes.api.v1.ingestion_jobs_routes.get_app_config_manager")
+    def test_get_ingestion_job_stats(self, mock_app_config_manager, mock_job_service):
+        """Test that the statistics over the requested window are returned."""
+        # Arrange
+        mock_job_service.from_environment_config.return_value.get_stats.return_value = IngestionJobStats(
+            window_minutes=15,
+            status_counts={status: 1 for status in IngestionJobStatus},
+            queue_depth=1,
+            in_progress=2,
+            completed=1,
+            failed=1,
+            throughput_per_minute=1 / 15,
+            end_to_end={"count": 1, "mean_seconds": 40, "p50_seconds": 40, "p95_seconds": 40, "max_seconds": 40},
+            queue_wait={},
+            analysis={},
+            ingestion={}
+        )
+        req = HttpRequest(method="GET", url="/ingestion-jobs/stats", params={"window_minutes": "15"}, body=None)
+
+        # Act
+        response = get_ingestion_job_stats(req)
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.get_body())
+        self.assertEqual(body["queue_depth"], 1)
+        self.assertEqual(body["end_to_end"]["mean_seconds"], 40)
+        mock_job_service.from_environment_config.return_value.get_stats.assert_called_once_with(
+            timedelta(minutes=15)
+        )
+
+    @patch("routes.api.v1.ingestion_jobs_routes.get_request_scheduler")
+    @patch("routes.api.v1.ingestion_jobs_routes.IngestionJobService")
+    @patch("routes.api.v1.ingestion_jobs_routes.get_app_config_manager")
+    def test_get_ingestion_job_stats_with_request_scheduler(
+        self,
+        mock_app_config_manager,
+        mock_job_service,
+        mock_get_request_scheduler
+    ):
+        """Test that the delays of the scheduled Content Understanding requests are returned when rate limited."""
+        # Arrange
+        mock_job_service.from_environment_config.return_value.get_stats.return_value = IngestionJobStats(
+            window_minutes=60,
+            status_counts={status: 0 for status in IngestionJobStatus},
+            queue_depth=0,
+            in_progress=0,
+            completed=0,
+            failed=0,
+            throughput_per_minute=0,
+            end_to_end={},
+            queue_wait={},
+            analysis={},
+            ingestion={}
+        )
+        mock_get_request_scheduler.return_value.stats = RequestSchedulerStats(
+            requests=10,
+            delayed_requests=4,
+            total_delay_seconds=6.5,
+            max_delay_seconds=2.5,
+            throttled_responses=1
+        )
+        req = HttpRequest(method="GET", url="/ingestion-jobs/stats", params={}, body=None)
+
+        # Act
+        response = get_ingestion_job_stats(req)
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.get_body())
+        self.assertEqual(body["window_minutes"], 60)
+        self.assertEqual(body["request_scheduler"]["delayed_requests"], 4)
+        self.assertEqual(body["request_scheduler"]["max_delay_seconds"], 2.5)
+        self.assertEqual(body["request_scheduler"]["throttled_responses"], 1)
+
+    @patch("routes.api.v1.ingestion_jobs_routes.IngestionJobService")
+    @patch("routes.api.v1.ingestion_jobs_routes.get_app_config_manager")
+    def test_get_ingestion_job_stats_invalid_window(self, mock_app_config_manager, mock_job_service):
+        """Test that a window that is not a positive number of minutes is rejected."""
+        for window_minutes in ["0", "-5", "an hour"]:
+            with self.subTest(window_minutes=window_minutes):
+                # Arrange
+                req = HttpRequest(
+                    method="GET",
+                    url="/ingestion-jobs/stats",
+                    params={"window_minutes": window_minutes},
+                    body=None
+                )
+
+                # Act
+                response = get_ingestion_job_stats(req)
+
+                # Assert
+                self.assertEqual(response.status_code, 400)
+        mock_job_service.from_environment_config.return_value.get_stats.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
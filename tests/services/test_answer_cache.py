@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from models.api.v1 import QueryMetrics, QueryResponse
+from services.answer_cache import AnswerCache, get_question_words, normalize_question
+
+
+class TestNormalizeQuestion(unittest.TestCase):
+
+    def test_normalizes_case_whitespace_and_trailing_punctuation(self):
+        self.assertEqual(normalize_question("  When does lease\tX   EXPIRE?! "), "when does lease x expire")
+        self.assertEqual(normalize_question("Ｌｅａｓｅ Ｘ"), "lease x")
+
+
+class TestGetQuestionWords(unittest.TestCase):
+
+    def test_keeps_case_and_strips_surrounding_punctuation(self):
+        self.assertEqual(get_question_words("Is (3OAS-074) like 3oas-074? Yes, 3OAS-074."),
+                         ["Is", "3OAS-074", "like", "3oas-074", "Yes"])
+
+
+class TestAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AnswerCache(max_size=10, ttl_seconds=60, similarity_threshold=0.9)
+        self.response = QueryResponse(
+            response="Lease X expires in 2030[1].",
+            citations=[["document.pdf", "D(1,0,0,1,1)"]],
+            metrics=QueryMetrics(prompt_tokens=1, completion_tokens=1, total_tokens=2, total_latency_sec=1.0)
+        )
+        self.get_data_version = MagicMock(return_value=3)
+
+    def _set(self, question, collection_id="5OAS074", data_version=3, config_id="config-1.0", embedding=None):
+        self.cache.set(question, config_id, "hash", collection_id, data_version, self.response, embedding=embedding)
+
+    def _get(self, question, config_id="config-1.0", lease_config_hash="hash", embedding=None):
+        return self.cache.get(question, config_id, lease_config_hash, self.get_data_version, embedding=embedding)
+
+    def test_returns_answer_for_normalized_question(self):
+        self._set("When does lease X in 5OAS074 expire?")
+
+        result = self._get("when does lease x in 5OAS074 expire")
+
+        self.assertEqual(result.response, self.response.response)
+        self.assertEqual(result.citations, self.response.citations)
+        self.assertIsNone(result.metrics)
+        self.get_data_version.assert_called_once_with("5OAS074")
+
+    def test_returns_copies_of_the_answer(self):
+        self._set("question about 5OAS074")
+
+        self._get("question about 5OAS074").citations.clear()
+
+        self.assertEqual(self._get("question about 5OAS074").citations, self.response.citations)
+
+    def test_misses_other_configurations(self):
+        self._set("question about 5OAS074")
+
+        self.assertIsNone(self._get("question about 5OAS074", lease_config_hash="other-hash"))
+        self.assertIsNone(self._get("question about 5OAS074", config_id="other-config-1.0"))
+
+    def test_does_not_cache_answer_whose_collection_is_not_named(self):
+        self._set("When does my lease expire?")
+
+        self.assertIsNone(self._get("When does my lease expire?"))
+
+    def test_distinguishes_collection_ids_by_case(self):
+        self._set("When does lease X in 3OAS-074 expire?", collection_id="3OAS-074")
+
+        result = self._get("When does lease X in 3oas-074 expire?")
+
+        self.assertIsNone(result)
+        self.get_data_version.assert_not_called()
+
+    def test_invalidates_answer_when_data_version_changes(self):
+        self._set("question about 5OAS074", data_version=2)
+
+        self.assertIsNone(self._get("question about 5OAS074"))
+
+        # The outdated entry was removed, so the data version is not read again
+        self.assertIsNone(self._get("question about 5OAS074"))
+        self.get_data_version.assert_called_once_with("5OAS074")
+
+    def test_invalidates_answer_when_collection_is_deleted(self):
+        self._set("question about 5OAS074")
+        self.get_data_version.return_value = None
+
+        self.assertIsNone(self._get("question about 5OAS074"))
+
+    def test_matches_similar_question_about_the_same_collection(self):
+        self._set("When does lease X in 5OAS074 expire?", embedding=np.array([1.0, 0.0, 0.0]))
+
+        result = self._get("What is the expiry date of lease X in 5OAS074?", embedding=np.array([0.95, 0.1, 0.0]))
+
+        self.assertEqual(result.response, self.response.response)
+
+    def test_does_not_match_similar_question_about_another_collection(self):
+        self._set("When does lease X in 5OAS074 expire?", embedding=np.array([1.0, 0.0, 0.0]))
+
+        result = self._get("When does lease X in 7ABC123 expire?", embedding=np.array([1.0, 0.0, 0.0]))
+
+        self.assertIsNone(result)
+
+    def test_does_not_match_similar_question_containing_the_collection_id(self):
+        self._set("When does lease X in 074 expire?", collection_id="074", embedding=np.array([1.0, 0.0, 0.0]))
+
+        result = self._get("When does lease X in 3OAS-074 expire?", embedding=np.array([1.0, 0.0, 0.0]))
+
+        self.assertIsNone(result)
+
+    def test_does_not_match_question_below_similarity_threshold(self):
+        self._set("When does lease X in 5OAS074 expire?", embedding=np.array([1.0, 0.0, 0.0]))
+
+        result = self._get("Who is the landlord of 5OAS074?", embedding=np.array([0.5, 0.8, 0.0]))
+
+        self.assertIsNone(result)
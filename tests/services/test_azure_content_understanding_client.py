@@ -1,7 +1,11 @@
+import io
+import json
 import unittest
 from unittest.mock import patch, Mock
+from requests import HTTPError
 from requests.models import Response
 from services.azure_content_understanding_client import AzureContentUnderstandingClient, _DEFAULT_API_VERSION
+from services.request_scheduler import RequestScheduler
 
 
 class TestAzureContentUnderstandingClientBase(unittest.TestCase):
@@ -187,6 +191,7 @@ class TestBeginAnalyzeData(TestAzureContentUnderstandingClientBase):
         analyzer_id = "analyzer_id"
         data = b"test_data"
         mock_response = Mock(spec=Response)
+        mock_response.status_code = 202
         mock_response.raise_for_status.return_value = None
         mock_post.return_value = mock_response
 
@@ -216,6 +221,7 @@ class TestBeginClassifyData(TestAzureContentUnderstandingClientBase):
         classifier_id = "classifier_id"
         data = b"test_data"
         mock_response = Mock(spec=Response)
+        mock_response.status_code = 202
         mock_response.raise_for_status.return_value = None
         mock_post.return_value = mock_response
 
@@ -244,6 +250,7 @@ class TestBeginClassifyFile(TestAzureContentUnderstandingClientBase):
         classifier_id = "classifier_id"
         file_location = "https://example.com/file.pdf"
         mock_response = Mock(spec=Response)
+        mock_response.status_code = 202
         mock_response.raise_for_status.return_value = None
         mock_post.return_value = mock_response        # Act
         result = self.client.begin_classify_file(classifier_id, file_location)
@@ -280,6 +287,7 @@ class TestBeginClassifyFile(TestAzureContentUnderstandingClientBase):
         mock_open.return_value.__enter__.return_value = mock_file
 
         mock_response = Mock(spec=Response)
+        mock_response.status_code = 202
         mock_response.raise_for_status.return_value = None
         mock_post.return_value = mock_response
 
@@ -310,6 +318,26 @@ class TestBeginClassifyFile(TestAzureContentUnderstandingClientBase):
         self.assertEqual(str(context.exception), "File location must be a valid path or URL.")
 
 
+def _mock_streamed_response(body: bytes, encoding: str = None) -> Mock:
+    """Builds a streamed polling response whose body is read with iter_content.
+
+    Args:
+        body (bytes): The body of the response.
+        encoding (str): The encoding of the response.
+
+    Returns:
+        Mock: The response.
+    """
+    stream = io.BytesIO(body)
+    mock_response = Mock(spec=Response)
+    mock_response.status_code = 200
+    mock_response.headers = {"operation-location": "https://example.com/operation"}
+    mock_response.encoding = encoding
+    mock_response.raise_for_status.return_value = None
+    mock_response.iter_content.side_effect = lambda chunk_size: iter(lambda: stream.read(chunk_size), b"")
+    return mock_response
+
+
 class TestPollResult(TestAzureContentUnderstandingClientBase):
     @patch("services.azure_content_understanding_client.requests.get")
     def test_poll_result(self, mock_get):
@@ -320,18 +348,276 @@ class TestPollResult(TestAzureContentUnderstandingClientBase):
         """
         # Arrange
         operation_location = "https://example.com/operation"
-        mock_response = Mock(spec=Response)
-        mock_response.headers = {"operation-location": operation_location}
-        mock_response.json.return_value = {"status": "succeeded"}
-        mock_response.raise_for_status.return_value = None
+        mock_response = _mock_streamed_response(b'{"status": "succeeded"}', encoding="utf-8")
         mock_get.return_value = mock_response
 
         # Act
         result = self.client.poll_result(mock_response)
 
         # Assert
-        mock_get.assert_called_with(operation_location, headers=self.client._headers, timeout=30)
+        mock_get.assert_called_with(operation_location, headers=self.client._headers, timeout=30, stream=True)
+        self.assertEqual(result, {"status": "succeeded"})
+        mock_response.close.assert_called_once()
+        self.assertEqual(self.client.last_polling_stats.polls, 1)
+        self.assertEqual(self.client.last_polling_stats.result_bytes, 23)
+
+    @patch("services.azure_content_understanding_client.time.sleep")
+    @patch("services.azure_content_understanding_client.requests.get")
+    def test_poll_result_reads_only_status_while_in_progress(self, mock_get, mock_sleep):
+        """Test that the body of the responses of an operation in progress is not read after its status.
+
+        Args:
+            mock_get (Mock): The mock for the requests.get method.
+            mock_sleep (Mock): The mock for the time.sleep method.
+        """
+        # Arrange
+        in_progress_body = json.dumps({"id": "operation", "status": "Running", "result": {"padding": "x" * 10000}})
+        succeeded_body = json.dumps({"id": "operation", "status": "Succeeded", "result": {"contents": []}})
+        in_progress_response = _mock_streamed_response(in_progress_body.encode())
+        succeeded_response = _mock_streamed_response(succeeded_body.encode())
+        mock_get.side_effect = [in_progress_response, succeeded_response]
+
+        # Act
+        result = self.client.poll_result(in_progress_response, polling_interval_seconds=0)
+
+        # Assert
+        self.assertEqual(result, json.loads(succeeded_body))
+        in_progress_response.close.assert_called_once()
+        self.assertEqual(self.client.last_polling_stats.model_dump(), {
+            "polls": 2,
+            "bytes_read": 1024 + len(succeeded_body),
+            "result_bytes": len(succeeded_body)
+        })
+
+    @patch("services.azure_content_understanding_client.requests.get")
+    def test_poll_result_without_status_at_start_of_body(self, mock_get):
+        """Test that the whole body is decoded when the status is after the first chunk.
+
+        Args:
+            mock_get (Mock): The mock for the requests.get method.
+        """
+        # Arrange
+        body = json.dumps({"result": {"contents": [{"markdown": "x" * 5000}]}, "status": "Succeeded"})
+        mock_response = _mock_streamed_response(body.encode())
+        mock_get.return_value = mock_response
+
+        # Act
+        result = self.client.poll_result(mock_response)
+
+        # Assert
+        self.assertEqual(result, json.loads(body))
+
+    @patch("services.azure_content_understanding_client.requests.get")
+    def test_poll_result_with_result_selection(self, mock_get):
+        """Test that the poll_result method only decodes the selected parts of the response once.
+
+        Args:
+            mock_get (Mock): The mock for the requests.get method.
+        """
+        # Arrange
+        mock_response = _mock_streamed_response(json.dumps({
+            "id": "operation",
+            "status": "Succeeded",
+            "result": {"contents": [{"markdown": "# Bail \u00e9t\u00e9", "pages": [{"words": []}], "fields": {}}]}
+        }, ensure_ascii=False).encode("utf-8"))
+        mock_get.return_value = mock_response
+
+        # Act
+        result = self.client.poll_result(
+            mock_response, result_selection={"result": {"contents": [{"markdown": True, "fields": True}]}})
+
+        # Assert
+        self.assertEqual(result, {
+            "status": "Succeeded",
+            "result": {"contents": [{"markdown": "# Bail \u00e9t\u00e9", "fields": {}}]}
+        })
+
+    @patch("services.azure_content_understanding_client.requests.get")
+    def test_poll_result_with_result_selection_failed(self, mock_get):
+        """Test that the error of a failed operation is decoded with a result selection.
+
+        Args:
+            mock_get (Mock): The mock for the requests.get method.
+        """
+        # Arrange
+        mock_response = _mock_streamed_response(
+            b'{"status": "Failed", "error": {"code": "InvalidContent"}, "result": {}}', encoding="utf-8")
+        mock_get.return_value = mock_response
+
+        # Act & Assert
+        with self.assertLogs(level="ERROR") as logs:
+            with self.assertRaises(RuntimeError):
+                self.client.poll_result(mock_response, result_selection={"result": {"contents": [{"fields": True}]}})
+        self.assertIn("InvalidContent", logs.output[0])
+        mock_response.close.assert_called_once()
+
+
+class TestThrottling(TestAzureContentUnderstandingClientBase):
+    def _mock_throttled_response(self, retry_after: str = None) -> Mock:
+        """Builds a response asking to retry later.
+
+        Args:
+            retry_after (str): The Retry-After header of the response.
+
+        Returns:
+            Mock: The response.
+        """
+        mock_response = Mock(spec=Response)
+        mock_response.status_code = 429
+        mock_response.headers = {"Retry-After": retry_after} if retry_after else {}
+        return mock_response
+
+    @patch("services.azure_content_understanding_client.time.sleep")
+    @patch("services.azure_content_understanding_client.requests.post")
+    def test_begin_analyze_data_retries_after_throttling(self, mock_post, mock_sleep):
+        """Test that a throttled request is retried after the time set by its Retry-After header.
+
+        Args:
+            mock_post (Mock): The mock for the requests.post method.
+            mock_sleep (Mock): The mock for the time.sleep method.
+        """
+        # Arrange
+        mock_response = Mock(spec=Response)
+        mock_response.status_code = 202
+        mock_response.raise_for_status.return_value = None
+        mock_response.headers = {}
+        mock_post.side_effect = [self._mock_throttled_response("7"), self._mock_throttled_response(), mock_response]
+
+        # Act
+        result = self.client.begin_analyze_data("analyzer_id", b"test_data")
+
+        # Assert
+        self.assertEqual(result, mock_response)
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual([call.args[0] for call in mock_sleep.call_args_list], [7.0, 2.0])
+
+    @patch("services.azure_content_understanding_client.time.sleep")
+    @patch("services.azure_content_understanding_client.requests.post")
+    def test_begin_analyze_data_fails_when_retries_exhausted(self, mock_post, mock_sleep):
+        """Test that a request still throttled after its retries fails.
+
+        Args:
+            mock_post (Mock): The mock for the requests.post method.
+            mock_sleep (Mock): The mock for the time.sleep method.
+        """
+        # Arrange
+        client = AzureContentUnderstandingClient(
+            endpoint=self.endpoint,
+            subscription_key=self.subscription_key,
+            max_throttled_retries=1
+        )
+        throttled_response = self._mock_throttled_response("1")
+        throttled_response.raise_for_status.side_effect = HTTPError("429 Too Many Requests")
+        mock_post.return_value = throttled_response
+
+        # Act & Assert
+        with self.assertRaises(HTTPError):
+            client.begin_analyze_data("analyzer_id", b"test_data")
+        self.assertEqual(mock_post.call_count, 2)
+        mock_sleep.assert_called_once_with(1.0)
+
+    @patch("services.request_scheduler.time")
+    @patch("services.azure_content_understanding_client.requests.get")
+    def test_poll_result_waits_after_throttling_with_scheduler(self, mock_get, mock_scheduler_time):
+        """Test that a throttled poll, which is not rate limited, waits for the Retry-After header before retrying.
+
+        Args:
+            mock_get (Mock): The mock for the requests.get method.
+            mock_scheduler_time (Mock): The mock for the time module of the scheduler.
+        """
+        # Arrange
+        clock = [100.0]
+        mock_scheduler_time.monotonic.side_effect = lambda: clock[0]
+        mock_scheduler_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        scheduler = RequestScheduler(Mock(), max_concurrent_operations=1, operation_timeout_seconds=300)
+        client = AzureContentUnderstandingClient(
+            endpoint=self.endpoint,
+            subscription_key=self.subscription_key,
+            scheduler=scheduler
+        )
+        sent_at = []
+        responses = iter([
+            self._mock_throttled_response("2"),
+            self._mock_throttled_response("2"),
+            _mock_streamed_response(b'{"status": "succeeded"}', encoding="utf-8")
+        ])
+
+        def get(*args, **kwargs):
+            sent_at.append(clock[0])
+            return next(responses)
+
+        mock_get.side_effect = get
+        operation = _mock_streamed_response(b"")
+
+        # Act
+        result = client.poll_result(operation)
+
+        # Assert
         self.assertEqual(result, {"status": "succeeded"})
+        self.assertEqual(sent_at, [100.0, 102.0, 104.0])
+        self.assertEqual(scheduler.stats.throttled_responses, 2)
+        # The polls are not counted as rate limited requests
+        self.assertEqual(scheduler.stats.requests, 0)
+
+    @patch("services.azure_content_understanding_client.requests.get")
+    @patch("services.azure_content_understanding_client.requests.post")
+    def test_scheduler_slot_held_until_result_polled(self, mock_post, mock_get):
+        """Test that an operation takes a slot of the scheduler when started and releases it once polled.
+
+        Args:
+            mock_post (Mock): The mock for the requests.post method.
+            mock_get (Mock): The mock for the requests.get method.
+        """
+        # Arrange
+        mock_scheduler = Mock()
+        mock_scheduler.acquire_request.return_value = 0.0
+        mock_scheduler.wait_for_pause.return_value = 0.0
+        mock_scheduler.acquire_operation.return_value = (5, 0.0)
+        client = AzureContentUnderstandingClient(
+            endpoint=self.endpoint,
+            subscription_key=self.subscription_key,
+            scheduler=mock_scheduler
+        )
+        mock_response = _mock_streamed_response(b'{"status": "succeeded"}', encoding="utf-8")
+        mock_post.return_value = mock_response
+        mock_get.return_value = mock_response
+
+        # Act
+        client.begin_analyze_data("analyzer_id", b"test_data")
+        released_before_polling = mock_scheduler.release_operation.called
+        client.poll_result(mock_response)
+
+        # Assert
+        self.assertFalse(released_before_polling)
+        mock_scheduler.acquire_request.assert_called_once()
+        mock_scheduler.release_operation.assert_called_once_with(5)
+
+    @patch("services.azure_content_understanding_client.requests.post")
+    def test_scheduler_slot_released_when_request_fails(self, mock_post):
+        """Test that the slot of an operation that failed to start is released.
+
+        Args:
+            mock_post (Mock): The mock for the requests.post method.
+        """
+        # Arrange
+        mock_scheduler = Mock()
+        mock_scheduler.acquire_request.return_value = 0.0
+        mock_scheduler.wait_for_pause.return_value = 0.0
+        mock_scheduler.acquire_operation.return_value = (5, 0.0)
+        client = AzureContentUnderstandingClient(
+            endpoint=self.endpoint,
+            subscription_key=self.subscription_key,
+            scheduler=mock_scheduler
+        )
+        mock_response = Mock(spec=Response)
+        mock_response.status_code = 400
+        mock_response.raise_for_status.side_effect = HTTPError("400 Bad Request")
+        mock_post.return_value = mock_response
+
+        # Act & Assert
+        with self.assertRaises(HTTPError):
+            client.begin_analyze_data("analyzer_id", b"test_data")
+        mock_scheduler.release_operation.assert_called_once_with(5)
 
 
 class TestBeginCreateClassifier(TestAzureContentUnderstandingClientBase):
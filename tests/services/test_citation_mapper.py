@@ -0,0 +1,146 @@
+import copy
+import unittest
+from services.citation_mapper import CitationMapper
+
+
+class TestCitationMapper(unittest.TestCase):
+
+    def setUp(self):
+        self.mapper = CitationMapper()
+
+    def test_replaces_citations_with_aliases(self):
+        data = {
+            "_id": "COL1",
+            "unstructured_data": [{
+                "lease_id": "1",
+                "fields": {
+                    "Name": [
+                        {"type": "string", "valueString": "Rooftop", "source": "D(1,1)", "document": "a.pdf"},
+                        {"valueString": "Ground", "document": "b.pdf", "date_of_document": "2023-10-01"}
+                    ]
+                }
+            }]
+        }
+
+        result, mapping = self.mapper.process_json(data)
+
+        self.assertEqual(result["unstructured_data"][0]["fields"], {
+            "Name": [
+                {"valueString": "Rooftop", "document": "CITECOL1-A"},
+                {"valueString": "Ground", "document": "CITECOL1-B", "date_of_document": "2023-10-01"}
+            ]
+        })
+        self.assertEqual(mapping, {
+            "CITECOL1-A": {"source_document": "a.pdf", "source_bounding_boxes": "D(1,1)"},
+            "CITECOL1-B": {"source_document": "b.pdf", "source_bounding_boxes": None}
+        })
+
+    def test_cites_array_values_with_document_of_array(self):
+        data = {
+            "_id": "COL1",
+            "unstructured_data": [{
+                "lease_id": "1",
+                "fields": {
+                    "equipment": [{
+                        "valueArray": [
+                            {"valueObject": {
+                                "make": {"valueString": "Make1", "source": "D(1,3)"},
+                                "quantity": {}
+                            }},
+                            {"valueString": "Loose item", "source": "D(1,4)"}
+                        ],
+                        "document": "c.pdf"
+                    }],
+                    "Lease": [{"valueInteger": 1, "document": "d.pdf"}]
+                }
+            }]
+        }
+
+        result, mapping = self.mapper.process_json(data)
+
+        self.assertEqual(result["unstructured_data"][0]["fields"], {
+            "equipment": [{
+                "valueArray": [
+                    {"valueObject": {"make": {"valueString": "Make1", "document": "CITECOL1-A"}}},
+                    {"valueString": "Loose item", "document": "CITECOL1-B"}
+                ]
+            }],
+            "Lease": [{"valueInteger": 1, "document": "CITECOL1-C"}]
+        })
+        self.assertEqual(mapping["CITECOL1-A"], {"source_document": "c.pdf", "source_bounding_boxes": "D(1,3)"})
+        self.assertEqual(mapping["CITECOL1-C"], {"source_document": "d.pdf", "source_bounding_boxes": None})
+
+    def test_leaves_out_fields_without_values(self):
+        data = {
+            "_id": "COL1",
+            "unstructured_data": [{
+                "lease_id": "1",
+                "fields": {
+                    "Empty": [{"valueString": "kept", "document": "a.pdf"}, {"document": "a.pdf"}],
+                    "Uncited": [{"valueString": "no document", "source": "D(1,1)"}]
+                }
+            }]
+        }
+
+        result, mapping = self.mapper.process_json(data)
+
+        self.assertEqual(result["unstructured_data"][0]["fields"], {
+            "Uncited": [{"valueString": "no document", "source": "D(1,1)"}]
+        })
+        self.assertEqual(mapping, {})
+
+    def test_does_not_modify_input(self):
+        data = {
+            "_id": "COL1",
+            "unstructured_data": [{
+                "lease_id": "1",
+                "fields": {
+                    "Name": [{"type": "string", "valueString": "Rooftop", "source": "D(1,1)", "document": "a.pdf"}]
+                }
+            }]
+        }
+        original = copy.deepcopy(data)
+
+        self.mapper.process_json(data)
+
+        self.assertEqual(data, original)
+
+    def test_aliases_are_unique_across_leases(self):
+        data = {
+            "_id": "COL1",
+            "unstructured_data": [
+                {
+                    "lease_id": str(lease_index),
+                    "fields": {"Name": [
+                        {"valueString": f"{lease_index}-{index}", "document": f"{lease_index}-{index}.pdf"}
+                        for index in range(3)
+                    ]}
+                }
+                for lease_index in range(2)
+            ]
+        }
+
+        result, mapping = self.mapper.process_json(data)
+
+        self.assertEqual(len(mapping), 6)
+        self.assertEqual(
+            [value["document"] for lease in result["unstructured_data"] for value in lease["fields"]["Name"]],
+            ["CITECOL1-A", "CITECOL1-B", "CITECOL1-C", "CITECOL1-D", "CITECOL1-E", "CITECOL1-F"]
+        )
+        self.assertEqual(mapping["CITECOL1-D"]["source_document"], "1-0.pdf")
+
+    def test_aliases_continue_after_z(self):
+        data = {
+            "_id": "COL1",
+            "unstructured_data": [{
+                "lease_id": "1",
+                "fields": {"Name": [{"valueString": str(index), "document": "a.pdf"} for index in range(28)]}
+            }]
+        }
+
+        result, _ = self.mapper.process_json(data)
+
+        self.assertEqual(
+            [value["document"] for value in result["unstructured_data"][0]["fields"]["Name"][25:]],
+            ["CITECOL1-Z", "CITECOL1-AA", "CITECOL1-AB"]
+        )
@@ -1,14 +1,17 @@
 from datetime import date
 import json
+import threading
 import unittest
 from unittest.mock import MagicMock
 from models.data_collection_config import LeaseAgreementCollectionRow
 from models.document_data_models import FieldMappingType, \
     LeaseAgreementDocumentData, \
     _LeaseAgreementDocumentData
-from models.data_collection_config import FieldDataCollectionConfig, DataType
-from services.collection_kernel_plugin import CollectionPlugin, document_data_cache
+from models.data_collection_config import FieldDataCollectionConfig, DataType, PayloadFormat
+from services.collection_kernel_plugin import CollectionPlugin, BoundCollectionPlugin, bind_collection_plugin, \
+    document_data_cache
 from models.document_data_models import DocumentData
+from services.compact_payload_serializer import COMPACT_PAYLOAD_LEGEND
 
 
 class TestCollectionPlugin(unittest.TestCase):
@@ -477,3 +480,251 @@ class TestCollectionPlugin(unittest.TestCase):
             plugin_cosmos_only.get_collection_data(collection_id)
 
         self.assertTrue("Lease docs service error" in str(context.exception))
+
+    def test_get_collection_data_compact_payload_format(self):
+        # Mock the IngestionCollectionDocumentService
+        mock_lease_docs_service = MagicMock()
+
+        config = self.config_cosmos_only.model_copy(update={"payload_format": PayloadFormat.COMPACT})
+        plugin_compact = CollectionPlugin(
+            config=config,
+            document_service=mock_lease_docs_service)
+        collection_id = "5OAS074ACMP"
+
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.return_value = {
+            "68313": {
+                "Name": [LeaseAgreementDocumentData(
+                    valueString="1 -  Rooftop",
+                    source_document="/path/to/document_LSE_date.pdf",
+                    source_bounding_boxes="D(1,1,1,1,1,1,1,1)",
+                    date_of_document=date(2023, 10, 1))],
+                "Lease": [LeaseAgreementDocumentData(
+                    valueInteger=68313,
+                    source_document="/path/to/document_LSE_date.pdf",
+                    source_bounding_boxes="D(1,1,1,1,1,1,1,2)")]
+            }
+        }
+
+        # Execute the method
+        response = plugin_compact.get_collection_data(collection_id)
+
+        expected_response = {
+            "id": "5OAS074ACMP",
+            "leases": [{
+                "lease_id": "68313",
+                "fields": {
+                    "Name": {"cols": ["v", "d", "c"], "rows": [["1 -  Rooftop", "2023-10-01", "CITE5OAS074ACMP-A"]]},
+                    "Lease": {"cols": ["v", "c"], "rows": [[68313, "CITE5OAS074ACMP-B"]]}
+                }
+            }]
+        }
+        self.assertEqual(json.loads(response), expected_response)
+        self.assertEqual(
+            plugin_compact._get_original_citation("CITE5OAS074ACMP-B"),
+            ["/path/to/document_LSE_date.pdf", "D(1,1,1,1,1,1,1,2)"]
+        )
+
+    def test_system_prompt_includes_legend_for_compact_payload_format(self):
+        plugin_json = CollectionPlugin(config=self.config_cosmos_only, document_service=MagicMock())
+        plugin_compact = CollectionPlugin(
+            config=self.config_cosmos_only.model_copy(update={"payload_format": PayloadFormat.COMPACT}),
+            document_service=MagicMock())
+
+        self.assertEqual(plugin_json.system_prompt, "test_prompt")
+        self.assertEqual(plugin_compact.system_prompt, f"test_prompt\n\n{COMPACT_PAYLOAD_LEGEND}")
+
+    def test_get_collection_data_records_data_version(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.return_value = {}
+        mock_lease_docs_service.get_data_version.return_value = 4
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+        cached_plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+
+        plugin.get_collection_data("3OAS074AVER")
+        cached_plugin.get_collection_data("3OAS074AVER")
+
+        self.assertEqual(plugin.data_versions, {"3OAS074AVER": 4})
+        # The version of cached data is the version it was read with
+        self.assertEqual(cached_plugin.data_versions, {"3OAS074AVER": 4})
+        mock_lease_docs_service.get_data_version.assert_called_once_with("3OAS074AVER", "fake_hash")
+        document_data_cache.clear()
+
+    def test_prefetch_collection_data_warms_cache(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.return_value = {}
+        mock_lease_docs_service.get_data_version.return_value = 2
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+
+        self.assertTrue(plugin.prefetch_collection_data("3OAS074APRE"))
+        # Prefetched collections are not recorded as retrieved
+        self.assertEqual(plugin.data_versions, {})
+
+        plugin.get_collection_data("3OAS074APRE")
+
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.assert_called_once()
+        mock_lease_docs_service.get_data_version.assert_called_once_with("3OAS074APRE", "fake_hash")
+        self.assertEqual(plugin.data_versions, {"3OAS074APRE": 2})
+        document_data_cache.clear()
+
+    def test_prefetch_collection_data_skips_missing_collection(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service.get_data_version.return_value = None
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+
+        self.assertFalse(plugin.prefetch_collection_data("MISSING1"))
+
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.assert_not_called()
+        self.assertEqual(len(document_data_cache), 0)
+        document_data_cache.clear()
+
+    def _build_cited_lease_data(self) -> dict:
+        return {
+            "000001": {
+                "Name": [LeaseAgreementDocumentData(
+                    type="string",
+                    valueString="Tenant",
+                    source="D(1,1,1,2,2)",
+                    document="Collections/3OAS-074/000001/lease.pdf",
+                    date_of_document=date(2023, 1, 1)
+                )],
+                "Lease": [LeaseAgreementDocumentData(
+                    type="integer",
+                    valueInteger=12,
+                    source="D(2,1,1,2,2)",
+                    document="Collections/3OAS-074/000001/amendment.pdf",
+                    date_of_document=date(2023, 2, 1)
+                )]
+            }
+        }
+
+    def test_get_collection_data_stores_citation_mappings(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.return_value = \
+            self._build_cited_lease_data()
+        mock_lease_docs_service.get_data_version.return_value = 3
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+
+        plugin.get_collection_data("3OAS-074")
+
+        mock_lease_docs_service.store_citation_mappings.assert_called_once_with(
+            "3OAS-074",
+            "fake_hash",
+            3,
+            {
+                "A": ["Collections/3OAS-074/000001/lease.pdf", "D(1,1,1,2,2)"],
+                "B": ["Collections/3OAS-074/000001/amendment.pdf", "D(2,1,1,2,2)"]
+            }
+        )
+        document_data_cache.clear()
+
+    def test_restore_citations_reads_stored_mappings_when_collection_is_not_cached(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service.get_citation_mappings.return_value = {
+            "A": ["Collections/3OAS-074/000001/lease.pdf", "D(1,1,1,2,2)"],
+            "B": ["Collections/3OAS-074/000001/amendment.pdf", "D(2,1,1,2,2)"]
+        }
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+
+        restored_citations = plugin.restore_citations(["CITE3OAS-074-A", '["CITE3OAS-074-B"]', "CITE3OAS-074-C"])
+
+        self.assertEqual(restored_citations, [
+            ["Collections/3OAS-074/000001/lease.pdf", "D(1,1,1,2,2)"],
+            ["Collections/3OAS-074/000001/amendment.pdf", "D(2,1,1,2,2)"]
+        ])
+        # The mappings of all the citations of the collection are read at once
+        mock_lease_docs_service.get_citation_mappings.assert_called_once_with(
+            "3OAS-074", "fake_hash", ["A", "B", "C"], None)
+
+    def test_restore_citations_reads_mappings_of_retrieved_data_version(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.return_value = \
+            self._build_cited_lease_data()
+        mock_lease_docs_service.get_data_version.return_value = 3
+        mock_lease_docs_service.get_citation_mappings.return_value = {}
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+        plugin.get_collection_data("3OAS-074")
+        # Another request loaded the data of the next version in the meantime
+        cache_key = plugin.composite_key("3OAS-074", "fake_hash")
+        document_data_cache[cache_key] = {**document_data_cache[cache_key], "data_version": 4}
+
+        restored_citations = plugin.restore_citations(["CITE3OAS-074-B"])
+
+        self.assertEqual(restored_citations, [])
+        mock_lease_docs_service.get_citation_mappings.assert_called_once_with("3OAS-074", "fake_hash", ["B"], 3)
+        document_data_cache.clear()
+
+    def test_restore_citations_uses_cached_mappings(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.return_value = \
+            self._build_cited_lease_data()
+        mock_lease_docs_service.get_data_version.return_value = 3
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+        plugin.get_collection_data("3OAS-074")
+
+        restored_citations = plugin.restore_citations(["CITE3OAS-074-B"])
+
+        self.assertEqual(restored_citations, [["Collections/3OAS-074/000001/amendment.pdf", "D(2,1,1,2,2)"]])
+        mock_lease_docs_service.get_citation_mappings.assert_not_called()
+        document_data_cache.clear()
+
+    def test_get_collection_data_when_citation_mappings_cannot_be_stored(self):
+        document_data_cache.clear()
+        mock_lease_docs_service = MagicMock()
+        mock_lease_docs_service._get_all_extracted_fields_from_collection_doc.return_value = \
+            self._build_cited_lease_data()
+        mock_lease_docs_service.get_data_version.return_value = 3
+        mock_lease_docs_service.store_citation_mappings.side_effect = Exception("Request rate is large")
+        plugin = CollectionPlugin(config=self.config_cosmos_only, document_service=mock_lease_docs_service)
+
+        with self.assertLogs(level="WARNING") as logs:
+            collection_data = plugin.get_collection_data("3OAS-074")
+
+        self.assertIn("CITE3OAS-074-A", collection_data)
+        self.assertIn("Citation mappings of collection 3OAS-074 could not be stored", logs.output[0])
+        document_data_cache.clear()
+
+
+class TestBoundCollectionPlugin(unittest.IsolatedAsyncioTestCase):
+    async def test_get_collection_data_delegates_to_bound_plugin(self):
+        collection_plugin = MagicMock(spec=CollectionPlugin)
+        collection_plugin.get_collection_data.return_value = "collection data"
+
+        with bind_collection_plugin(collection_plugin):
+            result = await BoundCollectionPlugin().get_collection_data("123")
+
+        self.assertEqual(result, "collection data")
+        collection_plugin.get_collection_data.assert_called_once_with("123")
+
+    async def test_get_collection_data_loads_data_off_event_loop(self):
+        collection_plugin = MagicMock(spec=CollectionPlugin)
+        loading_threads = []
+        collection_plugin.get_collection_data.side_effect = \
+            lambda collection_id: loading_threads.append(threading.current_thread()) or "collection data"
+
+        with bind_collection_plugin(collection_plugin):
+            await BoundCollectionPlugin().get_collection_data("123")
+
+        self.assertIsNot(loading_threads[0], threading.current_thread())
+
+    async def test_get_collection_data_without_bound_plugin(self):
+        with self.assertRaises(RuntimeError):
+            await BoundCollectionPlugin().get_collection_data("123")
+
+    async def test_binding_is_restored_after_nested_binding(self):
+        outer_plugin = MagicMock(spec=CollectionPlugin)
+        inner_plugin = MagicMock(spec=CollectionPlugin)
+
+        with bind_collection_plugin(outer_plugin):
+            with bind_collection_plugin(inner_plugin):
+                await BoundCollectionPlugin().get_collection_data("inner")
+            await BoundCollectionPlugin().get_collection_data("outer")
+
+        inner_plugin.get_collection_data.assert_called_once_with("inner")
+        outer_plugin.get_collection_data.assert_called_once_with("outer")
@@ -0,0 +1,78 @@
+import unittest
+from datetime import date
+from services.compact_payload_serializer import CompactPayloadSerializer
+
+
+class TestCompactPayloadSerializer(unittest.TestCase):
+    def setUp(self):
+        self.serializer = CompactPayloadSerializer()
+
+    def test_encode_scalar_fields(self):
+        data = {
+            "_id": "123",
+            "lease_config_hash": "hash",
+            "unstructured_data": [{
+                "lease_id": "L1",
+                "fields": {
+                    "Name": [
+                        {"valueString": "Rooftop", "date_of_document": date(2023, 10, 1), "document": "CITE123-A"},
+                        {"valueString": "Ground", "date_of_document": date(2023, 10, 2), "document": "CITE123-B"}
+                    ],
+                    "Lease": [
+                        {"valueInteger": 68313, "document": "CITE123-C"}
+                    ]
+                }
+            }]
+        }
+
+        result = self.serializer.encode(data)
+
+        self.assertEqual(result, {
+            "id": "123",
+            "leases": [{
+                "lease_id": "L1",
+                "fields": {
+                    "Name": {
+                        "cols": ["v", "d", "c"],
+                        "rows": [
+                            ["Rooftop", date(2023, 10, 1), "CITE123-A"],
+                            ["Ground", date(2023, 10, 2), "CITE123-B"]
+                        ]
+                    },
+                    "Lease": {
+                        "cols": ["v", "c"],
+                        "rows": [[68313, "CITE123-C"]]
+                    }
+                }
+            }]
+        })
+
+    def test_encode_array_of_objects(self):
+        data = {
+            "_id": "123",
+            "unstructured_data": [{
+                "lease_id": "L1",
+                "fields": {
+                    "equipment": [{
+                        "valueArray": [{
+                            "valueObject": {
+                                "make": {"valueString": "Make1", "document": "CITE123-A"},
+                                "quantity": {"valueString": "10"}
+                            }
+                        }]
+                    }]
+                }
+            }]
+        }
+
+        result = self.serializer.encode(data)
+
+        self.assertEqual(result["leases"][0]["fields"]["equipment"], {
+            "cols": ["v"],
+            "rows": [[[{"make": ["Make1", "CITE123-A"], "quantity": ["10", None]}]]]
+        })
+
+    def test_encode_empty_collection(self):
+        result = self.serializer.encode({"_id": "123", "lease_config_hash": "hash", "unstructured_data": []})
+
+        self.assertEqual(result, {"id": "123", "leases": []})
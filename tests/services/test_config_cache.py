@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import Mock, patch
+from models import FieldDataCollectionConfig
+from services.config_cache import ConfigCache
+
+
+class TestConfigCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ConfigCache(max_size=10, ttl_seconds=60, revalidate_after_seconds=30)
+        self.config = FieldDataCollectionConfig(
+            _id="test_config-1.0",
+            name="test_config",
+            version="1.0",
+            prompt="Test prompt",
+            collection_rows=[]
+        )
+        self.read_content_hash = Mock(return_value="hash1")
+
+    def test_returns_cached_config_and_counts_hits_and_misses(self):
+        self.assertIsNone(self.cache.get("test_config-1.0", self.read_content_hash))
+
+        self.cache.set(self.config, "hash1")
+        result = self.cache.get("test_config-1.0", self.read_content_hash)
+
+        self.assertEqual(result, self.config)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        self.read_content_hash.assert_not_called()
+
+    def test_returns_cached_instance(self):
+        self.cache.set(self.config, "hash1")
+        self.config.prompt = "Modified after set"
+
+        first = self.cache.get("test_config-1.0", self.read_content_hash)
+        second = self.cache.get("test_config-1.0", self.read_content_hash)
+
+        self.assertIs(first, second)
+        self.assertEqual(first.prompt, "Test prompt")
+
+    @patch("services.config_cache.time")
+    def test_checks_content_hash_after_revalidation_delay(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        self.cache.set(self.config, "hash1")
+        mock_time.monotonic.return_value = 130.0
+
+        first = self.cache.get("test_config-1.0", self.read_content_hash)
+        mock_time.monotonic.return_value = 159.0
+        second = self.cache.get("test_config-1.0", self.read_content_hash)
+
+        self.assertEqual(first, self.config)
+        self.assertIs(second, first)
+        self.read_content_hash.assert_called_once()
+        self.assertEqual(self.cache.hits, 2)
+
+    @patch("services.config_cache.time")
+    def test_does_not_return_config_whose_content_hash_changed(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        self.cache.set(self.config, "hash1")
+        mock_time.monotonic.return_value = 130.0
+        self.read_content_hash.return_value = "hash2"
+
+        result = self.cache.get("test_config-1.0", self.read_content_hash)
+
+        self.assertIsNone(result)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_cached_config_has_derived_structures(self):
+        self.cache.set(self.config, "hash1")
+
+        result = self.cache.get("test_config-1.0", self.read_content_hash)
+
+        self.assertIn("lease_field_names", result.__dict__)
+        self.assertIn("lease_collection_rows", result.__dict__)
+
+    def test_set_replaces_config_with_same_id(self):
+        self.cache.set(self.config, "hash1")
+
+        self.cache.set(self.config.model_copy(update={"lease_config_hash": "new_hash"}), "hash2")
+
+        self.assertEqual(self.cache.get("test_config-1.0", self.read_content_hash).lease_config_hash, "new_hash")
+
+    def test_invalidate_removes_config(self):
+        self.cache.set(self.config, "hash1")
+
+        self.cache.invalidate("test_config-1.0")
+        self.cache.invalidate("unknown-1.0")
+
+        self.assertIsNone(self.cache.get("test_config-1.0", self.read_content_hash))
@@ -1,7 +1,8 @@
+import hashlib
 import unittest
 from unittest.mock import Mock, patch
 import json
-from azure.cosmos.exceptions import CosmosHttpResponseError
+from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
 from azure.cosmos import ContainerProxy
 from semantic_kernel.contents import ChatMessageContent, AuthorRole, FunctionCallContent, FunctionResultContent
 from semantic_kernel.exceptions import ContentInitializationError
@@ -12,8 +13,13 @@ from services.cosmos_chat_history import (
     CosmosChatHistory,
     ChatMessageWithTypeAndData,
     ChatMessageData,
-    ChatMessageType
+    ChatMessageType,
+    MAX_PATCH_OPERATIONS,
+    TOOL_RESULT_REF_METADATA_KEY,
+    TOOL_RESULT_REFERENCE_MIN_LENGTH,
+    SUMMARY_MESSAGE_PREFIX
 )
+from utils.token_utils import estimate_message_tokens
 
 
 class TestCosmosChatHistoryStoreMessages(unittest.TestCase):
@@ -78,6 +84,205 @@ class TestCosmosChatHistoryStoreMessages(unittest.TestCase):
         self.assertEqual(body["domain"], self.domain)
 
 
+class TestCosmosChatHistoryAppendMessages(unittest.TestCase):
+    def setUp(self):
+        self.mock_container = Mock(spec=ContainerProxy)
+        self.domain = "test_domain"
+        self.chat_history = CosmosChatHistory(
+            container=self.mock_container,
+            user_message_limit=20,
+            domain=self.domain
+        )
+        self.mock_container.read_item.return_value = {
+            "id": "session123",
+            "user_id": "user456",
+            "domain": self.domain,
+            "messages": [
+                {"role": "user", "content": "Hello", "type": "human", "data": {"content": "Hello"}},
+                {"role": "assistant", "content": "Hi", "type": "ai", "data": {"content": "Hi"}}
+            ]
+        }
+        self.chat_history.read_messages("session123", "User456")
+
+    def _stored_message(self, message: ChatMessageContent, message_type: ChatMessageType) -> dict:
+        return ChatMessageWithTypeAndData(
+            **message.model_dump(),
+            type=message_type,
+            data=ChatMessageData(content=message.content)
+        ).model_dump()
+
+    def test_store_messages_appends_new_messages(self):
+        user_message = ChatMessageContent(role=AuthorRole.USER, content="Next question")
+        assistant_message = ChatMessageContent(role=AuthorRole.ASSISTANT, content="Next answer")
+        self.chat_history.add_message(user_message)
+        self.chat_history.add_message(assistant_message)
+
+        self.chat_history.store_messages("session123", "User456")
+
+        self.mock_container.upsert_item.assert_not_called()
+        self.mock_container.patch_item.assert_called_once_with(
+            item="session123",
+            partition_key=["user456", self.domain],
+            patch_operations=[
+                {"op": "add", "path": "/messages/-",
+                 "value": self._stored_message(user_message, ChatMessageType.HUMAN)},
+                {"op": "add", "path": "/messages/-",
+                 "value": self._stored_message(assistant_message, ChatMessageType.AI)}
+            ]
+        )
+
+    def test_store_messages_appends_only_messages_added_since_last_store(self):
+        self.chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, content="First"))
+        self.chat_history.store_messages("session123", "user456")
+        self.chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, content="Second"))
+        self.chat_history.store_messages("session123", "user456")
+
+        self.assertEqual(self.mock_container.patch_item.call_count, 2)
+        operations = self.mock_container.patch_item.call_args.kwargs["patch_operations"]
+        self.assertEqual([operation["value"]["data"]["content"] for operation in operations], ["Second"])
+
+    def test_store_messages_splits_patch_operations(self):
+        for index in range(MAX_PATCH_OPERATIONS + 2):
+            self.chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, content=str(index)))
+
+        self.chat_history.store_messages("session123", "user456")
+
+        self.assertEqual(
+            [len(call.kwargs["patch_operations"]) for call in self.mock_container.patch_item.call_args_list],
+            [MAX_PATCH_OPERATIONS, 2]
+        )
+
+    def test_store_messages_without_new_messages_does_not_write(self):
+        self.chat_history.store_messages("session123", "user456")
+
+        self.mock_container.patch_item.assert_not_called()
+        self.mock_container.upsert_item.assert_not_called()
+
+    def test_store_messages_upserts_session_when_append_fails(self):
+        self.mock_container.patch_item.side_effect = CosmosHttpResponseError(status_code=500)
+        self.chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, content="Next question"))
+
+        self.chat_history.store_messages("session123", "user456")
+
+        self.mock_container.upsert_item.assert_called_once()
+        body = self.mock_container.upsert_item.call_args.kwargs["body"]
+        self.assertEqual([message["data"]["content"] for message in body["messages"]], ["Hello", "Hi", "Next question"])
+
+    def test_store_messages_upserts_session_when_document_is_deleted(self):
+        self.mock_container.patch_item.side_effect = CosmosResourceNotFoundError(status_code=404)
+        self.chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, content="Next question"))
+
+        self.chat_history.store_messages("session123", "user456")
+
+        self.mock_container.upsert_item.assert_called_once()
+
+
+class TestCosmosChatHistoryToolResultReferences(unittest.TestCase):
+    def setUp(self):
+        self.mock_container = Mock(spec=ContainerProxy)
+        self.domain = "test_domain"
+        self.collection_data = json.dumps({"_id": "collection", "data": "x" * TOOL_RESULT_REFERENCE_MIN_LENGTH})
+        self.result_ref = hashlib.sha256(self.collection_data.encode("utf-8")).hexdigest()
+
+    def _chat_history(self, remove_tool_calls: bool = False) -> CosmosChatHistory:
+        return CosmosChatHistory(
+            container=self.mock_container,
+            user_message_limit=20,
+            domain=self.domain,
+            remove_tool_calls=remove_tool_calls
+        )
+
+    def _turn(self, question: str) -> list[ChatMessageContent]:
+        return [
+            ChatMessageContent(role=AuthorRole.USER, content=question),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, content="", items=[
+                FunctionCallContent(id="call1", function_name="get_collection_data", plugin_name="Collection")
+            ]),
+            ChatMessageContent(role=AuthorRole.TOOL, content="", items=[
+                FunctionResultContent(id="call1", function_name="get_collection_data", plugin_name="Collection",
+                                      result=self.collection_data)
+            ]),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, content="Answer")
+        ]
+
+    def _stored_session(self) -> dict:
+        chat_history = self._chat_history()
+        chat_history.internal_messages = self._turn("Question")
+        chat_history.store_messages("session123", "user456")
+        stored_session = self.mock_container.upsert_item.call_args.kwargs["body"]
+        self.mock_container.reset_mock()
+        return stored_session
+
+    def test_store_messages_stores_large_tool_results_by_reference(self):
+        chat_history = self._chat_history()
+        chat_history.internal_messages = self._turn("Question")
+
+        chat_history.store_messages("session123", "User456")
+
+        tool_result_item, session = [call.kwargs["body"] for call in self.mock_container.upsert_item.call_args_list]
+        self.assertEqual(tool_result_item, {
+            "id": f"tool-result-{self.result_ref}",
+            "user_id": "user456",
+            "domain": self.domain,
+            "result": self.collection_data
+        })
+        stored_result = session["messages"][2]["items"][0]
+        self.assertEqual(stored_result["result"], "")
+        self.assertEqual(stored_result["metadata"], {TOOL_RESULT_REF_METADATA_KEY: self.result_ref})
+        self.assertNotIn(self.collection_data, json.dumps(session, default=str))
+
+    def test_store_messages_stores_identical_tool_results_once(self):
+        self.mock_container.read_item.return_value = self._stored_session()
+        chat_history = self._chat_history(remove_tool_calls=True)
+        chat_history.read_messages("session123", "user456")
+        for message in self._turn("Follow-up question"):
+            chat_history.add_message(message)
+
+        chat_history.store_messages("session123", "user456")
+
+        self.mock_container.upsert_item.assert_not_called()
+        operations = self.mock_container.patch_item.call_args.kwargs["patch_operations"]
+        self.assertEqual(operations[2]["value"]["items"][0]["metadata"],
+                         {TOOL_RESULT_REF_METADATA_KEY: self.result_ref})
+
+    def test_read_messages_loads_tool_results_when_tool_calls_are_kept(self):
+        session = self._stored_session()
+        tool_result_item = {"id": f"tool-result-{self.result_ref}", "result": self.collection_data}
+        self.mock_container.read_item.side_effect = [session, tool_result_item]
+        chat_history = self._chat_history()
+
+        chat_history.read_messages("session123", "user456")
+
+        self.mock_container.read_item.assert_called_with(
+            item=f"tool-result-{self.result_ref}",
+            partition_key=["user456", self.domain]
+        )
+        for messages in [chat_history.internal_messages, chat_history.messages]:
+            self.assertEqual(messages[2].items[0].result, self.collection_data)
+            self.assertEqual(messages[2].items[0].metadata, {})
+
+    def test_read_messages_does_not_load_tool_results_when_tool_calls_are_removed(self):
+        self.mock_container.read_item.return_value = self._stored_session()
+        chat_history = self._chat_history(remove_tool_calls=True)
+
+        chat_history.read_messages("session123", "user456")
+
+        self.mock_container.read_item.assert_called_once()
+        self.assertEqual(chat_history.internal_messages[2].items[0].result, "")
+        self.assertEqual([message.content for message in chat_history.messages], ["Question", "Answer"])
+
+    def test_read_messages_keeps_reference_to_missing_tool_result(self):
+        self.mock_container.read_item.side_effect = [self._stored_session(), CosmosResourceNotFoundError(404)]
+        chat_history = self._chat_history()
+
+        with patch("services.cosmos_chat_history.logging") as mock_logging:
+            chat_history.read_messages("session123", "user456")
+            mock_logging.warning.assert_called_once_with(f"Tool result {self.result_ref} not found")
+
+        self.assertEqual(chat_history.internal_messages[2].items[0].metadata,
+                         {TOOL_RESULT_REF_METADATA_KEY: self.result_ref})
+
+
 class TestCosmosChatHistoryReadMessages(unittest.TestCase):
     def setUp(self):
         self.mock_container = Mock(spec=ContainerProxy)
@@ -876,6 +1081,200 @@ class TestCosmosChatHistoryReadMessages(unittest.TestCase):
         self.assertEqual(self.chat_history.internal_messages, [])
 
 
+class TestCosmosChatHistoryModelContent(unittest.TestCase):
+    def setUp(self):
+        self.mock_container = Mock(spec=ContainerProxy)
+        self.domain = "test_domain"
+        self.chat_history = CosmosChatHistory(
+            container=self.mock_container,
+            user_message_limit=20,
+            domain=self.domain,
+            remove_tool_calls=True
+        )
+        self.query_result = QueryResponse(
+            response="The lease expires in 2030[1].",
+            citations=[["document.pdf", "D(1,0,0,1,1)"]]
+        ).model_dump_json()
+
+    def test_store_messages_stores_text_of_responses(self):
+        self.chat_history.internal_messages = [
+            ChatMessageContent(role=AuthorRole.USER, content="When does the lease expire?"),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, content=self.query_result)
+        ]
+
+        self.chat_history.store_messages("session123", "user456")
+
+        messages = self.mock_container.upsert_item.call_args.kwargs["body"]["messages"]
+        self.assertIsNone(messages[0]["data"]["model_content"])
+        self.assertEqual(messages[1]["data"], {
+            "content": self.query_result,
+            "model_content": "The lease expires in 2030."
+        })
+
+    def test_read_messages_uses_stored_text_of_responses(self):
+        self.chat_history.internal_messages = [
+            ChatMessageContent(role=AuthorRole.USER, content="When does the lease expire?"),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, content=self.query_result)
+        ]
+        self.chat_history.store_messages("session123", "user456")
+        self.mock_container.read_item.return_value = self.mock_container.upsert_item.call_args.kwargs["body"]
+
+        with patch("services.cosmos_chat_history.QueryResponse") as mock_query_response:
+            self.chat_history.read_messages("session123", "user456")
+            mock_query_response.model_validate_json.assert_not_called()
+
+        self.assertEqual(self.chat_history.messages, [
+            ChatMessageContent(role=AuthorRole.USER, content="When does the lease expire?"),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, content="The lease expires in 2030.")
+        ])
+        self.assertEqual(self.chat_history.internal_messages[1].content, self.query_result)
+        # Only the responses of the assistant are copied
+        self.assertIs(self.chat_history.messages[0], self.chat_history.internal_messages[0])
+
+
+class TestCosmosChatHistoryReduceMessages(unittest.TestCase):
+    def setUp(self):
+        self.mock_container = Mock(spec=ContainerProxy)
+        self.domain = "test_domain"
+
+    def _chat_history(self, **kwargs) -> CosmosChatHistory:
+        return CosmosChatHistory(
+            container=self.mock_container,
+            user_message_limit=20,
+            domain=self.domain,
+            **kwargs
+        )
+
+    def _session(self, turns: int, summary: str | None = None, summarized_message_count: int = 0) -> dict:
+        messages = [{"role": "system", "content": "System prompt", "type": "internal",
+                     "data": {"content": "System prompt"}}]
+        for turn in range(turns):
+            messages.extend([
+                {"role": "user", "content": f"Question {turn}", "type": "human",
+                 "data": {"content": f"Question {turn}"}},
+                {"role": "assistant", "content": "", "type": "internal", "data": {"content": ""}, "items": [
+                    {"content_type": "function_call", "id": f"call{turn}", "name": "Collection-get_collection_data",
+                     "arguments": "{}"}
+                ]},
+                {"role": "tool", "content": "", "type": "internal", "data": {"content": ""}, "items": [
+                    {"content_type": "function_result", "id": f"call{turn}", "name": "Collection-get_collection_data",
+                     "result": f"Collection data {turn}"}
+                ]},
+                {"role": "assistant", "content": f"Answer {turn}", "type": "ai",
+                 "data": {"content": f"Answer {turn}"}}
+            ])
+        return {"id": "session123", "user_id": "user456", "domain": self.domain, "messages": messages,
+                "summary": summary, "summarized_message_count": summarized_message_count}
+
+    def _read(self, chat_history: CosmosChatHistory, session: dict):
+        self.mock_container.read_item.return_value = session
+        chat_history.read_messages("session123", "user456")
+
+    def test_all_turns_are_kept_by_default(self):
+        chat_history = self._chat_history(remove_tool_calls=True)
+
+        self._read(chat_history, self._session(turns=3))
+
+        self.assertEqual(
+            [message.content for message in chat_history.messages],
+            ["System prompt", "Question 0", "Answer 0", "Question 1", "Answer 1", "Question 2", "Answer 2"]
+        )
+        self.assertEqual(chat_history.history_tokens_saved, 0)
+
+    def test_only_last_turns_are_kept(self):
+        chat_history = self._chat_history(remove_tool_calls=True, max_turns=2)
+
+        self._read(chat_history, self._session(turns=3))
+
+        self.assertEqual(
+            [message.content for message in chat_history.messages],
+            ["System prompt", "Question 1", "Answer 1", "Question 2", "Answer 2"]
+        )
+        self.assertEqual(len(chat_history.internal_messages), 13)
+        # The left out tool calls are not counted, as they are removed with remove_tool_calls
+        self.assertEqual(
+            chat_history.history_tokens_saved,
+            estimate_message_tokens(chat_history.internal_messages[1])
+            + estimate_message_tokens(chat_history.internal_messages[4])
+        )
+
+    def test_summary_replaces_turns_left_out(self):
+        chat_history = self._chat_history(remove_tool_calls=True, max_turns=1)
+
+        self._read(chat_history, self._session(turns=3, summary="Earlier questions", summarized_message_count=5))
+
+        self.assertEqual(
+            [message.content for message in chat_history.messages],
+            ["System prompt", f"{SUMMARY_MESSAGE_PREFIX}\nEarlier questions", "Question 2", "Answer 2"]
+        )
+        self.assertEqual(chat_history.messages[1].role, AuthorRole.SYSTEM)
+
+    def test_only_last_tool_result_is_kept(self):
+        chat_history = self._chat_history(keep_last_tool_result_only=True)
+
+        self._read(chat_history, self._session(turns=2))
+
+        tool_results = [
+            item.result for message in chat_history.messages for item in message.items
+            if isinstance(item, FunctionResultContent)
+        ]
+        self.assertEqual(tool_results, ["Collection data 1"])
+        self.assertEqual(
+            [message.content for message in chat_history.messages if message.content],
+            ["System prompt", "Question 0", "Answer 0", "Question 1", "Answer 1"]
+        )
+        self.assertGreater(chat_history.history_tokens_saved, 0)
+
+    def test_get_messages_to_summarize_returns_unsummarized_turns_left_out(self):
+        chat_history = self._chat_history(remove_tool_calls=True, max_turns=1, summarize_older_turns=True)
+        self._read(chat_history, self._session(turns=3, summary="Earlier questions", summarized_message_count=5))
+
+        messages, summarized_message_count = chat_history.get_messages_to_summarize()
+
+        self.assertEqual([message.content for message in messages], ["Question 1", "Answer 1"])
+        self.assertEqual(summarized_message_count, 9)
+
+    def test_get_messages_to_summarize_when_summarization_is_disabled(self):
+        chat_history = self._chat_history(remove_tool_calls=True, max_turns=1)
+        self._read(chat_history, self._session(turns=3))
+
+        self.assertEqual(chat_history.get_messages_to_summarize(), ([], 0))
+
+    def test_store_summary_updates_session_document(self):
+        chat_history = self._chat_history(max_turns=1, summarize_older_turns=True)
+
+        chat_history.store_summary("session123", "User456", "Summary", 9)
+
+        self.mock_container.patch_item.assert_called_once_with(
+            item="session123",
+            partition_key=["user456", self.domain],
+            patch_operations=[
+                {"op": "set", "path": "/summary", "value": "Summary"},
+                {"op": "set", "path": "/summarized_message_count", "value": 9}
+            ]
+        )
+        self.assertEqual(chat_history.summary, "Summary")
+        self.assertEqual(chat_history.summarized_message_count, 9)
+
+
+class TestCosmosChatHistoryGetRequestedCollectionIds(unittest.TestCase):
+    def test_get_requested_collection_ids_from_most_recent(self):
+        chat_history = CosmosChatHistory(container=Mock(spec=ContainerProxy), user_message_limit=20, domain="test")
+        for collection_id in ["5OAS074", "7ABC123", "5OAS074"]:
+            chat_history.add_message(ChatMessageContent(role=AuthorRole.ASSISTANT, items=[
+                FunctionCallContent(id="call", function_name="get_collection_data", plugin_name="Collection",
+                                    arguments=json.dumps({"collection_id": collection_id}))
+            ]))
+        chat_history.add_message(ChatMessageContent(role=AuthorRole.ASSISTANT, items=[
+            FunctionCallContent(id="call", function_name="other_function", plugin_name="Collection",
+                                arguments=json.dumps({"collection_id": "OTHER01"})),
+            FunctionCallContent(id="call", function_name="get_collection_data", plugin_name="Collection",
+                                arguments="{invalid")
+        ]))
+
+        self.assertEqual(chat_history.get_requested_collection_ids(), ["7ABC123", "5OAS074"])
+
+
 class TestCosmosChatHistoryUserMessageLimitExceeded(unittest.TestCase):
     def setUp(self):
         self.mock_container = Mock(spec=ContainerProxy)
@@ -1,7 +1,14 @@
 import unittest
-from unittest.mock import MagicMock
-from services.ingest_config_management_service import IngestConfigManagementService
+from unittest.mock import MagicMock, patch
+from pymongo import errors
+from services.config_cache import ConfigCache
+from services.ingest_config_management_service import (
+    IngestConfigManagementService,
+    compute_content_hash,
+    get_config_cache,
+)
 from models import FieldDataCollectionConfig
+from models.environment_config import ConfigCacheConfig, ConfigurationValue
 
 
 class TestLoadConfig(unittest.TestCase):
@@ -86,6 +93,187 @@ class TestUpsertConfig(unittest.TestCase):
             .get_collection.return_value \
             .update_one.assert_called_once_with(
                 {"_id": "test_config-1.0"},
-                {"$set": config.model_dump(by_alias=True)},
+                {"$set": {**config.model_dump(by_alias=True), "content_hash": compute_content_hash(config)}},
                 upsert=True
             )
+
+
+class TestConfigCaching(unittest.TestCase):
+    """Test the caching of the configurations by IngestConfigManagementService."""
+
+    def setUp(self):
+        self.mock_db = MagicMock()
+        self.config_cache = ConfigCache(max_size=10, ttl_seconds=60, revalidate_after_seconds=30)
+        self.service = IngestConfigManagementService(self.mock_db, MagicMock(), self.config_cache)
+        self.config_data = {
+            "_id": "test_config-1.0",
+            "name": "test_config",
+            "version": "1.0",
+            "prompt": "Test prompt",
+            "collection_rows": [],
+            "content_hash": "hash1"
+        }
+        self.mock_collection = self.mock_db.get_collection.return_value
+        self.mock_collection.find_one.side_effect = self._find_one
+
+    def _find_one(self, filter, projection=None):
+        """Reads the stored configuration, or only its content hash with the projection."""
+        if self.config_data is None:
+            return None
+        if projection is not None:
+            return {"_id": self.config_data["_id"], "content_hash": self.config_data.get("content_hash")}
+        return self.config_data
+
+    def _full_reads(self) -> int:
+        """Counts the reads of the whole configuration."""
+        return len([call for call in self.mock_collection.find_one.call_args_list if len(call.args) == 1])
+
+    def test_load_config_parses_configuration_once(self):
+        """Test that the configuration is only read and parsed on the first load, then served from the cache."""
+        # act
+        first = self.service.load_config("test_config-1.0")
+        second = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertEqual(first, FieldDataCollectionConfig(**self.config_data))
+        self.assertEqual(second, first)
+        self.mock_collection.find_one.assert_called_once_with({"_id": "test_config-1.0"})
+        self.assertEqual(self.config_cache.hits, 1)
+        self.assertEqual(self.config_cache.misses, 1)
+
+    @patch("services.config_cache.time")
+    def test_config_upserted_by_another_worker_is_read_after_revalidation_delay(self, mock_time):
+        """Test that a configuration whose stored hash changed is read again once its hash is checked again."""
+        # arrange
+        mock_time.monotonic.return_value = 100.0
+        self.service.load_config("test_config-1.0")
+        self.config_data = {**self.config_data, "prompt": "Updated prompt", "content_hash": "hash2"}
+
+        # act
+        mock_time.monotonic.return_value = 129.0
+        before_delay = self.service.load_config("test_config-1.0")
+        mock_time.monotonic.return_value = 130.0
+        after_delay = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertEqual(before_delay.prompt, "Test prompt")
+        self.assertEqual(after_delay.prompt, "Updated prompt")
+        self.mock_collection.find_one.assert_any_call({"_id": "test_config-1.0"}, {"content_hash": 1})
+        self.assertEqual(self._full_reads(), 2)
+
+    @patch("services.config_cache.time")
+    def test_unchanged_config_is_not_read_again_after_revalidation_delay(self, mock_time):
+        """Test that only the hash of a cached configuration is read once its hash must be checked again."""
+        # arrange
+        mock_time.monotonic.return_value = 100.0
+        first = self.service.load_config("test_config-1.0")
+
+        # act
+        mock_time.monotonic.return_value = 130.0
+        result = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertIs(result, self.config_cache.get("test_config-1.0", lambda: "hash1"))
+        self.assertEqual(result, first)
+        self.assertEqual(self.mock_collection.find_one.call_count, 2)
+        self.assertEqual(self._full_reads(), 1)
+
+    def test_config_without_hash_is_cached_with_computed_hash(self):
+        """Test that the hash of a configuration upserted before the hash was stored is computed and stored."""
+        # arrange
+        del self.config_data["content_hash"]
+        content_hash = compute_content_hash(FieldDataCollectionConfig(**self.config_data))
+
+        # act
+        self.service.load_config("test_config-1.0")
+        result = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertEqual(result.prompt, "Test prompt")
+        self.assertEqual(self._full_reads(), 1)
+        self.mock_collection.update_one.assert_called_once_with(
+            {"_id": "test_config-1.0", "content_hash": {"$exists": False}},
+            {"$set": {"content_hash": content_hash}}
+        )
+
+    def test_config_without_hash_is_cached_when_hash_cannot_be_stored(self):
+        """Test that a failure to store the computed hash does not fail the load."""
+        # arrange
+        del self.config_data["content_hash"]
+        self.mock_collection.update_one.side_effect = errors.PyMongoError("Unavailable")
+
+        # act
+        with self.assertLogs(level="WARNING"):
+            result = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertEqual(result.prompt, "Test prompt")
+        self.assertIsNotNone(self.config_cache.get("test_config-1.0", lambda: None))
+
+    def test_missing_config_is_not_cached(self):
+        """Test that a configuration that does not exist is read again on the next load."""
+        # arrange
+        self.config_data = None
+
+        # act
+        first = self.service.load_config("test_config-1.0")
+        second = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(self.mock_collection.find_one.call_count, 2)
+
+    def test_upsert_config_replaces_cached_config(self):
+        """Test that the upserted configuration is loaded without being read again."""
+        # arrange
+        self.service.load_config("test_config-1.0")
+        config = FieldDataCollectionConfig(**{**self.config_data, "prompt": "Updated prompt"})
+
+        # act
+        self.service.upsert_config(config)
+        self.config_data = {**config.model_dump(by_alias=True), "content_hash": compute_content_hash(config)}
+        result = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertEqual(result.prompt, "Updated prompt")
+        self.assertEqual(self._full_reads(), 1)
+
+    def test_failed_upsert_invalidates_cached_config(self):
+        """Test that the configuration is read again when its upsert fails."""
+        # arrange
+        self.service.load_config("test_config-1.0")
+        self.mock_collection.update_one.side_effect = Exception("Update failed")
+
+        # act
+        with self.assertRaises(Exception):
+            self.service.upsert_config(FieldDataCollectionConfig(**{**self.config_data, "prompt": "Updated prompt"}))
+        result = self.service.load_config("test_config-1.0")
+
+        # assert
+        self.assertEqual(result.prompt, "Test prompt")
+        self.assertEqual(self._full_reads(), 2)
+
+
+class TestGetConfigCache(unittest.TestCase):
+    """Test the get_config_cache function."""
+
+    @patch("services.ingest_config_management_service.config_cache", None)
+    def test_returns_shared_cache(self):
+        """Test that the same cache is returned to every service."""
+        # act
+        first = get_config_cache(ConfigCacheConfig())
+        second = get_config_cache(ConfigCacheConfig())
+
+        # assert
+        self.assertIsInstance(first, ConfigCache)
+        self.assertIs(first, second)
+
+    @patch("services.ingest_config_management_service.config_cache", None)
+    def test_returns_none_when_disabled(self):
+        """Test that no cache is returned when the cache is disabled."""
+        # act
+        result = get_config_cache(ConfigCacheConfig(enabled=ConfigurationValue(value="false")))
+
+        # assert
+        self.assertIsNone(result)
@@ -156,7 +156,8 @@ class TestIngestionCollectionDocumentServiceIngestAnalyzerOutput(unittest.TestCa
                             }
                         ]
                     }
-                }
+                },
+                "$inc": {"data_version": 1}
             },
             upsert=True
         )
@@ -600,7 +601,8 @@ class TestIngestionCollectionDocumentServiceIngestClassifierOutput(unittest.Test
                             }
                         ]
                     }
-                }
+                },
+                "$inc": {"data_version": 1}
             },
             upsert=True
         )
@@ -1054,6 +1056,67 @@ class TestIngestionCollectionDocumentServiceGetAllExtractedFields(unittest.TestC
         self.assertIn("field1", lease_result)
         self.assertEqual(len(lease_result["field1"]), 2)  # 2 lease agreement data
 
+    def test_get_all_extracted_fields_from_stored_document(self):
+        """Test that the fields of a stored document are read as when validated through the document model."""
+        lease_fields = {
+            "field1": [
+                ExtractedLeaseField(
+                    type=ExtractedLeaseFieldType.ARRAY,
+                    valueArray=[
+                        ExtractedLeaseField(
+                            type=ExtractedLeaseFieldType.OBJECT,
+                            valueObject={
+                                "amount": ExtractedLeaseField(
+                                    type=ExtractedLeaseFieldType.NUMBER,
+                                    valueNumber=1200.5,
+                                    source="D(1,1,1,2,1,2,2,1,2)"
+                                )
+                            }
+                        )
+                    ],
+                    confidence=0.9,
+                    source="D(1,1,1,2,1,2,2,1,2)",
+                    date_of_document=date(2023, 1, 1),
+                    markdown="test_LSE_doc.md",
+                    document="test_LSE_doc.pdf"
+                )
+            ]
+        }
+        existing_document = ExtractedCollectionDocuments(
+            collection_id="test_collection",
+            config_id="config-id",
+            lease_config_hash="test_hash",
+            information=ExtractedCollectionInformationCollection(
+                leases=[
+                    ExtractedLeaseCollection(
+                        lease_id="test_lease",
+                        original_documents=["test_LSE_doc.pdf"],
+                        markdowns=["test_LSE_doc.md"],
+                        fields=lease_fields
+                    )
+                ]
+            )
+        )
+        # Stored as by _upsert_document
+        self.mock_collection_documents_collection.find_one.return_value = existing_document.model_dump(
+            by_alias=True, mode='json', exclude_defaults=True
+        )
+
+        result = self.service._get_all_extracted_fields_from_collection_doc("test_collection", self.config)
+
+        # Compared as dumped by the collection plugin: the unset nested values are not validated to None
+        expected = [LeaseAgreementDocumentData(**field.model_dump()) for field in lease_fields["field1"]]
+        self.assertEqual(list(result), ["test_lease"])
+        self.assertEqual(
+            [value.model_dump(exclude_none=True, exclude_defaults=True, exclude_unset=True)
+             for value in result["test_lease"]["field1"]],
+            [value.model_dump(exclude_none=True, exclude_defaults=True, exclude_unset=True) for value in expected]
+        )
+        self.assertEqual(
+            self.mock_collection_documents_collection.find_one.call_args.args[1],
+            {"collection_id": 1, "information.leases.lease_id": 1, "information.leases.fields": 1}
+        )
+
     @patch("services.ingest_lease_documents_service.logging")
     def test_get_all_extracted_fields_empty_leases(self, mock_logging):
         """Test with a document that has no leases."""
@@ -1089,3 +1152,92 @@ class TestIngestionCollectionDocumentServiceGetAllExtractedFields(unittest.TestC
 
 if __name__ == '__main__':
     unittest.main()
+
+
+class TestIngestionCollectionDocumentServiceGetDataVersion(unittest.TestCase):
+    def setUp(self):
+        self.mock_collection_documents_collection = MagicMock()
+        self.service = IngestionCollectionDocumentService(
+            collection_documents_collection=self.mock_collection_documents_collection,
+            container_client=MagicMock(),
+            mongo_lock_manager=MagicMock(),
+        )
+
+    def test_get_data_version_returns_version(self):
+        self.mock_collection_documents_collection.find_one.return_value = {"_id": "test_collection-fake_hash",
+                                                                           "data_version": 3}
+
+        result = self.service.get_data_version("test_collection", "fake_hash")
+
+        self.assertEqual(result, 3)
+        self.mock_collection_documents_collection.find_one.assert_called_once_with(
+            {"_id": "test_collection-fake_hash"}, {"data_version": 1})
+
+    def test_get_data_version_defaults_for_documents_ingested_before_versioning(self):
+        self.mock_collection_documents_collection.find_one.return_value = {"_id": "test_collection-fake_hash"}
+
+        self.assertEqual(self.service.get_data_version("test_collection", "fake_hash"), 0)
+
+    def test_get_data_version_returns_none_for_missing_document(self):
+        self.mock_collection_documents_collection.find_one.return_value = None
+
+        self.assertIsNone(self.service.get_data_version("test_collection", "fake_hash"))
+
+
+class TestIngestionCollectionDocumentServiceCitationMappings(unittest.TestCase):
+    def setUp(self):
+        self.mock_collection_documents_collection = MagicMock()
+        self.service = IngestionCollectionDocumentService(
+            collection_documents_collection=self.mock_collection_documents_collection,
+            container_client=MagicMock(),
+            mongo_lock_manager=MagicMock(),
+        )
+
+    def test_store_citation_mappings_replaces_mappings_document(self):
+        self.service.store_citation_mappings("test_collection", "fake_hash", 2, {"A": ["lease.pdf", "D(1,1,1,2,2)"]})
+
+        self.mock_collection_documents_collection.replace_one.assert_called_once_with(
+            {"_id": "test_collection-fake_hash-citations"},
+            {"lease_config_hash": "fake_hash", "data_version": 2, "citations": {"A": ["lease.pdf", "D(1,1,1,2,2)"]}},
+            upsert=True
+        )
+
+    def test_get_citation_mappings_reads_requested_mappings(self):
+        self.mock_collection_documents_collection.find_one.return_value = {
+            "_id": "test_collection-fake_hash-citations",
+            "citations": {"B": ["lease.pdf", "D(1,1,1,2,2)"]}
+        }
+
+        result = self.service.get_citation_mappings("test_collection", "fake_hash", ["B", "C"])
+
+        self.assertEqual(result, {"B": ["lease.pdf", "D(1,1,1,2,2)"]})
+        self.mock_collection_documents_collection.find_one.assert_called_once_with(
+            {"_id": "test_collection-fake_hash-citations"}, {"data_version": 1, "citations.B": 1, "citations.C": 1})
+
+    def test_get_citation_mappings_of_data_version(self):
+        self.mock_collection_documents_collection.find_one.return_value = {
+            "_id": "test_collection-fake_hash-citations",
+            "data_version": 3,
+            "citations": {"B": ["lease.pdf", "D(1,1,1,2,2)"]}
+        }
+
+        result = self.service.get_citation_mappings("test_collection", "fake_hash", ["B"], data_version=3)
+
+        self.assertEqual(result, {"B": ["lease.pdf", "D(1,1,1,2,2)"]})
+
+    def test_get_citation_mappings_ignores_mappings_of_other_data_version(self):
+        self.mock_collection_documents_collection.find_one.return_value = {
+            "_id": "test_collection-fake_hash-citations",
+            "data_version": 4,
+            "citations": {"B": ["amendment.pdf", "D(2,1,1,2,2)"]}
+        }
+
+        with self.assertLogs(level="WARNING"):
+            result = self.service.get_citation_mappings("test_collection", "fake_hash", ["B"], data_version=3)
+
+        self.assertEqual(result, {})
+
+    def test_get_citation_mappings_returns_empty_for_missing_document(self):
+        self.mock_collection_documents_collection.find_one.return_value = None
+
+        self.assertEqual(self.service.get_citation_mappings("test_collection", "fake_hash", ["A"]), {})
@@ -0,0 +1,192 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from pymongo import errors
+
+from models.ingestion_models import IngestionJobMessage, IngestionJobStatus
+from services import ingestion_job_service
+from services.ingestion_job_service import IngestionJobService
+
+
+def _build_finished_job(status: IngestionJobStatus, submitted: datetime, *stage_seconds: float) -> dict:
+    """Builds a finished job as read for the statistics, with the seconds spent waiting, analyzing and ingesting."""
+    timestamps = {IngestionJobStatus.SUBMITTED.value: submitted}
+    elapsed = 0
+    stages = [IngestionJobStatus.ANALYZING, IngestionJobStatus.INGESTING, IngestionJobStatus.DONE]
+    for stage, seconds in zip(stages, stage_seconds):
+        elapsed += seconds
+        timestamps[stage.value] = submitted + timedelta(seconds=elapsed)
+    return {"status": status.value, "timestamps": timestamps}
+
+
+class TestIngestionJobService(unittest.TestCase):
+    def setUp(self):
+        """Set up the test case with a mock collection."""
+        self.mock_collection = MagicMock()
+        self.service = IngestionJobService(self.mock_collection)
+        self.job = IngestionJobMessage(
+            job_id="job-1",
+            collection_id="collection1",
+            lease_id="lease1",
+            document_name="document.pdf",
+            document_path="Collections/collection1/lease1/document.pdf",
+            date_of_document=date(2024, 5, 1)
+        )
+
+    def test_submit_job_records_submitted_job(self):
+        """Test that a submitted job is upserted with its submission time."""
+        # Act
+        self.service.submit_job(self.job)
+
+        # Assert
+        filter, update = self.mock_collection.update_one.call_args[0]
+        self.assertEqual(filter, {"_id": "job-1"})
+        self.assertEqual(update["$set"]["status"], "submitted")
+        self.assertEqual(update["$set"]["document_path"], self.job.document_path)
+        self.assertEqual(update["$set"]["timestamps.submitted"], update["$set"]["updated_at"])
+        self.assertTrue(self.mock_collection.update_one.call_args[1]["upsert"])
+
+    def test_set_status_records_stage(self):
+        """Test that the status, its time, the attempts and the error of a job are recorded."""
+        # Act
+        self.service.set_status("job-1", IngestionJobStatus.FAILED, attempts=2, error="Analysis failed")
+
+        # Assert
+        filter, update = self.mock_collection.update_one.call_args[0]
+        self.assertEqual(filter, {"_id": "job-1"})
+        self.assertEqual(update["$set"]["status"], "failed")
+        self.assertIn("timestamps.failed", update["$set"])
+        self.assertEqual(update["$set"]["attempts"], 2)
+        self.assertEqual(update["$set"]["error"], "Analysis failed")
+
+    def test_set_status_logs_database_errors(self):
+        """Test that a failure to record a status does not fail the ingestion."""
+        # Arrange
+        self.mock_collection.update_one.side_effect = errors.PyMongoError("Unavailable")
+
+        # Act
+        with self.assertLogs(level="WARNING"):
+            self.service.set_status("job-1", IngestionJobStatus.ANALYZING)
+
+    def test_get_job(self):
+        """Test that a stored job is returned, and None for an unknown job."""
+        # Arrange
+        submitted = datetime(2024, 5, 1, 12, 0, 0)
+        self.mock_collection.find_one.side_effect = [
+            {
+                "_id": "job-1",
+                "collection_id": "collection1",
+                "lease_id": "lease1",
+                "document_name": "document.pdf",
+                "document_path": "Collections/collection1/lease1/document.pdf",
+                "status": "analyzing",
+                "timestamps": {"submitted": submitted, "analyzing": submitted + timedelta(seconds=5)},
+                "attempts": 0,
+                "error": None,
+                "updated_at": submitted + timedelta(seconds=5)
+            },
+            None
+        ]
+
+        # Act
+        job = self.service.get_job("job-1")
+        missing_job = self.service.get_job("job-2")
+
+        # Assert
+        self.assertEqual(job.id, "job-1")
+        self.assertEqual(job.status, IngestionJobStatus.ANALYZING)
+        self.assertEqual(job.timestamps[IngestionJobStatus.ANALYZING], submitted + timedelta(seconds=5))
+        self.assertIsNone(missing_job)
+
+    def test_get_stats(self):
+        """Test that the queue depth, throughput and durations are computed from the jobs."""
+        # Arrange
+        submitted = datetime(2024, 5, 1, 12, 0, 0)
+        self.mock_collection.aggregate.return_value = [
+            {"_id": "submitted", "count": 2},
+            {"_id": "retrying", "count": 1},
+            {"_id": "analyzing", "count": 1},
+            {"_id": "ingesting", "count": 1},
+            {"_id": "done", "count": 2},
+            {"_id": "failed", "count": 1},
+        ]
+        self.mock_collection.find.return_value = [
+            _build_finished_job(IngestionJobStatus.DONE, submitted, 2, 30, 8),
+            _build_finished_job(IngestionJobStatus.DONE, submitted, 4, 50, 6),
+            _build_finished_job(IngestionJobStatus.FAILED, submitted, 1),
+        ]
+
+        # Act
+        stats = self.service.get_stats(timedelta(minutes=10))
+
+        # Assert
+        self.assertEqual(stats.window_minutes, 10)
+        self.assertEqual(stats.queue_depth, 3)
+        self.assertEqual(stats.in_progress, 2)
+        self.assertEqual(stats.status_counts[IngestionJobStatus.DONE], 2)
+        self.assertEqual(stats.completed, 2)
+        self.assertEqual(stats.failed, 1)
+        self.assertAlmostEqual(stats.throughput_per_minute, 0.2)
+        self.assertEqual(stats.end_to_end.count, 2)
+        self.assertAlmostEqual(stats.end_to_end.mean_seconds, 50)
+        self.assertAlmostEqual(stats.end_to_end.max_seconds, 60)
+        self.assertAlmostEqual(stats.queue_wait.mean_seconds, 3)
+        self.assertAlmostEqual(stats.analysis.p50_seconds, 40)
+        self.assertAlmostEqual(stats.ingestion.mean_seconds, 7)
+
+        filter = self.mock_collection.find.call_args[0][0]
+        self.assertEqual(filter["status"], {"$in": ["done", "failed"]})
+        self.assertAlmostEqual(
+            filter["updated_at"]["$gte"].timestamp(),
+            (datetime.now(timezone.utc) - timedelta(minutes=10)).timestamp(),
+            delta=5
+        )
+
+    def test_get_stats_without_jobs(self):
+        """Test that the statistics of an empty window have no durations."""
+        # Arrange
+        self.mock_collection.aggregate.return_value = []
+        self.mock_collection.find.return_value = []
+
+        # Act
+        stats = self.service.get_stats(timedelta(minutes=60))
+
+        # Assert
+        self.assertEqual(stats.queue_depth, 0)
+        self.assertEqual(stats.throughput_per_minute, 0)
+        self.assertEqual(stats.end_to_end.count, 0)
+        self.assertIsNone(stats.end_to_end.mean_seconds)
+
+    def test_create_ttl_index_logs_database_errors(self):
+        """Test that a failure to create the TTL index is logged."""
+        # Arrange
+        self.mock_collection.create_index.side_effect = errors.PyMongoError("Conflicting index")
+
+        # Act
+        with self.assertLogs(level="WARNING"):
+            self.service.create_ttl_index(3600)
+
+        # Assert
+        self.mock_collection.create_index.assert_called_once_with("_ts", expireAfterSeconds=3600)
+
+    @patch("services.ingestion_job_service.CosmosClient")
+    def test_from_environment_config_creates_ttl_index_once(self, mock_cosmos_client):
+        """Test that the TTL index is created the first time the service is created."""
+        # Arrange
+        environment_config = MagicMock()
+        environment_config.cosmosdb.ingestion_job_collection_name.value = "IngestionJobs"
+        environment_config.ingestion_queue.job_ttl_seconds.value = 3600
+        mock_collection = mock_cosmos_client.return_value.get_collection.return_value
+
+        # Act
+        with patch.object(ingestion_job_service, "_indexed_collections", set()):
+            IngestionJobService.from_environment_config(environment_config)
+            IngestionJobService.from_environment_config(environment_config)
+
+        # Assert
+        mock_collection.create_index.assert_called_once_with("_ts", expireAfterSeconds=3600)
+
+
+if __name__ == '__main__':
+    unittest.main()
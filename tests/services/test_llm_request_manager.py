@@ -1,8 +1,16 @@
+import json
+import random
+import string
 import unittest
-from unittest.mock import patch
-from src.services.llm_request_manager import LlmRequestManager
+from unittest.mock import AsyncMock, MagicMock, patch
+from semantic_kernel.contents import ChatHistory, ChatMessageContent, FunctionCallContent, FunctionResultContent
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.connectors.ai.completion_usage import CompletionUsage
+from src.services.llm_request_manager import HISTORY_SUMMARY_PROMPT, LlmRequestManager
 from src.models.api.v1 import QueryResponse
 from src.services.collection_kernel_plugin import CollectionPlugin
+from utils.health_check_cache import service_status
 from src.models.data_collection_config import FieldDataCollectionConfig
 
 
@@ -129,3 +137,418 @@ class TestParseResponseContent(unittest.TestCase):
             citations=[]
         )
         self.assertEqual(result.model_dump_json(), expected.model_dump_json())
+
+    def test_structured_output_with_braces_in_response(self):
+        raw_content = json.dumps({"response": "Use {placeholders} and \"quotes\"[1].", "citations": ["CITE1-1"]})
+        self.collection_plugin.restore_citations = MagicMock(return_value=[["source_document1", "box1"]])
+
+        result = self.llm_request_manager._parse_response_content(raw_content, self.collection_plugin)
+
+        self.assertEqual(result.response, 'Use {placeholders} and "quotes"[1].')
+        self.collection_plugin.restore_citations.assert_called_once_with(["CITE1-1"])
+
+    def test_embedded_json_object_with_nested_values(self):
+        payload = {"response": "Test response", "citations": ["CITE1-1"], "details": {"pages": [{"page": 1}]}}
+        raw_content = f"Here is the answer: {json.dumps(payload)}"
+        self.collection_plugin.restore_citations = MagicMock(return_value=[])
+
+        result = self.llm_request_manager._parse_response_content(raw_content, self.collection_plugin)
+
+        self.assertEqual(result.response, "Test response")
+        self.collection_plugin.restore_citations.assert_called_once_with(["CITE1-1"])
+
+    def test_fuzz_structured_output(self):
+        rng = random.Random(29)
+        alphabet = string.ascii_letters + ' {}[]"\\:,.\n\t\u00e9\U0001F600'
+        self.collection_plugin.restore_citations = MagicMock(return_value=[])
+
+        for _ in range(200):
+            response = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200)))
+            citations = [f"CITE1-{index}" for index in range(rng.randint(0, 5))]
+            raw_content = json.dumps({"response": response, "citations": citations},
+                                     ensure_ascii=rng.random() < 0.5)
+            if rng.random() < 0.5:
+                raw_content = f"Answer:\n{raw_content}\n"
+
+            result = self.llm_request_manager._parse_response_content(raw_content, self.collection_plugin)
+
+            self.assertEqual(result.response, response)
+            self.collection_plugin.restore_citations.assert_called_with(citations)
+
+
+class TestStreamCollectionQuestion(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_config = patch('services.llm_request_manager.LlmConfig').start()
+        self.mock_config.endpoint = "https://mock-endpoint.openai.azure.com"
+        self.mock_config.key = "mock-api-key"
+        self.mock_config.default_model = "mock-deployment-name"
+        self.mock_config.api_version = "2023-05-15"
+        self.llm_request_manager = LlmRequestManager(self.mock_config)
+        self.llm_request_manager._chat_completions = MagicMock()
+
+        config = FieldDataCollectionConfig(
+            name="name",
+            version="v1",
+            prompt="prompt",
+            lease_config_hash="hash",
+            collection_rows=[])
+        self.collection_plugin = CollectionPlugin(config=config, document_service=None)
+        self.collection_plugin.restore_citations = MagicMock(return_value=[["source_document1", "box1"]])
+
+    def tearDown(self):
+        patch.stopall()
+
+    @staticmethod
+    def _stream(*chunks):
+        async def stream(**kwargs):
+            for chunk in chunks:
+                yield chunk
+        return stream
+
+    @staticmethod
+    def _chunk(content: str, usage: CompletionUsage | None = None) -> StreamingChatMessageContent:
+        return StreamingChatMessageContent(
+            role=AuthorRole.ASSISTANT,
+            content=content,
+            choice_index=0,
+            metadata={"usage": usage}
+        )
+
+    async def test_streams_response_text_then_parsed_response(self):
+        tool_call_stream = self._stream(
+            self._chunk(""),
+            self._chunk("", usage=CompletionUsage(prompt_tokens=80, completion_tokens=10))
+        )
+        answer_stream = self._stream(
+            self._chunk('{"respon'),
+            self._chunk('se": "The lease'),
+            self._chunk(' ends[1]."'),
+            self._chunk(', "citations": ["CITE1-1"]}'),
+            self._chunk("", usage=CompletionUsage(prompt_tokens=100, completion_tokens=20))
+        )
+        self.llm_request_manager._chat_completions.get_streaming_chat_message_content.side_effect = [
+            tool_call_stream(), answer_stream()
+        ]
+        history = ChatHistory()
+
+        events = [
+            event async for event in self.llm_request_manager.stream_collection_question(
+                "system", "When does the lease end?", self.collection_plugin, history)
+        ]
+
+        self.assertEqual([event.delta for event in events[:-1]], ["The lease", " ends[1]."])
+        self.assertEqual(events[-1].event, "response")
+        response = events[-1].response
+        self.assertEqual(response.response, "The lease ends[1].")
+        self.assertEqual(response.citations, [["source_document1", "box1"]])
+        # The usage of the tool call and of the answer is summed
+        self.assertEqual(response.metrics.prompt_tokens, 180)
+        self.assertEqual(response.metrics.completion_tokens, 30)
+        self.assertEqual(response.metrics.total_tokens, 210)
+        self.assertIsNotNone(response.metrics.time_to_first_token_sec)
+        self.assertLessEqual(response.metrics.time_to_first_token_sec, response.metrics.total_latency_sec)
+
+        self.collection_plugin.restore_citations.assert_called_once_with(["CITE1-1"])
+        self.assertEqual([message.role for message in history.messages],
+                         [AuthorRole.SYSTEM, AuthorRole.USER, AuthorRole.ASSISTANT])
+        self.assertIsNone(QueryResponse.model_validate_json(history.messages[-1].content).metrics)
+
+    async def test_answer_metrics_include_tool_call_usage(self):
+        async def get_chat_message_content(chat_history, settings, kernel):
+            # The auto invoke loop adds the tool call message, with the usage of its request, to the history
+            chat_history.add_message(ChatMessageContent(
+                role=AuthorRole.ASSISTANT,
+                items=[FunctionCallContent(id="call_1", function_name="get_collection_data", plugin_name="Collection")],
+                metadata={"usage": CompletionUsage(prompt_tokens=80, completion_tokens=10)}
+            ))
+            content = MagicMock()
+            content.content = '{"response": "The lease ends.", "citations": []}'
+            content.inner_content.usage = CompletionUsage(prompt_tokens=100, completion_tokens=20)
+            return content
+
+        self.llm_request_manager._chat_completions.get_chat_message_content = AsyncMock(
+            side_effect=get_chat_message_content)
+        self.collection_plugin.restore_citations.return_value = []
+
+        result = await self.llm_request_manager.answer_collection_question(
+            "system", "When does the lease end?", self.collection_plugin, ChatHistory())
+
+        metrics = QueryResponse.model_validate_json(result).metrics
+        self.assertEqual(metrics.prompt_tokens, 180)
+        self.assertEqual(metrics.completion_tokens, 30)
+        self.assertEqual(metrics.total_tokens, 210)
+
+    async def test_stream_failure_marks_openai_unhealthy(self):
+        async def failing_stream(**kwargs):
+            raise RuntimeError("boom")
+            yield
+
+        self.llm_request_manager._chat_completions.get_streaming_chat_message_content.side_effect = [
+            failing_stream()
+        ]
+
+        with patch.dict(service_status, clear=True):
+            with self.assertRaises(RuntimeError):
+                async for _ in self.llm_request_manager.stream_collection_question(
+                        "system", "question", self.collection_plugin, ChatHistory()):
+                    pass
+
+            self.assertEqual(service_status["openai"]["status"], "unhealthy")
+
+
+class TestSharedKernel(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_config = patch('services.llm_request_manager.LlmConfig').start()
+        self.mock_config.endpoint = "https://mock-endpoint.openai.azure.com"
+        self.mock_config.key = "mock-api-key"
+        self.mock_config.default_model = "mock-deployment-name"
+        self.mock_config.api_version = "2023-05-15"
+        self.llm_request_manager = LlmRequestManager(self.mock_config)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _collection_plugin(self, collection_data: str) -> MagicMock:
+        collection_plugin = MagicMock(spec=CollectionPlugin)
+        collection_plugin.get_collection_data.return_value = collection_data
+        collection_plugin.restore_citations.return_value = []
+        return collection_plugin
+
+    async def test_shared_kernel_invokes_plugin_of_each_query(self):
+        kernel = self.llm_request_manager._collection_kernel
+        responses = []
+
+        async def get_chat_message_content(chat_history, settings, kernel):
+            # Run the tool call as Semantic Kernel would, through the shared kernel
+            collection_data = await kernel.invoke(
+                plugin_name="Collection", function_name="get_collection_data", collection_id="123")
+            content = MagicMock()
+            content.content = f'{{"response": "{collection_data}", "citations": []}}'
+            return content
+
+        self.llm_request_manager._chat_completions = MagicMock()
+        self.llm_request_manager._chat_completions.get_chat_message_content.side_effect = get_chat_message_content
+
+        for collection_data in ["first data", "second data"]:
+            result = await self.llm_request_manager.answer_collection_question(
+                "system", "question", self._collection_plugin(collection_data), ChatHistory())
+            responses.append(QueryResponse.model_validate_json(result).response)
+
+        self.assertEqual(responses, ["first data", "second data"])
+        self.assertIs(self.llm_request_manager._collection_kernel, kernel)
+        for call in self.llm_request_manager._chat_completions.get_chat_message_content.call_args_list:
+            self.assertIs(call.kwargs["kernel"], kernel)
+            self.assertIs(call.kwargs["settings"], self.llm_request_manager._collection_execution_settings)
+
+
+class TestAnswerCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_config = patch('services.llm_request_manager.LlmConfig').start()
+        self.mock_config.endpoint = "https://mock-endpoint.openai.azure.com"
+        self.mock_config.key = "mock-api-key"
+        self.mock_config.default_model = "mock-deployment-name"
+        self.mock_config.api_version = "2023-05-15"
+        self.mock_config.answer_cache.enabled.value = "true"
+        self.mock_config.answer_cache.max_size.value = 10
+        self.mock_config.answer_cache.ttl_seconds.value = 60
+        self.mock_config.answer_cache.similarity_threshold.value = 0.95
+        self.mock_config.answer_cache.embedding_endpoint = None
+        self.llm_request_manager = LlmRequestManager(self.mock_config)
+
+        content = MagicMock()
+        content.content = '{"response": "Lease X expires in 2030[1].", "citations": ["CITE123-A"]}'
+        content.metadata = {"usage": CompletionUsage(prompt_tokens=10, completion_tokens=5)}
+        self.llm_request_manager._chat_completions = MagicMock()
+        self.llm_request_manager._chat_completions.get_chat_message_content = AsyncMock(return_value=content)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _collection_plugin(self, data_version=1) -> MagicMock:
+        collection_plugin = MagicMock(spec=CollectionPlugin)
+        collection_plugin.config_id = "config-1.0"
+        collection_plugin.lease_config_hash = "hash"
+        collection_plugin.data_versions = {"5OAS074": data_version}
+        collection_plugin.get_data_version.return_value = data_version
+        collection_plugin.restore_citations.return_value = [["document.pdf", "D(1,0,0,1,1)"]]
+        return collection_plugin
+
+    async def test_first_question_is_answered_from_cache(self):
+        await self.llm_request_manager.answer_collection_question(
+            "system", "When does lease X in 5OAS074 expire?", self._collection_plugin(), ChatHistory())
+        history = ChatHistory()
+
+        result = QueryResponse.model_validate_json(await self.llm_request_manager.answer_collection_question(
+            "system", "when does lease x in 5OAS074 expire", self._collection_plugin(), history))
+
+        self.llm_request_manager._chat_completions.get_chat_message_content.assert_called_once()
+        self.assertEqual(result.response, "Lease X expires in 2030[1].")
+        self.assertEqual(result.citations, [["document.pdf", "D(1,0,0,1,1)"]])
+        self.assertEqual(result.citation_regions.model_dump(),
+                         {"citation_index": [0], "page": [1], "polygon": [[0.0, 0.0, 1.0, 1.0]]})
+        self.assertTrue(result.metrics.cache_hit)
+        self.assertEqual(result.metrics.total_tokens, 0)
+        self.assertEqual([message.role for message in history.messages],
+                         [AuthorRole.SYSTEM, AuthorRole.USER, AuthorRole.ASSISTANT])
+        # The citation regions are only returned to the client
+        self.assertIsNone(QueryResponse.model_validate_json(history.messages[-1].content).citation_regions)
+
+    async def test_answer_is_not_reused_after_data_changes(self):
+        await self.llm_request_manager.answer_collection_question(
+            "system", "When does lease X in 5OAS074 expire?", self._collection_plugin(), ChatHistory())
+
+        result = QueryResponse.model_validate_json(await self.llm_request_manager.answer_collection_question(
+            "system", "When does lease X in 5OAS074 expire?", self._collection_plugin(data_version=2),
+            ChatHistory()))
+
+        self.assertEqual(self.llm_request_manager._chat_completions.get_chat_message_content.call_count, 2)
+        self.assertFalse(result.metrics.cache_hit)
+
+    async def test_follow_up_questions_are_not_cached(self):
+        history = ChatHistory()
+        await self.llm_request_manager.answer_collection_question(
+            "system", "Which leases are in 5OAS074?", self._collection_plugin(), history)
+        await self.llm_request_manager.answer_collection_question(
+            "system", "When does the first one expire?", self._collection_plugin(), history)
+
+        result = QueryResponse.model_validate_json(await self.llm_request_manager.answer_collection_question(
+            "system", "When does the first one expire?", self._collection_plugin(), ChatHistory()))
+
+        self.assertEqual(self.llm_request_manager._chat_completions.get_chat_message_content.call_count, 3)
+        self.assertFalse(result.metrics.cache_hit)
+
+    async def test_streamed_question_is_answered_from_cache(self):
+        await self.llm_request_manager.answer_collection_question(
+            "system", "When does lease X in 5OAS074 expire?", self._collection_plugin(), ChatHistory())
+
+        events = [event async for event in self.llm_request_manager.stream_collection_question(
+            "system", "When does lease X in 5OAS074 expire?", self._collection_plugin(), ChatHistory())]
+
+        self.assertEqual([event.event for event in events], ["delta", "response"])
+        self.assertEqual(events[0].delta, "Lease X expires in 2030[1].")
+        self.assertTrue(events[1].response.metrics.cache_hit)
+
+
+class TestSummarizeHistory(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_config = patch('services.llm_request_manager.LlmConfig').start()
+        self.mock_config.endpoint = "https://mock-endpoint.openai.azure.com"
+        self.mock_config.key = "mock-api-key"
+        self.mock_config.default_model = "mock-deployment-name"
+        self.mock_config.api_version = "2023-05-15"
+        self.llm_request_manager = LlmRequestManager(self.mock_config)
+        content = MagicMock()
+        content.content = "New summary"
+        self.llm_request_manager._chat_completions = MagicMock()
+        self.llm_request_manager._chat_completions.get_chat_message_content = AsyncMock(return_value=content)
+
+    def tearDown(self):
+        patch.stopall()
+
+    async def test_summarize_history_includes_existing_summary(self):
+        messages = [
+            ChatMessageContent(role=AuthorRole.USER, content="When does lease X expire?"),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, content="In 2030.")
+        ]
+
+        summary = await self.llm_request_manager.summarize_history("Previous summary", messages)
+
+        self.assertEqual(summary, "New summary")
+        history = self.llm_request_manager._chat_completions.get_chat_message_content.call_args.kwargs["chat_history"]
+        self.assertEqual(history.messages[0].content, HISTORY_SUMMARY_PROMPT)
+        self.assertEqual(
+            history.messages[1].content,
+            "Existing summary:\nPrevious summary\n\nNew messages:\nuser: When does lease X expire?\nassistant: In 2030."
+        )
+
+
+class TestKnownCollectionData(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_config = patch('services.llm_request_manager.LlmConfig').start()
+        self.mock_config.endpoint = "https://mock-endpoint.openai.azure.com"
+        self.mock_config.key = "mock-api-key"
+        self.mock_config.default_model = "mock-deployment-name"
+        self.mock_config.api_version = "2023-05-15"
+        self.mock_config.inject_known_collection_data = True
+        self.llm_request_manager = LlmRequestManager(self.mock_config)
+
+        content = MagicMock()
+        content.content = '{"response": "The lease expires in 2030.", "citations": []}'
+        self.llm_request_manager._chat_completions = MagicMock()
+        self.llm_request_manager._chat_completions.get_chat_message_content = AsyncMock(return_value=content)
+
+        self.collection_plugin = MagicMock(spec=CollectionPlugin)
+        self.collection_plugin.get_collection_data.return_value = '{"_id": "5OAS074"}'
+        self.collection_plugin.restore_citations.return_value = []
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _history(self) -> ChatHistory:
+        history = ChatHistory()
+        history.add_system_message("system")
+        history.add_user_message("When does the lease in 5OAS074 start?")
+        history.add_assistant_message('{"response": "In 2020.", "citations": []}')
+        return history
+
+    async def test_known_collection_data_is_added_to_history(self):
+        history = self._history()
+
+        result = await self.llm_request_manager.answer_collection_question(
+            "system", "When does it expire?", self.collection_plugin, history, known_collection_id="5OAS074")
+
+        self.assertEqual(QueryResponse.model_validate_json(result).response, "The lease expires in 2030.")
+        self.collection_plugin.get_collection_data.assert_called_once_with("5OAS074")
+        call_kwargs = self.llm_request_manager._chat_completions.get_chat_message_content.call_args.kwargs
+        self.assertIs(call_kwargs["settings"], self.llm_request_manager._known_collection_execution_settings)
+        function_call, function_result = history.messages[4].items[0], history.messages[5].items[0]
+        self.assertIsInstance(function_call, FunctionCallContent)
+        self.assertEqual(function_call.name, "Collection-get_collection_data")
+        self.assertEqual(function_call.parse_arguments(), {"collection_id": "5OAS074"})
+        self.assertIsInstance(function_result, FunctionResultContent)
+        self.assertEqual(function_result.id, function_call.id)
+        self.assertEqual(function_result.result, '{"_id": "5OAS074"}')
+        self.assertEqual(history.messages[6].role, AuthorRole.ASSISTANT)
+
+    async def test_tool_call_is_required_without_known_collection(self):
+        history = self._history()
+
+        await self.llm_request_manager.answer_collection_question(
+            "system", "When does it expire?", self.collection_plugin, history)
+
+        self.collection_plugin.get_collection_data.assert_not_called()
+        call_kwargs = self.llm_request_manager._chat_completions.get_chat_message_content.call_args.kwargs
+        self.assertIs(call_kwargs["settings"], self.llm_request_manager._collection_execution_settings)
+        self.assertEqual(len(history.messages), 5)
+
+    async def test_tool_call_is_required_when_disabled(self):
+        self.llm_request_manager._inject_known_collection_data = False
+
+        await self.llm_request_manager.answer_collection_question(
+            "system", "When does it expire?", self.collection_plugin, self._history(), known_collection_id="5OAS074")
+
+        self.collection_plugin.get_collection_data.assert_not_called()
+        call_kwargs = self.llm_request_manager._chat_completions.get_chat_message_content.call_args.kwargs
+        self.assertIs(call_kwargs["settings"], self.llm_request_manager._collection_execution_settings)
+
+    async def test_streamed_answer_uses_known_collection_data_in_one_request(self):
+        async def get_streaming_chat_message_content(**kwargs):
+            yield StreamingChatMessageContent(
+                role=AuthorRole.ASSISTANT, choice_index=0,
+                content='{"response": "The lease expires in 2030.", "citations": []}')
+        self.llm_request_manager._chat_completions.get_streaming_chat_message_content = MagicMock(
+            side_effect=get_streaming_chat_message_content)
+
+        events = [event async for event in self.llm_request_manager.stream_collection_question(
+            "system", "When does it expire?", self.collection_plugin, self._history(), known_collection_id="5OAS074")]
+
+        self.assertEqual(events[-1].response.response, "The lease expires in 2030.")
+        self.llm_request_manager._chat_completions.get_streaming_chat_message_content.assert_called_once()
+        call_kwargs = self.llm_request_manager._chat_completions.get_streaming_chat_message_content.call_args.kwargs
+        self.assertIs(call_kwargs["settings"], self.llm_request_manager._known_collection_execution_settings)
+        self.assertIs(call_kwargs["kernel"], self.llm_request_manager._collection_kernel)
@@ -0,0 +1,295 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+
+from pymongo import errors
+
+from services import request_scheduler
+from services.request_scheduler import MongoRateLimiter, RequestScheduler, TokenBucket, get_request_scheduler
+
+
+class TestTokenBucket(unittest.TestCase):
+    @patch("services.request_scheduler.time")
+    def test_acquire_sends_burst_then_waits_for_refill(self, mock_time):
+        """Test that a full bucket lets a burst through, then waits for a token to be refilled."""
+        # Arrange
+        clock = [100.0]
+        mock_time.monotonic.side_effect = lambda: clock[0]
+        mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        bucket = TokenBucket(rate=2, burst=3)
+
+        # Act
+        for _ in range(4):
+            bucket.acquire()
+
+        # Assert
+        mock_time.sleep.assert_called_once_with(0.5)
+
+    @patch("services.request_scheduler.time")
+    def test_acquire_refills_up_to_burst(self, mock_time):
+        """Test that an idle bucket does not hold more than its burst."""
+        # Arrange
+        clock = [100.0]
+        mock_time.monotonic.side_effect = lambda: clock[0]
+        mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        bucket = TokenBucket(rate=1, burst=2)
+        bucket.acquire()
+        bucket.acquire()
+        clock[0] += 60
+
+        # Act
+        for _ in range(3):
+            bucket.acquire()
+
+        # Assert
+        mock_time.sleep.assert_called_once_with(1.0)
+
+
+class TestMongoRateLimiter(unittest.TestCase):
+    def setUp(self):
+        """Set up the test case with a mock collection."""
+        self.mock_collection = MagicMock()
+
+    @patch("services.request_scheduler.time")
+    def test_acquire_counts_request_in_current_window(self, mock_time):
+        """Test that a request under the limit of its window is sent at once."""
+        # Arrange
+        mock_time.time.return_value = 1000.5
+        self.mock_collection.find_one_and_update.return_value = {"count": 2}
+        rate_limiter = MongoRateLimiter(self.mock_collection, "content-understanding", rate=2)
+
+        # Act
+        rate_limiter.acquire()
+
+        # Assert
+        filter, update = self.mock_collection.find_one_and_update.call_args[0]
+        self.assertEqual(filter, {"_id": "content-understanding-1000"})
+        self.assertEqual(update, {"$inc": {"count": 1}})
+        self.assertTrue(self.mock_collection.find_one_and_update.call_args[1]["upsert"])
+        mock_time.sleep.assert_not_called()
+
+    @patch("services.request_scheduler.time")
+    def test_acquire_waits_for_next_window_when_full(self, mock_time):
+        """Test that a request over the limit of its window waits for the next window."""
+        # Arrange
+        mock_time.time.side_effect = [1000.25, 1001.0]
+        self.mock_collection.find_one_and_update.side_effect = [{"count": 3}, {"count": 1}]
+        rate_limiter = MongoRateLimiter(self.mock_collection, "content-understanding", rate=2)
+
+        # Act
+        rate_limiter.acquire()
+
+        # Assert
+        mock_time.sleep.assert_called_once_with(0.75)
+        filter = self.mock_collection.find_one_and_update.call_args[0][0]
+        self.assertEqual(filter, {"_id": "content-understanding-1001"})
+
+    @patch("services.request_scheduler.time")
+    def test_acquire_uses_longer_windows_below_one_request_per_second(self, mock_time):
+        """Test that a rate below one request per second lets a request through per longer window."""
+        # Arrange
+        mock_time.time.return_value = 1000.0
+        self.mock_collection.find_one_and_update.return_value = {"count": 1}
+        rate_limiter = MongoRateLimiter(self.mock_collection, "content-understanding", rate=0.25)
+
+        # Act
+        rate_limiter.acquire()
+
+        # Assert
+        filter = self.mock_collection.find_one_and_update.call_args[0][0]
+        self.assertEqual(filter, {"_id": "content-understanding-250"})
+
+    @patch("services.request_scheduler.time")
+    def test_acquire_retries_concurrent_creation_of_window(self, mock_time):
+        """Test that a counter created by another worker at the same time is incremented again."""
+        # Arrange
+        mock_time.time.return_value = 1000.0
+        self.mock_collection.find_one_and_update.side_effect = [errors.DuplicateKeyError("Duplicate"), {"count": 2}]
+        rate_limiter = MongoRateLimiter(self.mock_collection, "content-understanding", rate=2)
+
+        # Act
+        rate_limiter.acquire()
+
+        # Assert
+        self.assertEqual(self.mock_collection.find_one_and_update.call_count, 2)
+
+    def test_acquire_sends_request_when_database_fails(self):
+        """Test that a failure to count a request does not block it."""
+        # Arrange
+        self.mock_collection.find_one_and_update.side_effect = errors.PyMongoError("Unavailable")
+        rate_limiter = MongoRateLimiter(self.mock_collection, "content-understanding", rate=2)
+
+        # Act
+        with self.assertLogs(level="WARNING"):
+            rate_limiter.acquire()
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def setUp(self):
+        """Set up the test case with a mock rate limiter."""
+        self.mock_rate_limiter = Mock()
+        self.scheduler = RequestScheduler(
+            self.mock_rate_limiter,
+            max_concurrent_operations=2,
+            operation_timeout_seconds=300
+        )
+
+    def test_acquire_request_waits_for_rate_limiter(self):
+        """Test that a request waits for the rate limiter and its delay is counted."""
+        # Act
+        delay_seconds = self.scheduler.acquire_request()
+
+        # Assert
+        self.mock_rate_limiter.acquire.assert_called_once()
+        stats = self.scheduler.stats
+        self.assertEqual(stats.requests, 1)
+        self.assertEqual(stats.delayed_requests, 0)
+        self.assertAlmostEqual(stats.total_delay_seconds, delay_seconds)
+
+    @patch("services.request_scheduler.time")
+    def test_acquire_request_waits_while_paused(self, mock_time):
+        """Test that the requests wait for the time asked by a throttled response."""
+        # Arrange
+        clock = [100.0]
+        mock_time.monotonic.side_effect = lambda: clock[0]
+        mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        self.scheduler.pause(5)
+
+        # Act
+        delay_seconds = self.scheduler.acquire_request()
+
+        # Assert
+        mock_time.sleep.assert_called_once_with(5)
+        self.assertEqual(delay_seconds, 5)
+        stats = self.scheduler.stats
+        self.assertEqual(stats.throttled_responses, 1)
+        self.assertEqual(stats.delayed_requests, 1)
+        self.assertEqual(stats.max_delay_seconds, 5)
+
+    @patch("services.request_scheduler.time")
+    def test_wait_for_pause_does_not_wait_for_rate_limiter(self, mock_time):
+        """Test that the requests that are not rate limited only wait while the requests are paused."""
+        # Arrange
+        clock = [100.0]
+        mock_time.monotonic.side_effect = lambda: clock[0]
+        mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        self.scheduler.pause(3)
+
+        # Act
+        first_delay_seconds = self.scheduler.wait_for_pause()
+        second_delay_seconds = self.scheduler.wait_for_pause()
+
+        # Assert
+        self.assertEqual(first_delay_seconds, 3)
+        self.assertEqual(second_delay_seconds, 0)
+        self.mock_rate_limiter.acquire.assert_not_called()
+        self.assertEqual(self.scheduler.stats.requests, 0)
+
+    def test_acquire_operation_waits_for_released_slot(self):
+        """Test that an operation over the limit waits until another operation is completed."""
+        # Arrange
+        first_slot_id, _ = self.scheduler.acquire_operation()
+        self.scheduler.acquire_operation()
+        acquired = threading.Event()
+
+        def acquire_operation():
+            self.scheduler.acquire_operation()
+            acquired.set()
+
+        waiting_thread = threading.Thread(target=acquire_operation)
+
+        # Act
+        waiting_thread.start()
+        acquired_before_release = acquired.wait(0.1)
+        self.scheduler.release_operation(first_slot_id)
+        waiting_thread.join(5)
+
+        # Assert
+        self.assertFalse(acquired_before_release)
+        self.assertTrue(acquired.is_set())
+        stats = self.scheduler.stats
+        self.assertEqual(stats.operations, 3)
+        self.assertEqual(stats.delayed_operations, 1)
+
+    def test_acquire_operation_reclaims_expired_slots(self):
+        """Test that the slots of the operations that timed out are reclaimed."""
+        # Arrange
+        scheduler = RequestScheduler(self.mock_rate_limiter, max_concurrent_operations=1, operation_timeout_seconds=0)
+        scheduler.acquire_operation()
+
+        # Act
+        _, delay_seconds = scheduler.acquire_operation()
+
+        # Assert
+        self.assertLess(delay_seconds, 1)
+        self.assertEqual(scheduler.stats.operations, 2)
+
+    def test_release_operation_ignores_unknown_slots(self):
+        """Test that releasing a slot twice does not free another slot."""
+        # Arrange
+        slot_id, _ = self.scheduler.acquire_operation()
+        self.scheduler.acquire_operation()
+
+        # Act
+        self.scheduler.release_operation(slot_id)
+        self.scheduler.release_operation(slot_id)
+
+        # Assert
+        self.assertEqual(len(self.scheduler._operation_slots), 1)
+
+
+class TestGetRequestScheduler(unittest.TestCase):
+    def setUp(self):
+        """Set up the test case with a rate limited configuration."""
+        self.environment_config = MagicMock()
+        rate_limit = self.environment_config.content_understanding.rate_limit
+        rate_limit.enabled.value = "true"
+        rate_limit.requests_per_second.value = 2.0
+        rate_limit.burst.value = 4
+        rate_limit.max_concurrent_operations.value = 4
+        rate_limit.operation_timeout_seconds.value = 300
+        rate_limit.shared_across_workers.value = "false"
+        self.environment_config.cosmosdb.rate_limit_collection_name.value = "RateLimits"
+
+    def test_get_request_scheduler_disabled(self):
+        """Test that the requests are not scheduled when the rate limit is disabled."""
+        # Arrange
+        self.environment_config.content_understanding.rate_limit.enabled.value = "false"
+
+        # Act
+        with patch.object(request_scheduler, "request_scheduler", None):
+            scheduler = get_request_scheduler(self.environment_config)
+
+        # Assert
+        self.assertIsNone(scheduler)
+
+    def test_get_request_scheduler_returns_singleton(self):
+        """Test that the scheduler of the worker is created once, with a token bucket."""
+        # Act
+        with patch.object(request_scheduler, "request_scheduler", None):
+            scheduler = get_request_scheduler(self.environment_config)
+            other_scheduler = get_request_scheduler(self.environment_config)
+
+        # Assert
+        self.assertIs(scheduler, other_scheduler)
+        self.assertIsInstance(scheduler._rate_limiter, TokenBucket)
+
+    @patch("services.request_scheduler.CosmosClient")
+    def test_get_request_scheduler_shared_across_workers(self, mock_cosmos_client):
+        """Test that the rate limit is counted in Cosmos DB when it is shared across the workers."""
+        # Arrange
+        self.environment_config.content_understanding.rate_limit.shared_across_workers.value = "true"
+        mock_collection = mock_cosmos_client.return_value.get_collection.return_value
+
+        # Act
+        with patch.object(request_scheduler, "request_scheduler", None), \
+                patch.object(request_scheduler, "_indexed_collections", set()):
+            scheduler = get_request_scheduler(self.environment_config)
+
+        # Assert
+        self.assertIsInstance(scheduler._rate_limiter, MongoRateLimiter)
+        mock_collection.create_index.assert_called_once_with("_ts", expireAfterSeconds=60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from utils.bounding_box_utils import parse_bounding_regions
+
+
+class TestParseBoundingRegions(unittest.TestCase):
+    def test_parses_regions_of_all_sources(self):
+        regions = parse_bounding_regions([
+            "D(1,1.0512,2.1243,7.4412,2.1243,7.4412,2.5123,1.0512,2.5123)",
+            None,
+            "D(3,0.5,0.5,1,0.5,1,1,0.5,1);D(4,2,2,3,2,3,3,2,3)"
+        ])
+
+        self.assertEqual(regions.source_offsets.tolist(), [0, 1, 1, 3])
+        self.assertEqual(regions.source_indices.tolist(), [0, 2, 2])
+        self.assertEqual(regions.pages.tolist(), [1, 3, 4])
+        self.assertEqual(regions.polygon_offsets.tolist(), [0, 8, 16, 24])
+        polygons = regions.polygons()
+        np.testing.assert_allclose(polygons[0], [1.0512, 2.1243, 7.4412, 2.1243, 7.4412, 2.5123, 1.0512, 2.5123])
+        np.testing.assert_allclose(polygons[2], [2, 2, 3, 2, 3, 3, 2, 3])
+
+    def test_parses_polygons_with_any_number_of_points(self):
+        regions = parse_bounding_regions(["D(2,0,0,1,1)\nD(5,0,0,1,0,1,1,0,1,0,0.5)"])
+
+        self.assertEqual(regions.pages.tolist(), [2, 5])
+        self.assertEqual([len(polygon) for polygon in regions.polygons()], [4, 10])
+
+    def test_ignores_missing_and_malformed_sources(self):
+        regions = parse_bounding_regions(["", "box1", "D()", "D(1,a,b)", None])
+
+        self.assertEqual(regions.source_offsets.tolist(), [0, 0, 0, 0, 0, 0])
+        self.assertEqual(len(regions.pages), 0)
+        self.assertEqual(regions.polygons(), [])
+
+    def test_parses_no_sources(self):
+        regions = parse_bounding_regions([])
+
+        self.assertEqual(regions.source_offsets.tolist(), [0])
+        self.assertEqual(regions.source_indices.tolist(), [])
@@ -1,3 +1,5 @@
+import random
+import re
 import unittest
 from src.utils.citation_cleaner import (
     remove_inline_citations_preserve_spacing
@@ -40,3 +42,42 @@ class TestCitationCleaner(unittest.TestCase):
         text = "Word[1]adjacent and word [2] with space."
         expected = "Word adjacent and word with space."
         self.assertEqual(remove_inline_citations_preserve_spacing(text), expected)
+
+    def test_golden_corpus(self):
+        """Test the output on responses of the assistant, as produced by the previous four-pass cleanup."""
+        golden_corpus = [
+            ("The lease for collection 3OAS074 expires on December 31, 2030[1].",
+             "The lease for collection 3OAS074 expires on December 31, 2030."),
+            ("The current rent amount is $12,500 per month[1][2], payable in advance [3] .",
+             "The current rent amount is $12,500 per month, payable in advance."),
+            ("Lease 000123 has a renewal option[1]and a termination fee[2]of $5,000[3]!",
+             "Lease 000123 has a renewal option and a termination fee of $5,000!"),
+            ("The tenant waived its termination rights[1]:\n\n- Section 4.2[2]\n- Amendment 1 [3]",
+             "The tenant waived its termination rights: - Section 4.2\n- Amendment 1 "),
+            ("Rent escalates by 3%[12]annually[13];the first increase is in 2025[14]?",
+             "Rent escalates by 3% annually;the first increase is in 2025?"),
+            ("See the lease[1]/[2]/[3]for details.", "See the lease // for details."),
+            ("The array[0] index [notacitation] and [1a] are kept, [ 2 ] too.",
+             "The array index [notacitation] and [1a] are kept, [ 2 ] too."),
+            ("No citations here,  but   extra  spaces .", "No citations here, but extra spaces."),
+            # The character following a citation between words is not a word before the next citation
+            ("x[1]y[2]z", "x yz"),
+        ]
+        for text, expected in golden_corpus:
+            with self.subTest(text=text):
+                self.assertEqual(remove_inline_citations_preserve_spacing(text), expected)
+
+    def test_fuzz_matches_four_pass_cleanup(self):
+        """Test random texts against the previous four-pass cleanup."""
+        def four_pass_cleanup(text: str) -> str:
+            result = re.sub(r'(\S)\[\d+\](\S)', r'\1 \2', text)
+            result = re.sub(r'\[\d+\]', '', result)
+            result = re.sub(r'\s{2,}', ' ', result)
+            return re.sub(r'\s+([,.;:!?])', r'\1', result)
+
+        rng = random.Random(44)
+        tokens = ["a", "word", " ", "  ", "\n", "\t", "\u00a0", "[1]", "[23]", "[", "]", "1", ".", ",", "!", "?",
+                  ";", ":", "[\u0661]", "[]"]
+        for _ in range(5000):
+            text = "".join(rng.choice(tokens) for _ in range(rng.randint(1, 15)))
+            self.assertEqual(remove_inline_citations_preserve_spacing(text), four_pass_cleanup(text), repr(text))
@@ -0,0 +1,180 @@
+import json
+import random
+import string
+import unittest
+from utils.json_stream_utils import JsonStringFieldStreamReader, iter_json_objects, load_json_selection
+
+
+class TestIterJsonObjects(unittest.TestCase):
+
+    def test_finds_nested_objects(self):
+        payload = {"response": "text", "citations": [{"document": "a", "boxes": [{"page": 1}]}], "metadata": {}}
+
+        self.assertEqual(list(iter_json_objects(f"Here: {json.dumps(payload)} done")), [json.dumps(payload)])
+
+    def test_ignores_braces_and_quotes_in_strings(self):
+        payload = json.dumps({"response": 'a } b { c \\" d \\', "citations": ["}", "{"]})
+
+        self.assertEqual(list(iter_json_objects(f'He said "quote" then {payload}')), [payload])
+
+    def test_finds_consecutive_objects(self):
+        self.assertEqual(list(iter_json_objects('{"a": 1}\n{"b": {"c": 2}}{}')), ['{"a": 1}', '{"b": {"c": 2}}', '{}'])
+
+    def test_skips_unclosed_objects(self):
+        self.assertEqual(list(iter_json_objects('{"response": "Test", "citations": ["doc1"]')), [])
+        self.assertEqual(list(iter_json_objects("no json here")), [])
+
+    def test_fuzz_finds_embedded_objects(self):
+        rng = random.Random(29)
+        alphabet = string.ascii_letters + string.digits + ' {}[]"\\:,\n\u00e9'
+
+        def random_text(max_length: int) -> str:
+            return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length)))
+
+        def random_value(depth: int = 0):
+            kind = rng.randint(0, 4 if depth < 3 else 1)
+            if kind == 0:
+                return random_text(20)
+            if kind == 1:
+                return rng.randint(-1000, 1000)
+            if kind == 2:
+                return None
+            if kind == 3:
+                return [random_value(depth + 1) for _ in range(rng.randint(0, 3))]
+            return {random_text(5): random_value(depth + 1) for _ in range(rng.randint(0, 3))}
+
+        for _ in range(300):
+            objects = [
+                json.dumps({random_text(5): random_value() for _ in range(rng.randint(0, 4))},
+                           ensure_ascii=rng.random() < 0.5)
+                for _ in range(rng.randint(1, 3))
+            ]
+            # Prose around the objects does not contain braces, as they cannot be told apart from JSON
+            separators = ["".join(c for c in random_text(30) if c not in "{}") for _ in range(len(objects) + 1)]
+            text = separators[0] + "".join(obj + separator for obj, separator in zip(objects, separators[1:]))
+
+            self.assertEqual(list(iter_json_objects(text)), objects)
+
+
+class TestJsonStringFieldStreamReader(unittest.TestCase):
+
+    def _read_in_chunks(self, content: str, chunk_size: int) -> str:
+        reader = JsonStringFieldStreamReader("response")
+        return "".join(
+            reader.feed(content[index:index + chunk_size]) for index in range(0, len(content), chunk_size)
+        )
+
+    def test_reads_field_value_in_any_chunk_size(self):
+        expected = 'The lease "A" ends in 2030[1].\nIt can be renewed é \U0001F600[2].'
+        content = json.dumps({"response": expected, "citations": ["CITE1-1", "CITE1-2"]})
+
+        for chunk_size in range(1, 12):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self._read_in_chunks(content, chunk_size), expected)
+
+    def test_reads_unescaped_non_ascii_characters(self):
+        content = json.dumps({"response": "Café \U0001F600"}, ensure_ascii=False)
+
+        self.assertEqual(self._read_in_chunks(content, 1), "Café \U0001F600")
+
+    def test_ignores_other_and_nested_fields(self):
+        content = json.dumps({
+            "citations": ["response", "\"response\": \"no\""],
+            "nested": {"response": "no"},
+            "response": "yes",
+            "other": "no"
+        })
+
+        self.assertEqual(self._read_in_chunks(content, 3), "yes")
+
+    def test_field_read_once_value_is_closed(self):
+        reader = JsonStringFieldStreamReader("status")
+
+        self.assertEqual(reader.feed('{"id": "op", "status": "Runn'), "Runn")
+        self.assertFalse(reader.field_read)
+        self.assertEqual(reader.feed('ing", "result": {'), "ing")
+        self.assertTrue(reader.field_read)
+
+    def test_returns_nothing_when_field_is_missing(self):
+        self.assertEqual(self._read_in_chunks('{"citations": []}', 2), "")
+        self.assertEqual(self._read_in_chunks("plain text", 2), "")
+
+
+class TestLoadJsonSelection(unittest.TestCase):
+
+    def test_decodes_selected_parts_only(self):
+        document = {
+            "id": "operation",
+            "status": "Succeeded",
+            "result": {
+                "analyzerId": "analyzer",
+                "contents": [
+                    {"markdown": "# Lease", "pages": [{"words": [{"content": "Lease"}]}], "fields": {"Name": {}}},
+                    {"markdown": "# Amendment", "tables": [], "category": "amendment"}
+                ]
+            }
+        }
+        selection = {"status": True, "result": {"contents": [{"markdown": True, "fields": True, "category": True}]}}
+
+        self.assertEqual(load_json_selection(json.dumps(document, indent=2), selection), {
+            "status": "Succeeded",
+            "result": {"contents": [
+                {"markdown": "# Lease", "fields": {"Name": {}}},
+                {"markdown": "# Amendment", "category": "amendment"}
+            ]}
+        })
+
+    def test_decodes_values_of_other_types_as_is(self):
+        selection = {"result": {"contents": [{"markdown": True}]}}
+
+        self.assertEqual(load_json_selection('{"result": null}', selection), {"result": None})
+        self.assertEqual(load_json_selection('{"result": {"contents": "none"}}', selection),
+                         {"result": {"contents": "none"}})
+        self.assertEqual(load_json_selection(' [] ', selection), [])
+
+    def test_raises_on_invalid_json(self):
+        for text in ['{"status": "Succeeded"', '{"status" "Succeeded"}', '{"status": "a" "b"}', '{status: 1}',
+                     '{"result": {"contents": [{}, ]}}', '{"status": "a"} extra', '{"id": [1, 2}']:
+            with self.subTest(text=text):
+                with self.assertRaises(json.JSONDecodeError):
+                    load_json_selection(text, {"status": True, "result": {"contents": [{"markdown": True}]}})
+
+    def test_fuzz_matches_filtered_document(self):
+        rng = random.Random(45)
+        keys = ["a", "b", "c", "d\u00e9"]
+
+        def random_value(depth: int = 0):
+            kind = rng.randint(0, 4 if depth < 4 else 2)
+            if kind == 0:
+                return "".join(rng.choice(string.ascii_letters + ' {}[]":,\\') for _ in range(rng.randint(0, 8)))
+            if kind == 1:
+                return rng.choice([rng.randint(-1000, 1000), rng.random(), None, True])
+            if kind == 2:
+                return {}
+            if kind == 3:
+                return [random_value(depth + 1) for _ in range(rng.randint(0, 3))]
+            return {rng.choice(keys): random_value(depth + 1) for _ in range(rng.randint(0, 4))}
+
+        def random_selection(depth: int = 0):
+            kind = rng.randint(0, 2 if depth < 3 else 0)
+            if kind == 0:
+                return True
+            if kind == 1:
+                return [random_selection(depth + 1)]
+            return {key: random_selection(depth + 1) for key in rng.sample(keys, rng.randint(0, len(keys)))}
+
+        for _ in range(500):
+            value = random_value()
+            selection = random_selection()
+            text = json.dumps(value, indent=rng.choice([None, 1]), ensure_ascii=rng.random() < 0.5)
+
+            self.assertEqual(load_json_selection(text, selection), _select(value, selection))
+
+
+def _select(value, selection):
+    """Filters a decoded JSON value with a selection, as load_json_selection."""
+    if isinstance(selection, dict) and isinstance(value, dict):
+        return {key: _select(item, selection[key]) for key, item in value.items() if key in selection}
+    if isinstance(selection, list) and isinstance(value, list):
+        return [_select(item, selection[0]) for item in value]
+    return value
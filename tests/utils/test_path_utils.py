@@ -1,7 +1,8 @@
 from unittest import TestCase
 from utils.path_utils import (
     build_adls_markdown_file_path,
-    build_adls_pdf_file_path
+    build_adls_pdf_file_path,
+    parse_adls_pdf_file_path
 )
 from models.ingestion_models import IngestDocumentType
 
@@ -68,3 +69,35 @@ class TestBuildAdlsPdfFilePath(TestCase):
         with self.assertRaises(ValueError) as context:
             build_adls_pdf_file_path(doc_type, collection_id, file_name, lease_id)
         self.assertEqual(str(context.exception), "Lease ID must be provided for COLLECTION document type.")
+
+
+class TestParseAdlsPdfFilePath(TestCase):
+
+    def test_when_pdf_file_path_return_its_parts(self):
+        """Tests the parsing of a PDF file path into the arguments it was built from."""
+        # arrange
+        path = "Collections/test_collection_id/test_lease_id/test_file.pdf"
+
+        # act
+        result = parse_adls_pdf_file_path(path)
+
+        # assert
+        self.assertEqual(
+            result,
+            (IngestDocumentType.COLLECTION, "test_collection_id", "test_file.pdf", "test_lease_id")
+        )
+        self.assertEqual(build_adls_pdf_file_path(*result), path)
+
+    def test_when_not_pdf_file_path_raises_value_error(self):
+        """Tests that a ValueError is raised for the paths that are not PDF files of a collection lease."""
+        paths = [
+            "Collections/test_collection_id/test_lease_id/test_file.md",
+            "Collections/test_collection_id/test_file.pdf",
+            "Collections/test_collection_id/test_lease_id/folder/test_file.pdf",
+            "Collections//test_lease_id/test_file.pdf",
+            "Others/test_collection_id/test_lease_id/test_file.pdf",
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                with self.assertRaises(ValueError):
+                    parse_adls_pdf_file_path(path)
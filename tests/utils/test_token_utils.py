@@ -0,0 +1,28 @@
+import unittest
+from semantic_kernel.contents import FunctionCallContent, FunctionResultContent
+from semantic_kernel.contents.chat_message_content import ChatMessageContent, AuthorRole
+from utils.token_utils import MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens, estimate_tokens
+
+
+class TestEstimateTokens(unittest.TestCase):
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abc"), 1)
+        self.assertEqual(estimate_tokens("a" * 400), 100)
+
+    def test_estimate_message_tokens_of_text_message(self):
+        message = ChatMessageContent(role=AuthorRole.USER, content="a" * 40)
+
+        self.assertEqual(estimate_message_tokens(message), MESSAGE_OVERHEAD_TOKENS + 10)
+
+    def test_estimate_message_tokens_includes_function_calls_and_results(self):
+        call = ChatMessageContent(role=AuthorRole.ASSISTANT, items=[
+            FunctionCallContent(id="call1", function_name="get", plugin_name="Data", arguments='{"id": "12"}')
+        ])
+        result = ChatMessageContent(role=AuthorRole.TOOL, items=[
+            FunctionResultContent(id="call1", function_name="get", plugin_name="Data", result="r" * 400)
+        ])
+
+        self.assertEqual(estimate_message_tokens(call), MESSAGE_OVERHEAD_TOKENS + 5)
+        self.assertEqual(estimate_message_tokens(result), MESSAGE_OVERHEAD_TOKENS + 100)